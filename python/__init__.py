@@ -2,17 +2,21 @@
 量化交易機器人 Python 策略層
 
 這個模組提供了策略開發、回測分析和數據處理的Python框架。
+子模塊在第一次訪問導出名稱時才導入。
 """
 
+from .lazy_exports import make_lazy_getattr
+
 __version__ = "0.1.0"
 __author__ = "Trading Bot Team"
 
-from .strategies import BaseStrategy
-from .backtest import BacktestEngine
-# from .analysis import TechnicalIndicators  # TODO: 實現後取消註釋
+# 導出名稱 -> 所在子模塊
+_EXPORTS = {
+    "BaseStrategy": ".strategies",
+    "BacktestEngine": ".backtest",
+    # "TechnicalIndicators": ".analysis",  # TODO: 實現後取消註釋
+}
+
+__all__ = list(_EXPORTS)
 
-__all__ = [
-    "BaseStrategy",
-    "BacktestEngine",
-    # "TechnicalIndicators",  # TODO: 實現後添加
-]
+__getattr__, __dir__ = make_lazy_getattr(_EXPORTS, __name__)
@@ -2,8 +2,58 @@
 回測模塊
 
 提供策略回測功能，包括回測引擎、績效分析等。
+導出的名稱在第一次訪問時才導入對應子模塊。
 """
 
-from .engine import BacktestEngine, BacktestConfig, BacktestResult, run_backtest
+import os
+import sys
 
-__all__ = ["BacktestEngine", "BacktestConfig", "BacktestResult", "run_backtest"]
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from lazy_exports import make_lazy_getattr
+
+# 導出名稱 -> 所在子模塊
+_EXPORTS = {
+    "BacktestEngine": ".engine",
+    "BacktestConfig": ".engine",
+    "BacktestResult": ".engine",
+    "run_backtest": ".engine",
+    "CandleStore": ".candle_store",
+    "Bar": ".incremental",
+    "IncrementalStrategy": ".incremental",
+    "ReconfigurableStrategy": ".incremental",
+    "RollingMean": ".incremental",
+    "supports_incremental": ".incremental",
+    "supports_reconfigure": ".incremental",
+    "TradeLedger": ".ledger",
+    "FloatBuffer": ".metrics",
+    "ReturnStatistics": ".metrics",
+    "BacktestCache": ".result_cache",
+    "CacheStats": ".result_cache",
+    "get_default_cache": ".result_cache",
+    "make_cache_key": ".result_cache",
+    "VectorizedBacktestEngine": ".vectorized",
+    "run_vectorized_backtest": ".vectorized",
+    "signals_to_positions": ".vectorized",
+    "SharedOHLCV": ".shared_data",
+    "SharedOHLCVHandle": ".shared_data",
+    "ParameterSweep": ".sweep",
+    "SweepResult": ".sweep",
+    "expand_grid": ".sweep",
+    "rank_results": ".sweep",
+    "run_parameter_sweep": ".sweep",
+    "FoldResult": ".walk_forward",
+    "WalkForwardFold": ".walk_forward",
+    "WalkForwardOptimizer": ".walk_forward",
+    "WalkForwardResult": ".walk_forward",
+    "make_folds": ".walk_forward",
+    "run_walk_forward": ".walk_forward",
+    "stitch_results": ".walk_forward",
+    "MonteCarloResult": ".monte_carlo",
+    "MonteCarloSimulator": ".monte_carlo",
+    "run_monte_carlo": ".monte_carlo",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__, __dir__ = make_lazy_getattr(_EXPORTS, __name__)
@@ -0,0 +1,281 @@
+"""
+本地K線存儲
+
+按交易對和月份分區保存OHLCV數據，每個分區是兩個定寬的 .npy 文件：
+timestamp.npy 為按時間排序的納秒時間戳（UTC），values.npy 為 (5, n) 的價格矩陣。
+讀取時以內存映射方式打開分區，在時間戳上二分查找日期範圍，
+只有落在範圍內的數據會被訪問，適合從多年的分鐘數據中取出一小段做回測。
+
+目錄結構：
+    root/
+        BTCUSDT/
+            meta.json
+            2024-01/timestamp.npy
+            2024-01/values.npy
+"""
+
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .shared_data import OHLCV_COLUMNS, ohlcv_frame
+
+logger = logging.getLogger(__name__)
+
+# 存儲格式版本
+STORE_VERSION = 1
+
+_SYMBOL_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+@dataclass(frozen=True)
+class CandlePartition:
+    """單個月份分區的內存映射視圖"""
+
+    month: str
+    timestamps: np.ndarray
+    values: np.ndarray
+
+    def bounds(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        """日期範圍（閉區間）在分區內對應的位置區間"""
+        lo = 0 if start is None else int(np.searchsorted(self.timestamps, start, "left"))
+        hi = (
+            len(self.timestamps)
+            if end is None
+            else int(np.searchsorted(self.timestamps, end, "right"))
+        )
+        return lo, hi
+
+
+def _month_of(timestamp: int) -> str:
+    """納秒時間戳所在的月份分區名"""
+    return str(np.datetime64(timestamp, "ns").astype("datetime64[M]"))
+
+
+class CandleStore:
+    """
+    按交易對和月份分區的K線存儲
+
+    寫入時與已有分區合併並按時間戳去重（新數據優先）；
+    讀取返回的 DataFrame 在單個分區內直接引用內存映射，跨分區時只複製範圍內的數據。
+    """
+
+    def __init__(self, root: Union[str, os.PathLike]):
+        """
+        初始化存儲
+
+        Args:
+            root: 存儲根目錄，不存在時自動創建
+        """
+        self.root = os.fspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # 路徑與元數據
+    # ------------------------------------------------------------------
+
+    def _symbol_dir(self, symbol: str) -> str:
+        if not _SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"無效的交易對名稱: {symbol}")
+        return os.path.join(self.root, symbol)
+
+    def _read_meta(self, symbol: str) -> Optional[dict]:
+        path = os.path.join(self._symbol_dir(symbol), "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"不支持的存儲版本: {meta.get('version')}")
+        return meta
+
+    def _write_meta(self, symbol: str, tz: Optional[str]) -> None:
+        path = os.path.join(self._symbol_dir(symbol), "meta.json")
+        meta = {"version": STORE_VERSION, "tz": tz, "columns": list(OHLCV_COLUMNS)}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def symbols(self) -> List[str]:
+        """已存儲的交易對"""
+        return sorted(
+            name
+            for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, "meta.json"))
+        )
+
+    def partitions(self, symbol: str) -> List[str]:
+        """交易對的月份分區，格式為 YYYY-MM"""
+        symbol_dir = self._symbol_dir(symbol)
+        if not os.path.isdir(symbol_dir):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(symbol_dir)
+            if os.path.exists(os.path.join(symbol_dir, name, "timestamp.npy"))
+        )
+
+    def timezone(self, symbol: str) -> Optional[str]:
+        """交易對數據的時區"""
+        meta = self._read_meta(symbol)
+        if meta is None:
+            raise KeyError(f"存儲中沒有交易對: {symbol}")
+        return meta["tz"]
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+
+    def write(self, symbol: str, data: pd.DataFrame) -> None:
+        """
+        寫入K線數據
+
+        Args:
+            symbol: 交易對
+            data: 以時間為索引、包含OHLCV列的數據
+        """
+        missing = [col for col in OHLCV_COLUMNS if col not in data.columns]
+        if missing:
+            raise ValueError(f"數據缺少必要列: {missing}")
+        if data.empty:
+            return
+
+        index = pd.DatetimeIndex(data.index)
+        tz = str(index.tz) if index.tz is not None else None
+        meta = self._read_meta(symbol)
+        if meta is not None and meta["tz"] != tz:
+            raise ValueError(f"時區不一致: 存儲為 {meta['tz']}，寫入數據為 {tz}")
+        if tz:
+            index = index.tz_convert("UTC").tz_localize(None)
+
+        timestamps = index.as_unit("ns").asi8
+        values = np.vstack([data[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS])
+
+        os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+        if meta is None:
+            self._write_meta(symbol, tz)
+
+        months = timestamps.view("datetime64[ns]").astype("datetime64[M]")
+        for month in np.unique(months):
+            selected = months == month
+            self._write_partition(
+                symbol, str(month), timestamps[selected], values[:, selected]
+            )
+
+        logger.info(f"K線已寫入: {symbol}, {len(timestamps)} 條")
+
+    def _write_partition(
+        self, symbol: str, month: str, timestamps: np.ndarray, values: np.ndarray
+    ) -> None:
+        """與已有分區合併後寫入"""
+        partition_dir = os.path.join(self._symbol_dir(symbol), month)
+        existing = self._open_partition(symbol, month)
+        if existing is not None:
+            # 新數據在前，np.unique 保留首次出現的位置，因此重複時間戳以新數據為準
+            timestamps = np.concatenate([timestamps, existing.timestamps])
+            values = np.concatenate([values, existing.values], axis=1)
+            del existing
+
+        timestamps, order = np.unique(timestamps, return_index=True)
+        values = np.ascontiguousarray(values[:, order])
+
+        os.makedirs(partition_dir, exist_ok=True)
+        for name, array in (("values", values), ("timestamp", timestamps)):
+            path = os.path.join(partition_dir, f"{name}.npy")
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(path + ".tmp", path)
+
+    # ------------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------------
+
+    def _open_partition(self, symbol: str, month: str) -> Optional[CandlePartition]:
+        """以內存映射方式打開分區"""
+        partition_dir = os.path.join(self._symbol_dir(symbol), month)
+        path = os.path.join(partition_dir, "timestamp.npy")
+        if not os.path.exists(path):
+            return None
+        return CandlePartition(
+            month=month,
+            timestamps=np.load(path, mmap_mode="r"),
+            values=np.load(os.path.join(partition_dir, "values.npy"), mmap_mode="r"),
+        )
+
+    def _to_storage_time(self, value, tz: Optional[str]) -> Optional[int]:
+        """把查詢時間轉換為存儲使用的納秒時間戳"""
+        if value is None:
+            return None
+        ts = pd.Timestamp(value)
+        if tz:
+            ts = ts.tz_localize(tz) if ts.tz is None else ts
+            ts = ts.tz_convert("UTC").tz_localize(None)
+        elif ts.tz is not None:
+            raise ValueError("存儲數據沒有時區，查詢時間也不能帶時區")
+        return ts.as_unit("ns").value
+
+    def read(
+        self,
+        symbol: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> pd.DataFrame:
+        """
+        讀取日期範圍內的K線
+
+        Args:
+            symbol: 交易對
+            start_date: 開始時間（含），默認從最早的數據開始
+            end_date: 結束時間（含），默認到最新的數據為止
+
+        Returns:
+            以時間為索引的OHLCV數據
+        """
+        tz = self.timezone(symbol)
+        start = self._to_storage_time(start_date, tz)
+        end = self._to_storage_time(end_date, tz)
+
+        first_month = None if start is None else _month_of(start)
+        last_month = None if end is None else _month_of(end)
+
+        timestamp_parts = []
+        value_parts = []
+        for month in self.partitions(symbol):
+            if (first_month and month < first_month) or (last_month and month > last_month):
+                continue
+            partition = self._open_partition(symbol, month)
+            lo, hi = partition.bounds(start, end)
+            if hi > lo:
+                timestamp_parts.append(partition.timestamps[lo:hi])
+                value_parts.append(partition.values[:, lo:hi])
+
+        if not timestamp_parts:
+            return ohlcv_frame(
+                np.empty(0, dtype=np.int64), np.empty((len(OHLCV_COLUMNS), 0)), tz
+            )
+        if len(timestamp_parts) == 1:
+            # 單個分區：直接引用內存映射，不複製數據
+            return ohlcv_frame(timestamp_parts[0], value_parts[0], tz)
+        return ohlcv_frame(
+            np.concatenate(timestamp_parts), np.concatenate(value_parts, axis=1), tz
+        )
+
+    def time_range(self, symbol: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """交易對數據的最早和最晚時間"""
+        months = self.partitions(symbol)
+        if not months:
+            raise KeyError(f"存儲中沒有交易對: {symbol}")
+        tz = self.timezone(symbol)
+        first = self._open_partition(symbol, months[0]).timestamps[0]
+        last = self._open_partition(symbol, months[-1]).timestamps[-1]
+        bounds = pd.DatetimeIndex(np.array([first, last]).view("datetime64[ns]"))
+        if tz:
+            bounds = bounds.tz_localize("UTC").tz_convert(tz)
+        return bounds[0], bounds[1]
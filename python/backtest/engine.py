@@ -7,9 +7,9 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Callable, Dict, List, Optional, Tuple, Any, Union
 import logging
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
 import sys
@@ -20,8 +20,17 @@ sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from strategies.base import BaseStrategy, StrategySignal, SignalType, PositionSide
 from strategies.sma_crossover import SMACrossoverStrategy
 
+from .candle_store import CandleStore
+from .incremental import Bar, supports_incremental
+from .ledger import TradeLedger
+from .metrics import FloatBuffer, ReturnStatistics
+from .result_cache import BacktestCache, make_cache_key
+
 logger = logging.getLogger(__name__)
 
+# 進度回調：(已處理K線數, 總K線數, 當前績效指標)
+ProgressCallback = Callable[[int, int, Dict[str, float]], None]
+
 
 class BacktestStatus(Enum):
     """回測狀態"""
@@ -43,6 +52,7 @@ class BacktestConfig:
     commission: float = 0.001  # 0.1%
     slippage: float = 0.0001  # 0.01%
     max_position_size: float = 0.95  # 95%的資金
+    warmup_bars: int = 0  # 數據開頭只用於策略預熱的K線數，不交易也不計入權益
 
     def __post_init__(self):
         """驗證配置"""
@@ -52,6 +62,8 @@ class BacktestConfig:
             raise ValueError("初始資金必須大於0")
         if not 0 <= self.commission <= 1:
             raise ValueError("手續費必須在0和1之間")
+        if self.warmup_bars < 0:
+            raise ValueError("預熱K線數不能小於0")
 
 
 @dataclass
@@ -82,9 +94,9 @@ class BacktestResult:
     volatility: float = 0.0
 
     # 詳細記錄
-    trades: List[Dict] = field(default_factory=list)
-    daily_returns: List[float] = field(default_factory=list)
-    equity_curve: List[float] = field(default_factory=list)
+    trades: Union[TradeLedger, List[Dict]] = field(default_factory=TradeLedger)
+    daily_returns: Union[np.ndarray, List[float]] = field(default_factory=list)
+    equity_curve: Union[np.ndarray, List[float]] = field(default_factory=list)
 
     @property
     def win_rate(self) -> float:
@@ -103,6 +115,9 @@ class BacktestResult:
     @property
     def profit_factor(self) -> float:
         """盈利因子"""
+        if isinstance(self.trades, TradeLedger):
+            return self.trades.profit_factor()
+
         total_profit = sum(trade["pnl"] for trade in self.trades if trade["pnl"] > 0)
         total_loss = abs(sum(trade["pnl"] for trade in self.trades if trade["pnl"] < 0))
 
@@ -134,18 +149,34 @@ class BacktestEngine:
         self.max_drawdown = 0.0
 
         # 記錄
-        self.trades = []
-        self.daily_returns = []
-        self.equity_curve = [config.initial_capital]
+        self.trades = TradeLedger()
+        self.daily_returns = FloatBuffer()
+        self.equity_curve = FloatBuffer(initial=[config.initial_capital])
+        self.return_stats = ReturnStatistics()
+
+        # 進度回調
+        self._progress_callback: Optional[ProgressCallback] = None
+        self._progress_total = 0
+        self._progress_interval = 1
+        self._bars_processed = 0
 
         logger.info(f"回測引擎初始化完成: {config.strategy.name}")
 
-    def run(self, data: pd.DataFrame) -> BacktestResult:
+    def run(
+        self,
+        data: Union[pd.DataFrame, CandleStore],
+        symbol: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        progress_interval: Optional[int] = None,
+    ) -> BacktestResult:
         """
         運行回測
 
         Args:
-            data: 歷史數據，包含OHLCV列
+            data: 歷史數據，包含OHLCV列；也可以是K線存儲，此時只讀取回測區間內的數據
+            symbol: 交易對，data 為K線存儲時必填
+            progress_callback: 進度回調，參數為已處理K線數、總K線數和 current_metrics()
+            progress_interval: 每處理多少根K線回調一次，默認約為總數的1%
 
         Returns:
             回測結果
@@ -154,12 +185,25 @@ class BacktestEngine:
             self.status = BacktestStatus.RUNNING
             logger.info(f"開始回測: {self.strategy.name}")
 
+            if isinstance(data, CandleStore):
+                data = self._load_from_store(data, symbol)
+
+            # 預熱K線不計入進度
+            bars = len(data) - self.config.warmup_bars
+            self._progress_callback = progress_callback
+            self._progress_total = bars
+            self._progress_interval = progress_interval or max(bars // 100, 1)
+            self._bars_processed = 0
+
             # 重置策略狀態
             self.strategy.reset()
 
             # 驗證數據
             self._validate_data(data)
 
+            # 按數據長度預分配權益曲線
+            self.equity_curve.reserve(len(self.equity_curve) + bars)
+
             # 運行回測
             self._run_backtest(data)
 
@@ -176,6 +220,12 @@ class BacktestEngine:
             logger.error(f"回測失敗: {e}")
             raise
 
+    def _load_from_store(self, store: CandleStore, symbol: Optional[str]) -> pd.DataFrame:
+        """從K線存儲讀取回測區間內的數據"""
+        if not symbol:
+            raise ValueError("從K線存儲回測時必須指定交易對")
+        return store.read(symbol, self.config.start_date, self.config.end_date)
+
     def _validate_data(self, data: pd.DataFrame) -> None:
         """驗證數據格式"""
         required_columns = ["open", "high", "low", "close", "volume"]
@@ -184,8 +234,8 @@ class BacktestEngine:
         if missing_columns:
             raise ValueError(f"數據缺少必要列: {missing_columns}")
 
-        if len(data) < 100:
-            raise ValueError("數據量不足，至少需要100條記錄")
+        if len(data) - self.config.warmup_bars < 100:
+            raise ValueError("數據量不足，預熱K線之外至少需要100條記錄")
 
         # 確保數據按時間排序
         if not data.index.is_monotonic_increasing:
@@ -194,35 +244,94 @@ class BacktestEngine:
 
     def _run_backtest(self, data: pd.DataFrame) -> None:
         """運行回測邏輯"""
+        if supports_incremental(self.strategy):
+            self._run_incremental(data)
+        else:
+            self._run_prefix(data)
+
+    def _run_incremental(self, data: pd.DataFrame) -> None:
+        """
+        增量回測：每根K線只把新K線交給策略的 on_bar，總耗時隨K線數線性增長
+
+        預熱K線同樣交給 on_bar，但忽略其信號。
+        """
+        timestamps = data.index
+        opens = data["open"].to_numpy(dtype=float)
+        highs = data["high"].to_numpy(dtype=float)
+        lows = data["low"].to_numpy(dtype=float)
+        closes = data["close"].to_numpy(dtype=float)
+        volumes = data["volume"].to_numpy(dtype=float)
+
         previous_date = None
+        warmup = self.config.warmup_bars
 
-        for current_time, row in data.iterrows():
-            current_price = row["close"]
+        for i in range(len(data)):
+            current_time = timestamps[i]
+            bar = Bar(
+                current_time, opens[i], highs[i], lows[i], closes[i], volumes[i]
+            )
+            signals = self.strategy.on_bar(bar)
+            if i < warmup:
+                continue
+            previous_date = self._step(current_time, closes[i], signals, previous_date)
+
+    def _run_prefix(self, data: pd.DataFrame) -> None:
+        """
+        前綴回測：每根K線都把截至當前的全部歷史交給 generate_signals
 
-            # 更新每日收益（如果跨日）
-            if previous_date is not None and current_time.date() != previous_date:
-                self._update_daily_return()
+        僅作為未實現增量接口的策略的後備路徑，耗時隨K線數平方增長。
+        預熱K線不單獨調用策略，只包含在之後每次傳入的歷史中。
+        """
+        previous_date = None
 
-            # 生成交易信號
+        for current_time, row in data.iloc[self.config.warmup_bars:].iterrows():
             # 為了模擬實際交易，我們只使用截止當前時間的數據
             available_data = data.loc[:current_time]
             signals = self.strategy.generate_signals(available_data)
+            previous_date = self._step(current_time, row["close"], signals, previous_date)
+
+    def _step(
+        self,
+        current_time: datetime,
+        current_price: float,
+        signals: List[StrategySignal],
+        previous_date,
+    ):
+        """
+        處理單根K線的信號並更新賬戶狀態
+
+        Returns:
+            當前K線的日期，供下一根K線判斷是否跨日
+        """
+        # 更新每日收益（如果跨日）
+        if previous_date is not None and current_time.date() != previous_date:
+            self._update_daily_return()
+
+        # 處理信號
+        for signal in signals or []:
+            if signal.signal_type != SignalType.HOLD:
+                self._process_signal(signal, current_price, current_time)
 
-            # 處理信號
-            for signal in signals:
-                if signal.signal_type != SignalType.HOLD:
-                    self._process_signal(signal, current_price, current_time)
+        # 更新未實現盈虧
+        self._update_unrealized_pnl(current_price)
 
-            # 更新未實現盈虧
-            self._update_unrealized_pnl(current_price)
+        # 更新權益曲線
+        self.equity_curve.append(self.current_capital)
 
-            # 更新權益曲線
-            self.equity_curve.append(self.current_capital)
+        # 更新最大回撤
+        self._update_max_drawdown()
 
-            # 更新最大回撤
-            self._update_max_drawdown()
+        if self._progress_callback is not None:
+            self._bars_processed += 1
+            if (
+                self._bars_processed % self._progress_interval == 0
+                or self._bars_processed == self._progress_total
+            ):
+                self._progress_callback(
+                    self._bars_processed, self._progress_total, self.current_metrics()
+                )
 
-            previous_date = current_time.date()
+        return current_time.date()
 
     def _process_signal(
         self, signal: StrategySignal, current_price: float, current_time: datetime
@@ -267,18 +376,17 @@ class BacktestEngine:
         self.current_capital -= total_cost
 
         # 記錄交易
-        trade = {
-            "timestamp": timestamp,
-            "action": "買入",
-            "price": price,
-            "quantity": quantity,
-            "commission": commission,
-            "slippage": slippage_cost,
-            "capital": self.current_capital,
-            "signal_strength": signal.strength,
-            "pnl": 0.0,  # 開倉時盈虧為0
-        }
-        self.trades.append(trade)
+        self.trades.record(
+            timestamp=timestamp,
+            action="買入",
+            price=price,
+            quantity=quantity,
+            commission=commission,
+            slippage=slippage_cost,
+            capital=self.current_capital,
+            signal_strength=signal.strength,
+            pnl=0.0,  # 開倉時盈虧為0
+        )
 
         logger.debug(
             f"買入執行: 價格={price:.4f}, 數量={quantity:.6f}, 成本={total_cost:.2f}"
@@ -320,18 +428,17 @@ class BacktestEngine:
         self.current_capital += position_value - total_cost
 
         # 記錄交易
-        trade = {
-            "timestamp": timestamp,
-            "action": action,
-            "price": price,
-            "quantity": self.position_size,
-            "commission": commission,
-            "slippage": slippage_cost,
-            "capital": self.current_capital,
-            "signal_strength": 1.0,  # 平倉信號強度設為1
-            "pnl": pnl - total_cost,  # 扣除交易成本
-        }
-        self.trades.append(trade)
+        self.trades.record(
+            timestamp=timestamp,
+            action=action,
+            price=price,
+            quantity=self.position_size,
+            commission=commission,
+            slippage=slippage_cost,
+            capital=self.current_capital,
+            signal_strength=1.0,  # 平倉信號強度設為1
+            pnl=pnl - total_cost,  # 扣除交易成本
+        )
 
         # 重置持倉
         self.current_position = PositionSide.FLAT
@@ -357,6 +464,7 @@ class BacktestEngine:
             self.equity_curve[-1] - self.equity_curve[-2]
         ) / self.equity_curve[-2]
         self.daily_returns.append(daily_return)
+        self.return_stats.update(daily_return)
 
     def _update_max_drawdown(self) -> None:
         """更新最大回撤"""
@@ -371,10 +479,10 @@ class BacktestEngine:
         """生成回測結果"""
         # 基本統計
         total_trades = len(self.trades)
-        winning_trades = sum(1 for trade in self.trades if trade["pnl"] > 0)
-        losing_trades = sum(1 for trade in self.trades if trade["pnl"] < 0)
+        winning_trades = self.trades.winning_count
+        losing_trades = self.trades.losing_count
 
-        total_pnl = sum(trade["pnl"] for trade in self.trades)
+        total_pnl = self.trades.total_pnl
         total_return = (
             self.current_capital - self.config.initial_capital
         ) / self.config.initial_capital
@@ -383,12 +491,10 @@ class BacktestEngine:
         days = (self.config.end_date - self.config.start_date).days
         annual_return = (1 + total_return) ** (365 / days) - 1 if days > 0 else 0
 
-        # 計算風險指標
-        sharpe_ratio = self._calculate_sharpe_ratio()
-        sortino_ratio = self._calculate_sortino_ratio()
-        volatility = (
-            np.std(self.daily_returns) * np.sqrt(252) if self.daily_returns else 0
-        )
+        # 風險指標由流式統計量直接讀取
+        sharpe_ratio = self.return_stats.sharpe_ratio
+        sortino_ratio = self.return_stats.sortino_ratio
+        volatility = self.return_stats.volatility
 
         return BacktestResult(
             strategy_name=self.strategy.name,
@@ -407,63 +513,90 @@ class BacktestEngine:
             sortino_ratio=sortino_ratio,
             volatility=volatility,
             trades=self.trades,
-            daily_returns=self.daily_returns,
-            equity_curve=self.equity_curve,
+            daily_returns=self.daily_returns.values,
+            equity_curve=self.equity_curve.values,
         )
 
+    def current_metrics(self) -> Dict[str, float]:
+        """
+        當前K線為止的績效指標
+
+        所有指標都由回測過程中維護的狀態直接讀取，可以在任意K線調用。
+        """
+        initial_capital = self.config.initial_capital
+        return {
+            "bars": len(self.equity_curve) - 1,
+            "equity": self.current_capital,
+            "total_return": (self.current_capital - initial_capital) / initial_capital,
+            "max_drawdown": self.max_drawdown,
+            "sharpe_ratio": self.return_stats.sharpe_ratio,
+            "sortino_ratio": self.return_stats.sortino_ratio,
+            "volatility": self.return_stats.volatility,
+        }
+
     def _calculate_sharpe_ratio(self) -> float:
         """計算夏普比率"""
-        if not self.daily_returns:
-            return 0.0
+        return self.return_stats.sharpe_ratio
 
-        avg_return = np.mean(self.daily_returns)
-        std_return = np.std(self.daily_returns)
+    def _calculate_sortino_ratio(self) -> float:
+        """計算索蒂諾比率"""
+        return self.return_stats.sortino_ratio
 
-        if std_return == 0:
-            return 0.0
 
-        # 假設無風險利率為0
-        return avg_return / std_return * np.sqrt(252)
+def _result_metrics(result: BacktestResult) -> Dict[str, float]:
+    """由回測結果生成與 current_metrics 相同格式的指標"""
+    return {
+        "bars": len(result.equity_curve) - 1,
+        "equity": result.final_capital,
+        "total_return": result.total_return,
+        "max_drawdown": result.max_drawdown,
+        "sharpe_ratio": result.sharpe_ratio,
+        "sortino_ratio": result.sortino_ratio,
+        "volatility": result.volatility,
+    }
 
-    def _calculate_sortino_ratio(self) -> float:
-        """計算索蒂諾比率"""
-        if not self.daily_returns:
-            return 0.0
 
-        avg_return = np.mean(self.daily_returns)
-        negative_returns = [r for r in self.daily_returns if r < 0]
+def calculate_volatility(daily_returns: Union[np.ndarray, List[float]]) -> float:
+    """計算年化波動率"""
+    return ReturnStatistics.from_returns(daily_returns).volatility
 
-        if not negative_returns:
-            return float("inf") if avg_return > 0 else 0.0
 
-        downside_deviation = np.std(negative_returns)
+def calculate_sharpe_ratio(daily_returns: Union[np.ndarray, List[float]]) -> float:
+    """計算夏普比率"""
+    return ReturnStatistics.from_returns(daily_returns).sharpe_ratio
 
-        if downside_deviation == 0:
-            return 0.0
 
-        return avg_return / downside_deviation * np.sqrt(252)
+def calculate_sortino_ratio(daily_returns: Union[np.ndarray, List[float]]) -> float:
+    """計算索蒂諾比率"""
+    return ReturnStatistics.from_returns(daily_returns).sortino_ratio
 
 
 def run_backtest(
     strategy: BaseStrategy,
-    data: pd.DataFrame,
+    data: Union[pd.DataFrame, CandleStore],
     start_date: datetime,
     end_date: datetime,
     initial_capital: float = 10000.0,
     commission: float = 0.001,
     slippage: float = 0.0001,
+    symbol: Optional[str] = None,
+    cache: Optional[BacktestCache] = None,
+    progress_callback: Optional[ProgressCallback] = None,
 ) -> BacktestResult:
     """
     運行回測的便利函數
 
     Args:
         strategy: 策略實例
-        data: 歷史數據
+        data: 歷史數據，或K線存儲
         start_date: 開始日期
         end_date: 結束日期
         initial_capital: 初始資金
         commission: 手續費率
         slippage: 滑點
+        symbol: 交易對，data 為K線存儲時必填
+        cache: 回測結果緩存，相同輸入直接返回緩存結果
+        progress_callback: 進度回調，見 BacktestEngine.run
 
     Returns:
         回測結果
@@ -479,10 +612,28 @@ def run_backtest(
 
     engine = BacktestEngine(config)
 
-    # 過濾數據到指定日期範圍
-    filtered_data = data[(data.index >= start_date) & (data.index <= end_date)]
-
-    return engine.run(filtered_data)
+    if isinstance(data, CandleStore):
+        # 存儲按日期範圍只映射需要的分區
+        filtered_data = engine._load_from_store(data, symbol)
+    else:
+        # 過濾數據到指定日期範圍
+        filtered_data = data[(data.index >= start_date) & (data.index <= end_date)]
+
+    if cache is None:
+        return engine.run(filtered_data, progress_callback=progress_callback)
+
+    key = make_cache_key(filtered_data, config, type(engine).__name__)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.info(f"回測緩存命中: {strategy.name}")
+        if progress_callback is not None:
+            total = len(filtered_data)
+            progress_callback(total, total, _result_metrics(cached))
+        return replace(cached, strategy_name=strategy.name)
+
+    result = engine.run(filtered_data, progress_callback=progress_callback)
+    cache.put(key, result)
+    return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+"""
+增量策略協議
+
+定義逐根K線（bar-by-bar）的策略接口。實現該協議的策略只需處理最新一根K線，
+指標和持倉等狀態由策略實例自身持久保存，回測引擎無需在每根K線上重新切片歷史數據。
+
+聲明了可熱更新參數的策略還可以在運行中原地修改這些參數，保留已預熱的指標和持倉狀態。
+"""
+
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence
+
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from strategies.base import StrategySignal
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class Bar(NamedTuple):
+    """單根K線"""
+
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class IncrementalStrategy(ABC):
+    """
+    增量策略協議
+
+    與 BaseStrategy 一同繼承使用，例如：
+
+        class MyStrategy(IncrementalStrategy, BaseStrategy):
+            def on_bar(self, bar): ...
+            def generate_signals(self, data): ...
+
+    約定：
+        - on_bar 只接收最新一根K線，指標緩衝區等狀態保存在策略實例上
+        - reset() 必須同時清空增量狀態，回測開始前引擎會調用 reset()
+        - 對同一段數據，逐根調用 on_bar 的信號應與在每個前綴上調用
+          generate_signals 的最後信號一致，兩種回測路徑才能得到相同交易
+    """
+
+    @abstractmethod
+    def on_bar(self, bar: Bar) -> List[StrategySignal]:
+        """
+        處理一根新K線
+
+        Args:
+            bar: 最新K線
+
+        Returns:
+            該K線收盤時產生的交易信號
+        """
+        pass
+
+
+def supports_incremental(strategy: Any) -> bool:
+    """策略是否支持增量接口"""
+    return isinstance(strategy, IncrementalStrategy) or callable(
+        getattr(strategy, "on_bar", None)
+    )
+
+
+class ReconfigurableStrategy(ABC):
+    """
+    熱更新參數協議
+
+    HOT_PARAMETERS 聲明可以在運行中修改的參數名。更新配置時如果修改的參數全部在其中，
+    StrategyManager 調用 reconfigure 原地更新，策略實例、指標緩衝區和持倉狀態都保留；
+    否則重新創建策略並用窗口中的K線重新預熱。
+
+    約定：
+        - reconfigure 被調用時 self.parameters 仍是舊值，返回後由調用方寫入新值
+        - 只重算受影響的指標；回看長度變長且緩衝區不夠時，從 history 補齊
+        - 參數不合法時拋出 ValueError，且不修改任何狀態
+    """
+
+    HOT_PARAMETERS: FrozenSet[str] = frozenset()
+
+    @abstractmethod
+    def reconfigure(
+        self, changes: Dict[str, Any], history: Optional["pd.DataFrame"] = None
+    ) -> None:
+        """
+        原地應用參數修改
+
+        Args:
+            changes: 修改的參數及其新值，只包含 HOT_PARAMETERS 中的參數
+            history: 策略窗口中已收盤的K線（不含未收盤的末尾K線），沒有同步過窗口時為 None
+        """
+        pass
+
+
+def supports_reconfigure(strategy: Any, parameters: Iterable[str]) -> bool:
+    """策略是否可以原地更新這些參數"""
+    hot_parameters = getattr(strategy, "HOT_PARAMETERS", None)
+    if hot_parameters is None or not callable(getattr(strategy, "reconfigure", None)):
+        return False
+    return set(parameters) <= set(hot_parameters)
+
+
+class RollingMean:
+    """
+    增量滑動平均
+
+    保存最近的值和當前週期內的和，每次更新 O(1)。週期可以在運行中修改：
+    縮短時直接使用已保存的值，加長且保存的值不夠時才需要傳入歷史數據。
+    """
+
+    def __init__(self, period: int, capacity: Optional[int] = None):
+        """
+        Args:
+            period: 平均週期
+            capacity: 保存的值的個數，大於週期時加長週期無需歷史數據
+        """
+        if period < 1:
+            raise ValueError(f"週期必須大於0: {period}")
+        self.period = period
+        self._values: deque = deque(maxlen=max(capacity or period, period))
+        self._sum = 0.0
+
+    @property
+    def ready(self) -> bool:
+        """已保存的值是否足夠一個週期"""
+        return len(self._values) >= self.period
+
+    @property
+    def value(self) -> Optional[float]:
+        """當前平均值，值不夠一個週期時為 None"""
+        return self._sum / self.period if self.ready else None
+
+    def update(self, value: float) -> Optional[float]:
+        """加入一個新值，返回更新後的平均值"""
+        values = self._values
+        if len(values) >= self.period:
+            self._sum -= values[-self.period]
+        values.append(value)
+        self._sum += value
+        return self.value
+
+    def resize(self, period: int, history: Optional[Sequence[float]] = None) -> None:
+        """
+        修改週期
+
+        Args:
+            period: 新週期
+            history: 截至最新值的歷史數據，比已保存的值更長時替換緩衝區
+
+        Raises:
+            ValueError: 週期小於1
+        """
+        if period < 1:
+            raise ValueError(f"週期必須大於0: {period}")
+        maxlen = max(self._values.maxlen, period)
+        if history is not None and len(history) > len(self._values):
+            values = deque((float(v) for v in history[-maxlen:]), maxlen=maxlen)
+        elif maxlen != self._values.maxlen:
+            values = deque(self._values, maxlen=maxlen)
+        else:
+            values = self._values
+
+        self._values = values
+        self.period = period
+        count = min(len(values), period)
+        self._sum = math.fsum(islice(values, len(values) - count, None))
+
+    def reset(self) -> None:
+        self._values.clear()
+        self._sum = 0.0
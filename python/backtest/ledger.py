@@ -0,0 +1,358 @@
+"""
+列式交易賬本
+
+以按列存放的定長數組記錄交易，代替每筆交易一個字典的列表。
+追加為均攤 O(1)，統計量直接在數組上向量化計算，可以零拷貝導出為 DataFrame；
+同時保留列表接口（len、下標、迭代返回字典），兼容原有按字典讀取交易的代碼。
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# 引擎使用的交易動作，按順序對應動作代碼
+DEFAULT_ACTIONS = ("買入", "平多", "平空", "減倉")
+
+# 浮點列
+FLOAT_COLUMNS = (
+    "price",
+    "quantity",
+    "commission",
+    "slippage",
+    "capital",
+    "signal_strength",
+    "pnl",
+)
+
+# 按交易規模縮放的列
+SCALED_COLUMNS = ("quantity", "commission", "slippage", "capital", "pnl")
+
+# 字典視圖的鍵順序，與原來引擎記錄的交易字典一致
+RECORD_KEYS = ("timestamp", "action") + FLOAT_COLUMNS
+
+
+class TradeLedger:
+    """列式交易賬本"""
+
+    def __init__(self, capacity: int = 64):
+        """
+        初始化賬本
+
+        Args:
+            capacity: 初始容量，超出後按倍數擴容
+        """
+        capacity = max(int(capacity), 1)
+        self._size = 0
+        self._tz: Optional[str] = None
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._actions = np.empty(capacity, dtype=np.int8)
+        self._floats = {name: np.empty(capacity, dtype=np.float64) for name in FLOAT_COLUMNS}
+        self.action_names: List[str] = list(DEFAULT_ACTIONS)
+        self._action_codes = {name: code for code, name in enumerate(self.action_names)}
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+
+    def _reserve(self, extra: int) -> None:
+        """確保還能容納 extra 筆交易"""
+        needed = self._size + extra
+        capacity = len(self._timestamps)
+        if needed <= capacity:
+            return
+
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+
+        self._timestamps = self._grow(self._timestamps, capacity)
+        self._actions = self._grow(self._actions, capacity)
+        for name in FLOAT_COLUMNS:
+            self._floats[name] = self._grow(self._floats[name], capacity)
+
+    def _grow(self, array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.empty(capacity, dtype=array.dtype)
+        grown[: self._size] = array[: self._size]
+        return grown
+
+    def action_code(self, action: str) -> int:
+        """取得動作代碼，未知動作會登記新代碼"""
+        code = self._action_codes.get(action)
+        if code is None:
+            code = len(self.action_names)
+            self.action_names.append(action)
+            self._action_codes[action] = code
+        return code
+
+    def _timestamp_value(self, timestamp: Any) -> int:
+        """把時間戳轉換為納秒整數，帶時區的時間戳按UTC存儲"""
+        ts = pd.Timestamp(timestamp)
+        if ts.tz is not None and self._tz is None:
+            self._tz = str(ts.tz)
+        return ts.value
+
+    def record(
+        self,
+        timestamp: Any,
+        action: str,
+        price: float,
+        quantity: float,
+        commission: float,
+        slippage: float,
+        capital: float,
+        signal_strength: float,
+        pnl: float,
+    ) -> None:
+        """追加一筆交易"""
+        self._reserve(1)
+        i = self._size
+        self._timestamps[i] = self._timestamp_value(timestamp)
+        self._actions[i] = self.action_code(action)
+        floats = self._floats
+        floats["price"][i] = price
+        floats["quantity"][i] = quantity
+        floats["commission"][i] = commission
+        floats["slippage"][i] = slippage
+        floats["capital"][i] = capital
+        floats["signal_strength"][i] = signal_strength
+        floats["pnl"][i] = pnl
+        self._size = i + 1
+
+    def record_many(
+        self,
+        timestamps: pd.DatetimeIndex,
+        actions: np.ndarray,
+        **columns: np.ndarray,
+    ) -> None:
+        """
+        按列批量追加交易
+
+        Args:
+            timestamps: 交易時間
+            actions: 每筆交易的動作代碼，由 action_code 取得
+            **columns: FLOAT_COLUMNS 中每一列的數組，標量會廣播到全部交易
+        """
+        n = len(timestamps)
+        self._reserve(n)
+        start, stop = self._size, self._size + n
+
+        index = pd.DatetimeIndex(timestamps)
+        if index.tz is not None and self._tz is None:
+            self._tz = str(index.tz)
+        self._timestamps[start:stop] = index.as_unit("ns").asi8
+
+        self._actions[start:stop] = actions
+
+        for name in FLOAT_COLUMNS:
+            self._floats[name][start:stop] = columns[name]
+        self._size = stop
+
+    def append(self, trade: Dict[str, Any]) -> None:
+        """以字典形式追加一筆交易，兼容列表的 append"""
+        self.record(**{key: trade[key] for key in RECORD_KEYS})
+
+    def extend(
+        self, trades: Union["TradeLedger", Iterable[Dict[str, Any]]], scale: float = 1.0
+    ) -> None:
+        """
+        批量追加交易
+
+        Args:
+            trades: 另一個賬本或交易字典序列
+            scale: 對數量、費用、資金和盈虧的縮放係數
+        """
+        if not isinstance(trades, TradeLedger):
+            ledger = TradeLedger()
+            for trade in trades:
+                ledger.append(trade)
+            trades = ledger
+
+        n = len(trades)
+        self._reserve(n)
+        start, stop = self._size, self._size + n
+
+        self._timestamps[start:stop] = trades._timestamps[:n]
+        if self._tz is None:
+            self._tz = trades._tz
+
+        # 動作代碼按名稱重新映射
+        mapping = np.array(
+            [self.action_code(name) for name in trades.action_names], dtype=np.int8
+        )
+        self._actions[start:stop] = mapping[trades._actions[:n]]
+
+        for name in FLOAT_COLUMNS:
+            values = trades._floats[name][:n]
+            if name in SCALED_COLUMNS and scale != 1.0:
+                np.multiply(values, scale, out=self._floats[name][start:stop])
+            else:
+                self._floats[name][start:stop] = values
+        self._size = stop
+
+    # ------------------------------------------------------------------
+    # 列視圖
+    # ------------------------------------------------------------------
+
+    def column(self, name: str) -> np.ndarray:
+        """返回某一浮點列的只讀視圖"""
+        view = self._floats[name][: self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """納秒時間戳視圖（UTC）"""
+        return self._timestamps[: self._size]
+
+    @property
+    def actions(self) -> np.ndarray:
+        """動作代碼視圖"""
+        return self._actions[: self._size]
+
+    @property
+    def price(self) -> np.ndarray:
+        return self.column("price")
+
+    @property
+    def quantity(self) -> np.ndarray:
+        return self.column("quantity")
+
+    @property
+    def commission(self) -> np.ndarray:
+        return self.column("commission")
+
+    @property
+    def slippage(self) -> np.ndarray:
+        return self.column("slippage")
+
+    @property
+    def pnl(self) -> np.ndarray:
+        return self.column("pnl")
+
+    def mask(self, action: str) -> np.ndarray:
+        """某一動作的布爾掩碼"""
+        code = self._action_codes.get(action)
+        if code is None:
+            return np.zeros(self._size, dtype=bool)
+        return self.actions == code
+
+    # ------------------------------------------------------------------
+    # 統計
+    # ------------------------------------------------------------------
+
+    @property
+    def winning_count(self) -> int:
+        return int(np.count_nonzero(self.pnl > 0))
+
+    @property
+    def losing_count(self) -> int:
+        return int(np.count_nonzero(self.pnl < 0))
+
+    @property
+    def total_pnl(self) -> float:
+        return float(self.pnl.sum())
+
+    @property
+    def gross_profit(self) -> float:
+        pnl = self.pnl
+        return float(pnl[pnl > 0].sum())
+
+    @property
+    def gross_loss(self) -> float:
+        pnl = self.pnl
+        return float(-pnl[pnl < 0].sum())
+
+    @property
+    def total_costs(self) -> float:
+        return float(self.commission.sum() + self.slippage.sum())
+
+    def profit_factor(self) -> float:
+        """盈利因子"""
+        total_profit = self.gross_profit
+        total_loss = self.gross_loss
+        if total_loss == 0:
+            return float("inf") if total_profit > 0 else 0.0
+        return total_profit / total_loss
+
+    # ------------------------------------------------------------------
+    # 導出
+    # ------------------------------------------------------------------
+
+    def _timestamp_index(self, values: np.ndarray) -> pd.DatetimeIndex:
+        index = pd.DatetimeIndex(values.view("datetime64[ns]"))
+        if self._tz:
+            index = index.tz_localize("UTC").tz_convert(self._tz)
+        return index
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """導出為 DataFrame，數值列直接引用賬本數組"""
+        columns: Dict[str, Any] = {
+            "timestamp": self._timestamp_index(self.timestamps),
+            "action": pd.Categorical.from_codes(self.actions, categories=self.action_names),
+        }
+        for name in FLOAT_COLUMNS:
+            columns[name] = self.column(name)
+        return pd.DataFrame(columns, copy=False)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """導出為交易字典列表"""
+        return [self[i] for i in range(self._size)]
+
+    # ------------------------------------------------------------------
+    # 列表兼容接口
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def _record(self, i: int) -> Dict[str, Any]:
+        ts = pd.Timestamp(int(self._timestamps[i]))
+        if self._tz:
+            ts = ts.tz_localize("UTC").tz_convert(self._tz)
+        record: Dict[str, Any] = {
+            "timestamp": ts,
+            "action": self.action_names[self._actions[i]],
+        }
+        for name in FLOAT_COLUMNS:
+            record[name] = float(self._floats[name][i])
+        return record
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._record(i) for i in range(*key.indices(self._size))]
+        i = key + self._size if key < 0 else key
+        if not 0 <= i < self._size:
+            raise IndexError("交易索引超出範圍")
+        return self._record(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._size):
+            yield self._record(i)
+
+    def __repr__(self) -> str:
+        return f"TradeLedger(trades={self._size})"
+
+    def __getstate__(self):
+        # 序列化時只保存有效數據，不保存預留容量
+        n = self._size
+        return {
+            "size": n,
+            "tz": self._tz,
+            "timestamps": self._timestamps[:n].copy(),
+            "actions": self._actions[:n].copy(),
+            "floats": {name: values[:n].copy() for name, values in self._floats.items()},
+            "action_names": self.action_names,
+        }
+
+    def __setstate__(self, state):
+        self._size = state["size"]
+        self._tz = state["tz"]
+        self._timestamps = state["timestamps"]
+        self._actions = state["actions"]
+        self._floats = state["floats"]
+        self.action_names = state["action_names"]
+        self._action_codes = {name: code for code, name in enumerate(self.action_names)}
@@ -0,0 +1,201 @@
+"""
+流式績效統計
+
+提供預分配的 float64 緩衝區和 Welford 算法的收益統計量，
+回測過程中每根K線只做常數時間的更新，任意時刻都可以讀取夏普比率、
+索蒂諾比率和波動率，不需要在結束時再對整段序列做一次遍歷。
+"""
+
+import math
+from typing import Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+# 年化係數（按交易日）
+PERIODS_PER_YEAR = 252
+
+
+class FloatBuffer:
+    """
+    預分配的 float64 緩衝區
+
+    每個元素佔 8 字節，容量不足時按倍數擴容；values 返回有效部分的視圖。
+    """
+
+    def __init__(self, capacity: int = 64, initial: Optional[Iterable[float]] = None):
+        """
+        初始化緩衝區
+
+        Args:
+            capacity: 初始容量
+            initial: 初始數據
+        """
+        self._data = np.empty(max(int(capacity), 1), dtype=np.float64)
+        self._size = 0
+        if initial is not None:
+            self.extend(initial)
+
+    def reserve(self, capacity: int) -> None:
+        """確保總容量不少於 capacity"""
+        if capacity <= len(self._data):
+            return
+        grown = np.empty(capacity, dtype=np.float64)
+        grown[: self._size] = self._data[: self._size]
+        self._data = grown
+
+    def append(self, value: float) -> None:
+        """追加一個值"""
+        if self._size == len(self._data):
+            self.reserve(2 * len(self._data))
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values: Iterable[float]) -> None:
+        """批量追加"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        needed = self._size + len(values)
+        if needed > len(self._data):
+            self.reserve(max(needed, 2 * len(self._data)))
+        self._data[self._size : needed] = values
+        self._size = needed
+
+    def clear(self) -> None:
+        """清空數據，保留容量"""
+        self._size = 0
+
+    @property
+    def values(self) -> np.ndarray:
+        """有效數據的視圖"""
+        return self._data[: self._size]
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def tolist(self) -> List[float]:
+        return self.values.tolist()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def __repr__(self) -> str:
+        return f"FloatBuffer(size={self._size}, capacity={len(self._data)})"
+
+
+class ReturnStatistics:
+    """
+    收益率的流式統計量
+
+    用 Welford 算法維護全部收益的均值和方差，以及負收益的均值和方差。
+    方差為總體方差，與 np.std 的默認口徑一致；下行偏差沿用引擎原有定義，
+    即負收益子序列的標準差。
+    """
+
+    __slots__ = ("count", "mean", "_m2", "downside_count", "downside_mean", "_downside_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.downside_count = 0
+        self.downside_mean = 0.0
+        self._downside_m2 = 0.0
+
+    @classmethod
+    def from_returns(cls, returns: Union[np.ndarray, List[float]]) -> "ReturnStatistics":
+        """由完整收益序列構建"""
+        stats = cls()
+        stats.update_many(returns)
+        return stats
+
+    def update(self, value: float) -> None:
+        """加入一個收益率"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if value < 0:
+            self.downside_count += 1
+            delta = value - self.downside_mean
+            self.downside_mean += delta / self.downside_count
+            self._downside_m2 += delta * (value - self.downside_mean)
+
+    def update_many(self, values: Union[np.ndarray, List[float]]) -> None:
+        """批量加入收益率，按 Chan 等人的並行公式合併分塊統計量"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+
+        self.count, self.mean, self._m2 = _merge(
+            self.count, self.mean, self._m2, values
+        )
+        negative = values[values < 0]
+        if len(negative):
+            self.downside_count, self.downside_mean, self._downside_m2 = _merge(
+                self.downside_count, self.downside_mean, self._downside_m2, negative
+            )
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.variance, 0.0))
+
+    @property
+    def downside_std(self) -> float:
+        if not self.downside_count:
+            return 0.0
+        return math.sqrt(max(self._downside_m2 / self.downside_count, 0.0))
+
+    @property
+    def volatility(self) -> float:
+        """年化波動率"""
+        return self.std * math.sqrt(PERIODS_PER_YEAR)
+
+    @property
+    def sharpe_ratio(self) -> float:
+        """夏普比率，假設無風險利率為0"""
+        std = self.std
+        if not self.count or std == 0:
+            return 0.0
+        return self.mean / std * math.sqrt(PERIODS_PER_YEAR)
+
+    @property
+    def sortino_ratio(self) -> float:
+        """索蒂諾比率"""
+        if not self.count:
+            return 0.0
+        if not self.downside_count:
+            return float("inf") if self.mean > 0 else 0.0
+
+        downside = self.downside_std
+        if downside == 0:
+            return 0.0
+        return self.mean / downside * math.sqrt(PERIODS_PER_YEAR)
+
+
+def _merge(count: int, mean: float, m2: float, values: np.ndarray):
+    """把一塊數據的均值和平方和合併進已有統計量"""
+    n = len(values)
+    batch_mean = float(values.mean())
+    batch_m2 = float(np.square(values - batch_mean).sum())
+    if count == 0:
+        return n, batch_mean, batch_m2
+
+    total = count + n
+    delta = batch_mean - mean
+    mean += delta * n / total
+    m2 += batch_m2 + delta * delta * count * n / total
+    return total, mean, m2
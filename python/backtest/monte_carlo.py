@@ -0,0 +1,263 @@
+"""
+蒙特卡洛穩健性分析
+
+對回測結果的每日收益或交易盈虧做重抽樣，生成大量權益路徑，
+統計期末資金、最大回撤和夏普比率的分佈。
+
+路徑以二維數組（路徑數 × 步數）分塊生成，單塊內存受 max_chunk_bytes 限制；
+路徑數很大時可以把各塊分發到進程池。每 SEED_BLOCK_PATHS 條路徑使用一個獨立的子種子，
+分塊邊界總是落在子種子的邊界上，因此相同種子下的結果與分塊方式和工作進程數無關。
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .engine import BacktestResult
+from .ledger import TradeLedger
+
+logger = logging.getLogger(__name__)
+
+# 支持的重抽樣方式
+METHODS = ("daily_bootstrap", "trade_bootstrap", "trade_reshuffle")
+
+# 共用一個子種子的路徑數，也是分塊的最小單位
+SEED_BLOCK_PATHS = 16
+
+
+@dataclass
+class MonteCarloResult:
+    """蒙特卡洛模擬結果，每個數組的長度等於路徑數"""
+
+    method: str
+    initial_capital: float
+    final_capital: np.ndarray
+    max_drawdown: np.ndarray
+    sharpe_ratio: np.ndarray
+
+    @property
+    def n_paths(self) -> int:
+        return len(self.final_capital)
+
+    @property
+    def probability_of_loss(self) -> float:
+        """期末資金低於初始資金的概率"""
+        return float(np.mean(self.final_capital < self.initial_capital))
+
+    def percentiles(self, q: Sequence[float] = (5, 25, 50, 75, 95)) -> pd.DataFrame:
+        """各指標的分位數表"""
+        return pd.DataFrame(
+            {
+                "final_capital": np.percentile(self.final_capital, q),
+                "max_drawdown": np.percentile(self.max_drawdown, q),
+                "sharpe_ratio": np.nanpercentile(self.sharpe_ratio, q),
+            },
+            index=[f"p{p:g}" for p in q],
+        )
+
+
+def _closed_trade_pnl(trades: Union[TradeLedger, List[Dict]]) -> np.ndarray:
+    """提取平倉交易的盈虧，開倉記錄不計入"""
+    if isinstance(trades, TradeLedger):
+        return trades.pnl[~trades.mask("買入")].copy()
+    return np.array(
+        [trade["pnl"] for trade in trades if trade["action"] != "買入"], dtype=float
+    )
+
+
+def _path_statistics(equity: np.ndarray, returns: np.ndarray, periods_per_year: float):
+    """
+    計算一塊路徑的統計量
+
+    Args:
+        equity: (路徑數, 步數+1) 的權益矩陣，首列為初始資金
+        returns: (路徑數, 步數) 的每步收益率矩陣
+        periods_per_year: 年化係數
+
+    Returns:
+        (期末資金, 最大回撤, 夏普比率)
+    """
+    final_capital = equity[:, -1].copy()
+
+    # 原地計算 權益/峰值，最大回撤 = 1 - 最小比值
+    ratio = np.maximum.accumulate(equity, axis=1)
+    np.divide(equity, ratio, out=ratio)
+    max_drawdown = 1.0 - ratio.min(axis=1)
+    del ratio
+
+    std = returns.std(axis=1)
+    mean = returns.mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), 0.0)
+
+    return final_capital, max_drawdown, sharpe
+
+
+def _simulate_chunk(
+    samples: np.ndarray,
+    method: str,
+    n_paths: int,
+    initial_capital: float,
+    periods_per_year: float,
+    seeds: Sequence[np.random.SeedSequence],
+):
+    """生成一塊路徑並返回其統計量，每 SEED_BLOCK_PATHS 條路徑使用 seeds 中的一個子種子"""
+    n_steps = len(samples)
+    drawn = np.empty((n_paths, n_steps))
+    for index, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        block = drawn[index * SEED_BLOCK_PATHS : (index + 1) * SEED_BLOCK_PATHS]
+        if method == "trade_reshuffle":
+            # 每行獨立打亂交易順序
+            block[:] = rng.permuted(np.tile(samples, (len(block), 1)), axis=1)
+        else:
+            block[:] = samples[rng.integers(0, n_steps, size=block.shape)]
+
+    equity = np.empty((n_paths, n_steps + 1))
+    equity[:, 0] = initial_capital
+
+    if method == "daily_bootstrap":
+        np.cumprod(1.0 + drawn, axis=1, out=equity[:, 1:])
+        equity[:, 1:] *= initial_capital
+    else:
+        # 交易盈虧按金額累加，收益率為盈虧除以交易前權益
+        np.cumsum(drawn, axis=1, out=equity[:, 1:])
+        equity[:, 1:] += initial_capital
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(drawn, equity[:, :-1], out=drawn)
+
+    return _path_statistics(equity, drawn, periods_per_year)
+
+
+class MonteCarloSimulator:
+    """
+    蒙特卡洛模擬器
+
+    重抽樣方式：
+        - daily_bootstrap: 對每日收益有放回抽樣，按複利生成權益路徑
+        - trade_bootstrap: 對平倉交易盈虧有放回抽樣，按金額累加
+        - trade_reshuffle: 對平倉交易盈虧做無放回重排，期末資金不變，只改變路徑形態
+    """
+
+    def __init__(
+        self,
+        result: BacktestResult,
+        n_paths: int = 10000,
+        method: str = "daily_bootstrap",
+        seed: Optional[int] = None,
+        max_chunk_bytes: int = 64 * 1024 * 1024,
+        max_workers: Optional[int] = None,
+    ):
+        """
+        初始化模擬器
+
+        Args:
+            result: 回測結果
+            n_paths: 路徑數
+            method: 重抽樣方式
+            seed: 隨機種子
+            max_chunk_bytes: 單塊路徑矩陣的內存上限，單塊至少包含 SEED_BLOCK_PATHS 條路徑
+            max_workers: 工作進程數，為 None 時在當前進程中計算
+        """
+        if method not in METHODS:
+            raise ValueError(f"未知的重抽樣方式: {method}")
+        if n_paths <= 0:
+            raise ValueError("路徑數必須大於0")
+
+        self.result = result
+        self.n_paths = n_paths
+        self.method = method
+        self.seed = seed
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_workers = max_workers
+
+        if method == "daily_bootstrap":
+            self.samples = np.asarray(result.daily_returns, dtype=float)
+            self.periods_per_year = 252.0
+        else:
+            self.samples = _closed_trade_pnl(result.trades)
+            years = (result.end_date - result.start_date).days / 365
+            self.periods_per_year = len(self.samples) / years if years > 0 else 252.0
+
+        if len(self.samples) == 0:
+            raise ValueError("回測結果中沒有可抽樣的數據")
+
+    def _chunk_sizes(self) -> List[int]:
+        """按內存上限切分路徑數，每塊的路徑數是 SEED_BLOCK_PATHS 的倍數（最後一塊除外）"""
+        # 單條路徑需要抽樣索引、抽樣值、權益和回撤比值四行
+        bytes_per_path = (len(self.samples) + 1) * 8 * 4
+        paths = self.max_chunk_bytes // bytes_per_path
+        chunk = max(1, paths // SEED_BLOCK_PATHS) * SEED_BLOCK_PATHS
+        sizes = [chunk] * (self.n_paths // chunk)
+        if self.n_paths % chunk:
+            sizes.append(self.n_paths % chunk)
+        return sizes
+
+    def run(self) -> MonteCarloResult:
+        """運行模擬"""
+        sizes = self._chunk_sizes()
+        seeds = np.random.SeedSequence(self.seed).spawn(-(-self.n_paths // SEED_BLOCK_PATHS))
+        args = []
+        first_block = 0
+        for size in sizes:
+            n_blocks = -(-size // SEED_BLOCK_PATHS)
+            args.append(
+                (
+                    self.samples,
+                    self.method,
+                    size,
+                    self.result.initial_capital,
+                    self.periods_per_year,
+                    seeds[first_block : first_block + n_blocks],
+                )
+            )
+            first_block += n_blocks
+
+        logger.info(
+            f"蒙特卡洛模擬開始: {self.method}, {self.n_paths} 條路徑, {len(sizes)} 塊"
+        )
+
+        if self.max_workers and len(sizes) > 1:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                chunks = list(executor.map(_simulate_chunk, *zip(*args)))
+        else:
+            chunks = [_simulate_chunk(*arg) for arg in args]
+
+        final_capital, max_drawdown, sharpe = (np.concatenate(parts) for parts in zip(*chunks))
+        return MonteCarloResult(
+            method=self.method,
+            initial_capital=self.result.initial_capital,
+            final_capital=final_capital,
+            max_drawdown=max_drawdown,
+            sharpe_ratio=sharpe,
+        )
+
+
+def run_monte_carlo(
+    result: BacktestResult,
+    n_paths: int = 10000,
+    method: str = "daily_bootstrap",
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> MonteCarloResult:
+    """
+    運行蒙特卡洛模擬的便利函數
+
+    Args:
+        result: 回測結果
+        n_paths: 路徑數
+        method: 重抽樣方式
+        seed: 隨機種子
+        max_workers: 工作進程數
+
+    Returns:
+        模擬結果
+    """
+    simulator = MonteCarloSimulator(
+        result, n_paths=n_paths, method=method, seed=seed, max_workers=max_workers
+    )
+    return simulator.run()
@@ -0,0 +1,346 @@
+"""
+回測結果緩存
+
+以內容地址緩存回測結果：鍵是輸入數據指紋、策略類型與參數、策略和回測引擎的源代碼摘要、
+回測區間和成本設置的哈希，值是序列化後的 BacktestResult。相同輸入的回測無論由誰、
+在何時發起，都直接讀取緩存；修改策略或引擎代碼後舊結果自動失效。
+
+緩存保存在本地目錄，每個結果一個文件，總大小超過上限時按最近使用時間淘汰。
+緩存文件使用 pickle 序列化，只應指向本機可信的目錄。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 緩存格式版本，結果結構變化時遞增，使舊緩存自動失效；代碼變化由源代碼摘要覆蓋
+CACHE_VERSION = 1
+
+# 默認緩存目錄和大小上限
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "trading-bot", "backtest"
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def fingerprint_data(data: pd.DataFrame) -> str:
+    """
+    計算行情數據指紋
+
+    對索引和所有列逐行哈希，再把列名、時區和行哈希合併為一個摘要。
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    index = pd.DatetimeIndex(data.index) if len(data) else data.index
+    header = {
+        "columns": [str(col) for col in data.columns],
+        "tz": str(getattr(index, "tz", None)),
+        "rows": len(data),
+    }
+    hasher.update(json.dumps(header, sort_keys=True).encode("utf-8"))
+    hasher.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+
+def strategy_fingerprint(strategy: Any) -> Dict[str, Any]:
+    """
+    提取影響回測結果的策略信息
+
+    策略名稱不計入，名稱不同但類型和參數相同的策略共用緩存。
+    """
+    config = getattr(strategy, "config", None)
+    return {
+        "type": f"{type(strategy).__module__}.{type(strategy).__qualname__}",
+        "symbol": getattr(config, "symbol", getattr(strategy, "symbol", None)),
+        "timeframe": getattr(config, "timeframe", getattr(strategy, "timeframe", None)),
+        "parameters": getattr(strategy, "parameters", None),
+        "risk_params": getattr(strategy, "risk_params", None),
+    }
+
+
+# 源文件摘要，按 (路徑, 修改時間, 大小) 緩存，未修改的文件不重複讀取
+_source_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def _file_digest(path: str) -> str:
+    """源文件內容的摘要"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _source_digests.get(key)
+    if digest is None:
+        with open(path, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        _source_digests[key] = digest
+    return digest
+
+
+def code_fingerprint(strategy: Any) -> Dict[str, Optional[str]]:
+    """
+    計算策略和回測引擎的源代碼摘要
+
+    策略類及其基類所在模塊、回測包內全部模塊的源文件都計入，
+    任一文件修改後緩存鍵隨之改變。按模塊名記錄，項目目錄移動不影響緩存。
+    """
+    modules: Dict[str, Optional[str]] = {}
+    for cls in type(strategy).__mro__:
+        module = sys.modules.get(cls.__module__)
+        path = getattr(module, "__file__", None)
+        if path:
+            modules[cls.__module__] = path
+
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in os.listdir(package_dir):
+        if name.endswith(".py"):
+            modules[f"{__package__}.{name[:-3]}"] = os.path.join(package_dir, name)
+
+    digests: Dict[str, Optional[str]] = {}
+    for module_name, path in modules.items():
+        try:
+            digests[module_name] = _file_digest(path)
+        except OSError:
+            digests[module_name] = None
+    return digests
+
+
+def make_cache_key(
+    data: Union[pd.DataFrame, str], config: Any, engine: str = "BacktestEngine"
+) -> str:
+    """
+    生成緩存鍵
+
+    Args:
+        data: 過濾後的回測數據，或已經計算好的數據指紋
+        config: 回測配置（BacktestConfig）
+        engine: 回測引擎類名
+
+    Returns:
+        十六進制緩存鍵
+    """
+    payload = {
+        "version": CACHE_VERSION,
+        "engine": engine,
+        "data": data if isinstance(data, str) else fingerprint_data(data),
+        "strategy": strategy_fingerprint(config.strategy),
+        "code": code_fingerprint(config.strategy),
+        "start_date": pd.Timestamp(config.start_date).isoformat(),
+        "end_date": pd.Timestamp(config.end_date).isoformat(),
+        "initial_capital": config.initial_capital,
+        "commission": config.commission,
+        "slippage": config.slippage,
+        "max_position_size": config.max_position_size,
+        "warmup_bars": config.warmup_bars,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """緩存計數器"""
+
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    errors: int = 0
+    entries: int = 0
+    bytes: int = 0
+    max_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class BacktestCache:
+    """
+    磁盤上的回測結果緩存
+
+    每個結果保存為 <key>.pkl；文件修改時間記錄最近使用時間。
+    多個進程（掃描工作進程、多個橋接進程）可以共用同一目錄：索引未命中時直接查找磁盤，
+    讀到其他進程寫入的結果；寫入後按整個目錄的總大小淘汰最久未使用的結果，
+    max_bytes 對所有進程寫入的結果共同生效。內存中的索引只用於統計和同一進程內的排序。
+    """
+
+    SUFFIX = ".pkl"
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        初始化緩存
+
+        Args:
+            directory: 緩存目錄，默認為 ~/.cache/trading-bot/backtest
+            max_bytes: 緩存總大小上限
+        """
+        self.directory = directory or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._stats = CacheStats(max_bytes=max_bytes)
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def _load_index(self) -> None:
+        """掃描緩存目錄，按修改時間恢復最近使用順序"""
+        # 修改時間相同時保持本進程已知的使用順序
+        rank = {key: i for i, key in enumerate(self._entries)}
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            key = name[: -len(self.SUFFIX)]
+            found.append((stat.st_mtime_ns, rank.get(key, -1), key, stat.st_size))
+
+        self._entries = OrderedDict((key, size) for _, _, key, size in sorted(found))
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._entries.values())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries or os.path.exists(self._path(key))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """讀取緩存，未命中返回 None"""
+        with self._lock:
+            # 不在索引中的結果可能由其他進程寫入，直接查找磁盤
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    result = pickle.load(f)
+                os.utime(path)
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                # 從未寫入，或已被其他進程淘汰
+                self._entries.pop(key, None)
+                self._stats.misses += 1
+                return None
+            except Exception as e:
+                # 文件損壞，當作未命中處理
+                logger.warning(f"讀取回測緩存失敗: {key}: {e}")
+                self._stats.errors += 1
+                self._stats.misses += 1
+                self._discard(key)
+                return None
+
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return result
+
+    def put(self, key: str, result: Any) -> None:
+        """寫入緩存並按大小上限淘汰"""
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            logger.debug(f"回測結果超過緩存上限，不緩存: {len(payload)} bytes")
+            return
+
+        with self._lock:
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                logger.warning(f"寫入回測緩存失敗: {key}: {e}")
+                self._stats.errors += 1
+                return
+
+            self._entries[key] = len(payload)
+            self._entries.move_to_end(key)
+            self._stats.writes += 1
+            self._evict()
+
+    def _evict(self) -> None:
+        """按整個目錄的內容淘汰最久未使用的結果，直到總大小不超過上限"""
+        self._load_index()
+        total = self.total_bytes
+        while total > self.max_bytes and self._entries:
+            key, size = next(iter(self._entries.items()))
+            self._discard(key)
+            total -= size
+            self._stats.evictions += 1
+
+    def _discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """刪除所有緩存結果"""
+        with self._lock:
+            for key in list(self._entries):
+                self._discard(key)
+
+    def stats(self) -> CacheStats:
+        """返回計數器快照"""
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                writes=self._stats.writes,
+                evictions=self._stats.evictions,
+                errors=self._stats.errors,
+                entries=len(self._entries),
+                bytes=self.total_bytes,
+                max_bytes=self.max_bytes,
+            )
+
+
+# 進程內共用的默認緩存，首次使用時創建
+_default_cache: Optional[BacktestCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> BacktestCache:
+    """
+    獲取默認緩存
+
+    目錄和大小上限可以通過環境變量 BACKTEST_CACHE_DIR 和 BACKTEST_CACHE_MAX_BYTES 設置。
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = BacktestCache(
+                os.environ.get("BACKTEST_CACHE_DIR") or None,
+                int(os.environ.get("BACKTEST_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            )
+        return _default_cache
@@ -0,0 +1,130 @@
+"""
+共享內存行情數據
+
+把OHLCV數據放入一塊 multiprocessing 共享內存，工作進程按名稱掛載後直接得到
+零拷貝的 NumPy 視圖和 DataFrame，避免每個任務都序列化一份完整數據。
+"""
+
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+@dataclass(frozen=True)
+class SharedOHLCVHandle:
+    """共享內存句柄，可以安全地傳給其他進程"""
+
+    name: str
+    length: int
+    tz: Optional[str] = None
+
+
+def _layout(buffer, length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """在共享內存上建立時間戳和價格矩陣兩個視圖"""
+    timestamps = np.ndarray((length,), dtype=np.int64, buffer=buffer)
+    values = np.ndarray(
+        (len(OHLCV_COLUMNS), length), dtype=np.float64, buffer=buffer, offset=length * 8
+    )
+    return timestamps, values
+
+
+def ohlcv_frame(
+    timestamps: np.ndarray, values: np.ndarray, tz: Optional[str]
+) -> pd.DataFrame:
+    """
+    由 UTC 納秒時間戳和 (5, n) 價格矩陣構建 DataFrame
+
+    價格列直接引用 values（例如共享內存或滾動窗口的緩衝區），不複製。
+
+    Args:
+        timestamps: UTC 納秒時間戳
+        values: 按 OHLCV_COLUMNS 排列的價格矩陣
+        tz: 索引的時區，None 表示不帶時區
+    """
+    index = pd.DatetimeIndex(timestamps.view("datetime64[ns]"))
+    if tz:
+        index = index.tz_localize("UTC").tz_convert(tz)
+    return pd.DataFrame(values.T, index=index, columns=list(OHLCV_COLUMNS), copy=False)
+
+
+class SharedOHLCV:
+    """
+    共享內存中的OHLCV數據
+
+    主進程用 from_dataframe() 創建並在結束時調用 unlink()；
+    工作進程用 attach(handle) 掛載，只讀使用。
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, length: int, tz: Optional[str]):
+        self._shm = shm
+        self.length = length
+        self.tz = tz
+        self.timestamps, self.values = _layout(shm.buf, length)
+
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame) -> "SharedOHLCV":
+        """把 DataFrame 複製到新的共享內存塊"""
+        missing = [col for col in OHLCV_COLUMNS if col not in data.columns]
+        if missing:
+            raise ValueError(f"數據缺少必要列: {missing}")
+
+        length = len(data)
+        size = max(length * 8 * (len(OHLCV_COLUMNS) + 1), 1)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+
+        index = pd.DatetimeIndex(data.index)
+        tz = str(index.tz) if index.tz is not None else None
+        if tz:
+            index = index.tz_convert("UTC").tz_localize(None)
+
+        shared = cls(shm, length, tz)
+        shared.timestamps[:] = index.as_unit("ns").asi8
+        for i, col in enumerate(OHLCV_COLUMNS):
+            shared.values[i] = data[col].to_numpy(dtype=np.float64)
+        return shared
+
+    @classmethod
+    def attach(cls, handle: SharedOHLCVHandle) -> "SharedOHLCV":
+        """按句柄掛載已存在的共享內存"""
+        shm = shared_memory.SharedMemory(name=handle.name)
+        return cls(shm, handle.length, handle.tz)
+
+    @property
+    def handle(self) -> SharedOHLCVHandle:
+        """共享內存句柄"""
+        return SharedOHLCVHandle(self._shm.name, self.length, self.tz)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """零拷貝構建 DataFrame"""
+        return ohlcv_frame(self.timestamps, self.values, self.tz)
+
+    def slice(self, start: int, stop: int) -> pd.DataFrame:
+        """按位置切片，返回共享內存上的 DataFrame 視圖"""
+        return ohlcv_frame(
+            self.timestamps[start:stop], self.values[:, start:stop], self.tz
+        )
+
+    def close(self) -> None:
+        """釋放本進程中的映射"""
+        self.timestamps = self.values = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # 仍有 DataFrame 引用共享內存，映射會在這些對象回收後釋放
+            pass
+
+    def unlink(self) -> None:
+        """釋放映射並刪除共享內存塊，只應由創建者調用"""
+        self.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedOHLCV":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.unlink()
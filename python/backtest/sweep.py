@@ -0,0 +1,324 @@
+"""
+參數掃描
+
+把策略工廠和參數網格展開為一組回測任務，分發到進程池並行執行。
+行情數據通過共享內存交給工作進程，每個進程只在啟動時掛載一次，
+任務本身只攜帶參數字典。
+"""
+
+import itertools
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+
+from .engine import BacktestConfig, BacktestEngine, BacktestResult
+from .shared_data import SharedOHLCV, SharedOHLCVHandle
+from .vectorized import VectorizedBacktestEngine
+
+logger = logging.getLogger(__name__)
+
+ParamGrid = Union[Dict[str, List[Any]], List[Dict[str, Any]]]
+
+# 結果表中保留的回測指標
+RESULT_METRICS = (
+    "total_return",
+    "annual_return",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "max_drawdown",
+    "volatility",
+    "total_trades",
+    "win_rate",
+    "profit_factor",
+    "final_capital",
+)
+
+
+def expand_grid(param_grid: ParamGrid) -> List[Dict[str, Any]]:
+    """
+    展開參數網格
+
+    Args:
+        param_grid: {"fast_period": [5, 10], "slow_period": [20, 30]} 形式的網格，
+            或已經展開好的參數字典列表
+
+    Returns:
+        參數組合列表
+    """
+    if isinstance(param_grid, dict):
+        keys = list(param_grid.keys())
+        return [dict(zip(keys, values)) for values in itertools.product(*param_grid.values())]
+    return [dict(params) for params in param_grid]
+
+
+def summarize_result(result: BacktestResult) -> Dict[str, float]:
+    """提取結果表需要的回測指標"""
+    return {name: float(getattr(result, name)) for name in RESULT_METRICS}
+
+
+@dataclass
+class SweepResult:
+    """單個參數組合的回測結果"""
+
+    params: Dict[str, Any]
+    metrics: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+    result: Optional[BacktestResult] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class BacktestSettings:
+    """工作進程共用的回測設置"""
+
+    strategy_factory: Callable[..., Any]
+    start_date: datetime
+    end_date: datetime
+    initial_capital: float
+    commission: float
+    slippage: float
+    max_position_size: float
+    vectorized: bool
+    keep_results: bool
+    warmup_bars: int = 0
+
+
+# 工作進程狀態：由進程池 initializer 設置一次，之後所有任務共用
+_worker_shared: Optional[SharedOHLCV] = None
+_worker_data: Optional[pd.DataFrame] = None
+_worker_settings: Optional[BacktestSettings] = None
+
+
+def _init_worker(handle: SharedOHLCVHandle, settings: BacktestSettings) -> None:
+    """進程池初始化：掛載共享內存行情並按日期範圍過濾"""
+    global _worker_shared, _worker_data, _worker_settings
+
+    _worker_shared = SharedOHLCV.attach(handle)
+    data = _worker_shared.to_dataframe()
+    mask = (data.index >= settings.start_date) & (data.index <= settings.end_date)
+    _worker_data = data[mask]
+    _worker_settings = settings
+
+
+def run_single_backtest(
+    settings: BacktestSettings, data: pd.DataFrame, params: Dict[str, Any]
+) -> SweepResult:
+    """用給定參數創建策略並運行一次回測"""
+    try:
+        strategy = settings.strategy_factory(**params)
+        config = BacktestConfig(
+            strategy=strategy,
+            start_date=settings.start_date,
+            end_date=settings.end_date,
+            initial_capital=settings.initial_capital,
+            commission=settings.commission,
+            slippage=settings.slippage,
+            max_position_size=settings.max_position_size,
+            warmup_bars=settings.warmup_bars,
+        )
+        engine_cls = VectorizedBacktestEngine if settings.vectorized else BacktestEngine
+        result = engine_cls(config).run(data)
+        return SweepResult(
+            params=params,
+            metrics=summarize_result(result),
+            result=result if settings.keep_results else None,
+        )
+    except Exception as e:
+        return SweepResult(params=params, error=str(e))
+
+
+def _run_task(params: Dict[str, Any]) -> SweepResult:
+    """工作進程任務入口"""
+    return run_single_backtest(_worker_settings, _worker_data, params)
+
+
+class ParameterSweep:
+    """
+    並行參數掃描
+
+    策略工廠必須可以被 pickle（模塊級函數或類），以 strategy_factory(**params)
+    的方式創建策略實例。結果按完成順序流式返回，run() 彙總為按指標排序的表格。
+    """
+
+    def __init__(
+        self,
+        strategy_factory: Callable[..., Any],
+        param_grid: ParamGrid,
+        data: pd.DataFrame,
+        start_date: datetime,
+        end_date: datetime,
+        initial_capital: float = 10000.0,
+        commission: float = 0.001,
+        slippage: float = 0.0001,
+        max_position_size: float = 0.95,
+        max_workers: Optional[int] = None,
+        rank_by: str = "sharpe_ratio",
+        vectorized: bool = False,
+        keep_results: bool = False,
+    ):
+        """
+        初始化參數掃描
+
+        Args:
+            strategy_factory: 策略工廠
+            param_grid: 參數網格
+            data: 歷史數據，包含OHLCV列
+            start_date: 開始日期
+            end_date: 結束日期
+            initial_capital: 初始資金
+            commission: 手續費率
+            slippage: 滑點
+            max_position_size: 最大倉位比例
+            max_workers: 最大工作進程數，默認為CPU核數
+            rank_by: 結果表的排序指標，越大越好（max_drawdown 除外）
+            vectorized: 是否使用向量化回測引擎
+            keep_results: 是否把完整 BacktestResult 傳回主進程
+        """
+        if rank_by not in RESULT_METRICS:
+            raise ValueError(f"未知的排序指標: {rank_by}")
+
+        self.param_sets = expand_grid(param_grid)
+        self.data = data
+        self.max_workers = max_workers
+        self.rank_by = rank_by
+        self.settings = BacktestSettings(
+            strategy_factory=strategy_factory,
+            start_date=start_date,
+            end_date=end_date,
+            initial_capital=initial_capital,
+            commission=commission,
+            slippage=slippage,
+            max_position_size=max_position_size,
+            vectorized=vectorized,
+            keep_results=keep_results,
+        )
+
+        self.results: List[SweepResult] = []
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> None:
+        """取消掃描：未開始的任務不再執行，正在運行的任務完成後丟棄"""
+        self._cancel_event.set()
+        logger.info("參數掃描已取消")
+
+    def iter_results(self) -> Iterator[SweepResult]:
+        """
+        按完成順序流式返回結果
+
+        每產出一個結果都會檢查取消標記，可以在消費循環中或其他線程調用 cancel()。
+        """
+        self.results = []
+        self._cancel_event.clear()
+
+        with SharedOHLCV.from_dataframe(self.data) as shared:
+            executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(shared.handle, self.settings),
+            )
+            try:
+                # 工作進程崩潰時任務不會返回結果，從這裡找回對應的參數
+                submitted = {executor.submit(_run_task, params): params for params in self.param_sets}
+                pending = set(submitted)
+                logger.info(f"參數掃描開始: {len(pending)} 個參數組合")
+
+                while pending and not self.cancelled:
+                    done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        sweep_result = self._collect(future, submitted[future])
+                        self.results.append(sweep_result)
+                        yield sweep_result
+                        if self.cancelled:
+                            break
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        logger.info(f"參數掃描結束: 完成 {len(self.results)}/{len(self.param_sets)}")
+
+    def _collect(self, future: Future, params: Dict[str, Any]) -> SweepResult:
+        """讀取任務結果，工作進程異常退出等情況下返回帶參數的失敗結果"""
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"參數掃描任務失敗: {params}: {e}")
+            return SweepResult(params=params, error=str(e))
+
+    def run(self) -> pd.DataFrame:
+        """運行掃描並返回排序後的結果表"""
+        for _ in self.iter_results():
+            pass
+        return self.ranked_table()
+
+    def ranked_table(self) -> pd.DataFrame:
+        """把已完成的結果整理為按 rank_by 排序的表格"""
+        return rank_results(self.results, self.rank_by)
+
+
+def rank_results(results: List[SweepResult], rank_by: str = "sharpe_ratio") -> pd.DataFrame:
+    """
+    把掃描結果整理為排序表格
+
+    每行包含參數列、指標列和 error 列，失敗的組合排在最後。
+    """
+    rows = [{**r.params, **r.metrics, "error": r.error} for r in results]
+    if not rows:
+        return pd.DataFrame()
+
+    table = pd.DataFrame(rows)
+    if rank_by not in table.columns:
+        return table
+    ascending = rank_by == "max_drawdown"
+    return table.sort_values(rank_by, ascending=ascending, na_position="last").reset_index(
+        drop=True
+    )
+
+
+def run_parameter_sweep(
+    strategy_factory: Callable[..., Any],
+    param_grid: ParamGrid,
+    data: pd.DataFrame,
+    start_date: datetime,
+    end_date: datetime,
+    max_workers: Optional[int] = None,
+    rank_by: str = "sharpe_ratio",
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    運行參數掃描的便利函數
+
+    Args:
+        strategy_factory: 策略工廠
+        param_grid: 參數網格
+        data: 歷史數據
+        start_date: 開始日期
+        end_date: 結束日期
+        max_workers: 最大工作進程數
+        rank_by: 排序指標
+        **kwargs: 傳給 ParameterSweep 的其他回測設置
+
+    Returns:
+        排序後的結果表
+    """
+    sweep = ParameterSweep(
+        strategy_factory,
+        param_grid,
+        data,
+        start_date,
+        end_date,
+        max_workers=max_workers,
+        rank_by=rank_by,
+        **kwargs,
+    )
+    return sweep.run()
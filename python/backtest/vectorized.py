@@ -0,0 +1,285 @@
+"""
+向量化回測引擎
+
+面向參數研究的回測模式：策略一次性給出整段數據的目標倉位數組，
+持倉、手續費、滑點、權益曲線和回撤全部用 NumPy 數組運算完成，不再逐根K線循環。
+"""
+
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from typing import Optional, Union
+import logging
+
+from .candle_store import CandleStore
+from .engine import BacktestEngine, BacktestConfig, BacktestResult, PositionSide
+
+logger = logging.getLogger(__name__)
+
+
+def signals_to_positions(signals: np.ndarray) -> np.ndarray:
+    """
+    把信號數組轉換為目標倉位數組
+
+    Args:
+        signals: 1 表示買入，-1 表示賣出（平多），0 表示保持
+
+    Returns:
+        目標倉位數組，買入後保持 1，賣出後保持 0
+    """
+    signals = np.asarray(signals, dtype=float)
+    positions = np.where(signals > 0, 1.0, np.where(signals < 0, 0.0, np.nan))
+    # 前向填充：保持最近一次信號對應的倉位
+    filled = np.where(np.isnan(positions), 0, np.arange(len(positions)))
+    np.maximum.accumulate(filled, out=filled)
+    positions = positions[filled]
+    return np.nan_to_num(positions, nan=0.0)
+
+
+class VectorizedBacktestEngine(BacktestEngine):
+    """
+    向量化回測引擎
+
+    策略需要實現 generate_positions(data) -> np.ndarray，返回每根K線收盤後的
+    目標倉位，取值範圍 [0, 1]，1 表示按 max_position_size 滿倉做多。也可以在
+    run() 中直接傳入倉位數組。
+
+    與事件驅動引擎的約定相同：在信號K線的收盤價成交，按成交金額收取手續費和滑點，
+    權益曲線首元素為初始資金。不同之處在於權益按每根K線收盤價逐根盯市，
+    每日收益取自每個自然日最後一根K線的權益。
+
+    有預熱K線時策略基於全部數據給出倉位，從預熱結束後的第一根K線開始按該K線的
+    目標倉位建倉。
+    """
+
+    def __init__(self, config: BacktestConfig):
+        super().__init__(config)
+        self._positions: Optional[np.ndarray] = None
+
+    def run(
+        self,
+        data: Union[pd.DataFrame, CandleStore],
+        positions: Optional[np.ndarray] = None,
+        symbol: Optional[str] = None,
+    ) -> BacktestResult:
+        """
+        運行向量化回測
+
+        Args:
+            data: 歷史數據，包含OHLCV列，或K線存儲
+            positions: 目標倉位數組，默認調用策略的 generate_positions
+            symbol: 交易對，data 為K線存儲時必填
+
+        Returns:
+            回測結果
+        """
+        self._positions = positions
+        return super().run(data, symbol=symbol)
+
+    def _run_backtest(self, data: pd.DataFrame) -> None:
+        """向量化回測邏輯"""
+        positions = self._positions
+        if positions is None:
+            if not callable(getattr(self.strategy, "generate_positions", None)):
+                raise ValueError(f"策略 {self.strategy.name} 未實現 generate_positions")
+            positions = self.strategy.generate_positions(data)
+
+        positions = np.asarray(positions, dtype=float)
+        if positions.shape != (len(data),):
+            raise ValueError(f"倉位數組長度 {positions.shape} 與數據長度 {len(data)} 不一致")
+
+        # 預熱K線只用於計算倉位
+        warmup = self.config.warmup_bars
+        data = data.iloc[warmup:]
+        positions = positions[warmup:]
+        closes = data["close"].to_numpy(dtype=float)
+        n = len(closes)
+        exposure = np.clip(np.nan_to_num(positions), 0.0, 1.0) * self.config.max_position_size
+
+        # 倉位變化點把序列切分為若干區間，區間內持倉數量不變
+        changed = np.empty(n, dtype=bool)
+        changed[0] = True
+        changed[1:] = exposure[1:] != exposure[:-1]
+        starts = np.flatnonzero(changed)
+        regime = np.cumsum(changed) - 1
+
+        base, cost, start_price = self._solve_regimes(
+            data.index, closes, exposure, starts
+        )
+
+        # 區間內權益 = 基準權益 × (1 - 成本 - 倉位 + 倉位 × 價格 / 入場價)
+        a = exposure[starts][regime]
+        equity = base[regime] * (1.0 - cost[regime] - a + a * closes / start_price[regime])
+
+        self.equity_curve.extend(equity)
+        self.current_capital = float(equity[-1])
+
+        peak = np.maximum.accumulate(
+            np.concatenate(([self.config.initial_capital], equity))
+        )
+        drawdown = (peak[1:] - equity) / peak[1:]
+        self.max_drawdown = float(max(drawdown.max(), 0.0))
+        self.peak_equity = float(peak[-1])
+
+        # 按當地日期分組，與 BacktestEngine 的 current_time.date() 一致
+        index = pd.DatetimeIndex(data.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        days = index.to_numpy().astype("datetime64[D]")
+        day_ends = np.flatnonzero(np.append(days[1:] != days[:-1], True))
+        day_close = equity[day_ends]
+        daily_returns = day_close[1:] / day_close[:-1] - 1.0
+        self.daily_returns.extend(daily_returns)
+        self.return_stats.update_many(daily_returns)
+
+        final_exposure = exposure[-1]
+        self.current_position = PositionSide.LONG if final_exposure > 0 else PositionSide.FLAT
+
+    def _solve_regimes(self, timestamps, closes, exposure, starts):
+        """
+        用數組運算求解每個倉位區間的基準權益與調倉成本，並批量記錄交易
+
+        記區間 j 起點的盯市權益為 E_j、倉位為 a_j、入場價為 p_j，調倉金額為
+        T_j = a_j E_j - a_{j-1} E_{j-1} p_j / p_{j-1}，區間權益增長
+        g_j = E_{j+1} / E_j = 1 - a_j + a_j p_{j+1} / p_j - rate |T_j| / E_j。
+        g_j 只依賴 g_{j-1}，且依賴程度與費率同階，因此從不計成本的增長出發，
+        整體按元素迭代，每輪誤差縮小約 rate 倍，幾輪後精確收斂，再用 cumprod 得到權益。
+
+        Returns:
+            (基準權益, 成本比例, 入場價) 三個按區間排列的數組
+        """
+        rate = self.config.commission + self.config.slippage
+        price = closes[starts]
+        a = exposure[starts]
+        a_prev = np.concatenate(([0.0], a[:-1]))
+        ratio = np.concatenate(([1.0], price[1:] / price[:-1]))
+        drift = 1.0 - a + a * np.append(ratio[1:], 1.0)
+
+        # 權益增長只影響下一區間調倉前的倉位比例 a_{j-1} p_j / p_{j-1} / g_{j-1}；
+        # 因果遞推按元素迭代最多 k 輪一定收斂，實際只需幾輪
+        growth = drift
+        while True:
+            growth_prev = np.concatenate(([1.0], growth[:-1]))
+            held = a_prev * ratio / np.where(growth_prev != 0, growth_prev, 1.0)
+            cost = rate * np.abs(a - held)
+            updated = drift - cost
+            if np.array_equal(updated, growth):
+                break
+            growth = updated
+
+        base = self.config.initial_capital * np.concatenate(([1.0], np.cumprod(growth[:-1])))
+        traded = (a - held) * base
+        trade_cost = np.abs(traded) * rate
+        self._record_trades(timestamps[starts], price, a, base, traded, trade_cost)
+        return base, cost, price
+
+    def _record_trades(
+        self,
+        timestamps: pd.DatetimeIndex,
+        price: np.ndarray,
+        a: np.ndarray,
+        base: np.ndarray,
+        traded: np.ndarray,
+        trade_cost: np.ndarray,
+    ) -> None:
+        """按列計算每次調倉的數量、費用和盈虧，一次寫入交易賬本"""
+        quantity = a * base / price
+        previous = np.concatenate(([0.0], quantity[:-1]))
+        delta = quantity - previous
+        buys = delta > 0
+
+        # 平均入場價：持倉成本 B 在買入時加上成交金額，減倉時按剩餘比例縮小，
+        # 即仿射遞推 B_j = m_j B_{j-1} + d_j，用倍增掃描求解
+        scale = np.ones(len(price))
+        np.divide(quantity, previous, out=scale, where=~buys & (previous > 0))
+        basis = _affine_scan(scale, np.where(buys, price * delta, 0.0))
+        basis_prev = np.concatenate(([0.0], basis[:-1]))
+        entry_price = np.divide(
+            basis_prev, previous, out=np.zeros(len(price)), where=previous > 0
+        )
+
+        value = np.abs(traded)
+        commission = value * self.config.commission
+        slippage_cost = value * self.config.slippage
+        pnl = np.where(buys, 0.0, (price - entry_price) * -delta - commission - slippage_cost)
+        code = self.trades.action_code
+        action = np.where(
+            buys, code("買入"), np.where(quantity == 0, code("平多"), code("減倉"))
+        )
+
+        done = value > 0
+        self.trades.record_many(
+            timestamps[done],
+            action[done],
+            price=price[done],
+            quantity=np.abs(delta[done]),
+            commission=commission[done],
+            slippage=slippage_cost[done],
+            capital=(base - trade_cost)[done],
+            signal_strength=1.0,
+            pnl=pnl[done],
+        )
+
+
+def _affine_scan(scale: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    """
+    求解 x_j = scale_j x_{j-1} + offset_j，x_{-1} = 0
+
+    倍增掃描：每輪把每個位置與前 shift 個位置的部分變換複合，共 log2(k) 輪。
+    """
+    scale = scale.copy()
+    value = offset.copy()
+    shift = 1
+    while shift < len(value):
+        value[shift:] = scale[shift:] * value[:-shift] + value[shift:]
+        scale[shift:] = scale[shift:] * scale[:-shift]
+        shift *= 2
+    return value
+
+
+def run_vectorized_backtest(
+    strategy,
+    data: pd.DataFrame,
+    start_date: datetime,
+    end_date: datetime,
+    initial_capital: float = 10000.0,
+    commission: float = 0.001,
+    slippage: float = 0.0001,
+    max_position_size: float = 0.95,
+    positions: Optional[np.ndarray] = None,
+) -> BacktestResult:
+    """
+    運行向量化回測的便利函數
+
+    Args:
+        strategy: 策略實例
+        data: 歷史數據
+        start_date: 開始日期
+        end_date: 結束日期
+        initial_capital: 初始資金
+        commission: 手續費率
+        slippage: 滑點
+        max_position_size: 最大倉位比例
+        positions: 與 data 或過濾後數據等長的目標倉位數組，默認由策略生成
+
+    Returns:
+        回測結果
+    """
+    config = BacktestConfig(
+        strategy=strategy,
+        start_date=start_date,
+        end_date=end_date,
+        initial_capital=initial_capital,
+        commission=commission,
+        slippage=slippage,
+        max_position_size=max_position_size,
+    )
+
+    engine = VectorizedBacktestEngine(config)
+
+    mask = (data.index >= start_date) & (data.index <= end_date)
+    filtered_data = data[mask]
+    if positions is not None and len(positions) == len(data):
+        positions = np.asarray(positions)[mask]
+
+    return engine.run(filtered_data, positions)
@@ -0,0 +1,416 @@
+"""
+前推（Walk-Forward）優化
+
+把歷史數據切分為若干折，每折在樣本內窗口上做參數網格優化，
+再用最優參數在緊隨其後的樣本外窗口上回測，最後把各折的樣本外權益曲線
+拼接為一個完整的回測結果。樣本外回測先用樣本內窗口末尾的K線預熱策略指標，
+交易和權益從樣本外窗口的第一根K線開始記錄。
+
+各折相互獨立，在進程池中並行執行；行情數據放在共享內存中，
+工作進程按位置切片得到零拷貝的 DataFrame 視圖。
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .engine import (
+    BacktestResult,
+    calculate_sharpe_ratio,
+    calculate_sortino_ratio,
+    calculate_volatility,
+)
+from .ledger import TradeLedger
+from .shared_data import SharedOHLCV, SharedOHLCVHandle
+from .sweep import (
+    ParamGrid,
+    RESULT_METRICS,
+    BacktestSettings,
+    expand_grid,
+    run_single_backtest,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WalkForwardFold:
+    """一折的樣本內/樣本外窗口，均為左閉右開的位置區間"""
+
+    index: int
+    in_sample_start: int
+    in_sample_end: int
+    out_of_sample_start: int
+    out_of_sample_end: int
+
+
+@dataclass
+class FoldResult:
+    """單折結果"""
+
+    fold: WalkForwardFold
+    best_params: Dict[str, Any] = field(default_factory=dict)
+    in_sample_metrics: Dict[str, float] = field(default_factory=dict)
+    out_of_sample: Optional[BacktestResult] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class WalkForwardResult:
+    """前推優化結果"""
+
+    folds: List[FoldResult]
+    combined: Optional[BacktestResult]
+
+    def summary(self) -> pd.DataFrame:
+        """每折的最優參數與樣本內/樣本外指標"""
+        rows = []
+        for fold_result in self.folds:
+            row = {"fold": fold_result.fold.index, **fold_result.best_params}
+            for name, value in fold_result.in_sample_metrics.items():
+                row[f"is_{name}"] = value
+            if fold_result.out_of_sample is not None:
+                for name in RESULT_METRICS:
+                    row[f"oos_{name}"] = float(getattr(fold_result.out_of_sample, name))
+            row["error"] = fold_result.error
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def make_folds(
+    n_bars: int,
+    in_sample_bars: int,
+    out_of_sample_bars: int,
+    anchored: bool = False,
+    step_bars: Optional[int] = None,
+) -> List[WalkForwardFold]:
+    """
+    切分前推窗口
+
+    Args:
+        n_bars: K線總數
+        in_sample_bars: 樣本內窗口長度；錨定模式下為第一折的長度
+        out_of_sample_bars: 樣本外窗口長度
+        anchored: 錨定模式下樣本內窗口始終從第一根K線開始並逐折增長，
+            否則為固定長度的滾動窗口
+        step_bars: 相鄰兩折的步長，默認等於樣本外窗口長度；不能小於樣本外窗口長度，
+            否則相鄰折的樣本外窗口重疊，拼接後同一段K線被重複計算
+
+    Returns:
+        折列表
+
+    Raises:
+        ValueError: 窗口長度不大於0，或步長小於樣本外窗口長度
+    """
+    if in_sample_bars <= 0 or out_of_sample_bars <= 0:
+        raise ValueError("樣本內和樣本外窗口長度必須大於0")
+
+    step = step_bars or out_of_sample_bars
+    if step < out_of_sample_bars:
+        raise ValueError(f"步長 {step} 小於樣本外窗口長度 {out_of_sample_bars}，樣本外窗口會重疊")
+    folds = []
+    in_sample_end = in_sample_bars
+
+    while in_sample_end + out_of_sample_bars <= n_bars:
+        folds.append(
+            WalkForwardFold(
+                index=len(folds),
+                in_sample_start=0 if anchored else in_sample_end - in_sample_bars,
+                in_sample_end=in_sample_end,
+                out_of_sample_start=in_sample_end,
+                out_of_sample_end=in_sample_end + out_of_sample_bars,
+            )
+        )
+        in_sample_end += step
+
+    return folds
+
+
+# 工作進程狀態
+_worker_shared: Optional[SharedOHLCV] = None
+_worker_settings: Optional[BacktestSettings] = None
+_worker_param_sets: List[Dict[str, Any]] = []
+_worker_rank_by: str = "sharpe_ratio"
+_worker_warmup_bars: Optional[int] = None
+
+
+def _init_worker(
+    handle: SharedOHLCVHandle,
+    settings: BacktestSettings,
+    param_sets: List[Dict[str, Any]],
+    rank_by: str,
+    warmup_bars: Optional[int],
+) -> None:
+    """進程池初始化：掛載共享內存行情"""
+    global _worker_shared, _worker_settings, _worker_param_sets, _worker_rank_by
+    global _worker_warmup_bars
+
+    _worker_shared = SharedOHLCV.attach(handle)
+    _worker_settings = settings
+    _worker_param_sets = param_sets
+    _worker_rank_by = rank_by
+    _worker_warmup_bars = warmup_bars
+
+
+def _window_settings(
+    data: pd.DataFrame, keep_results: bool, warmup_bars: int = 0
+) -> BacktestSettings:
+    """以預熱K線之後的窗口首尾時間作為回測區間"""
+    return replace(
+        _worker_settings,
+        start_date=data.index[warmup_bars].to_pydatetime(),
+        end_date=data.index[-1].to_pydatetime(),
+        keep_results=keep_results,
+        warmup_bars=warmup_bars,
+    )
+
+
+def _warmup_start(fold: WalkForwardFold) -> int:
+    """樣本外回測的預熱起點，默認為整個樣本內窗口"""
+    if _worker_warmup_bars is None:
+        return fold.in_sample_start
+    return max(fold.out_of_sample_start - _worker_warmup_bars, 0)
+
+
+def _score(metrics: Dict[str, float], rank_by: str) -> float:
+    """排序分數，越大越好"""
+    value = metrics[rank_by]
+    if np.isnan(value):
+        return -np.inf
+    return -value if rank_by == "max_drawdown" else value
+
+
+def _run_fold(fold: WalkForwardFold) -> FoldResult:
+    """在工作進程中優化並驗證一折"""
+    in_sample = _worker_shared.slice(fold.in_sample_start, fold.in_sample_end)
+    settings = _window_settings(in_sample, keep_results=False)
+
+    best, best_score = None, -np.inf
+    for params in _worker_param_sets:
+        candidate = run_single_backtest(settings, in_sample, params)
+        if not candidate.ok:
+            continue
+        score = _score(candidate.metrics, _worker_rank_by)
+        if best is None or score > best_score:
+            best, best_score = candidate, score
+
+    if best is None:
+        return FoldResult(fold=fold, error="樣本內沒有成功的參數組合")
+
+    # 策略從樣本內窗口末尾開始預熱，交易和權益只從樣本外窗口開始記錄
+    warmup_start = _warmup_start(fold)
+    out_of_sample = _worker_shared.slice(warmup_start, fold.out_of_sample_end)
+    settings = _window_settings(
+        out_of_sample, keep_results=True, warmup_bars=fold.out_of_sample_start - warmup_start
+    )
+    oos = run_single_backtest(settings, out_of_sample, best.params)
+
+    return FoldResult(
+        fold=fold,
+        best_params=best.params,
+        in_sample_metrics=best.metrics,
+        out_of_sample=oos.result,
+        error=oos.error,
+    )
+
+
+def stitch_results(results: List[BacktestResult], initial_capital: float) -> BacktestResult:
+    """
+    拼接各折樣本外結果
+
+    每折都以相同初始資金回測，拼接時按上一折的期末資金等比例縮放，
+    使資金在各折之間連續複利。
+    """
+    if not results:
+        raise ValueError("沒有可拼接的回測結果")
+
+    equity_parts = [np.array([initial_capital])]
+    return_parts = []
+    trades = TradeLedger()
+    capital = initial_capital
+
+    for result in results:
+        scale = capital / result.initial_capital
+        equity_parts.append(np.asarray(result.equity_curve[1:], dtype=float) * scale)
+        return_parts.append(np.asarray(result.daily_returns, dtype=float))
+        trades.extend(result.trades, scale=scale)
+        capital = result.final_capital * scale
+
+    equity_curve = np.concatenate(equity_parts)
+    daily_returns = np.concatenate(return_parts)
+    peak = np.maximum.accumulate(equity_curve)
+    max_drawdown = float(np.max((peak - equity_curve) / peak))
+
+    start_date = results[0].start_date
+    end_date = results[-1].end_date
+    total_return = (capital - initial_capital) / initial_capital
+    days = (end_date - start_date).days
+    annual_return = (1 + total_return) ** (365 / days) - 1 if days > 0 else 0
+
+    return BacktestResult(
+        strategy_name=f"{results[0].strategy_name} (walk-forward)",
+        start_date=start_date,
+        end_date=end_date,
+        initial_capital=initial_capital,
+        final_capital=capital,
+        total_trades=len(trades),
+        winning_trades=trades.winning_count,
+        losing_trades=trades.losing_count,
+        total_pnl=trades.total_pnl,
+        total_return=total_return,
+        annual_return=annual_return,
+        max_drawdown=max_drawdown,
+        sharpe_ratio=calculate_sharpe_ratio(daily_returns),
+        sortino_ratio=calculate_sortino_ratio(daily_returns),
+        volatility=calculate_volatility(daily_returns),
+        trades=trades,
+        daily_returns=daily_returns,
+        equity_curve=equity_curve,
+    )
+
+
+class WalkForwardOptimizer:
+    """
+    前推優化器
+
+    策略工廠需要可以被 pickle，以 strategy_factory(**params) 創建策略。
+    回測引擎要求每個窗口至少100根K線，樣本外窗口不計預熱K線。
+    """
+
+    def __init__(
+        self,
+        strategy_factory: Callable[..., Any],
+        param_grid: ParamGrid,
+        data: pd.DataFrame,
+        in_sample_bars: int,
+        out_of_sample_bars: int,
+        anchored: bool = False,
+        step_bars: Optional[int] = None,
+        rank_by: str = "sharpe_ratio",
+        initial_capital: float = 10000.0,
+        commission: float = 0.001,
+        slippage: float = 0.0001,
+        max_position_size: float = 0.95,
+        max_workers: Optional[int] = None,
+        vectorized: bool = False,
+        warmup_bars: Optional[int] = None,
+    ):
+        """
+        初始化前推優化器
+
+        Args:
+            strategy_factory: 策略工廠
+            param_grid: 參數網格
+            data: 歷史數據，包含OHLCV列
+            in_sample_bars: 樣本內窗口長度
+            out_of_sample_bars: 樣本外窗口長度
+            anchored: 是否使用錨定窗口
+            step_bars: 相鄰兩折的步長
+            rank_by: 樣本內選參指標
+            initial_capital: 初始資金
+            commission: 手續費率
+            slippage: 滑點
+            max_position_size: 最大倉位比例
+            max_workers: 最大工作進程數
+            vectorized: 是否使用向量化回測引擎
+            warmup_bars: 樣本外回測前用於預熱策略的K線數，應不小於策略最長的回看週期；
+                默認使用整個樣本內窗口
+        """
+        if rank_by not in RESULT_METRICS:
+            raise ValueError(f"未知的排序指標: {rank_by}")
+        if warmup_bars is not None and warmup_bars < 0:
+            raise ValueError("預熱K線數不能小於0")
+
+        self.data = data
+        self.param_sets = expand_grid(param_grid)
+        self.folds = make_folds(
+            len(data), in_sample_bars, out_of_sample_bars, anchored, step_bars
+        )
+        if not self.folds:
+            raise ValueError("數據長度不足以切分出一折")
+
+        self.rank_by = rank_by
+        self.initial_capital = initial_capital
+        self.max_workers = max_workers
+        self.warmup_bars = warmup_bars
+        self.settings = BacktestSettings(
+            strategy_factory=strategy_factory,
+            start_date=data.index[0],
+            end_date=data.index[-1],
+            initial_capital=initial_capital,
+            commission=commission,
+            slippage=slippage,
+            max_position_size=max_position_size,
+            vectorized=vectorized,
+            keep_results=False,
+        )
+
+    def run(self) -> WalkForwardResult:
+        """並行運行所有折並拼接樣本外結果"""
+        logger.info(
+            f"前推優化開始: {len(self.folds)} 折, 每折 {len(self.param_sets)} 個參數組合"
+        )
+
+        with SharedOHLCV.from_dataframe(self.data) as shared:
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(
+                    shared.handle,
+                    self.settings,
+                    self.param_sets,
+                    self.rank_by,
+                    self.warmup_bars,
+                ),
+            ) as executor:
+                fold_results = list(executor.map(_run_fold, self.folds))
+
+        for fold_result in fold_results:
+            if fold_result.error:
+                logger.warning(f"第 {fold_result.fold.index} 折失敗: {fold_result.error}")
+
+        oos_results = [r.out_of_sample for r in fold_results if r.out_of_sample is not None]
+        combined = stitch_results(oos_results, self.initial_capital) if oos_results else None
+
+        logger.info("前推優化完成")
+        return WalkForwardResult(folds=fold_results, combined=combined)
+
+
+def run_walk_forward(
+    strategy_factory: Callable[..., Any],
+    param_grid: ParamGrid,
+    data: pd.DataFrame,
+    in_sample_bars: int,
+    out_of_sample_bars: int,
+    anchored: bool = False,
+    **kwargs,
+) -> WalkForwardResult:
+    """
+    運行前推優化的便利函數
+
+    Args:
+        strategy_factory: 策略工廠
+        param_grid: 參數網格
+        data: 歷史數據
+        in_sample_bars: 樣本內窗口長度
+        out_of_sample_bars: 樣本外窗口長度
+        anchored: 是否使用錨定窗口
+        **kwargs: 傳給 WalkForwardOptimizer 的其他設置
+
+    Returns:
+        前推優化結果
+    """
+    optimizer = WalkForwardOptimizer(
+        strategy_factory,
+        param_grid,
+        data,
+        in_sample_bars,
+        out_of_sample_bars,
+        anchored=anchored,
+        **kwargs,
+    )
+    return optimizer.run()
@@ -2,26 +2,66 @@
 橋接模塊
 
 提供Python與Rust之間的通信接口。
+
+導出的名稱在第一次訪問時才導入對應子模塊，導入本包本身不會加載 pandas 和 NumPy。
 """
 
-from .rust_bridge import (
-    StrategyManager,
-    create_strategy_from_json,
-    generate_signals,
-    run_backtest_from_json,
-    get_strategy_info,
-    list_strategies,
-    update_strategy_config,
-    strategy_manager,
-)
-
-__all__ = [
-    "StrategyManager",
-    "create_strategy_from_json",
-    "generate_signals",
-    "run_backtest_from_json",
-    "get_strategy_info",
-    "list_strategies",
-    "update_strategy_config",
-    "strategy_manager",
-]
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from lazy_exports import make_lazy_getattr
+
+# 導出名稱 -> 所在子模塊
+_EXPORTS = {
+    "available_codecs": ".codec",
+    "get_codec": ".codec",
+    "negotiate_codec": ".codec",
+    "decode_columnar": ".market_data",
+    "encode_columnar": ".market_data",
+    "load_columnar": ".market_data",
+    "parse_market_data": ".market_data",
+    "write_columnar": ".market_data",
+    "BacktestJob": ".jobs",
+    "BacktestJobManager": ".jobs",
+    "JobStatus": ".jobs",
+    "RollingWindow": ".rolling_window",
+    "WindowGapError": ".rolling_window",
+    "measure_import_time": ".import_timing",
+    "SnapshotError": ".snapshot",
+    "SnapshotScheduler": ".snapshot",
+    "BridgeMetrics": ".metrics",
+    "Histogram": ".metrics",
+    "bridge_metrics": ".metrics",
+    "StrategyManager": ".rust_bridge",
+    "create_strategy_from_json": ".rust_bridge",
+    "generate_signals": ".rust_bridge",
+    "generate_signals_batch": ".rust_bridge",
+    "append_market_data": ".rust_bridge",
+    "resync_market_data": ".rust_bridge",
+    "run_backtest_from_json": ".rust_bridge",
+    "run_backtest_to_dict": ".rust_bridge",
+    "run_backtest_encoded": ".rust_bridge",
+    "stream_backtest": ".rust_bridge",
+    "submit_backtest": ".rust_bridge",
+    "get_backtest_status": ".rust_bridge",
+    "get_backtest_progress": ".rust_bridge",
+    "cancel_backtest": ".rust_bridge",
+    "get_backtest_result": ".rust_bridge",
+    "list_backtest_jobs": ".rust_bridge",
+    "get_job_manager": ".rust_bridge",
+    "get_backtest_cache_stats": ".rust_bridge",
+    "get_bridge_metrics": ".rust_bridge",
+    "get_strategy_info": ".rust_bridge",
+    "list_strategies": ".rust_bridge",
+    "update_strategy_config": ".rust_bridge",
+    "save_strategy_snapshot": ".rust_bridge",
+    "restore_strategy_snapshot": ".rust_bridge",
+    "register_strategy": ".rust_bridge",
+    "strategy_manager": ".rust_bridge",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__, __dir__ = make_lazy_getattr(_EXPORTS, __name__)
@@ -0,0 +1,216 @@
+"""
+橋接響應的序列化編解碼
+
+回測結果包含成千上萬個權益點和交易記錄，標準庫 json 既慢又不認識
+NumPy 數組、datetime 和枚舉。這裡提供三種編解碼器：
+
+    - orjson：輸出標準 JSON，原生序列化 NumPy 數組和 datetime，比標準庫快一個數量級
+    - msgpack：二進制格式，浮點數每個 9 字節，長權益曲線的體積約為 JSON 的一半
+    - json：標準庫實現，總是可用
+
+NaN 和無窮大（例如沒有虧損日時的 Sortino 比率）在所有編解碼器中統一編碼為 null，
+標準庫 json 不再輸出非標準的 Infinity，msgpack 也不輸出無窮大浮點數。
+
+orjson 和 msgpack 為可選依賴，未安裝時對應的編解碼器不可用。
+調用方按偏好順序給出可接受的編解碼器，由 negotiate_codec 選出第一個可用的。
+"""
+
+import json
+import logging
+import math
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可選依賴
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 可選依賴
+    msgpack = None
+
+
+def to_serializable(obj: Any) -> Any:
+    """
+    把編解碼器不認識的對象轉換為基本類型
+
+    作為各編解碼器的 default 鉤子使用：NumPy 數組轉為列表，NumPy 標量轉為 Python 數值，
+    datetime（包括 pandas.Timestamp）轉為 ISO8601 字符串，枚舉取其值。
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "__array__"):
+        return np.asarray(obj).tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def finite_or_none(obj: Any) -> Any:
+    """
+    把結果中的 NaN 和無窮大替換為 None
+
+    遞歸處理字典、列表和元組；浮點數組全部有限時原樣返回，不轉換為列表。
+    """
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: finite_or_none(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [finite_or_none(value) for value in obj]
+    if isinstance(obj, np.ndarray) and obj.dtype.kind == "f":
+        finite = np.isfinite(obj)
+        if finite.all():
+            return obj
+        return np.where(finite, obj, None).tolist()
+    if isinstance(obj, np.floating):
+        return finite_or_none(float(obj))
+    return obj
+
+
+class Codec(ABC):
+    """
+    編解碼器
+
+    子類實現 _encode；encode 先把 NaN 和無窮大替換為 None，
+    保證所有編解碼器對非有限浮點數的表示一致。
+    """
+
+    name = ""
+
+    # 輸出是否為 JSON 文本，JSON 系的編解碼器之間可以互相解碼
+    is_json = False
+
+    def encode(self, obj: Any) -> bytes:
+        """把結果編碼為字節串"""
+        return self._encode(finite_or_none(obj))
+
+    @abstractmethod
+    def _encode(self, obj: Any) -> bytes:
+        """編碼已替換非有限浮點數的結果"""
+
+    @abstractmethod
+    def decode(self, data: Union[bytes, str]) -> Any:
+        """解碼 encode 的輸出"""
+
+
+class JsonCodec(Codec):
+    """標準庫 json"""
+
+    name = "json"
+    is_json = True
+
+    def _encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=to_serializable).encode("utf-8")
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """orjson"""
+
+    name = "orjson"
+    is_json = True
+
+    def _encode(self, obj: Any) -> bytes:
+        return orjson.dumps(
+            obj, default=to_serializable, option=orjson.OPT_SERIALIZE_NUMPY
+        )
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """msgpack"""
+
+    name = "msgpack"
+
+    def _encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=to_serializable, use_bin_type=True)
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+_CODEC_FACTORIES: Dict[str, Callable[[], Codec]] = {
+    "orjson": OrjsonCodec,
+    "msgpack": MsgpackCodec,
+    "json": JsonCodec,
+}
+
+_AVAILABLE = {"json": True, "orjson": orjson is not None, "msgpack": msgpack is not None}
+
+_codecs: Dict[str, Codec] = {}
+
+
+def available_codecs() -> List[str]:
+    """當前環境可用的編解碼器名稱"""
+    return [name for name in _CODEC_FACTORIES if _AVAILABLE[name]]
+
+
+def get_codec(name: str) -> Codec:
+    """
+    按名稱獲取編解碼器
+
+    Raises:
+        ValueError: 名稱未知或對應的庫沒有安裝
+    """
+    if name not in _CODEC_FACTORIES:
+        raise ValueError(f"未知的編解碼器: {name}")
+    if not _AVAILABLE[name]:
+        raise ValueError(f"編解碼器不可用，需要安裝 {name}")
+    codec = _codecs.get(name)
+    if codec is None:
+        codec = _codecs[name] = _CODEC_FACTORIES[name]()
+    return codec
+
+
+def default_json_codec() -> Codec:
+    """最快的可用 JSON 編解碼器"""
+    return get_codec("orjson" if _AVAILABLE["orjson"] else "json")
+
+
+def negotiate_codec(accept: Optional[Union[str, Sequence[str]]] = None) -> Codec:
+    """
+    按調用方偏好選擇編解碼器
+
+    Args:
+        accept: 可接受的編解碼器名稱，按偏好排序；可以是逗號分隔的字符串。
+            為空時使用最快的 JSON 編解碼器
+
+    Returns:
+        第一個可用的編解碼器
+
+    Raises:
+        ValueError: 沒有一個可接受的編解碼器可用
+    """
+    if not accept:
+        return default_json_codec()
+    if isinstance(accept, str):
+        accept = [name.strip() for name in accept.split(",") if name.strip()]
+
+    for name in accept:
+        if _AVAILABLE.get(name):
+            return get_codec(name)
+    raise ValueError(f"沒有可用的編解碼器: {list(accept)}，當前可用 {available_codecs()}")
+
+
+def dumps(obj: Any) -> str:
+    """用最快的可用 JSON 編解碼器序列化為字符串"""
+    return default_json_codec().encode(obj).decode("utf-8")
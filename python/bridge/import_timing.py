@@ -0,0 +1,96 @@
+"""
+橋接模塊冷啟動耗時測量
+
+在全新的解釋器中執行常見的橋接調用，記錄總耗時，並用 -X importtime
+找出耗時最多的導入。用法：
+
+    python python/bridge/rust_bridge.py --import-time
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 測量項目 -> 在新解釋器中執行的代碼
+COLD_START_TARGETS: Dict[str, str] = {
+    "interpreter": "pass",
+    "import_bridge": "import bridge.rust_bridge",
+    "list_strategies": "from bridge.rust_bridge import list_strategies; list_strategies()",
+    "get_strategy_info": (
+        "from bridge.rust_bridge import get_strategy_info; get_strategy_info('cold-start')"
+    ),
+}
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int]]:
+    """解析 -X importtime 輸出，返回 (模塊, 累計微秒)"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        entries.append((parts[2].rstrip(), int(parts[1])))
+    return entries
+
+
+def measure_import_time(
+    targets: Optional[Dict[str, str]] = None, repeat: int = 3, top: int = 10
+) -> Dict[str, Any]:
+    """
+    測量冷啟動耗時
+
+    Args:
+        targets: 測量項目，默認為 COLD_START_TARGETS
+        repeat: 每個項目運行次數，取最小值
+        top: 每個項目報告的最耗時導入數
+
+    Returns:
+        每個項目的總耗時（毫秒）和累計耗時最多的導入
+    """
+    targets = targets or COLD_START_TARGETS
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (PYTHON_DIR, env.get("PYTHONPATH")) if path
+    )
+
+    report: Dict[str, Any] = {}
+    for name, code in targets.items():
+        best = None
+        stderr = ""
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", code],
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            elapsed = (time.perf_counter() - start) * 1000
+            if completed.returncode != 0:
+                raise RuntimeError(f"{name} 執行失敗: {completed.stderr.strip()[-500:]}")
+            if best is None or elapsed < best:
+                best, stderr = elapsed, completed.stderr
+
+        # 按累計耗時排序，包含被間接導入的模塊，便於找出拖慢啟動的依賴
+        imports = [(module.strip(), us) for module, us in _parse_importtime(stderr)]
+        imports.sort(key=lambda item: item[1], reverse=True)
+        report[name] = {
+            "wall_ms": round(best, 1),
+            "top_imports_ms": {module: round(us / 1000, 1) for module, us in imports[:top]},
+        }
+    return report
+
+
+def main() -> None:
+    print(json.dumps(measure_import_time(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
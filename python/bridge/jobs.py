@@ -0,0 +1,409 @@
+"""
+異步回測任務
+
+回測任務提交後在有界的進程池中運行，調用方用任務ID查詢狀態和進度、取消任務、
+讀取結果。進度由工作進程通過隊列回報，取消是協作式的：未開始的任務直接取消，
+運行中的任務在下一次進度回調時中止。
+
+已完成任務的結果以編碼後的 JSON 字節保存，總大小超過上限時淘汰最早完成的結果，
+任務記錄本身保留，狀態仍為已完成但結果不可再讀取。已結束的任務記錄超過保留時間
+或數量上限時連同結果一起刪除。
+
+工作進程用 forkserver（不支持時用 spawn）啟動，不繼承調用方進程的線程和鎖。
+"""
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 已完成結果佔用內存的默認上限
+DEFAULT_MAX_RESULT_BYTES = 256 * 1024 * 1024
+
+# 已結束任務記錄的默認數量上限和保留時間（秒）
+DEFAULT_MAX_FINISHED_JOBS = 1000
+DEFAULT_FINISHED_JOB_TTL = 24 * 3600.0
+
+
+def default_start_method() -> str:
+    """工作進程的啟動方式，優先 forkserver"""
+    methods = multiprocessing.get_all_start_methods()
+    return "forkserver" if "forkserver" in methods else "spawn"
+
+
+class JobStatus(Enum):
+    """回測任務狀態"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """任務在運行中被取消"""
+
+
+@dataclass
+class BacktestJob:
+    """回測任務記錄"""
+
+    job_id: str
+    status: JobStatus = JobStatus.PENDING
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    processed: int = 0
+    total: int = 0
+    metrics: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+    result_bytes: int = 0
+    result_evicted: bool = False
+
+    @property
+    def progress(self) -> float:
+        """完成比例"""
+        return self.processed / self.total if self.total else 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "processed": self.processed,
+            "total": self.total,
+            "progress": self.progress,
+            "metrics": self.metrics,
+            "error": self.error,
+            "result_bytes": self.result_bytes,
+            "result_evicted": self.result_evicted,
+        }
+
+
+def _run_job(job_id: str, config_json: str, progress_queue, cancelled) -> bytes:
+    """
+    在工作進程中運行回測任務
+
+    Returns:
+        編碼後的回測結果
+    """
+    # 工作進程中才導入橋接模塊，避免與 rust_bridge 循環導入
+    from bridge.codec import default_json_codec
+    from bridge.rust_bridge import _backtest_result_to_dict, _run_backtest_from_config
+    import json
+
+    progress_queue.put((job_id, "started", None))
+
+    def on_progress(processed: int, total: int, metrics: Dict[str, float]) -> None:
+        if job_id in cancelled:
+            raise JobCancelled(job_id)
+        progress_queue.put((job_id, "progress", (processed, total, metrics)))
+
+    result = _run_backtest_from_config(json.loads(config_json), on_progress)
+    return default_json_codec().encode(_backtest_result_to_dict(result))
+
+
+class BacktestJobManager:
+    """
+    回測任務管理器
+
+    進程池和進程間通信所需的管理進程在第一次提交任務時創建。
+    所有公開方法都是線程安全的。
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_result_bytes: int = DEFAULT_MAX_RESULT_BYTES,
+        max_finished_jobs: int = DEFAULT_MAX_FINISHED_JOBS,
+        finished_job_ttl: Optional[float] = DEFAULT_FINISHED_JOB_TTL,
+        start_method: Optional[str] = None,
+    ):
+        """
+        初始化任務管理器
+
+        Args:
+            max_workers: 同時運行的回測數，默認為CPU核數
+            max_result_bytes: 已完成結果的總大小上限
+            max_finished_jobs: 保留的已結束任務數，超出時刪除最早結束的任務
+            finished_job_ttl: 已結束任務的保留時間（秒），None 表示不按時間刪除
+            start_method: 工作進程的啟動方式，默認見 default_start_method
+        """
+        self.max_workers = max_workers
+        self.max_result_bytes = max_result_bytes
+        self.max_finished_jobs = max_finished_jobs
+        self.finished_job_ttl = finished_job_ttl
+        self.start_method = start_method or default_start_method()
+
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, BacktestJob] = {}
+        self._futures: Dict[str, Future] = {}
+        self._results: "OrderedDict[str, bytes]" = OrderedDict()
+        self._result_total = 0
+        # 已結束的任務，按結束順序
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._sync_manager = None
+        self._progress_queue = None
+        self._cancelled = None
+        self._listener: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        """創建進程池、進度隊列和監聽線程"""
+        if self._executor is not None:
+            return
+        context = multiprocessing.get_context(self.start_method)
+        self._sync_manager = context.Manager()
+        self._progress_queue = self._sync_manager.Queue()
+        self._cancelled = self._sync_manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        self._listener = threading.Thread(
+            target=self._listen, name="backtest-job-progress", daemon=True
+        )
+        self._listener.start()
+
+    def _listen(self) -> None:
+        """把工作進程回報的進度寫入任務記錄"""
+        while True:
+            try:
+                message = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+
+            job_id, kind, payload = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.finished:
+                    continue
+                if kind == "started":
+                    job.status = JobStatus.RUNNING
+                    job.started_at = time.time()
+                elif kind == "progress":
+                    job.processed, job.total, job.metrics = payload
+
+    # ------------------------------------------------------------------
+    # 公開接口
+    # ------------------------------------------------------------------
+
+    def submit(self, config_json: str) -> str:
+        """
+        提交回測任務
+
+        Args:
+            config_json: JSON格式的回測配置，格式同 run_backtest_from_json
+
+        Returns:
+            任務ID
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._ensure_started()
+            job = BacktestJob(job_id=job_id)
+            self._jobs[job_id] = job
+            future = self._executor.submit(
+                _run_job, job_id, config_json, self._progress_queue, self._cancelled
+            )
+            self._futures[job_id] = future
+
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        logger.info(f"回測任務已提交: {job_id}")
+        return job_id
+
+    def _on_done(self, job_id: str, future: Future) -> None:
+        """任務結束時更新狀態並保存結果"""
+        with self._lock:
+            job = self._jobs[job_id]
+            self._futures.pop(job_id, None)
+            job.finished_at = time.time()
+
+            if future.cancelled():
+                job.status = JobStatus.CANCELLED
+            elif isinstance(future.exception(), JobCancelled):
+                job.status = JobStatus.CANCELLED
+            elif future.exception() is not None:
+                job.status = JobStatus.FAILED
+                job.error = str(future.exception())
+            else:
+                result = future.result()
+                job.status = JobStatus.COMPLETED
+                job.processed = job.total
+                job.result_bytes = len(result)
+                self._results[job_id] = result
+                self._result_total += len(result)
+                self._evict()
+
+            if self._cancelled is not None:
+                self._cancelled.pop(job_id, None)
+            self._finished[job_id] = None
+            self._prune()
+
+        logger.info(f"回測任務結束: {job_id}, {job.status.value}")
+
+    def _evict(self) -> None:
+        """淘汰最早完成的結果直到總大小不超過上限"""
+        while self._result_total > self.max_result_bytes and self._results:
+            evicted_id, result = self._results.popitem(last=False)
+            self._result_total -= len(result)
+            self._jobs[evicted_id].result_evicted = True
+            logger.info(f"回測結果超過內存上限，已淘汰: {evicted_id}")
+
+    def _prune(self) -> None:
+        """刪除超過保留時間或數量上限的已結束任務"""
+        now = time.time()
+        while self._finished:
+            job_id = next(iter(self._finished))
+            job = self._jobs[job_id]
+            expired = (
+                self.finished_job_ttl is not None
+                and now - job.finished_at > self.finished_job_ttl
+            )
+            if not expired and len(self._finished) <= self.max_finished_jobs:
+                break
+            self._remove(job_id)
+            logger.info(f"回測任務記錄已過期，已刪除: {job_id}")
+
+    def _remove(self, job_id: str) -> None:
+        """刪除已結束任務的記錄和結果"""
+        del self._jobs[job_id]
+        self._finished.pop(job_id, None)
+        result = self._results.pop(job_id, None)
+        if result is not None:
+            self._result_total -= len(result)
+
+    def _get_job(self, job_id: str) -> BacktestJob:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"回測任務不存在: {job_id}")
+        return job
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        """任務狀態"""
+        with self._lock:
+            return self._get_job(job_id).to_dict()
+
+    def progress(self, job_id: str) -> Dict[str, Any]:
+        """任務進度和當前績效指標"""
+        with self._lock:
+            job = self._get_job(job_id)
+            return {
+                "job_id": job_id,
+                "status": job.status.value,
+                "processed": job.processed,
+                "total": job.total,
+                "progress": job.progress,
+                "metrics": job.metrics,
+            }
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        取消任務
+
+        Returns:
+            任務尚未結束、取消請求已生效時為 True
+        """
+        with self._lock:
+            job = self._get_job(job_id)
+            if job.finished:
+                return False
+            future = self._futures.get(job_id)
+            self._cancelled[job_id] = True
+
+        # 未開始的任務直接取消，運行中的任務在下一次進度回調時中止
+        if future is not None:
+            future.cancel()
+        logger.info(f"回測任務取消請求: {job_id}")
+        return True
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        """
+        讀取已完成任務的結果
+
+        Returns:
+            編碼後的回測結果；任務未完成時返回 None
+
+        Raises:
+            KeyError: 任務不存在
+            RuntimeError: 任務失敗、被取消或結果已被淘汰
+        """
+        with self._lock:
+            job = self._get_job(job_id)
+            if not job.finished:
+                return None
+            if job.status == JobStatus.FAILED:
+                raise RuntimeError(f"回測任務失敗: {job.error}")
+            if job.status == JobStatus.CANCELLED:
+                raise RuntimeError(f"回測任務已取消: {job_id}")
+            if job.result_evicted:
+                raise RuntimeError(f"回測結果已被淘汰: {job_id}")
+            self._results.move_to_end(job_id)
+            return self._results[job_id]
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """所有任務的狀態，按提交時間排序"""
+        with self._lock:
+            self._prune()
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def forget(self, job_id: str) -> bool:
+        """刪除已結束的任務記錄和結果"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.finished:
+                return False
+            self._remove(job_id)
+            return True
+
+    @property
+    def result_bytes(self) -> int:
+        """已保存結果的總大小"""
+        return self._result_total
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        關閉進程池
+
+        Args:
+            wait: 是否等待運行中的任務結束；為 False 時運行中的任務會被取消
+        """
+        with self._lock:
+            executor = self._executor
+            if executor is None:
+                return
+            if not wait:
+                for job_id in self._futures:
+                    self._cancelled[job_id] = True
+
+        executor.shutdown(wait=True, cancel_futures=not wait)
+        try:
+            self._progress_queue.put(None)
+        except (EOFError, OSError, queue.Full):
+            pass
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+        self._sync_manager.shutdown()
+
+        with self._lock:
+            self._executor = None
+            self._sync_manager = self._progress_queue = self._cancelled = None
+            self._listener = None
+        logger.info("回測任務管理器已關閉")
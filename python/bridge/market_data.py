@@ -0,0 +1,221 @@
+"""
+行情數據傳輸格式
+
+橋接接口接收的K線數據有三種形式：
+    - JSON 記錄數組：[{"timestamp": ..., "open": ..., ...}, ...]
+    - 列式二進制文件引用：{"format": "columnar", "path": "/dev/shm/..."}
+    - Arrow IPC 文件引用：{"format": "arrow", "path": "..."}（需要安裝 pyarrow）
+
+列式二進制格式為小端序定寬列，文件以內存映射方式打開，
+解碼得到的 NumPy 數組和 DataFrame 直接引用映射內存，不複製數據。
+
+文件佈局：
+    magic     8 字節  b"TBCOLS01"
+    n_rows    u64
+    n_cols    u32
+    reserved  u32
+    每列描述：dtype u8（t=納秒時間戳 UTC，f=float64，i=int64）、名稱長度 u8、名稱 UTF-8
+    填充到 8 字節對齊
+    列數據：按描述順序，每列 n_rows × 8 字節
+"""
+
+import json
+import mmap
+import struct
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+COLUMNAR_MAGIC = b"TBCOLS01"
+ARROW_MAGIC = b"ARROW1"
+
+_HEADER = struct.Struct("<8sQII")
+_COLUMN = struct.Struct("<BB")
+
+_DTYPES = {ord("t"): "<i8", ord("f"): "<f8", ord("i"): "<i8"}
+
+MarketDataInput = Union[str, bytes, List[Dict[str, Any]], Dict[str, Any]]
+
+
+def market_data_to_frame(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    把K線記錄列表轉換為以時間為索引的 DataFrame
+
+    按列收集後一次性構建，字符串時間戳按 ISO8601 解析，
+    比逐行構建 DataFrame 再轉換時間列快數倍，常駐工作進程中每次請求都會調用。
+    """
+    if not records:
+        return pd.DataFrame()
+
+    columns = {key: [record[key] for record in records] for key in records[0]}
+    timestamps = columns.pop("timestamp", None)
+    if timestamps is None:
+        return pd.DataFrame(columns)
+
+    if isinstance(timestamps[0], str):
+        index = pd.to_datetime(timestamps, format="ISO8601")
+    else:
+        index = pd.to_datetime(timestamps)
+    return pd.DataFrame(columns, index=pd.DatetimeIndex(index, name="timestamp"))
+
+
+# ----------------------------------------------------------------------
+# 列式二進制格式
+# ----------------------------------------------------------------------
+
+
+def encode_columnar(data: pd.DataFrame) -> bytes:
+    """
+    把 DataFrame 編碼為列式二進制格式
+
+    時間索引寫為 timestamp 列，數值列按原順序寫入。
+    """
+    index = pd.DatetimeIndex(data.index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+
+    columns: List[Tuple[str, int, np.ndarray]] = [
+        ("timestamp", ord("t"), index.as_unit("ns").asi8)
+    ]
+    for name in data.columns:
+        values = data[name].to_numpy()
+        if np.issubdtype(values.dtype, np.integer):
+            columns.append((str(name), ord("i"), values.astype("<i8")))
+        else:
+            columns.append((str(name), ord("f"), values.astype("<f8")))
+
+    parts = [_HEADER.pack(COLUMNAR_MAGIC, len(data), len(columns), 0)]
+    for name, code, _ in columns:
+        encoded = name.encode("utf-8")
+        parts.append(_COLUMN.pack(code, len(encoded)) + encoded)
+
+    header_size = sum(len(part) for part in parts)
+    parts.append(b"\0" * (-header_size % 8))
+    parts.extend(values.tobytes() for _, _, values in columns)
+    return b"".join(parts)
+
+
+def write_columnar(path: str, data: pd.DataFrame) -> None:
+    """把 DataFrame 寫入列式二進制文件"""
+    with open(path, "wb") as f:
+        f.write(encode_columnar(data))
+
+
+def decode_columnar(buffer) -> pd.DataFrame:
+    """
+    零拷貝解碼列式二進制數據
+
+    Args:
+        buffer: bytes、memoryview 或 mmap 等支持緩衝區協議的對象
+
+    Returns:
+        以 timestamp（UTC）為索引的 DataFrame，數值列直接引用 buffer
+    """
+    magic, n_rows, n_cols, _ = _HEADER.unpack_from(buffer, 0)
+    if magic != COLUMNAR_MAGIC:
+        raise ValueError("不是有效的列式行情數據")
+
+    offset = _HEADER.size
+    layout = []
+    for _ in range(n_cols):
+        code, name_length = _COLUMN.unpack_from(buffer, offset)
+        offset += _COLUMN.size
+        name = bytes(buffer[offset : offset + name_length]).decode("utf-8")
+        offset += name_length
+        if code not in _DTYPES:
+            raise ValueError(f"未知的列類型: {code}")
+        layout.append((name, code))
+
+    offset += -offset % 8
+    expected = offset + n_rows * 8 * n_cols
+    if len(buffer) < expected:
+        raise ValueError(f"列式行情數據不完整: {len(buffer)} < {expected}")
+
+    index = None
+    columns: Dict[str, np.ndarray] = {}
+    float_offsets: List[int] = []
+    for name, code in layout:
+        array = np.frombuffer(buffer, dtype=_DTYPES[code], count=n_rows, offset=offset)
+        if code == ord("t") and index is None:
+            index = pd.DatetimeIndex(array.view("datetime64[ns]"), name="timestamp")
+            index = index.tz_localize("UTC")
+        else:
+            columns[name] = array
+            if code == ord("f"):
+                float_offsets.append(offset)
+        offset += n_rows * 8
+
+    block = n_rows * 8
+    contiguous = len(float_offsets) == len(columns) and all(
+        position == float_offsets[0] + i * block for i, position in enumerate(float_offsets)
+    )
+    if columns and contiguous:
+        # 數值列是相鄰的 float64，作為一個二維塊引用，DataFrame 不需要合併複製
+        values = np.frombuffer(
+            buffer, dtype="<f8", count=n_rows * len(columns), offset=float_offsets[0]
+        ).reshape(len(columns), n_rows)
+        return pd.DataFrame(values.T, index=index, columns=list(columns), copy=False)
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def load_columnar(path: str) -> pd.DataFrame:
+    """以內存映射方式打開列式二進制文件"""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # DataFrame 持有映射的引用，映射在 DataFrame 回收後自動釋放
+    return decode_columnar(mapped)
+
+
+def load_arrow(path: str) -> pd.DataFrame:
+    """讀取 Arrow IPC 文件，需要安裝 pyarrow"""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("讀取 Arrow 格式的行情數據需要安裝 pyarrow") from e
+
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    data = table.to_pandas()
+    if "timestamp" in data.columns:
+        index = pd.DatetimeIndex(pd.to_datetime(data.pop("timestamp")), name="timestamp")
+        data = data.set_index(index)
+    return data
+
+
+def load_market_data(reference: Dict[str, Any]) -> pd.DataFrame:
+    """按引用描述加載二進制行情數據"""
+    path = reference.get("path")
+    if not path:
+        raise ValueError("行情數據引用缺少 path")
+
+    data_format = reference.get("format", "columnar")
+    if data_format == "columnar":
+        return load_columnar(path)
+    if data_format == "arrow":
+        return load_arrow(path)
+    raise ValueError(f"未知的行情數據格式: {data_format}")
+
+
+def parse_market_data(market_data: MarketDataInput) -> pd.DataFrame:
+    """
+    解析任意一種形式的行情數據
+
+    Args:
+        market_data: JSON 字符串、已解析的記錄數組、二進制文件引用，
+            或直接傳入的列式二進制字節
+
+    Returns:
+        以時間為索引的 DataFrame
+    """
+    if isinstance(market_data, (bytes, bytearray, memoryview)):
+        if bytes(market_data[: len(COLUMNAR_MAGIC)]) == COLUMNAR_MAGIC:
+            return decode_columnar(market_data)
+        market_data = bytes(market_data).decode("utf-8")
+
+    if isinstance(market_data, str):
+        market_data = json.loads(market_data)
+
+    if isinstance(market_data, dict):
+        return load_market_data(market_data)
+    return market_data_to_frame(market_data)
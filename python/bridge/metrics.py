@@ -0,0 +1,338 @@
+"""
+橋接調用指標
+
+記錄每個橋接函數的調用次數、錯誤次數、總耗時、分階段耗時（解析、計算、序列化等）
+和輸入輸出字節數。耗時和字節數保存在 HDR 風格的直方圖中：桶寬隨數值按 2 的冪增長，
+每個數量級內再等分為固定數量的子桶，內存佔用與樣本數無關，分位數的相對誤差有上界。
+
+設置環境變量 BRIDGE_TRACE_FILE 或調用 BridgeMetrics.open_trace 後，
+每次調用還會以一行 JSON 追加到跟蹤文件，便於事後定位性能回退。
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+# 每個數量級的子桶精度（位），8 位時分位數相對誤差不超過 1/128
+DEFAULT_PRECISION_BITS = 8
+
+# 報告的分位數
+REPORTED_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class Histogram:
+    """
+    HDR 風格的整數直方圖
+
+    小於 2**precision_bits 的值各佔一個桶；更大的值按最高有效位所在的數量級分組，
+    每組 2**(precision_bits-1) 個等寬子桶。只保存非空桶。
+    """
+
+    def __init__(self, precision_bits: int = DEFAULT_PRECISION_BITS):
+        if precision_bits < 2:
+            raise ValueError(f"精度位數至少為2: {precision_bits}")
+        self.precision_bits = precision_bits
+        self._linear_limit = 1 << precision_bits
+        self._half = 1 << (precision_bits - 1)
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def _index(self, value: int) -> int:
+        if value < self._linear_limit:
+            return value
+        shift = value.bit_length() - self.precision_bits
+        return self._linear_limit + (shift - 1) * self._half + ((value >> shift) - self._half)
+
+    def _highest_equivalent(self, index: int) -> int:
+        """桶內的最大值"""
+        if index < self._linear_limit:
+            return index
+        offset = index - self._linear_limit
+        shift = offset // self._half + 1
+        mantissa = offset % self._half + self._half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        """記錄一個非負整數樣本，負值按0記錄"""
+        value = max(int(value), 0)
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> int:
+        """
+        分位數
+
+        Args:
+            percent: 百分位，0 到 100
+
+        Returns:
+            不小於該比例樣本的桶上界（不超過最大值）；沒有樣本時為0
+        """
+        if not self.count:
+            return 0
+        rank = max(1, int(-(-self.count * percent // 100)))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "count": self.count,
+            "min": self.min or 0,
+            "max": self.max or 0,
+            "mean": round(self.mean, 3),
+        }
+        for percent in REPORTED_PERCENTILES:
+            result[f"p{percent:g}"] = self.percentile(percent)
+        return result
+
+
+# 以下兩個類在每次調用的路徑上創建或更新，使用 __slots__ 而不是 dataclass，
+# 同時避免導入 dataclasses 拖慢橋接模塊的冷啟動
+
+
+class FunctionMetrics:
+    """單個橋接函數的累計指標"""
+
+    __slots__ = ("calls", "errors", "latency_us", "phases_us", "bytes_in", "bytes_out")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency_us = Histogram()
+        self.phases_us: Dict[str, Histogram] = {}
+        self.bytes_in = Histogram()
+        self.bytes_out = Histogram()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_us": self.latency_us.to_dict(),
+            "phases_us": {name: hist.to_dict() for name, hist in self.phases_us.items()},
+            "bytes_in": self.bytes_in.to_dict(),
+            "bytes_out": self.bytes_out.to_dict(),
+        }
+
+
+class CallTrace:
+    """一次調用的計時和大小記錄"""
+
+    __slots__ = ("function", "phases_ns", "bytes_in", "bytes_out", "error")
+
+    def __init__(self, function: str):
+        self.function = function
+        self.phases_ns: Dict[str, int] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.error: Optional[str] = None
+
+
+_current_call: contextvars.ContextVar[Optional[CallTrace]] = contextvars.ContextVar(
+    "bridge_call", default=None
+)
+
+
+def _payload_size(value: Any) -> int:
+    """字符串或字節串的字節數，其他類型不計"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        # ASCII 字符串的字符數即字節數，避免為大段 JSON 重新編碼
+        return len(value) if value.isascii() else len(value.encode("utf-8"))
+    return 0
+
+
+class phase:
+    """
+    計時一個階段的上下文管理器
+
+    在被 instrument 包裝的函數中使用；同名階段多次出現時累加。
+    不在橋接調用中時不做任何記錄。
+    """
+
+    __slots__ = ("name", "call", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.call = _current_call.get()
+        self.start = 0
+
+    def __enter__(self) -> None:
+        if self.call is not None:
+            self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc_info) -> None:
+        if self.call is not None:
+            elapsed = time.perf_counter_ns() - self.start
+            phases = self.call.phases_ns
+            phases[self.name] = phases.get(self.name, 0) + elapsed
+
+
+def mark_error(error: Any) -> None:
+    """把當前調用標記為失敗，用於捕獲異常後返回錯誤結果的函數"""
+    call = _current_call.get()
+    if call is not None:
+        call.error = str(error)
+
+
+def add_output_bytes(size: int) -> None:
+    """累加當前調用的輸出字節數，用於流式輸出的中間事件"""
+    call = _current_call.get()
+    if call is not None:
+        call.bytes_out += size
+
+
+class BridgeMetrics:
+    """橋接調用指標彙總，所有方法都是線程安全的"""
+
+    def __init__(self, trace_path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._functions: Dict[str, FunctionMetrics] = {}
+        self._since = time.time()
+        self._trace_path: Optional[str] = None
+        self._trace_file: Optional[TextIO] = None
+        if trace_path:
+            self.open_trace(trace_path)
+
+    def open_trace(self, path: str) -> None:
+        """開始把每次調用追加到 JSON Lines 跟蹤文件"""
+        trace_file = open(path, "a", encoding="utf-8", buffering=1)
+        with self._lock:
+            previous, self._trace_file = self._trace_file, trace_file
+            self._trace_path = path
+        if previous is not None:
+            previous.close()
+        logger.info(f"橋接調用跟蹤文件: {path}")
+
+    def close_trace(self) -> None:
+        """停止寫入跟蹤文件"""
+        with self._lock:
+            trace_file, self._trace_file = self._trace_file, None
+            self._trace_path = None
+        if trace_file is not None:
+            trace_file.close()
+
+    def record(self, call: CallTrace, duration_ns: int) -> None:
+        """記錄一次調用"""
+        with self._lock:
+            metrics = self._functions.get(call.function)
+            if metrics is None:
+                metrics = self._functions[call.function] = FunctionMetrics()
+            metrics.calls += 1
+            if call.error is not None:
+                metrics.errors += 1
+            metrics.latency_us.record(duration_ns // 1000)
+            for name, elapsed in call.phases_ns.items():
+                histogram = metrics.phases_us.get(name)
+                if histogram is None:
+                    histogram = metrics.phases_us[name] = Histogram()
+                histogram.record(elapsed // 1000)
+            metrics.bytes_in.record(call.bytes_in)
+            metrics.bytes_out.record(call.bytes_out)
+
+            if self._trace_file is not None:
+                line = {
+                    "ts": time.time(),
+                    "function": call.function,
+                    "duration_us": duration_ns // 1000,
+                    "phases_us": {name: ns // 1000 for name, ns in call.phases_ns.items()},
+                    "bytes_in": call.bytes_in,
+                    "bytes_out": call.bytes_out,
+                    "error": call.error,
+                }
+                try:
+                    self._trace_file.write(json.dumps(line, ensure_ascii=False) + "\n")
+                except (OSError, ValueError) as e:
+                    logger.warning(f"寫入橋接跟蹤文件失敗，停止跟蹤: {e}")
+                    self._trace_file = None
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        """
+        獲取指標快照
+
+        Args:
+            reset: 讀取後清空已累計的指標
+
+        Returns:
+            {"since": 開始統計的時間戳, "trace_file": 跟蹤文件路徑, "functions": {函數名: 指標}}
+        """
+        with self._lock:
+            result = {
+                "since": self._since,
+                "trace_file": self._trace_path,
+                "functions": {
+                    name: metrics.to_dict() for name, metrics in sorted(self._functions.items())
+                },
+            }
+            if reset:
+                self._functions = {}
+                self._since = time.time()
+        return result
+
+    def reset(self) -> None:
+        """清空已累計的指標"""
+        with self._lock:
+            self._functions = {}
+            self._since = time.time()
+
+
+# 進程內共用的指標彙總
+bridge_metrics = BridgeMetrics(os.environ.get("BRIDGE_TRACE_FILE") or None)
+
+
+def instrument(function: Callable) -> Callable:
+    """
+    為橋接函數添加調用指標
+
+    記錄總耗時、字符串和字節串參數的總大小、返回值大小，以及函數拋出的異常。
+    函數內部可以用 phase 記錄分階段耗時，用 mark_error 標記以錯誤結果返回的失敗。
+    """
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        call = CallTrace(function=name)
+        for value in args:
+            call.bytes_in += _payload_size(value)
+        for value in kwargs.values():
+            call.bytes_in += _payload_size(value)
+
+        token = _current_call.set(call)
+        start = time.perf_counter_ns()
+        try:
+            result = function(*args, **kwargs)
+            call.bytes_out += _payload_size(result)
+            return result
+        except Exception as e:
+            call.error = str(e) or type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter_ns() - start
+            _current_call.reset(token)
+            bridge_metrics.record(call, duration)
+
+    return wrapper
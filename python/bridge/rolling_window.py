@@ -0,0 +1,206 @@
+"""
+策略的滾動K線窗口
+
+實盤中每次只有最新的一兩根K線是新的。滾動窗口把最近 capacity 根K線保存在
+預分配的數組中，新K線原地寫入，策略讀取窗口時得到直接引用緩衝區的 DataFrame，
+因此每個週期的傳輸量和處理量只與新K線數量有關，與窗口長度無關。
+
+緩衝區長度為窗口容量的兩倍，寫滿後把最近的 capacity - 1 根K線移回開頭，
+移動的代價分攤到每根K線上是常數時間，窗口始終是一段連續內存。
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest.shared_data import OHLCV_COLUMNS, ohlcv_frame
+
+logger = logging.getLogger(__name__)
+
+# 默認窗口長度
+DEFAULT_WINDOW_SIZE = 1000
+
+
+class WindowGapError(ValueError):
+    """新K線與窗口末尾之間缺少K線，需要重新同步"""
+
+
+def timeframe_to_ns(timeframe: Optional[str]) -> Optional[int]:
+    """
+    把週期字符串轉換為納秒
+
+    Args:
+        timeframe: 週期，例如 1m、15m、1h、4h、1d
+
+    Returns:
+        週期長度；無法識別（例如按月的週期）時返回 None，此時不做缺口檢查
+    """
+    if not timeframe or timeframe.endswith("M"):
+        return None
+    try:
+        return pd.Timedelta(timeframe).value
+    except ValueError:
+        return None
+
+
+class RollingWindow:
+    """
+    固定長度的OHLCV滾動窗口
+
+    時間戳按 UTC 納秒保存；窗口末尾是未收盤K線，與其時間相同的K線覆蓋最後一行，
+    早於窗口末尾的K線被忽略，晚於預期下一根的K線觸發 WindowGapError。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_WINDOW_SIZE, interval: Optional[int] = None):
+        """
+        初始化窗口
+
+        Args:
+            capacity: 窗口保留的K線數量
+            interval: K線週期（納秒），用於缺口檢查，None 表示不檢查
+        """
+        if capacity < 1:
+            raise ValueError(f"窗口長度必須大於0: {capacity}")
+        self.capacity = int(capacity)
+        self.interval = interval
+        self.tz: Optional[str] = None
+        self._timestamps = np.empty(2 * self.capacity, dtype=np.int64)
+        self._values = np.empty((len(OHLCV_COLUMNS), 2 * self.capacity), dtype=np.float64)
+        self._start = 0
+        self._stop = 0
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getstate__(self):
+        # 只保存窗口內的K線，不保存兩倍長度的緩衝區
+        return {
+            "capacity": self.capacity,
+            "interval": self.interval,
+            "tz": self.tz,
+            "timestamps": self._timestamps[self._start : self._stop].copy(),
+            "values": self._values[:, self._start : self._stop].copy(),
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state["capacity"], state["interval"])
+        self.tz = state["tz"]
+        n = len(state["timestamps"])
+        self._timestamps[:n] = state["timestamps"]
+        self._values[:, :n] = state["values"]
+        self._stop = n
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """窗口中最新K線的時間戳（UTC 納秒）"""
+        return int(self._timestamps[self._stop - 1]) if len(self) else None
+
+    def clear(self) -> None:
+        """清空窗口，保留緩衝區"""
+        self._start = self._stop = 0
+
+    def _push(self, timestamp: int, row: np.ndarray) -> None:
+        """在末尾寫入一根K線"""
+        if self._stop == len(self._timestamps):
+            keep = self.capacity - 1
+            self._timestamps[:keep] = self._timestamps[self._stop - keep : self._stop]
+            self._values[:, :keep] = self._values[:, self._stop - keep : self._stop]
+            self._start, self._stop = 0, keep
+
+        self._timestamps[self._stop] = timestamp
+        self._values[:, self._stop] = row
+        self._stop += 1
+        if self._stop - self._start > self.capacity:
+            self._start += 1
+
+    def append(self, data: pd.DataFrame) -> Tuple[List[int], bool, pd.DataFrame]:
+        """
+        追加新K線
+
+        窗口末尾的K線視為未收盤，出現更晚的K線時才確定收盤。
+
+        Args:
+            data: 以時間為索引、包含OHLCV列的新K線，按時間排序
+
+        Returns:
+            (新增K線在 data 中的位置, 是否覆蓋了末尾K線, 本次收盤的K線)；
+            覆蓋末尾K線的行不計入新增位置，收盤K線帶有最後一次覆蓋後的OHLCV
+        """
+        timestamps, values = self._columns(data)
+        added: List[int] = []
+        overwritten = False
+        closed_timestamps: List[int] = []
+        closed_values: List[np.ndarray] = []
+        for position in range(len(timestamps)):
+            timestamp = int(timestamps[position])
+            last = self.last_timestamp
+            if last is not None:
+                if timestamp < last:
+                    continue
+                if timestamp == last:
+                    self._values[:, self._stop - 1] = values[:, position]
+                    overwritten = True
+                    continue
+                if self.interval and timestamp - last > self.interval:
+                    raise WindowGapError(
+                        f"K線缺口: 窗口末尾 {pd.Timestamp(last, tz='UTC')}，"
+                        f"新K線 {pd.Timestamp(timestamp, tz='UTC')}"
+                    )
+                # 原末尾K線已收盤，複製出來，之後的移動和寫入不會影響它
+                closed_timestamps.append(last)
+                closed_values.append(self._values[:, self._stop - 1].copy())
+            self._push(timestamp, values[:, position])
+            added.append(position)
+
+        closed = ohlcv_frame(
+            np.asarray(closed_timestamps, dtype=np.int64),
+            np.column_stack(closed_values) if closed_values else np.empty((len(OHLCV_COLUMNS), 0)),
+            self.tz,
+        )
+        return added, overwritten, closed
+
+    def reset(self, data: pd.DataFrame) -> None:
+        """用完整歷史重建窗口，只保留最近 capacity 根K線"""
+        self.clear()
+        timestamps, values = self._columns(data.iloc[-self.capacity :])
+        n = len(timestamps)
+        self._timestamps[:n] = timestamps
+        self._values[:, :n] = values
+        self._stop = n
+
+    def closed_frame(self) -> pd.DataFrame:
+        """窗口中已收盤的K線，即除末尾K線以外的全部K線，與 frame 共享緩衝區"""
+        return self.frame().iloc[:-1]
+
+    def frame(self) -> pd.DataFrame:
+        """
+        窗口內容
+
+        返回的 DataFrame 直接引用窗口緩衝區，下一次 append 後內容可能改變，
+        策略應在本次調用內使用，不應長期持有。
+        """
+        return ohlcv_frame(
+            self._timestamps[self._start : self._stop],
+            self._values[:, self._start : self._stop],
+            self.tz,
+        )
+
+    def _columns(self, data: pd.DataFrame):
+        """提取 UTC 納秒時間戳和 (5, n) 價格矩陣，並記錄數據時區"""
+        missing = [col for col in OHLCV_COLUMNS if col not in data.columns]
+        if missing:
+            raise ValueError(f"數據缺少必要列: {missing}")
+
+        index = pd.DatetimeIndex(data.index)
+        tz = str(index.tz) if index.tz is not None else None
+        if len(self) and tz != self.tz:
+            raise ValueError(f"時區不一致: 窗口為 {self.tz}，新數據為 {tz}")
+        self.tz = tz
+        if tz:
+            index = index.tz_convert("UTC").tz_localize(None)
+
+        timestamps = index.as_unit("ns").asi8
+        values = np.vstack([data[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS])
+        return timestamps, values
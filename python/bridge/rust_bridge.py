@@ -2,29 +2,120 @@
 Rust橋接模塊
 
 提供Rust與Python之間的通信接口，支持策略執行和回測。
+
+模塊頂層只導入標準庫。pandas、NumPy、策略和回測引擎在第一次用到時才導入，
+list_strategies 等輕量調用不需要為它們付出數百毫秒的啟動時間。
 """
 
+from __future__ import annotations
+
+import importlib
 import json
-import pandas as pd
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, List, Any, Optional, Tuple, Union
 import logging
+import os
+import struct
+import sys
+import threading
 import traceback
 
-from strategies.base import BaseStrategy, StrategySignal, StrategyConfig
-from strategies.sma_crossover import SMACrossoverStrategy
-from strategies.dynamic_position_strategy import DynamicPositionStrategy
-from backtest.engine import run_backtest, BacktestResult
+# 以腳本方式啟動工作進程時，確保可以導入同級的策略和回測模塊
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bridge.metrics import add_output_bytes, bridge_metrics, instrument, mark_error, phase
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from bridge.codec import Codec
+    from bridge.jobs import BacktestJobManager
+    from strategies.base import BaseStrategy, StrategySignal, StrategyConfig
+    from backtest.engine import BacktestResult
+    from backtest.incremental import Bar
+    from bridge.rolling_window import RollingWindow
 
 logger = logging.getLogger(__name__)
 
 
+# 策略類型註冊表：類型名 -> "模塊:類名"，第一次創建該類型的策略時才導入對應模塊
+STRATEGY_REGISTRY: Dict[str, str] = {
+    "sma_crossover": "strategies.sma_crossover:SMACrossoverStrategy",
+    "incremental_sma_crossover": "strategies.incremental_sma_crossover:IncrementalSMACrossoverStrategy",
+}
+
+_strategy_classes: Dict[str, type] = {}
+
+
+def register_strategy(strategy_type: str, target: Union[str, type]) -> None:
+    """
+    註冊策略類型
+
+    Args:
+        strategy_type: 策略類型名，不區分大小寫
+        target: 策略類，或 "模塊:類名" 形式的延遲導入路徑
+    """
+    key = strategy_type.lower()
+    _strategy_classes.pop(key, None)
+    if isinstance(target, str):
+        STRATEGY_REGISTRY[key] = target
+    else:
+        STRATEGY_REGISTRY[key] = f"{target.__module__}:{target.__qualname__}"
+        _strategy_classes[key] = target
+
+
+def load_strategy_class(strategy_type: str) -> type:
+    """
+    按類型名加載策略類
+
+    Raises:
+        ValueError: 策略類型未註冊
+    """
+    key = strategy_type.lower()
+    strategy_class = _strategy_classes.get(key)
+    if strategy_class is None:
+        target = STRATEGY_REGISTRY.get(key)
+        if target is None:
+            raise ValueError(f"未知的策略類型: {strategy_type}")
+        module_name, _, class_name = target.partition(":")
+        strategy_class = getattr(importlib.import_module(module_name), class_name)
+        _strategy_classes[key] = strategy_class
+    return strategy_class
+
+
+def build_strategy(strategy_type: str, config: Dict[str, Any]) -> BaseStrategy:
+    """
+    按類型和配置創建策略實例，不註冊到策略管理器
+
+    Args:
+        strategy_type: 策略類型
+        config: 策略配置
+
+    Returns:
+        新的策略實例
+    """
+    from strategies.base import StrategyConfig
+
+    strategy_config = StrategyConfig(
+        name=config["name"],
+        symbol=config["symbol"],
+        timeframe=config.get("timeframe", "1h"),
+        parameters=config.get("parameters", {}),
+        risk_params=config.get("risk_params", {}),
+        enabled=config.get("enabled", True),
+    )
+    return load_strategy_class(strategy_type)(strategy_config)
+
+
 class StrategyManager:
     """策略管理器"""
 
     def __init__(self):
         self.strategies: Dict[str, BaseStrategy] = {}
         self.strategy_configs: Dict[str, StrategyConfig] = {}
+        self.windows: Dict[str, RollingWindow] = {}
+        # 策略集合或配置每次變化時遞增，快照計劃據此立即保存
+        self.revision = 0
 
     def create_strategy(self, strategy_type: str, config: Dict[str, Any]) -> str:
         """
@@ -38,24 +129,13 @@ class StrategyManager:
             策略ID
         """
         try:
-            strategy_config = StrategyConfig(
-                name=config["name"],
-                symbol=config["symbol"],
-                timeframe=config.get("timeframe", "1h"),
-                parameters=config.get("parameters", {}),
-                risk_params=config.get("risk_params", {}),
-                enabled=config.get("enabled", True),
-            )
-
-            # 根據策略類型創建策略實例
-            if strategy_type.lower() == "sma_crossover":
-                strategy = SMACrossoverStrategy(strategy_config)
-            else:
-                raise ValueError(f"未知的策略類型: {strategy_type}")
+            strategy = build_strategy(strategy_type, config)
+            strategy_config = strategy.config
 
             strategy_id = strategy_config.name
             self.strategies[strategy_id] = strategy
             self.strategy_configs[strategy_id] = strategy_config
+            self.revision += 1
 
             logger.info(f"策略已創建: {strategy_id}")
             return strategy_id
@@ -73,6 +153,8 @@ class StrategyManager:
         if strategy_id in self.strategies:
             del self.strategies[strategy_id]
             del self.strategy_configs[strategy_id]
+            self.windows.pop(strategy_id, None)
+            self.revision += 1
             logger.info(f"策略已移除: {strategy_id}")
             return True
         return False
@@ -81,12 +163,66 @@ class StrategyManager:
         """列出所有策略"""
         return list(self.strategies.keys())
 
+    def save_snapshot(self, path: str) -> int:
+        """
+        保存所有策略的配置、指標緩衝區、持倉狀態和滾動窗口，格式見 bridge.snapshot
+
+        Returns:
+            快照文件大小（字節）
+        """
+        from bridge.snapshot import save_snapshot
+
+        return save_snapshot(self, path)
+
+    def restore_snapshot(self, path: str) -> List[str]:
+        """
+        從快照恢復策略，恢復後無需重新同步即可繼續追加K線
+
+        Returns:
+            已恢復的策略ID
+
+        Raises:
+            SnapshotError: 快照文件損壞或版本不兼容
+        """
+        from bridge.snapshot import restore_snapshot
+
+        restored = restore_snapshot(self, path)
+        self.revision += 1
+        return restored
+
     def update_strategy_config(self, strategy_id: str, config: Dict[str, Any]) -> bool:
-        """更新策略配置"""
-        if strategy_id not in self.strategies:
+        """
+        更新策略配置
+
+        參數沒有變化或修改的參數全部聲明為可熱更新（見 ReconfigurableStrategy）時原地更新，
+        保留策略的指標緩衝區和持倉狀態；否則重新創建策略並用窗口中的K線重新預熱。
+
+        Returns:
+            是否更新成功；策略不存在或熱更新參數不合法時為 False
+        """
+        from backtest.incremental import supports_reconfigure
+
+        strategy = self.strategies.get(strategy_id)
+        if strategy is None:
             return False
 
         strategy_config = self.strategy_configs[strategy_id]
+        window = self.windows.get(strategy_id)
+        changes = {
+            name: value
+            for name, value in config.get("parameters", {}).items()
+            if name not in strategy_config.parameters or strategy_config.parameters[name] != value
+        }
+
+        # 參數沒有變化（例如只改風控參數或重新應用相同配置）時不需要重新創建策略
+        hot = not changes or supports_reconfigure(strategy, changes)
+        if hot and changes:
+            try:
+                history = window.closed_frame() if window is not None and len(window) else None
+                strategy.reconfigure(changes, history)
+            except ValueError as e:
+                logger.error(f"策略熱更新失敗: {strategy_id}: {e}")
+                return False
 
         # 更新配置
         if "parameters" in config:
@@ -95,20 +231,193 @@ class StrategyManager:
             strategy_config.risk_params.update(config["risk_params"])
         if "enabled" in config:
             strategy_config.enabled = config["enabled"]
+        self.revision += 1
+
+        if hot:
+            logger.info(f"策略配置已熱更新: {strategy_id}: {sorted(changes)}")
+            return True
 
         # 重新創建策略實例
-        strategy_type = type(self.strategies[strategy_id]).__name__
-        if strategy_type == "SMACrossoverStrategy":
-            self.strategies[strategy_id] = SMACrossoverStrategy(strategy_config)
+        strategy_class = type(strategy)
+        if strategy_class in _strategy_classes.values():
+            self.strategies[strategy_id] = strategy_class(strategy_config)
+
+        # 新實例沒有增量狀態，用窗口中已收盤的K線重新預熱
+        if window is not None and len(window):
+            self._replay(self.strategies[strategy_id], window.closed_frame())
 
         logger.info(f"策略配置已更新: {strategy_id}")
         return True
 
+    def append_market_data(
+        self, strategy_id: str, data: pd.DataFrame
+    ) -> List[StrategySignal]:
+        """
+        追加新K線並增量生成信號
+
+        只需要傳入新K線（通常是一根），窗口原地更新。窗口末尾的K線視為未收盤，
+        支持 on_bar 的策略只在出現更晚的K線、末尾K線確定收盤後才處理它，
+        因此 on_bar 收到的是最終的OHLCV，與回測引擎一致；
+        其餘策略在窗口上調用 generate_signals，末尾K線被更新時也會重新評估。
+
+        Args:
+            strategy_id: 策略ID
+            data: 新K線
+
+        Returns:
+            新K線產生的交易信號；支持 on_bar 的策略為本次收盤K線產生的信號
+
+        Raises:
+            WindowGapError: 窗口尚未同步，或新K線與窗口末尾之間有缺口，需要調用 resync_market_data
+        """
+        from backtest.incremental import supports_incremental
+        from bridge.rolling_window import WindowGapError
+
+        strategy = self.strategies.get(strategy_id)
+        if strategy is None:
+            raise ValueError(f"策略不存在: {strategy_id}")
+
+        window = self.windows.get(strategy_id)
+        if window is None or not len(window):
+            raise WindowGapError(f"策略窗口尚未同步: {strategy_id}")
+
+        added, overwritten, closed = window.append(data)
+        if supports_incremental(strategy):
+            signals: List[StrategySignal] = []
+            for position in range(len(closed)):
+                signals.extend(strategy.on_bar(_bar_at(closed, position)))
+            return signals
+        if not added and not overwritten:
+            return []
+        return strategy.generate_signals(window.frame())
+
+    def resync_market_data(
+        self,
+        strategy_id: str,
+        data: pd.DataFrame,
+        window_size: Optional[int] = None,
+    ) -> List[StrategySignal]:
+        """
+        用完整歷史重建策略窗口
+
+        首次使用增量接口、出現K線缺口或重連之後調用。支持 on_bar 的策略
+        會被重置並用最後一根以外的全部歷史重新預熱，最後一根視為未收盤K線。
+
+        Args:
+            strategy_id: 策略ID
+            data: 完整歷史K線
+            window_size: 窗口長度，默認沿用原窗口或 DEFAULT_WINDOW_SIZE
+
+        Returns:
+            最新一根K線產生的交易信號；支持 on_bar 的策略為最新一根已收盤K線的信號
+        """
+        from backtest.incremental import supports_incremental
+        from bridge.rolling_window import DEFAULT_WINDOW_SIZE, RollingWindow, timeframe_to_ns
+
+        strategy = self.strategies.get(strategy_id)
+        if strategy is None:
+            raise ValueError(f"策略不存在: {strategy_id}")
+
+        window = self.windows.get(strategy_id)
+        if window is None or (window_size and window_size != window.capacity):
+            window = RollingWindow(
+                window_size or (window.capacity if window else DEFAULT_WINDOW_SIZE),
+                timeframe_to_ns(self.strategy_configs[strategy_id].timeframe),
+            )
+            self.windows[strategy_id] = window
+
+        window.reset(data)
+        if not len(window):
+            return []
+        if supports_incremental(strategy):
+            return self._replay(strategy, data.iloc[:-1])
+        return strategy.generate_signals(window.frame())
+
+    def generate_signals_batch(
+        self,
+        strategy_ids: List[str],
+        data: pd.DataFrame,
+        max_workers: Optional[int] = None,
+    ) -> Tuple[Dict[str, List[StrategySignal]], Dict[str, str]]:
+        """
+        用同一份行情數據評估多個策略
+
+        行情只解析一次，每個策略得到共享底層數組的淺拷貝，
+        策略添加指標列不會影響其他策略。某個策略失敗只記錄錯誤，不影響其餘策略。
+
+        Args:
+            strategy_ids: 策略ID列表
+            data: 已解析的行情數據
+            max_workers: 線程數，大於1時並行評估（適用於在 NumPy 等計算中釋放 GIL 的策略）
+
+        Returns:
+            (策略ID到信號列表的映射, 策略ID到錯誤信息的映射)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        signals: Dict[str, List[StrategySignal]] = {}
+        errors: Dict[str, str] = {}
+
+        def evaluate(strategy_id: str) -> List[StrategySignal]:
+            strategy = self.strategies.get(strategy_id)
+            if strategy is None:
+                raise ValueError(f"策略不存在: {strategy_id}")
+            return strategy.generate_signals(data.copy(deep=False))
+
+        unique_ids = list(dict.fromkeys(strategy_ids))
+        if max_workers and max_workers > 1 and len(unique_ids) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_ids))) as pool:
+                futures = {sid: pool.submit(evaluate, sid) for sid in unique_ids}
+                for strategy_id, future in futures.items():
+                    try:
+                        signals[strategy_id] = future.result()
+                    except Exception as e:
+                        errors[strategy_id] = str(e)
+        else:
+            for strategy_id in unique_ids:
+                try:
+                    signals[strategy_id] = evaluate(strategy_id)
+                except Exception as e:
+                    errors[strategy_id] = str(e)
+
+        for strategy_id, message in errors.items():
+            logger.error(f"策略生成信號失敗: {strategy_id}: {message}")
+        return signals, errors
+
+    @staticmethod
+    def _replay(strategy: BaseStrategy, data: pd.DataFrame) -> List[StrategySignal]:
+        """重置增量策略並逐根回放K線，返回最後一根K線的信號"""
+        from backtest.incremental import supports_incremental
+
+        if not supports_incremental(strategy):
+            return []
+        strategy.reset()
+        signals: List[StrategySignal] = []
+        for position in range(len(data)):
+            signals = strategy.on_bar(_bar_at(data, position))
+        return signals
+
+
+def _bar_at(data: pd.DataFrame, position: int) -> Bar:
+    """取出 DataFrame 中的一根K線"""
+    from backtest.incremental import Bar
+
+    row = data.iloc[position]
+    return Bar(
+        timestamp=data.index[position],
+        open=float(row["open"]),
+        high=float(row["high"]),
+        low=float(row["low"]),
+        close=float(row["close"]),
+        volume=float(row["volume"]),
+    )
+
 
 # 全局策略管理器
 strategy_manager = StrategyManager()
 
 
+@instrument
 def create_strategy_from_json(json_data: str) -> str:
     """
     從JSON創建策略
@@ -120,100 +429,294 @@ def create_strategy_from_json(json_data: str) -> str:
         策略ID
     """
     try:
-        config = json.loads(json_data)
+        with phase("parse"):
+            config = json.loads(json_data)
         strategy_type = config.get("type", "sma_crossover")
-        return strategy_manager.create_strategy(strategy_type, config)
+        with phase("compute"):
+            return strategy_manager.create_strategy(strategy_type, config)
     except Exception as e:
+        mark_error(e)
         logger.error(f"從JSON創建策略失敗: {e}")
         raise
 
 
+@instrument
 def generate_signals(strategy_id: str, market_data_json: str) -> str:
     """
     生成交易信號
 
     Args:
         strategy_id: 策略ID
-        market_data_json: JSON格式的市場數據
+        market_data_json: JSON格式的市場數據，或列式二進制文件引用
 
     Returns:
         JSON格式的信號列表
     """
+    from bridge.market_data import parse_market_data
+
     try:
         strategy = strategy_manager.get_strategy(strategy_id)
         if not strategy:
             raise ValueError(f"策略不存在: {strategy_id}")
 
-        # 解析市場數據
-        market_data = json.loads(market_data_json)
-        df = pd.DataFrame(market_data)
-
-        # 確保索引是日期時間
-        if "timestamp" in df.columns:
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-            df.set_index("timestamp", inplace=True)
+        # 解析市場數據，時間戳作為索引
+        with phase("parse"):
+            df = parse_market_data(market_data_json)
 
         # 生成信號
-        signals = strategy.generate_signals(df)
-
-        # 轉換為JSON格式
-        signals_data = []
-        for signal in signals:
-            signal_data = {
-                "symbol": signal.symbol,
-                "signal_type": signal.signal_type.value,
-                "strength": float(signal.strength),
-                "price": float(signal.price) if signal.price else None,
-                "quantity": float(signal.quantity) if signal.quantity else None,
-                "timestamp": signal.timestamp.isoformat(),
-                "metadata": signal.metadata,
-            }
-            signals_data.append(signal_data)
+        with phase("compute"):
+            signals = strategy.generate_signals(df)
 
-        return json.dumps(signals_data)
+        with phase("serialize"):
+            return _signals_to_json(signals)
 
     except Exception as e:
+        mark_error(e)
         logger.error(f"生成信號失敗: {e}")
         error_result = {"error": str(e), "traceback": traceback.format_exc()}
         return json.dumps(error_result)
 
 
+@instrument
+def append_market_data(strategy_id: str, market_data_json: str) -> str:
+    """
+    追加新K線並增量生成信號
+
+    Args:
+        strategy_id: 策略ID
+        market_data_json: 只包含新K線的市場數據，格式同 generate_signals
+
+    Returns:
+        JSON格式的信號列表；窗口需要重新同步時返回帶 resync_required 的錯誤
+    """
+    from bridge.market_data import parse_market_data
+    from bridge.rolling_window import WindowGapError
+
+    try:
+        with phase("parse"):
+            df = parse_market_data(market_data_json)
+        with phase("compute"):
+            signals = strategy_manager.append_market_data(strategy_id, df)
+        with phase("serialize"):
+            return _signals_to_json(signals)
+
+    except WindowGapError as e:
+        mark_error(e)
+        logger.warning(f"策略窗口需要重新同步: {strategy_id}: {e}")
+        return json.dumps({"error": str(e), "resync_required": True})
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"追加K線失敗: {e}")
+        error_result = {"error": str(e), "traceback": traceback.format_exc()}
+        return json.dumps(error_result)
+
+
+@instrument
+def resync_market_data(
+    strategy_id: str, market_data_json: str, window_size: Optional[int] = None
+) -> str:
+    """
+    用完整歷史重建策略窗口
+
+    Args:
+        strategy_id: 策略ID
+        market_data_json: 完整歷史K線，格式同 generate_signals
+        window_size: 窗口長度
+
+    Returns:
+        JSON格式的信號列表（最新一根K線的信號）
+    """
+    from bridge.market_data import parse_market_data
+
+    try:
+        with phase("parse"):
+            df = parse_market_data(market_data_json)
+        with phase("compute"):
+            signals = strategy_manager.resync_market_data(strategy_id, df, window_size)
+        with phase("serialize"):
+            return _signals_to_json(signals)
+
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"同步策略窗口失敗: {e}")
+        error_result = {"error": str(e), "traceback": traceback.format_exc()}
+        return json.dumps(error_result)
+
+
+@instrument
+def generate_signals_batch(
+    strategy_ids_json: str, market_data_json: str, max_workers: Optional[int] = None
+) -> str:
+    """
+    批量生成交易信號
+
+    Args:
+        strategy_ids_json: JSON格式的策略ID列表
+        market_data_json: 所有策略共用的市場數據，格式同 generate_signals
+        max_workers: 並行評估的線程數，默認逐個評估
+
+    Returns:
+        JSON格式的結果：{"signals": {策略ID: [信號, ...]}, "errors": {策略ID: 錯誤信息}}
+    """
+    from bridge.codec import dumps
+    from bridge.market_data import parse_market_data
+
+    try:
+        with phase("parse"):
+            strategy_ids = json.loads(strategy_ids_json)
+            if not isinstance(strategy_ids, list):
+                raise ValueError("策略ID必須是列表")
+            df = parse_market_data(market_data_json)
+
+        with phase("compute"):
+            signals, errors = strategy_manager.generate_signals_batch(
+                [str(strategy_id) for strategy_id in strategy_ids], df, max_workers
+            )
+
+        with phase("serialize"):
+            result = {
+                "signals": {
+                    strategy_id: [_signal_to_dict(signal) for signal in strategy_signals]
+                    for strategy_id, strategy_signals in signals.items()
+                },
+                "errors": errors,
+            }
+            return dumps(result)
+
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"批量生成信號失敗: {e}")
+        error_result = {"error": str(e), "traceback": traceback.format_exc()}
+        return json.dumps(error_result)
+
+
+def _signal_to_dict(signal: StrategySignal) -> Dict[str, Any]:
+    """把信號轉換為可JSON序列化的字典"""
+    return {
+        "symbol": signal.symbol,
+        "signal_type": signal.signal_type.value,
+        "strength": float(signal.strength),
+        "price": float(signal.price) if signal.price else None,
+        "quantity": float(signal.quantity) if signal.quantity else None,
+        "timestamp": signal.timestamp.isoformat(),
+        "metadata": signal.metadata,
+    }
+
+
+def _signals_to_json(signals: List[StrategySignal]) -> str:
+    """把信號列表轉換為JSON"""
+    from bridge.codec import dumps
+
+    return dumps([_signal_to_dict(signal) for signal in signals])
+
+
+def _align_timezone(value: datetime, data: pd.DataFrame) -> datetime:
+    """讓回測起止時間與行情索引的時區一致，二進制行情的索引總是 UTC"""
+    import pandas as pd
+
+    tz = getattr(data.index, "tz", None)
+    if tz is not None and value.tzinfo is None:
+        return pd.Timestamp(value).tz_localize(tz).to_pydatetime()
+    if tz is None and value.tzinfo is not None:
+        return pd.Timestamp(value).tz_convert("UTC").tz_localize(None).to_pydatetime()
+    return value
+
+
+@instrument
 def run_backtest_from_json(config_json: str) -> str:
     """
     運行回測
 
     Args:
-        config_json: JSON格式的回測配置
+        config_json: JSON格式的回測配置，market_data 可以是K線記錄數組或二進制文件引用；
+            use_cache 為 true 時讀寫本地回測結果緩存，默認不使用
 
     Returns:
         JSON格式的回測結果
     """
-    try:
-        config = json.loads(config_json)
+    from bridge.codec import dumps
 
-        # 創建策略
-        strategy_config = config["strategy"]
-        strategy_id = strategy_manager.create_strategy(
-            strategy_config.get("type", "sma_crossover"), strategy_config
-        )
+    result = _run_backtest_to_dict(config_json)
+    with phase("serialize"):
+        return dumps(result)
 
-        strategy = strategy_manager.get_strategy(strategy_id)
 
-        # 準備數據
-        market_data = pd.DataFrame(config["market_data"])
-        if "timestamp" in market_data.columns:
-            market_data["timestamp"] = pd.to_datetime(market_data["timestamp"])
-            market_data.set_index("timestamp", inplace=True)
-
-        # 回測配置
-        start_date = datetime.fromisoformat(config["start_date"])
-        end_date = datetime.fromisoformat(config["end_date"])
-        initial_capital = config.get("initial_capital", 10000.0)
-        commission = config.get("commission", 0.001)
-        slippage = config.get("slippage", 0.0001)
-
-        # 運行回測
-        result = run_backtest(
+@instrument
+def run_backtest_to_dict(config_json: str) -> Dict[str, Any]:
+    """
+    運行回測並返回未序列化的結果
+
+    交易時間、收益序列和權益曲線保留為 Timestamp 和 NumPy 數組，
+    由調用方選擇的編解碼器直接序列化。
+
+    Args:
+        config_json: JSON格式的回測配置
+
+    Returns:
+        回測結果字典，失敗時為包含 error 的字典
+    """
+    return _run_backtest_to_dict(config_json)
+
+
+@instrument
+def run_backtest_encoded(config_json: str, codec: "Codec") -> bytes:
+    """
+    運行回測並用協商的編解碼器直接編碼結果，不經過 JSON 中轉
+
+    Args:
+        config_json: JSON格式的回測配置
+        codec: 編解碼器
+
+    Returns:
+        編碼後的回測結果
+    """
+    result = _run_backtest_to_dict(config_json)
+    with phase("serialize"):
+        return codec.encode(result)
+
+
+def _run_backtest_to_dict(config_json: str) -> Dict[str, Any]:
+    """回測的公共部分，階段耗時和錯誤記錄到調用方的指標中"""
+    try:
+        with phase("parse"):
+            config = json.loads(config_json)
+        result = _run_backtest_from_config(config)
+        with phase("convert"):
+            return _backtest_result_to_dict(result)
+
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"回測失敗: {e}")
+        return {"error": str(e), "traceback": traceback.format_exc()}
+
+
+def _run_backtest_from_config(
+    config: Dict[str, Any], progress_callback: Optional[Callable[..., None]] = None
+) -> BacktestResult:
+    """按回測配置創建策略並運行回測"""
+    from backtest.engine import run_backtest
+    from backtest.result_cache import get_default_cache
+    from bridge.market_data import parse_market_data
+
+    # 創建回測專用的策略實例，不影響策略管理器中同名的實盤策略
+    strategy_config = config["strategy"]
+    strategy = build_strategy(strategy_config.get("type", "sma_crossover"), strategy_config)
+
+    # 準備數據
+    with phase("parse"):
+        market_data = parse_market_data(config["market_data"])
+
+    # 回測配置
+    start_date = _align_timezone(datetime.fromisoformat(config["start_date"]), market_data)
+    end_date = _align_timezone(datetime.fromisoformat(config["end_date"]), market_data)
+    initial_capital = config.get("initial_capital", 10000.0)
+    commission = config.get("commission", 0.001)
+    slippage = config.get("slippage", 0.0001)
+    cache = get_default_cache() if config.get("use_cache", False) else None
+
+    # 運行回測
+    with phase("compute"):
+        return run_backtest(
             strategy=strategy,
             data=market_data,
             start_date=start_date,
@@ -221,41 +724,312 @@ def run_backtest_from_json(config_json: str) -> str:
             initial_capital=initial_capital,
             commission=commission,
             slippage=slippage,
+            cache=cache,
+            progress_callback=progress_callback,
         )
 
-        # 轉換結果為JSON
-        result_data = {
-            "strategy_name": result.strategy_name,
-            "start_date": result.start_date.isoformat(),
-            "end_date": result.end_date.isoformat(),
-            "initial_capital": result.initial_capital,
-            "final_capital": result.final_capital,
-            "total_trades": result.total_trades,
-            "winning_trades": result.winning_trades,
-            "losing_trades": result.losing_trades,
-            "total_pnl": result.total_pnl,
-            "total_return": result.total_return,
-            "annual_return": result.annual_return,
-            "max_drawdown": result.max_drawdown,
-            "sharpe_ratio": result.sharpe_ratio,
-            "sortino_ratio": result.sortino_ratio,
-            "volatility": result.volatility,
-            "win_rate": result.win_rate,
-            "avg_trade_pnl": result.avg_trade_pnl,
-            "profit_factor": result.profit_factor,
-            "trades": result.trades,
-            "daily_returns": result.daily_returns,
-            "equity_curve": result.equity_curve,
-        }
 
-        return json.dumps(result_data)
+# 流式回測結果每個分塊的默認條目數
+STREAM_CHUNK_SIZE = 10000
+
+
+@instrument
+def stream_backtest(config_json: str, emit: Callable[[bytes], None]) -> bytes:
+    """
+    運行回測並以事件流輸出結果
+
+    每個事件是一個JSON對象，按順序為：
+        {"type": "progress", "processed": ..., "total": ..., "equity": ..., ...}  回測過程中多次
+        {"type": "header", ...匯總指標..., "trade_count": ..., "equity_points": ...}
+        {"type": "trades", "offset": ..., "items": [...]}                            按分塊
+        {"type": "equity", "offset": ..., "values": [...]}                           按分塊
+        {"type": "daily_returns", "offset": ..., "values": [...]}                    按分塊
+        {"type": "end"} 或 {"type": "error", "error": ...}
+
+    結果逐塊編碼和發送，雙方都不需要一次性持有整個結果的序列化文本。
+
+    Args:
+        config_json: JSON格式的回測配置，可以包含 chunk_size 指定分塊大小
+        emit: 發送一個已編碼事件的函數
+
+    Returns:
+        已編碼的結束事件（end 或 error），由調用方作為最後一個事件發送
+    """
+    from bridge.codec import default_json_codec
+
+    codec = default_json_codec()
+
+    def send(event: bytes) -> None:
+        add_output_bytes(len(event))
+        emit(event)
+
+    try:
+        config = json.loads(config_json)
+        chunk_size = int(config.get("chunk_size", STREAM_CHUNK_SIZE))
+        if chunk_size < 1:
+            raise ValueError(f"分塊大小必須大於0: {chunk_size}")
+
+        def on_progress(processed: int, total: int, metrics: Dict[str, float]) -> None:
+            send(codec.encode(dict(metrics, type="progress", processed=processed, total=total)))
+
+        result = _run_backtest_from_config(config, on_progress)
+        body = _backtest_result_to_dict(result)
+        trades = result.trades
+        equity_curve = body.pop("equity_curve")
+        daily_returns = body.pop("daily_returns")
+        del body["trades"]
+
+        with phase("stream"):
+            send(
+                codec.encode(
+                    dict(
+                        body,
+                        type="header",
+                        trade_count=len(trades),
+                        equity_points=len(equity_curve),
+                        daily_return_count=len(daily_returns),
+                        chunk_size=chunk_size,
+                    )
+                )
+            )
+            for offset in range(0, len(trades), chunk_size):
+                items = [trades[i] for i in range(offset, min(offset + chunk_size, len(trades)))]
+                send(codec.encode({"type": "trades", "offset": offset, "items": items}))
+            for name, values in (("equity", equity_curve), ("daily_returns", daily_returns)):
+                for offset in range(0, len(values), chunk_size):
+                    chunk = values[offset : offset + chunk_size]
+                    send(codec.encode({"type": name, "offset": offset, "values": chunk}))
+
+        return codec.encode({"type": "end"})
 
     except Exception as e:
-        logger.error(f"回測失敗: {e}")
+        mark_error(e)
+        logger.error(f"流式回測失敗: {e}")
+        return codec.encode(
+            {"type": "error", "error": str(e), "traceback": traceback.format_exc()}
+        )
+
+
+def _backtest_result_to_dict(result: BacktestResult) -> Dict[str, Any]:
+    """回測結果轉換為字典，數組字段不轉換為列表"""
+    import numpy as np
+
+    return {
+        "strategy_name": result.strategy_name,
+        "start_date": result.start_date.isoformat(),
+        "end_date": result.end_date.isoformat(),
+        "initial_capital": result.initial_capital,
+        "final_capital": result.final_capital,
+        "total_trades": result.total_trades,
+        "winning_trades": result.winning_trades,
+        "losing_trades": result.losing_trades,
+        "total_pnl": result.total_pnl,
+        "total_return": result.total_return,
+        "annual_return": result.annual_return,
+        "max_drawdown": result.max_drawdown,
+        "sharpe_ratio": result.sharpe_ratio,
+        "sortino_ratio": result.sortino_ratio,
+        "volatility": result.volatility,
+        "win_rate": result.win_rate,
+        "avg_trade_pnl": result.avg_trade_pnl,
+        "profit_factor": result.profit_factor,
+        "trades": list(result.trades),
+        "daily_returns": np.ascontiguousarray(result.daily_returns, dtype=np.float64),
+        "equity_curve": np.ascontiguousarray(result.equity_curve, dtype=np.float64),
+    }
+
+
+# 異步回測任務管理器，首次提交任務時創建
+_job_manager: Optional[BacktestJobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> BacktestJobManager:
+    """
+    獲取進程內共用的回測任務管理器
+
+    並發數和結果內存上限可以通過環境變量 BACKTEST_JOB_WORKERS 和
+    BACKTEST_JOB_MAX_RESULT_BYTES 設置。
+    """
+    from bridge.jobs import DEFAULT_MAX_RESULT_BYTES, BacktestJobManager
+
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            workers = os.environ.get("BACKTEST_JOB_WORKERS")
+            _job_manager = BacktestJobManager(
+                max_workers=int(workers) if workers else None,
+                max_result_bytes=int(
+                    os.environ.get("BACKTEST_JOB_MAX_RESULT_BYTES", DEFAULT_MAX_RESULT_BYTES)
+                ),
+            )
+        return _job_manager
+
+
+@instrument
+def submit_backtest(config_json: str) -> str:
+    """
+    提交異步回測任務
+
+    Args:
+        config_json: JSON格式的回測配置，格式同 run_backtest_from_json
+
+    Returns:
+        JSON格式的任務ID：{"job_id": ...}
+    """
+    try:
+        json.loads(config_json)
+        return json.dumps({"job_id": get_job_manager().submit(config_json)})
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"提交回測任務失敗: {e}")
+        error_result = {"error": str(e), "traceback": traceback.format_exc()}
+        return json.dumps(error_result)
+
+
+@instrument
+def get_backtest_status(job_id: str) -> str:
+    """
+    獲取回測任務狀態
+
+    Returns:
+        JSON格式的任務狀態，status 為 pending、running、completed、failed 或 cancelled
+    """
+    from bridge.codec import dumps
+
+    try:
+        return dumps(get_job_manager().status(job_id))
+    except KeyError as e:
+        mark_error(e)
+        return json.dumps({"error": e.args[0]})
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"獲取回測任務狀態失敗: {e}")
+        return json.dumps({"error": str(e), "traceback": traceback.format_exc()})
+
+
+@instrument
+def get_backtest_progress(job_id: str) -> str:
+    """
+    獲取回測任務進度
+
+    Returns:
+        JSON格式的進度：已處理K線數、總K線數、完成比例和當前績效指標
+    """
+    from bridge.codec import dumps
+
+    try:
+        return dumps(get_job_manager().progress(job_id))
+    except KeyError as e:
+        mark_error(e)
+        return json.dumps({"error": e.args[0]})
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"獲取回測任務進度失敗: {e}")
+        return json.dumps({"error": str(e), "traceback": traceback.format_exc()})
+
+
+@instrument
+def cancel_backtest(job_id: str) -> str:
+    """
+    取消回測任務
+
+    Returns:
+        JSON格式的結果：{"success": 取消請求是否生效}
+    """
+    try:
+        return json.dumps({"success": get_job_manager().cancel(job_id)})
+    except KeyError as e:
+        mark_error(e)
+        return json.dumps({"success": False, "error": e.args[0]})
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"取消回測任務失敗: {e}")
+        return json.dumps({"success": False, "error": str(e)})
+
+
+@instrument
+def get_backtest_result(job_id: str) -> str:
+    """
+    讀取回測任務結果
+
+    Returns:
+        任務完成時為JSON格式的回測結果（格式同 run_backtest_from_json）；
+        未完成時為 {"status": ..., "pending": true}；失敗、取消或結果已淘汰時為錯誤
+    """
+    try:
+        manager = get_job_manager()
+        result = manager.result(job_id)
+        if result is None:
+            return json.dumps({"status": manager.status(job_id)["status"], "pending": True})
+        return result.decode("utf-8")
+    except KeyError as e:
+        mark_error(e)
+        return json.dumps({"error": e.args[0]})
+    except Exception as e:
+        mark_error(e)
+        return json.dumps({"error": str(e)})
+
+
+@instrument
+def list_backtest_jobs() -> str:
+    """
+    列出所有回測任務
+
+    Returns:
+        JSON格式的任務狀態列表
+    """
+    from bridge.codec import dumps
+
+    try:
+        return dumps(get_job_manager().list_jobs())
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"列出回測任務失敗: {e}")
+        return json.dumps({"error": str(e), "traceback": traceback.format_exc()})
+
+
+@instrument
+def get_backtest_cache_stats() -> str:
+    """
+    獲取回測緩存計數器
+
+    Returns:
+        JSON格式的命中、未命中、寫入、淘汰次數和緩存大小
+    """
+    from backtest.result_cache import get_default_cache
+
+    try:
+        return json.dumps(get_default_cache().stats().to_dict())
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"獲取回測緩存統計失敗: {e}")
         error_result = {"error": str(e), "traceback": traceback.format_exc()}
         return json.dumps(error_result)
 
 
+def get_bridge_metrics(reset: bool = False) -> str:
+    """
+    獲取橋接調用指標
+
+    每個函數的調用次數、錯誤次數，以及總耗時、分階段耗時（微秒）和
+    輸入輸出字節數的分位數。讀取指標本身不計入統計。
+
+    Args:
+        reset: 讀取後清空已累計的指標
+
+    Returns:
+        JSON格式的指標快照
+    """
+    try:
+        return json.dumps(bridge_metrics.snapshot(reset=reset))
+    except Exception as e:
+        logger.error(f"獲取橋接指標失敗: {e}")
+        error_result = {"error": str(e), "traceback": traceback.format_exc()}
+        return json.dumps(error_result)
+
+
+@instrument
 def get_strategy_info(strategy_id: str) -> str:
     """
     獲取策略信息
@@ -288,11 +1062,13 @@ def get_strategy_info(strategy_id: str) -> str:
         return json.dumps(json_info)
 
     except Exception as e:
+        mark_error(e)
         logger.error(f"獲取策略信息失敗: {e}")
         error_result = {"error": str(e), "traceback": traceback.format_exc()}
         return json.dumps(error_result)
 
 
+@instrument
 def list_strategies() -> str:
     """
     列出所有策略
@@ -304,11 +1080,13 @@ def list_strategies() -> str:
         strategies = strategy_manager.list_strategies()
         return json.dumps(strategies)
     except Exception as e:
+        mark_error(e)
         logger.error(f"列出策略失敗: {e}")
         error_result = {"error": str(e), "traceback": traceback.format_exc()}
         return json.dumps(error_result)
 
 
+@instrument
 def update_strategy_config(strategy_id: str, config_json: str) -> str:
     """
     更新策略配置
@@ -332,6 +1110,7 @@ def update_strategy_config(strategy_id: str, config_json: str) -> str:
         return json.dumps(result)
 
     except Exception as e:
+        mark_error(e)
         logger.error(f"更新策略配置失敗: {e}")
         error_result = {
             "success": False,
@@ -341,6 +1120,59 @@ def update_strategy_config(strategy_id: str, config_json: str) -> str:
         return json.dumps(error_result)
 
 
+def _snapshot_path(path: str) -> str:
+    """快照路徑，未指定時使用環境變量 BRIDGE_SNAPSHOT_PATH"""
+    path = path or os.environ.get("BRIDGE_SNAPSHOT_PATH", "")
+    if not path:
+        raise ValueError("未指定快照路徑，也沒有設置 BRIDGE_SNAPSHOT_PATH")
+    return path
+
+
+@instrument
+def save_strategy_snapshot(path: str = "") -> str:
+    """
+    保存策略狀態快照
+
+    Args:
+        path: 快照文件路徑，默認為環境變量 BRIDGE_SNAPSHOT_PATH
+
+    Returns:
+        JSON格式的結果：{"path": ..., "bytes": ..., "strategies": 策略數}
+    """
+    try:
+        path = _snapshot_path(path)
+        size = strategy_manager.save_snapshot(path)
+        return json.dumps(
+            {"path": path, "bytes": size, "strategies": len(strategy_manager.strategies)}
+        )
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"保存策略快照失敗: {e}")
+        error_result = {"error": str(e), "traceback": traceback.format_exc()}
+        return json.dumps(error_result)
+
+
+@instrument
+def restore_strategy_snapshot(path: str = "") -> str:
+    """
+    從快照恢復策略
+
+    Args:
+        path: 快照文件路徑，默認為環境變量 BRIDGE_SNAPSHOT_PATH
+
+    Returns:
+        JSON格式的結果：{"restored": [策略ID, ...]}
+    """
+    try:
+        restored = strategy_manager.restore_snapshot(_snapshot_path(path))
+        return json.dumps({"restored": restored})
+    except Exception as e:
+        mark_error(e)
+        logger.error(f"恢復策略快照失敗: {e}")
+        error_result = {"error": str(e), "traceback": traceback.format_exc()}
+        return json.dumps(error_result)
+
+
 # 供Rust調用的C風格接口
 def c_create_strategy(json_data: bytes) -> bytes:
     """C風格接口：創建策略"""
@@ -362,6 +1194,43 @@ def c_generate_signals(strategy_id: bytes, market_data: bytes) -> bytes:
         return json.dumps({"error": str(e)}).encode("utf-8")
 
 
+def c_generate_signals_batch(
+    strategy_ids: bytes, market_data: bytes, max_workers: bytes = b""
+) -> bytes:
+    """C風格接口：批量生成信號"""
+    try:
+        workers = int(max_workers) if max_workers else None
+        result = generate_signals_batch(
+            strategy_ids.decode("utf-8"), market_data.decode("utf-8"), workers
+        )
+        return result.encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_append_market_data(strategy_id: bytes, market_data: bytes) -> bytes:
+    """C風格接口：追加新K線"""
+    try:
+        result = append_market_data(strategy_id.decode("utf-8"), market_data.decode("utf-8"))
+        return result.encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_resync_market_data(
+    strategy_id: bytes, market_data: bytes, window_size: bytes = b""
+) -> bytes:
+    """C風格接口：重建策略窗口"""
+    try:
+        size = int(window_size) if window_size else None
+        result = resync_market_data(
+            strategy_id.decode("utf-8"), market_data.decode("utf-8"), size
+        )
+        return result.encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
 def c_run_backtest(config: bytes) -> bytes:
     """C風格接口：運行回測"""
     try:
@@ -371,7 +1240,316 @@ def c_run_backtest(config: bytes) -> bytes:
         return json.dumps({"error": str(e)}).encode("utf-8")
 
 
-if __name__ == "__main__":
+def c_submit_backtest(config: bytes) -> bytes:
+    """C風格接口：提交回測任務"""
+    try:
+        return submit_backtest(config.decode("utf-8")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_get_backtest_status(job_id: bytes) -> bytes:
+    """C風格接口：獲取回測任務狀態"""
+    try:
+        return get_backtest_status(job_id.decode("utf-8")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_get_backtest_progress(job_id: bytes) -> bytes:
+    """C風格接口：獲取回測任務進度"""
+    try:
+        return get_backtest_progress(job_id.decode("utf-8")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_cancel_backtest(job_id: bytes) -> bytes:
+    """C風格接口：取消回測任務"""
+    try:
+        return cancel_backtest(job_id.decode("utf-8")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_get_backtest_result(job_id: bytes) -> bytes:
+    """C風格接口：讀取回測任務結果"""
+    try:
+        return get_backtest_result(job_id.decode("utf-8")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_list_backtest_jobs() -> bytes:
+    """C風格接口：列出回測任務"""
+    try:
+        return list_backtest_jobs().encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_get_bridge_metrics(reset: bytes = b"") -> bytes:
+    """C風格接口：獲取橋接調用指標"""
+    try:
+        return get_bridge_metrics(reset.strip().lower() in (b"1", b"true")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_get_strategy_info(strategy_id: bytes) -> bytes:
+    """C風格接口：獲取策略信息"""
+    try:
+        return get_strategy_info(strategy_id.decode("utf-8")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_list_strategies() -> bytes:
+    """C風格接口：列出策略"""
+    try:
+        return list_strategies().encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_update_strategy_config(strategy_id: bytes, config: bytes) -> bytes:
+    """C風格接口：更新策略配置"""
+    try:
+        result = update_strategy_config(strategy_id.decode("utf-8"), config.decode("utf-8"))
+        return result.encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_save_strategy_snapshot(path: bytes = b"") -> bytes:
+    """C風格接口：保存策略快照"""
+    try:
+        return save_strategy_snapshot(path.decode("utf-8")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_restore_strategy_snapshot(path: bytes = b"") -> bytes:
+    """C風格接口：從快照恢復策略"""
+    try:
+        return restore_strategy_snapshot(path.decode("utf-8")).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+def c_create_strategy_json(json_data: bytes) -> bytes:
+    """C風格接口：創建策略，策略ID以JSON字符串返回"""
+    try:
+        strategy_id = create_strategy_from_json(json_data.decode("utf-8"))
+        return json.dumps(strategy_id).encode("utf-8")
+    except Exception as e:
+        return json.dumps({"error": str(e)}).encode("utf-8")
+
+
+# 常駐工作進程
+#
+# Rust 端啟動一個長期運行的 Python 進程，通過標準輸入輸出交換幀：
+# 每幀為 4 字節大端長度 + 內容。請求內容為 JSON：
+#     {"function": "generate_signals", "args": ["SMA_Test", "[...]"]}
+# 響應內容為對應 c_* 函數返回的原始字節。策略實例保存在進程內的
+# strategy_manager 中，在多次請求之間保持狀態。
+#
+# 請求可以帶上 "accept": ["msgpack", "orjson", "json"] 按偏好協商編解碼器，
+# 此時響應內容為 "編解碼器名稱\0" + 按該編解碼器編碼的結果。
+
+FRAME_HEADER = struct.Struct(">I")
+
+# 單幀大小上限，防止長度字段損壞時分配過大內存
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+
+WORKER_FUNCTIONS: Dict[str, Callable[..., bytes]] = {
+    "create_strategy_from_json": c_create_strategy_json,
+    "generate_signals": c_generate_signals,
+    "generate_signals_batch": c_generate_signals_batch,
+    "append_market_data": c_append_market_data,
+    "resync_market_data": c_resync_market_data,
+    "run_backtest_from_json": c_run_backtest,
+    "submit_backtest": c_submit_backtest,
+    "get_backtest_status": c_get_backtest_status,
+    "get_backtest_progress": c_get_backtest_progress,
+    "cancel_backtest": c_cancel_backtest,
+    "get_backtest_result": c_get_backtest_result,
+    "list_backtest_jobs": c_list_backtest_jobs,
+    "get_bridge_metrics": c_get_bridge_metrics,
+    "get_strategy_info": c_get_strategy_info,
+    "list_strategies": c_list_strategies,
+    "update_strategy_config": c_update_strategy_config,
+    "save_strategy_snapshot": c_save_strategy_snapshot,
+    "restore_strategy_snapshot": c_restore_strategy_snapshot,
+}
+
+# 流式函數：回測等長時間任務先發送若干事件幀，最後返回結束事件，
+# 一個請求對應多個響應幀，事件格式見 stream_backtest
+WORKER_STREAM_FUNCTIONS: Dict[str, Callable[..., bytes]] = {
+    "stream_backtest": stream_backtest,
+}
+
+# 協商了編解碼器時改用的函數，最後一個參數為編解碼器，直接返回編碼後的結果
+WORKER_OBJECT_FUNCTIONS: Dict[str, Callable[..., bytes]] = {
+    "run_backtest_from_json": run_backtest_encoded,
+}
+
+
+def read_frame(stream: BinaryIO) -> Optional[bytes]:
+    """
+    讀取一幀
+
+    Returns:
+        幀內容，輸入流結束時返回 None
+    """
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"幀長度超過上限: {length}")
+
+    payload = stream.read(length)
+    if len(payload) < length:
+        return None
+    return payload
+
+
+def write_frame(stream: BinaryIO, payload: bytes) -> None:
+    """寫入一幀並立即刷新"""
+    stream.write(FRAME_HEADER.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def handle_worker_request(
+    payload: bytes, emit: Optional[Callable[[bytes], None]] = None
+) -> Optional[bytes]:
+    """
+    處理一個工作進程請求
+
+    Args:
+        payload: 請求內容
+        emit: 發送中間幀的函數，流式函數通過它輸出結束事件之前的所有事件
+
+    Returns:
+        響應內容（流式函數為結束事件）；收到 shutdown 請求時返回 None
+    """
+    from bridge.codec import negotiate_codec
+
+    try:
+        request = json.loads(payload)
+        function_name = request["function"]
+        args = [str(arg).encode("utf-8") for arg in request.get("args", [])]
+        accept = request.get("accept")
+        codec = negotiate_codec(accept) if accept else None
+    except Exception as e:
+        return json.dumps({"error": f"無效請求: {e}"}).encode("utf-8")
+
+    if function_name == "shutdown":
+        return None
+    if function_name == "ping":
+        response = b'"pong"'
+    elif function_name in WORKER_STREAM_FUNCTIONS:
+        # 流式函數的事件總是JSON，不參與編解碼器協商
+        if emit is None:
+            return json.dumps({"error": f"函數需要流式輸出: {function_name}"}).encode("utf-8")
+        function = WORKER_STREAM_FUNCTIONS[function_name]
+        return function(*(arg.decode("utf-8") for arg in args), emit)
+    elif function_name not in WORKER_FUNCTIONS:
+        response = json.dumps({"error": f"未知函數: {function_name}"}).encode("utf-8")
+    elif codec is not None and function_name in WORKER_OBJECT_FUNCTIONS:
+        try:
+            function = WORKER_OBJECT_FUNCTIONS[function_name]
+            encoded = function(*(arg.decode("utf-8") for arg in args), codec)
+            return codec.name.encode("ascii") + b"\0" + encoded
+        except Exception as e:
+            logger.error(f"工作進程請求失敗: {function_name}: {e}")
+            response = json.dumps({"error": str(e)}).encode("utf-8")
+    else:
+        try:
+            response = WORKER_FUNCTIONS[function_name](*args)
+        except Exception as e:
+            logger.error(f"工作進程請求失敗: {function_name}: {e}")
+            error_result = {"error": str(e), "traceback": traceback.format_exc()}
+            response = json.dumps(error_result).encode("utf-8")
+
+    if codec is None:
+        return response
+    if not codec.is_json:
+        response = codec.encode(json.loads(response))
+    return codec.name.encode("ascii") + b"\0" + response
+
+
+def serve_worker(
+    instream: Optional[BinaryIO] = None, outstream: Optional[BinaryIO] = None
+) -> None:
+    """
+    運行常駐工作進程的請求循環
+
+    默認使用進程的標準輸入輸出。標準輸出專用於傳輸幀，
+    循環期間 print 等輸出會被重定向到標準錯誤，避免破壞幀格式。
+
+    設置了環境變量 BRIDGE_SNAPSHOT_PATH 時，啟動時從該快照恢復策略，
+    每隔 BRIDGE_SNAPSHOT_INTERVAL 秒（默認60）和退出時保存快照，
+    策略的創建、刪除和配置更新會立即保存。
+
+    Args:
+        instream: 請求輸入流
+        outstream: 響應輸出流
+    """
+    instream = instream or sys.stdin.buffer
+    outstream = outstream or sys.stdout.buffer
+
+    original_stdout = sys.stdout
+    sys.stdout = sys.stderr
+    logger.info("Python工作進程已啟動")
+
+    snapshots = None
+    snapshot_path = os.environ.get("BRIDGE_SNAPSHOT_PATH")
+    if snapshot_path:
+        from bridge.snapshot import DEFAULT_SNAPSHOT_INTERVAL, SnapshotScheduler
+
+        snapshots = SnapshotScheduler(
+            strategy_manager,
+            snapshot_path,
+            float(os.environ.get("BRIDGE_SNAPSHOT_INTERVAL", DEFAULT_SNAPSHOT_INTERVAL)),
+        )
+        snapshots.restore()
+
+    try:
+        while True:
+            payload = read_frame(instream)
+            if payload is None:
+                break
+
+            response = handle_worker_request(
+                payload, lambda event: write_frame(outstream, event)
+            )
+            if response is None:
+                write_frame(outstream, b'"bye"')
+                break
+            write_frame(outstream, response)
+            if snapshots is not None:
+                snapshots.tick()
+    finally:
+        if snapshots is not None:
+            snapshots.save()
+        if _job_manager is not None:
+            _job_manager.shutdown(wait=False)
+        sys.stdout = original_stdout
+        logger.info("Python工作進程已退出")
+
+
+if __name__ == "__main__" and "--worker" in sys.argv[1:]:
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    serve_worker()
+elif __name__ == "__main__" and "--import-time" in sys.argv[1:]:
+    from bridge.import_timing import main
+
+    main()
+elif __name__ == "__main__":
     # 測試代碼
     logging.basicConfig(level=logging.INFO)
 
@@ -0,0 +1,239 @@
+"""
+策略狀態快照
+
+把策略管理器中每個策略的配置、指標緩衝區、持倉狀態和滾動窗口保存到一個二進制文件，
+工作進程重啟後直接恢復，不需要重新同步和回放歷史K線。
+
+文件格式（小端）：
+    頭部：魔數 TBSNAP01、格式版本 (uint16)、保留 (uint16)、內容 CRC32 (uint32)、內容長度 (uint64)
+    內容：pickle 編碼的 {"created_at": 時間戳, "strategies": {策略ID: 條目}}
+    條目：{"type": "模塊:類名", "state_version": 狀態版本, "state": pickle 編碼的 (策略, 配置, 窗口)}
+
+每個策略單獨編碼，某個策略無法保存或恢復（類已刪除、狀態版本變化）只跳過該策略。
+策略類可以用類屬性 STATE_VERSION 聲明狀態格式版本，內部狀態結構改變時遞增，
+舊快照中的該策略就不會被恢復。快照使用 pickle，只應指向本機可信的路徑。
+"""
+
+import importlib
+import logging
+import os
+import pickle
+import struct
+import tempfile
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from bridge.rust_bridge import StrategyManager
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"TBSNAP01"
+
+# 快照格式版本，文件結構變化時遞增，舊版本的快照不再讀取
+SNAPSHOT_VERSION = 1
+
+# 工作進程定期保存快照的默認間隔（秒）
+DEFAULT_SNAPSHOT_INTERVAL = 60.0
+
+_HEADER = struct.Struct("<8sHHIQ")
+
+
+class SnapshotError(ValueError):
+    """快照文件損壞或版本不兼容"""
+
+
+def state_version(strategy_class: type) -> int:
+    """策略類聲明的狀態格式版本，未聲明時為0"""
+    return int(getattr(strategy_class, "STATE_VERSION", 0))
+
+
+def encode_snapshot(manager: "StrategyManager") -> bytes:
+    """
+    編碼策略管理器中的所有策略
+
+    Returns:
+        快照文件內容
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    for strategy_id, strategy in manager.strategies.items():
+        strategy_class = type(strategy)
+        try:
+            state = pickle.dumps(
+                (
+                    strategy,
+                    manager.strategy_configs.get(strategy_id),
+                    manager.windows.get(strategy_id),
+                ),
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        except Exception as e:
+            logger.warning(f"策略狀態無法保存，已跳過: {strategy_id}: {e}")
+            continue
+        entries[strategy_id] = {
+            "type": f"{strategy_class.__module__}:{strategy_class.__qualname__}",
+            "state_version": state_version(strategy_class),
+            "state": state,
+        }
+
+    payload = pickle.dumps(
+        {"created_at": time.time(), "strategies": entries}, protocol=pickle.HIGHEST_PROTOCOL
+    )
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, zlib.crc32(payload), len(payload)) + payload
+
+
+def decode_snapshot(data: bytes) -> Dict[str, Any]:
+    """
+    解碼快照文件內容
+
+    Raises:
+        SnapshotError: 魔數、版本、長度或校驗和不匹配
+    """
+    if len(data) < _HEADER.size:
+        raise SnapshotError("快照文件不完整")
+    magic, version, _, checksum, length = _HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("不是策略快照文件")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"快照版本不兼容: {version}，當前版本 {SNAPSHOT_VERSION}")
+
+    payload = data[_HEADER.size :]
+    if len(payload) != length or zlib.crc32(payload) != checksum:
+        raise SnapshotError("快照文件已損壞")
+    return pickle.loads(payload)
+
+
+def save_snapshot(manager: "StrategyManager", path: str) -> int:
+    """
+    保存快照
+
+    先寫入同目錄下的臨時文件再替換，寫入中途退出不會破壞已有快照。
+
+    Returns:
+        快照文件大小（字節）
+    """
+    data = encode_snapshot(manager)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    logger.info(f"策略快照已保存: {path}, {len(manager.strategies)} 個策略, {len(data)} 字節")
+    return len(data)
+
+
+def restore_snapshot(manager: "StrategyManager", path: str) -> List[str]:
+    """
+    從快照恢復策略，同名策略被覆蓋
+
+    Returns:
+        已恢復的策略ID
+
+    Raises:
+        OSError: 文件無法讀取
+        SnapshotError: 快照文件損壞或版本不兼容
+    """
+    with open(path, "rb") as f:
+        snapshot = decode_snapshot(f.read())
+
+    restored: List[str] = []
+    for strategy_id, entry in snapshot["strategies"].items():
+        try:
+            module_name, _, class_name = entry["type"].partition(":")
+            strategy_class = getattr(importlib.import_module(module_name), class_name)
+            if state_version(strategy_class) != entry["state_version"]:
+                logger.warning(
+                    f"策略狀態版本已變化，不恢復: {strategy_id}: "
+                    f"{entry['state_version']} -> {state_version(strategy_class)}"
+                )
+                continue
+            strategy, config, window = pickle.loads(entry["state"])
+        except Exception as e:
+            logger.warning(f"策略狀態無法恢復，已跳過: {strategy_id}: {e}")
+            continue
+
+        manager.strategies[strategy_id] = strategy
+        manager.strategy_configs[strategy_id] = config if config is not None else strategy.config
+        if window is not None:
+            manager.windows[strategy_id] = window
+        else:
+            manager.windows.pop(strategy_id, None)
+        restored.append(strategy_id)
+
+    age = time.time() - snapshot["created_at"]
+    logger.info(f"策略快照已恢復: {path}, {len(restored)} 個策略, 快照時間 {age:.0f} 秒前")
+    return restored
+
+
+class SnapshotScheduler:
+    """
+    工作進程的快照計劃
+
+    工作進程在每個請求處理完之後調用 tick，距上次保存超過間隔且期間處理過請求時保存；
+    空閒時狀態不變，不需要保存。策略被創建、刪除或更新配置（管理器的 revision 變化）時
+    立即保存，否則重啟後會恢復舊的配置或已刪除的策略。退出時調用 save 保存最終狀態。
+    """
+
+    def __init__(
+        self,
+        manager: "StrategyManager",
+        path: str,
+        interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+    ):
+        self.manager = manager
+        self.path = path
+        self.interval = interval
+        self._last_save = time.monotonic()
+        self._dirty = False
+        self._revision = manager.revision
+
+    def restore(self) -> List[str]:
+        """快照文件存在時恢復，損壞或不兼容的快照只記錄警告"""
+        if not os.path.exists(self.path):
+            return []
+        try:
+            return restore_snapshot(self.manager, self.path)
+        except (OSError, SnapshotError) as e:
+            logger.warning(f"策略快照無法讀取，將從頭創建策略: {self.path}: {e}")
+            return []
+
+    def tick(self) -> bool:
+        """
+        記錄一個已處理的請求，到期時保存快照
+
+        Returns:
+            是否保存了快照
+        """
+        self._dirty = True
+        if (
+            self.manager.revision == self._revision
+            and time.monotonic() - self._last_save < self.interval
+        ):
+            return False
+        return self.save() is not None
+
+    def save(self) -> Optional[int]:
+        """
+        保存快照，失敗時只記錄錯誤
+
+        Returns:
+            快照大小；沒有需要保存的變化或保存失敗時為 None
+        """
+        if not self._dirty:
+            return None
+        self._last_save = time.monotonic()
+        self._revision = self.manager.revision
+        try:
+            size = save_snapshot(self.manager, self.path)
+        except Exception as e:
+            logger.error(f"保存策略快照失敗: {self.path}: {e}")
+            return None
+        self._dirty = False
+        return size
@@ -0,0 +1,39 @@
+"""
+延遲導出
+
+包的 __init__ 只聲明導出名稱所在的子模塊，名稱在第一次訪問時才導入對應子模塊，
+導入包本身不會加載子模塊依賴的 pandas、NumPy 等。
+"""
+
+import importlib
+import sys
+from typing import Callable, Dict, List, Tuple
+
+
+def make_lazy_getattr(
+    exports: Dict[str, str], module_name: str
+) -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    """
+    生成包的模塊級 __getattr__ 和 __dir__
+
+    Args:
+        exports: 導出名稱 -> 所在子模塊（相對於包的模塊名，如 ".engine"）
+        module_name: 包的 __name__
+
+    Returns:
+        (__getattr__, __dir__)，在包的 __init__ 中賦值給同名的模塊屬性
+    """
+
+    def __getattr__(name: str):
+        submodule = exports.get(name)
+        if submodule is None:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(submodule, module_name), name)
+        # 緩存到包的命名空間，之後的訪問不再經過 __getattr__
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[module_name])) | set(exports))
+
+    return __getattr__, __dir__
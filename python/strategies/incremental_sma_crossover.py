@@ -0,0 +1,84 @@
+"""
+增量SMA交叉策略
+
+快線上穿慢線時買入，下穿時賣出。同時實現 generate_signals 和 on_bar：
+回測引擎和橋接層逐根K線調用 on_bar，只保存最近 slow_period + 1 個收盤價，
+不再在每根K線上切片全部歷史。兩個入口用同一段收盤價和同一種算法計算均線，
+對同一段數據產生完全相同的信號。
+"""
+
+from collections import deque
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backtest.incremental import Bar, IncrementalStrategy
+
+from .base import BaseStrategy, SignalType, StrategyConfig, StrategySignal
+
+
+class IncrementalSMACrossoverStrategy(IncrementalStrategy, BaseStrategy):
+    """
+    增量SMA交叉策略
+
+    參數：
+        fast_period: 快線週期，默認5
+        slow_period: 慢線週期，默認20，必須大於快線週期
+    """
+
+    def __init__(self, config: StrategyConfig):
+        """
+        Raises:
+            ValueError: 週期小於1或快線週期不小於慢線週期
+        """
+        fast = int(config.parameters.get("fast_period", 5))
+        slow = int(config.parameters.get("slow_period", 20))
+        if fast < 1 or fast >= slow:
+            raise ValueError(f"均線週期不合法: fast_period={fast}, slow_period={slow}")
+        super().__init__(config)
+        self.reset()
+
+    @property
+    def fast_period(self) -> int:
+        return int(self.parameters.get("fast_period", 5))
+
+    @property
+    def slow_period(self) -> int:
+        return int(self.parameters.get("slow_period", 20))
+
+    def reset(self):
+        super().reset()
+        # 判斷交叉需要上一根K線的均線，多保存一個收盤價
+        self._closes: deque = deque(maxlen=self.slow_period + 1)
+
+    def on_bar(self, bar: Bar) -> List[StrategySignal]:
+        self._closes.append(float(bar.close))
+        return self._cross_signals(self._closes)
+
+    def generate_signals(self, data: pd.DataFrame) -> List[StrategySignal]:
+        closes = data["close"].to_numpy(dtype=float)
+        return self._cross_signals(closes[-(self.slow_period + 1):])
+
+    def _cross_signals(self, closes: Sequence[float]) -> List[StrategySignal]:
+        """
+        根據最近 slow_period + 1 個收盤價判斷均線交叉
+
+        Args:
+            closes: 最近的收盤價，不足 slow_period + 1 個時不產生信號
+        """
+        fast, slow = self.fast_period, self.slow_period
+        if len(closes) < slow + 1:
+            return []
+
+        closes = np.asarray(closes, dtype=float)
+        fast_prev, fast_now = closes[-fast - 1 : -1].mean(), closes[-fast:].mean()
+        slow_prev, slow_now = closes[:-1].mean(), closes[1:].mean()
+        price = float(closes[-1])
+        metadata = {"fast_ma": float(fast_now), "slow_ma": float(slow_now)}
+
+        if fast_prev <= slow_prev and fast_now > slow_now:
+            return [StrategySignal(self.symbol, SignalType.BUY, 1.0, price, metadata=metadata)]
+        if fast_prev >= slow_prev and fast_now < slow_now:
+            return [StrategySignal(self.symbol, SignalType.SELL, 1.0, price, metadata=metadata)]
+        return []
@@ -5,19 +5,25 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Any, Set, Tuple
+from dataclasses import dataclass, field, replace
 from enum import Enum
 import asyncio
 import aiohttp
 import hmac
 import hashlib
+import random
 import time
 import json
 import logging
 from urllib.parse import urlencode
 
 from .execution_engine import Order, OrderStatus, OrderType, OrderSide
+from .order_book import OrderBook, OrderBookGapError
+from .rate_limiter import (
+    BINANCE_FUTURES_ORDER_ENDPOINTS, BINANCE_FUTURES_WEIGHTS, REQUESTS,
+    RateLimit, RateLimiter, RequestPriority, binance_futures_limits
+)
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +46,8 @@ class ExchangeConfig:
     testnet: bool = True
     rate_limit: int = 100  # 每秒請求限制
     timeout: int = 30  # 請求超時時間
+    max_retries: int = 2  # 收到 429 後重試的次數
+    ws_url: Optional[str] = None  # 行情 WebSocket 地址，默認按交易所和 testnet 選擇
     
     def __post_init__(self):
         if not self.api_key or not self.api_secret:
@@ -60,6 +68,21 @@ class MarketData:
     change_24h: Optional[float] = None
 
 
+@dataclass
+class Kline:
+    """K線"""
+    symbol: str
+    interval: str
+    open_time: float
+    close_time: float
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    closed: bool
+
+
 @dataclass
 class BalanceInfo:
     """餘額信息"""
@@ -89,7 +112,11 @@ class ExchangeInterface(ABC):
     def __init__(self, config: ExchangeConfig):
         self.config = config
         self.session: Optional[aiohttp.ClientSession] = None
-        self.rate_limiter = asyncio.Semaphore(config.rate_limit)
+        self.rate_limiter = self._create_rate_limiter()
+        # 進行中的低優先級 GET 請求，相同請求合併為一次
+        self._pending_requests: Dict[Tuple, asyncio.Future] = {}
+        # 本地維護的訂單簿，支持深度推送的交易所填充
+        self.order_books: Dict[str, OrderBook] = {}
         
     async def __aenter__(self):
         await self.connect()
@@ -127,6 +154,56 @@ class ExchangeInterface(ABC):
         """獲取市場數據"""
         pass
     
+    async def get_market_data_bulk(self, symbols: Iterable[str]) -> Dict[str, MarketData]:
+        """
+        批量獲取市場數據
+
+        默認逐個請求，有批量行情接口的交易所應覆蓋為一次請求。
+
+        Args:
+            symbols: 交易對
+
+        Returns:
+            交易對到行情的映射；可能包含未請求的交易對，獲取失敗的交易對不在其中
+        """
+        symbols = list(symbols)
+        results = await asyncio.gather(
+            *(self.get_market_data(symbol) for symbol in symbols), return_exceptions=True
+        )
+        market_data = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"獲取 {symbol} 市場數據失敗: {result}")
+                continue
+            market_data[symbol] = result
+        return market_data
+
+    def get_streamed_market_data(self, symbol: str) -> Optional[MarketData]:
+        """推送的新鮮行情，不支持推送或沒有新鮮數據時為 None"""
+        return None
+
+    async def start_market_stream(self, symbols: Iterable[str], kline_interval: str = "1m") -> Optional[Any]:
+        """
+        啟動行情推送
+
+        Returns:
+            提供 updates() 的行情訂閱；交易所不支持推送時為 None，調用方應繼續輪詢
+        """
+        return None
+
+    async def start_order_book(self, symbols: Iterable[str]) -> Optional[Dict[str, OrderBook]]:
+        """
+        維護交易對的本地訂單簿
+
+        Returns:
+            order_books；交易所不支持深度推送時為 None
+        """
+        return None
+
+    async def stop_order_book(self, symbols: Iterable[str]):
+        """停止維護交易對的訂單簿"""
+        pass
+
     @abstractmethod
     async def place_order(self, order: Order) -> Dict[str, Any]:
         """下單"""
@@ -147,22 +224,87 @@ class ExchangeInterface(ABC):
         """獲取交易手續費"""
         pass
     
+    def _create_rate_limiter(self) -> RateLimiter:
+        """創建限流器，默認只限制每秒請求數，子類按交易所的權重和窗口覆蓋"""
+        return RateLimiter([RateLimit(REQUESTS, 1.0, self.config.rate_limit)])
+
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """限流等待時間和剩餘額度"""
+        return self.rate_limiter.get_stats()
+
     async def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None, 
-                           data: Optional[Dict] = None, signed: bool = False) -> Dict[str, Any]:
-        """發送HTTP請求"""
-        async with self.rate_limiter:
-            if not self.session:
-                await self.connect()
-            
-            url = f"{self.config.base_url}{endpoint}"
-            
+                           data: Optional[Dict] = None, signed: bool = False,
+                           priority: Optional[RequestPriority] = None,
+                           max_wait: Optional[float] = None) -> Dict[str, Any]:
+        """
+        發送HTTP請求
+
+        請求先在限流器中按優先級排隊等待額度；收到 429 時按 Retry-After 暫停後重新排隊，
+        最多重試 config.max_retries 次，收到 418 時暫停並直接拋出異常。
+        低優先級的 GET 請求與參數相同的進行中請求合併，共用一次響應。
+
+        Args:
+            priority: 優先級，默認由限流器按接口判斷
+            max_wait: 最長排隊時間（秒），默認使用通道的設置
+
+        Raises:
+            RequestDroppedError: 請求在排隊時被限流器丟棄
+        """
+        if priority is None:
+            priority = self.rate_limiter.priority_for(method, endpoint)
+        if priority is not RequestPriority.LOW or method.upper() != 'GET' or data is not None:
+            return await self._send_request(method, endpoint, params, data, signed, priority, max_wait)
+
+        key = (endpoint, signed, tuple(sorted((params or {}).items())))
+        pending = self._pending_requests.get(key)
+        if pending is not None:
+            self.rate_limiter.lane_stats[priority].coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending_requests[key] = future
+        try:
+            result = await self._send_request(method, endpoint, params, data, signed, priority, max_wait)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 沒有其他等待者時避免 "exception was never retrieved" 警告
+                future.exception()
+            raise
+        finally:
+            del self._pending_requests[key]
+
+    async def _send_request(self, method: str, endpoint: str, params: Optional[Dict],
+                            data: Optional[Dict], signed: bool,
+                            priority: RequestPriority, max_wait: Optional[float]) -> Dict[str, Any]:
+        """排隊、簽名並發送請求，處理 429/418"""
+        if not self.session:
+            await self.connect()
+
+        url = f"{self.config.base_url}{endpoint}"
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(method, endpoint, params, priority, max_wait)
+
+            request_params = dict(params) if params else None
             if signed:
-                params = params or {}
-                params['timestamp'] = int(time.time() * 1000)
-                params = self._sign_request(params)
-            
+                # 排隊之後再簽名，等待時間不佔用時間戳的有效期
+                request_params = request_params or {}
+                request_params['timestamp'] = int(time.time() * 1000)
+                request_params = self._sign_request(request_params)
+
             try:
-                async with self.session.request(method, url, params=params, json=data) as response:
+                async with self.session.request(method, url, params=request_params, json=data) as response:
+                    self.rate_limiter.update_from_headers(response.headers)
+                    if response.status in (429, 418):
+                        self.rate_limiter.pause(response.status, response.headers.get('Retry-After'))
+                        if response.status == 429 and attempt < self.config.max_retries:
+                            attempt += 1
+                            continue
                     response.raise_for_status()
                     return await response.json()
             except Exception as e:
@@ -182,6 +324,401 @@ class ExchangeInterface(ABC):
         return params
 
 
+# Binance U本位合約行情 WebSocket 地址
+BINANCE_WS_URL = "wss://fstream.binance.com"
+BINANCE_TESTNET_WS_URL = "wss://stream.binancefuture.com"
+
+
+class BinanceMarketStream:
+    """
+    Binance 合約行情 WebSocket 訂閱
+
+    在組合流 /stream 上訂閱每個交易對的 ticker、bookTicker 和 kline 流，
+    收到消息後立即合併為該交易對最新的 MarketData 並推送給訂閱者：
+        - ticker：最新價、24小時成交量、最高最低價和漲跌幅
+        - bookTicker：最優買賣價
+        - kline：最新價（當前K線收盤價）和K線
+    通過 subscribe_depth 訂閱增量深度的交易對另外維護本地訂單簿，
+    未同步或出現序號缺口時自動獲取深度快照重新同步。
+    連接斷開或長時間收不到行情時按指數退避重連，重連後重新訂閱所有交易對。
+    """
+
+    def __init__(
+        self,
+        ws_url: str,
+        symbols: Iterable[str] = (),
+        kline_interval: str = "1m",
+        reconnect_delay: float = 0.5,
+        max_reconnect_delay: float = 30.0,
+        receive_timeout: float = 30.0,
+        queue_size: int = 1000,
+        order_books: Optional[Dict[str, OrderBook]] = None,
+    ):
+        """
+        初始化行情訂閱
+
+        Args:
+            ws_url: WebSocket 根地址，例如 wss://fstream.binance.com
+            symbols: 初始訂閱的交易對
+            kline_interval: K線週期
+            reconnect_delay: 首次重連等待時間（秒），之後每次加倍
+            max_reconnect_delay: 重連等待時間上限（秒）
+            receive_timeout: 有訂閱時超過該時間沒有消息即視為連接失效（秒）
+            queue_size: 每個訂閱者的隊列長度，消費過慢時丟棄最舊的更新
+            order_books: 存放訂單簿的字典，默認新建
+        """
+        self.ws_url = ws_url.rstrip('/')
+        self.kline_interval = kline_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.receive_timeout = receive_timeout
+        self.queue_size = queue_size
+
+        self.symbols: Set[str] = {symbol.upper() for symbol in symbols}
+        self.latest: Dict[str, MarketData] = {}
+        self.latest_klines: Dict[str, Kline] = {}
+        self.order_books: Dict[str, OrderBook] = order_books if order_books is not None else {}
+        self.reconnects = 0
+
+        self._received_at: Dict[str, float] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._request_id = 0
+        self._subscribers: List[Tuple[Optional[Set[str]], asyncio.Queue]] = []
+        self._kline_subscribers: List[Tuple[Optional[Set[str]], asyncio.Queue]] = []
+        self._fetch_snapshot: Optional[Callable[[str], Awaitable[Mapping[str, Any]]]] = None
+        self._resync_tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def _streams(self, symbols: Iterable[str]) -> List[str]:
+        """交易對對應的流名稱"""
+        streams = []
+        for symbol in sorted(symbols):
+            name = symbol.lower()
+            streams.extend([f"{name}@ticker", f"{name}@bookTicker", f"{name}@kline_{self.kline_interval}"])
+        return streams
+
+    def _depth_streams(self, symbols: Iterable[str]) -> List[str]:
+        """增量深度流名稱"""
+        return [f"{symbol.lower()}@depth@100ms" for symbol in sorted(symbols)]
+
+    async def start(self):
+        """開始訂閱，連接在後台建立並自動重連"""
+        if self._task is not None and not self._task.done():
+            return
+        # WebSocket 是長連接，不能使用帶總超時的 REST 會話
+        self._session = aiohttp.ClientSession()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"行情訂閱已啟動: {self.ws_url}, {sorted(self.symbols)}")
+
+    async def stop(self):
+        """停止訂閱並結束所有異步迭代器"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in self._resync_tasks.values():
+            task.cancel()
+        self._resync_tasks.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        for _, queue in self._subscribers + self._kline_subscribers:
+            self._offer(queue, None)
+        logger.info("行情訂閱已停止")
+
+    async def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        """等待連接建立，超時返回 False"""
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def subscribe(self, symbols: Iterable[str]):
+        """增加訂閱的交易對"""
+        new_symbols = {symbol.upper() for symbol in symbols} - self.symbols
+        if not new_symbols:
+            return
+        self.symbols |= new_symbols
+        if self._ws is not None and not self._ws.closed:
+            await self._send('SUBSCRIBE', self._streams(new_symbols))
+
+    async def unsubscribe(self, symbols: Iterable[str]):
+        """取消訂閱交易對並刪除其緩存的行情"""
+        removed = {symbol.upper() for symbol in symbols} & self.symbols
+        if not removed:
+            return
+        self.symbols -= removed
+        for symbol in removed:
+            self.latest.pop(symbol, None)
+            self.latest_klines.pop(symbol, None)
+            self._received_at.pop(symbol, None)
+        if self._ws is not None and not self._ws.closed:
+            await self._send('UNSUBSCRIBE', self._streams(removed))
+
+    async def subscribe_depth(self, symbols: Iterable[str],
+                              fetch_snapshot: Callable[[str], Awaitable[Mapping[str, Any]]]):
+        """
+        訂閱增量深度並維護本地訂單簿
+
+        Args:
+            symbols: 交易對
+            fetch_snapshot: 獲取深度快照的協程函數，參數為交易對
+        """
+        self._fetch_snapshot = fetch_snapshot
+        new_symbols = [symbol.upper() for symbol in symbols if symbol.upper() not in self.order_books]
+        if not new_symbols:
+            return
+        for symbol in new_symbols:
+            self.order_books[symbol] = OrderBook(symbol)
+        if self._ws is not None and not self._ws.closed:
+            await self._send('SUBSCRIBE', self._depth_streams(new_symbols))
+        # 先訂閱再取快照，期間的增量在訂單簿中緩存
+        for symbol in new_symbols:
+            self._schedule_resync(symbol)
+
+    async def unsubscribe_depth(self, symbols: Iterable[str]):
+        """取消訂閱增量深度並刪除本地訂單簿"""
+        removed = {symbol.upper() for symbol in symbols} & set(self.order_books)
+        if not removed:
+            return
+        for symbol in removed:
+            self.order_books.pop(symbol)
+            task = self._resync_tasks.pop(symbol, None)
+            if task is not None:
+                task.cancel()
+        if self._ws is not None and not self._ws.closed:
+            await self._send('UNSUBSCRIBE', self._depth_streams(removed))
+
+    def _schedule_resync(self, symbol: str):
+        task = self._resync_tasks.get(symbol)
+        if self._fetch_snapshot is None or (task is not None and not task.done()):
+            return
+        self._resync_tasks[symbol] = asyncio.create_task(self._resync(symbol))
+
+    async def _resync(self, symbol: str):
+        """獲取快照同步訂單簿，快照早於緩存的增量或請求失敗時退避重試"""
+        delay = self.reconnect_delay
+        book = self.order_books[symbol]
+        while not book.synced:
+            try:
+                book.apply_snapshot(await self._fetch_snapshot(symbol))
+                logger.info(f"訂單簿已同步: {symbol} @ {book.last_update_id}")
+                return
+            except asyncio.CancelledError:
+                raise
+            except OrderBookGapError as e:
+                logger.info(f"深度快照與增量未銜接，重新獲取: {e}")
+            except Exception as e:
+                logger.warning(f"獲取 {symbol} 深度快照失敗: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def get_latest(self, symbol: str, max_age: Optional[float] = None) -> Optional[MarketData]:
+        """
+        最新行情，不等待網絡
+
+        Args:
+            symbol: 交易對
+            max_age: 允許的最長未更新時間（秒），超過時返回 None
+
+        Returns:
+            最新的 MarketData；尚未收到或已過期時為 None
+        """
+        symbol = symbol.upper()
+        if max_age is not None:
+            received_at = self._received_at.get(symbol)
+            if received_at is None or time.monotonic() - received_at > max_age:
+                return None
+        return self.latest.get(symbol)
+
+    async def updates(self, symbols: Optional[Iterable[str]] = None) -> AsyncIterator[MarketData]:
+        """
+        逐條產出行情更新，stop() 後結束
+
+        Args:
+            symbols: 只接收這些交易對，默認接收全部
+        """
+        async for item in self._iterate(self._subscribers, symbols):
+            yield item
+
+    async def klines(self, symbols: Optional[Iterable[str]] = None,
+                     closed_only: bool = True) -> AsyncIterator[Kline]:
+        """
+        逐條產出K線更新，stop() 後結束
+
+        Args:
+            symbols: 只接收這些交易對，默認接收全部
+            closed_only: 只產出已收盤的K線
+        """
+        async for kline in self._iterate(self._kline_subscribers, symbols):
+            if kline.closed or not closed_only:
+                yield kline
+
+    async def _iterate(self, subscribers: List[Tuple[Optional[Set[str]], asyncio.Queue]],
+                       symbols: Optional[Iterable[str]]):
+        symbol_filter = {symbol.upper() for symbol in symbols} if symbols is not None else None
+        entry = (symbol_filter, asyncio.Queue(maxsize=self.queue_size))
+        subscribers.append(entry)
+        try:
+            while True:
+                item = await entry[1].get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            subscribers.remove(entry)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item: Any):
+        """放入隊列，隊列已滿時丟棄最舊的一條"""
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    def _publish(self, subscribers: List[Tuple[Optional[Set[str]], asyncio.Queue]], symbol: str, item: Any):
+        for symbol_filter, queue in subscribers:
+            if symbol_filter is None or symbol in symbol_filter:
+                self._offer(queue, item)
+
+    async def _send(self, method: str, params: List[str]):
+        self._request_id += 1
+        await self._ws.send_json({'method': method, 'params': params, 'id': self._request_id})
+
+    async def _run(self):
+        """連接、訂閱、接收，斷開後退避重連"""
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with self._session.ws_connect(f"{self.ws_url}/stream", autoping=True) as ws:
+                    self._ws = ws
+                    streams = self._streams(self.symbols) + self._depth_streams(self.order_books)
+                    if streams:
+                        await self._send('SUBSCRIBE', streams)
+                    self._connected.set()
+                    logger.info(f"行情 WebSocket 已連接: {self.ws_url}")
+                    if await self._receive(ws):
+                        # 收到過行情才重置退避，避免連上即斷時快速重連
+                        delay = self.reconnect_delay
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"行情 WebSocket 連接中斷: {e}")
+            finally:
+                self._ws = None
+                self._connected.clear()
+
+            self.reconnects += 1
+            wait = delay * random.uniform(0.8, 1.2)
+            logger.info(f"{wait:.2f} 秒後重連行情 WebSocket")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _receive(self, ws: aiohttp.ClientWebSocketResponse) -> bool:
+        """
+        接收消息直到連接關閉
+
+        Returns:
+            本次連接是否收到過行情
+        """
+        received = False
+        while True:
+            try:
+                message = await ws.receive(timeout=self.receive_timeout)
+            except asyncio.TimeoutError:
+                if self.symbols or self.order_books:
+                    raise ConnectionError(f"{self.receive_timeout} 秒內沒有收到行情")
+                continue
+
+            if message.type == aiohttp.WSMsgType.TEXT:
+                received = self._handle_message(json.loads(message.data)) or received
+            elif message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                                  aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                return received
+
+    def _handle_message(self, message: Dict[str, Any]) -> bool:
+        """
+        處理一條組合流消息
+
+        Returns:
+            是否為行情消息（訂閱應答等返回 False）
+        """
+        data = message.get('data')
+        if data is None:
+            if message.get('error'):
+                logger.error(f"行情訂閱請求失敗: {message['error']}")
+            return False
+
+        event = data.get('e')
+        symbol = data.get('s')
+        if not symbol:
+            return False
+
+        if event == 'depthUpdate':
+            book = self.order_books.get(symbol)
+            if book is None:
+                return False
+            try:
+                book.apply_diff(data)
+            except OrderBookGapError:
+                pass
+            if not book.synced:
+                self._schedule_resync(symbol)
+            return True
+
+        if event == '24hrTicker':
+            changes = {
+                'price': float(data['c']),
+                'volume': float(data['v']),
+                'high_24h': float(data['h']),
+                'low_24h': float(data['l']),
+                'change_24h': float(data['P']),
+            }
+        elif event == 'bookTicker':
+            changes = {'bid': float(data['b']), 'ask': float(data['a'])}
+        elif event == 'kline':
+            k = data['k']
+            kline = Kline(
+                symbol=symbol,
+                interval=k['i'],
+                open_time=float(k['t']),
+                close_time=float(k['T']),
+                open=float(k['o']),
+                high=float(k['h']),
+                low=float(k['l']),
+                close=float(k['c']),
+                volume=float(k['v']),
+                closed=bool(k['x']),
+            )
+            self.latest_klines[symbol] = kline
+            self._publish(self._kline_subscribers, symbol, kline)
+            changes = {'price': kline.close}
+        else:
+            return False
+
+        timestamp = float(data.get('E') or data.get('T') or time.time() * 1000)
+        current = self.latest.get(symbol)
+        if current is None:
+            # 只收到買賣價時以中間價作為暫時的最新價
+            price = changes.get('price', (changes.get('bid', 0.0) + changes.get('ask', 0.0)) / 2)
+            current = MarketData(symbol=symbol, price=price, volume=0.0, timestamp=timestamp)
+        # 每次更新產生新對象，訂閱者持有的舊行情不會被修改
+        market_data = replace(current, timestamp=timestamp, **changes)
+        self.latest[symbol] = market_data
+        self._received_at[symbol] = time.monotonic()
+        self._publish(self._subscribers, symbol, market_data)
+        return True
+
+
 class BinanceInterface(ExchangeInterface):
     """Binance交易所接口"""
     
@@ -191,6 +728,63 @@ class BinanceInterface(ExchangeInterface):
             'X-MBX-APIKEY': config.api_key,
             'Content-Type': 'application/json'
         }
+        self.market_stream: Optional[BinanceMarketStream] = None
+        # 推送行情超過該時間未更新時 get_market_data 回退為 REST 請求（秒）
+        self.stream_max_age = 5.0
+
+    def _create_rate_limiter(self) -> RateLimiter:
+        """Binance U本位合約的權重、下單次數窗口和響應頭校正"""
+        return RateLimiter(
+            binance_futures_limits(self.config.rate_limit),
+            endpoint_weights=BINANCE_FUTURES_WEIGHTS,
+            order_endpoints=BINANCE_FUTURES_ORDER_ENDPOINTS,
+        )
+
+    async def start_market_stream(self, symbols: Iterable[str],
+                                  kline_interval: str = "1m") -> BinanceMarketStream:
+        """
+        啟動 WebSocket 行情訂閱，已啟動時增加訂閱的交易對
+
+        啟動後 get_market_data 直接返回推送的最新行情，不再發送 REST 請求；
+        需要逐條處理行情時使用 market_stream.updates()。
+        """
+        if self.market_stream is None:
+            ws_url = self.config.ws_url or (
+                BINANCE_TESTNET_WS_URL if self.config.testnet else BINANCE_WS_URL
+            )
+            self.market_stream = BinanceMarketStream(
+                ws_url, symbols, kline_interval, order_books=self.order_books
+            )
+            await self.market_stream.start()
+        else:
+            await self.market_stream.subscribe(symbols)
+        return self.market_stream
+
+    async def start_order_book(self, symbols: Iterable[str]) -> Dict[str, OrderBook]:
+        """
+        維護交易對的本地訂單簿
+
+        通過行情 WebSocket 訂閱增量深度，用深度快照同步，結果在 order_books 中。
+        """
+        stream = await self.start_market_stream(())
+        await stream.subscribe_depth(symbols, self.get_depth_snapshot)
+        return self.order_books
+
+    async def stop_order_book(self, symbols: Iterable[str]):
+        """取消深度訂閱，交易對的訂單簿從 order_books 中刪除"""
+        if self.market_stream is not None:
+            await self.market_stream.unsubscribe_depth(symbols)
+
+    async def get_depth_snapshot(self, symbol: str, limit: int = 1000) -> Dict[str, Any]:
+        """獲取深度快照"""
+        return await self._make_request('GET', '/fapi/v1/depth', params={'symbol': symbol, 'limit': limit})
+
+    async def disconnect(self):
+        """斷開連接並停止行情訂閱"""
+        if self.market_stream is not None:
+            await self.market_stream.stop()
+            self.market_stream = None
+        await super().disconnect()
     
     async def get_account_balance(self) -> List[BalanceInfo]:
         """獲取賬戶餘額"""
@@ -237,27 +831,63 @@ class BinanceInterface(ExchangeInterface):
             logger.error(f"獲取持倉失敗: {e}")
             return []
     
+    def get_streamed_market_data(self, symbol: str) -> Optional[MarketData]:
+        """WebSocket 推送的新鮮行情"""
+        if self.market_stream is None:
+            return None
+        return self.market_stream.get_latest(symbol, max_age=self.stream_max_age)
+
     async def get_market_data(self, symbol: str) -> MarketData:
-        """獲取市場數據"""
+        """獲取市場數據，有新鮮的推送行情時直接返回"""
+        latest = self.get_streamed_market_data(symbol)
+        if latest is not None:
+            return latest
+
         try:
             # 獲取價格數據
             ticker_result = await self._make_request('GET', '/fapi/v1/ticker/24hr', 
                                                    params={'symbol': symbol})
-            
-            return MarketData(
-                symbol=symbol,
-                price=float(ticker_result['lastPrice']),
-                volume=float(ticker_result['volume']),
-                timestamp=float(ticker_result['closeTime']),
-                bid=float(ticker_result['bidPrice']),
-                ask=float(ticker_result['askPrice']),
-                high_24h=float(ticker_result['highPrice']),
-                low_24h=float(ticker_result['lowPrice']),
-                change_24h=float(ticker_result['priceChangePercent'])
-            )
+            return self._parse_ticker(ticker_result)
         except Exception as e:
             logger.error(f"獲取市場數據失敗: {e}")
             raise
+
+    async def get_market_data_bulk(self, symbols: Iterable[str]) -> Dict[str, MarketData]:
+        """
+        批量獲取24小時行情
+
+        全量行情接口的權重（40）相當於40個單交易對請求，交易對較少時逐個請求更省權重；
+        逐個請求的總權重不低於全量接口時一次請求全部交易對，返回結果包含所有交易對。
+        """
+        symbols = list(symbols)
+        endpoint = '/fapi/v1/ticker/24hr'
+        per_symbol_weight = sum(self.rate_limiter.weight(endpoint, {'symbol': symbol}) for symbol in symbols)
+        if per_symbol_weight < self.rate_limiter.weight(endpoint):
+            return await super().get_market_data_bulk(symbols)
+
+        try:
+            tickers = await self._make_request('GET', endpoint)
+            return {ticker['symbol']: self._parse_ticker(ticker) for ticker in tickers}
+        except Exception as e:
+            logger.error(f"批量獲取市場數據失敗: {e}")
+            raise
+
+    @staticmethod
+    def _parse_ticker(ticker: Dict[str, Any]) -> MarketData:
+        """解析24小時行情，合約行情不含買賣價時 bid/ask 為 None"""
+        bid = ticker.get('bidPrice')
+        ask = ticker.get('askPrice')
+        return MarketData(
+            symbol=ticker['symbol'],
+            price=float(ticker['lastPrice']),
+            volume=float(ticker['volume']),
+            timestamp=float(ticker['closeTime']),
+            bid=float(bid) if bid is not None else None,
+            ask=float(ask) if ask is not None else None,
+            high_24h=float(ticker['highPrice']),
+            low_24h=float(ticker['lowPrice']),
+            change_24h=float(ticker['priceChangePercent'])
+        )
     
     async def place_order(self, order: Order) -> Dict[str, Any]:
         """下單"""
@@ -273,7 +903,10 @@ class BinanceInterface(ExchangeInterface):
             if order.type == OrderType.LIMIT and order.price:
                 params['price'] = str(order.price)
             
-            result = await self._make_request('POST', '/fapi/v1/order', params=params, signed=True)
+            # 止損單與撤單同屬緊急請求，不排在普通新訂單之後
+            priority = RequestPriority.CRITICAL if order.type == OrderType.STOP_LOSS else RequestPriority.HIGH
+            result = await self._make_request('POST', '/fapi/v1/order', params=params, signed=True,
+                                              priority=priority)
             
             # 更新訂單狀態
             order.exchange_order_id = result['orderId']
@@ -467,12 +1100,235 @@ class MockExchangeInterface(ExchangeInterface):
             )
 
 
+@dataclass
+class MarketDataCacheStats:
+    """行情緩存統計"""
+    hits: int = 0  # 緩存未過期直接返回
+    misses: int = 0  # 沒有緩存
+    expired: int = 0  # 緩存已過期，需要刷新
+    streamed: int = 0  # 返回推送行情
+    stale_served: int = 0  # 刷新失敗時返回過期緩存
+    refreshes: int = 0  # 發出的刷新次數
+    refresh_errors: int = 0
+    coalesced: int = 0  # 等待進行中的刷新而不是另發請求
+    symbols_refreshed: int = 0  # 刷新得到的交易對總數
+    unwatched: int = 0  # 長時間未讀取而停止刷新的交易對數
+    failures: int = 0  # 沒有取得行情的交易對讀取次數
+    served: int = 0  # 從緩存返回的行情數
+    served_age_total: float = 0.0  # 返回的緩存行情的累計存在時間（秒）
+    served_age_max: float = 0.0
+
+
+class MarketDataCache:
+    """
+    多交易對行情緩存
+
+    讀取時緩存未過期直接返回；過期或沒有緩存時為所有關注的交易對發起一次批量刷新，
+    同一時刻只有一個刷新在進行，併發的讀取等待同一個刷新的結果。
+    交易所有新鮮的推送行情時優先返回推送行情。
+    超過 idle_ttl 未被讀取的交易對不再關注，其緩存一併刪除。
+    """
+
+    def __init__(self, exchange: ExchangeInterface, ttl: float = 1.0, max_stale: float = 30.0,
+                 idle_ttl: float = 300.0):
+        """
+        初始化行情緩存
+
+        Args:
+            exchange: 交易所接口
+            ttl: 緩存有效期（秒）
+            max_stale: 刷新失敗時仍可返回的最長緩存時間（秒）
+            idle_ttl: 交易對超過該時間未被讀取時停止刷新（秒）
+        """
+        self.exchange = exchange
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.idle_ttl = idle_ttl
+        # 關注的交易對及其最近一次被讀取的時間
+        self.watched: Dict[str, float] = {}
+        self.stats = MarketDataCacheStats()
+        self._entries: Dict[str, Tuple[MarketData, float]] = {}
+        self._refreshing: Optional[asyncio.Task] = None
+
+    async def get(self, symbol: str) -> MarketData:
+        """
+        獲取單個交易對的行情
+
+        Raises:
+            KeyError: 交易所沒有返回該交易對的行情
+            Exception: 刷新失敗且沒有可用的過期緩存時為刷新的異常
+        """
+        symbol = symbol.upper()
+        result, errors = await self._lookup([symbol])
+        if symbol in errors:
+            raise errors[symbol]
+        return result[symbol]
+
+    async def get_many(self, symbols: Iterable[str]) -> Dict[str, MarketData]:
+        """
+        獲取多個交易對的行情，最多發起一次批量刷新
+
+        沒有取得行情的交易對記錄警告並從結果中省略，不影響其他交易對。
+        """
+        result, errors = await self._lookup(symbols)
+        for symbol, error in errors.items():
+            logger.warning(f"獲取 {symbol} 市場數據失敗: {error}")
+        return result
+
+    async def _lookup(self, symbols: Iterable[str]) -> Tuple[Dict[str, MarketData], Dict[str, Exception]]:
+        """
+        讀取行情
+
+        Returns:
+            (取得的行情, 沒有取得行情的交易對及原因)
+        """
+        symbols = [symbol.upper() for symbol in symbols]
+        now = time.monotonic()
+        self._expire_watched(now)
+        for symbol in symbols:
+            self.watched[symbol] = now
+
+        result: Dict[str, MarketData] = {}
+        errors: Dict[str, Exception] = {}
+        refresh: List[str] = []
+        for symbol in symbols:
+            streamed = self.exchange.get_streamed_market_data(symbol)
+            if streamed is not None:
+                self.stats.streamed += 1
+                result[symbol] = streamed
+                continue
+            entry = self._entries.get(symbol)
+            if entry is None:
+                self.stats.misses += 1
+                refresh.append(symbol)
+            elif now - entry[1] > self.ttl:
+                self.stats.expired += 1
+                refresh.append(symbol)
+            else:
+                self.stats.hits += 1
+                result[symbol] = self._serve(entry, now)
+
+        if refresh:
+            error: Optional[Exception] = None
+            try:
+                await self.refresh(refresh)
+            except Exception as e:
+                error = e
+            now = time.monotonic()
+            for symbol in refresh:
+                entry = self._entries.get(symbol)
+                if entry is None or now - entry[1] > self.max_stale:
+                    self.stats.failures += 1
+                    errors[symbol] = error if error is not None else KeyError(f"交易所沒有返回 {symbol} 的行情")
+                    continue
+                if error is not None or now - entry[1] > self.ttl:
+                    self.stats.stale_served += 1
+                result[symbol] = self._serve(entry, now)
+        return result, errors
+
+    def _expire_watched(self, now: float):
+        """
+        停止關注超過 idle_ttl 未被讀取的交易對並刪除其緩存
+
+        全量接口順帶返回的未關注交易對，緩存超過 max_stale 後同樣刪除。
+        """
+        idle = [symbol for symbol, read_at in self.watched.items() if now - read_at > self.idle_ttl]
+        for symbol in idle:
+            del self.watched[symbol]
+            self._entries.pop(symbol, None)
+        self.stats.unwatched += len(idle)
+
+        expired = [
+            symbol for symbol, (_, fetched_at) in self._entries.items()
+            if symbol not in self.watched and now - fetched_at > self.max_stale
+        ]
+        for symbol in expired:
+            del self._entries[symbol]
+
+    def _serve(self, entry: Tuple[MarketData, float], now: float) -> MarketData:
+        age = now - entry[1]
+        self.stats.served += 1
+        self.stats.served_age_total += age
+        self.stats.served_age_max = max(self.stats.served_age_max, age)
+        return entry[0]
+
+    async def refresh(self, symbols: Iterable[str] = ()):
+        """
+        刷新關注的交易對和 symbols
+
+        已有刷新在進行時等待它完成；其結果仍不包含所需交易對時再發起一次刷新。
+        """
+        needed = {symbol.upper() for symbol in symbols}
+        if self._refreshing is not None:
+            self.stats.coalesced += 1
+            try:
+                await asyncio.shield(self._refreshing)
+            except Exception:
+                pass
+            if all(symbol in self._entries and self._fresh(symbol) for symbol in needed):
+                return
+            if self._refreshing is not None:
+                # 另一個讀取已經發起了新的刷新
+                self.stats.coalesced += 1
+                await asyncio.shield(self._refreshing)
+                return
+
+        task = asyncio.ensure_future(self._fetch(needed.union(self.watched)))
+        self._refreshing = task
+        try:
+            await asyncio.shield(task)
+        finally:
+            if self._refreshing is task:
+                self._refreshing = None
+
+    def _fresh(self, symbol: str) -> bool:
+        return time.monotonic() - self._entries[symbol][1] <= self.ttl
+
+    async def _fetch(self, symbols: Set[str]):
+        self.stats.refreshes += 1
+        try:
+            market_data = await self.exchange.get_market_data_bulk(sorted(symbols))
+        except Exception:
+            self.stats.refresh_errors += 1
+            raise
+        fetched_at = time.monotonic()
+        for symbol, data in market_data.items():
+            self._entries[symbol] = (data, fetched_at)
+        self.stats.symbols_refreshed += len(market_data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率和緩存存在時間"""
+        stats = self.stats
+        lookups = stats.hits + stats.misses + stats.expired
+        return {
+            'hits': stats.hits,
+            'misses': stats.misses,
+            'expired': stats.expired,
+            'streamed': stats.streamed,
+            'stale_served': stats.stale_served,
+            'hit_rate': stats.hits / lookups if lookups else 0.0,
+            'refreshes': stats.refreshes,
+            'refresh_errors': stats.refresh_errors,
+            'coalesced': stats.coalesced,
+            'failures': stats.failures,
+            'unwatched': stats.unwatched,
+            'symbols_per_refresh': stats.symbols_refreshed / stats.refreshes if stats.refreshes else 0.0,
+            'avg_served_age': stats.served_age_total / stats.served if stats.served else 0.0,
+            'max_served_age': stats.served_age_max,
+            'cached_symbols': len(self._entries),
+            'watched_symbols': len(self.watched),
+        }
+
+
 class ExchangeManager:
     """交易所管理器"""
     
-    def __init__(self):
+    def __init__(self, market_data_ttl: float = 1.0):
         self.exchanges: Dict[str, ExchangeInterface] = {}
         self.default_exchange: Optional[str] = None
+        # 每個交易所一個共享的行情緩存，所有協調器和風控讀取同一份行情
+        self.market_data_ttl = market_data_ttl
+        self.market_data_caches: Dict[str, MarketDataCache] = {}
     
     def add_exchange(self, name: str, exchange: ExchangeInterface, is_default: bool = False):
         """添加交易所"""
@@ -487,6 +1343,30 @@ class ExchangeManager:
             name = self.default_exchange
         return self.exchanges.get(name) if name else None
     
+    def get_market_data_cache(self, name: Optional[str] = None) -> Optional[MarketDataCache]:
+        """獲取交易所的共享行情緩存，首次使用時創建"""
+        if name is None:
+            name = self.default_exchange
+        exchange = self.exchanges.get(name) if name else None
+        if exchange is None:
+            return None
+        cache = self.market_data_caches.get(name)
+        if cache is None or cache.exchange is not exchange:
+            cache = self.market_data_caches[name] = MarketDataCache(exchange, ttl=self.market_data_ttl)
+        return cache
+
+    async def get_market_data(self, symbol: str, exchange: Optional[str] = None) -> MarketData:
+        """
+        通過共享緩存獲取市場數據
+
+        Raises:
+            RuntimeError: 沒有可用的交易所
+        """
+        cache = self.get_market_data_cache(exchange)
+        if cache is None:
+            raise RuntimeError("未找到可用的交易所")
+        return await cache.get(symbol)
+
     async def connect_all(self):
         """連接所有交易所"""
         for name, exchange in self.exchanges.items():
@@ -534,4 +1414,12 @@ class ExchangeManager:
             except Exception as e:
                 logger.error(f"獲取 {name} 持倉失敗: {e}")
                 positions[name] = []
-        return positions
\ No newline at end of file
+        return positions
+
+    def get_market_data_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """獲取所有交易所的行情緩存統計"""
+        return {name: cache.get_stats() for name, cache in self.market_data_caches.items()}
+
+    def get_rate_limit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """獲取所有交易所的限流統計"""
+        return {name: exchange.get_rate_limit_stats() for name, exchange in self.exchanges.items()}
@@ -16,6 +16,7 @@ import numpy as np
 
 from ..strategies.base import StrategySignal, SignalType
 from ..strategies.dynamic_position_strategy import DynamicPositionStrategy
+from .order_book import OrderBook
 
 logger = logging.getLogger(__name__)
 
@@ -166,6 +167,9 @@ class ExecutionEngine:
             'quantity_precision': 4,  # 數量精度
         }
         
+        # 交易對的本地訂單簿，已同步時按實際深度計算訂單價格
+        self.order_books: Dict[str, OrderBook] = {}
+        
         # 風險控制
         self.risk_limits = {
             'max_position_size': 0.5,  # 最大持倉佔比
@@ -264,7 +268,7 @@ class ExecutionEngine:
                 return None
             
             # 計算訂單價格
-            order_price = self._calculate_order_price(signal, current_price)
+            order_price = self._calculate_order_price(signal, current_price, quantity)
             
             # 確定杠桿倍數
             leverage = self._calculate_leverage(signal)
@@ -323,15 +327,26 @@ class ExecutionEngine:
         
         return 0.0
     
-    def _calculate_order_price(self, signal: StrategySignal, current_price: float) -> float:
+    def _calculate_order_price(self, signal: StrategySignal, current_price: float,
+                               quantity: Optional[float] = None) -> float:
         """計算訂單價格"""
+        is_buy = signal.signal_type == SignalType.BUY
         # 市價單使用當前價格
-        if signal.signal_type == SignalType.BUY:
+        if is_buy:
             # 買入時稍微高於當前價格以確保成交
-            return current_price * (1 + self.execution_config['max_slippage'])
+            limit_price = current_price * (1 + self.execution_config['max_slippage'])
         else:
             # 賣出時稍微低於當前價格以確保成交
-            return current_price * (1 - self.execution_config['max_slippage'])
+            limit_price = current_price * (1 - self.execution_config['max_slippage'])
+        
+        # 訂單簿已同步且深度足夠時，使用吃完該數量需要的最差價格，但不超過最大滑點
+        book = self.order_books.get(signal.symbol)
+        if book is not None and book.synced and quantity:
+            fill_price = book.fill_price('buy' if is_buy else 'sell', quantity)
+            if fill_price is not None:
+                return min(fill_price, limit_price) if is_buy else max(fill_price, limit_price)
+        
+        return limit_price
     
     def _calculate_leverage(self, signal: StrategySignal) -> float:
         """計算杠桿倍數"""
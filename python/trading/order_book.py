@@ -0,0 +1,295 @@
+"""
+本地訂單簿
+
+用 REST 深度快照建立每個交易對的 L2 訂單簿，再用帶序號的增量深度推送保持最新。
+增量與快照或上一條增量之間缺少序號時拋出 OrderBookGapError，訂單簿回到未同步狀態，
+之後的增量先緩存，獲取新快照後從緩存中接續。
+
+同步規則（Binance U本位合約，增量帶 pu 字段）：
+    - 丟棄 u < 快照 lastUpdateId 的增量
+    - 快照後的第一條增量必須滿足 U <= lastUpdateId <= u，或 pu 恰好等於 lastUpdateId
+    - 之後每條增量的 pu 必須等於上一條增量的 u
+現貨增量沒有 pu 字段，第一條增量滿足 U <= lastUpdateId + 1 <= u，之後 U 等於上一條 u + 1。
+
+每一側的價位保存在按價格排序的數組中，最優價位在數組末尾：買方按價格升序，
+賣方按價格降序。更新用二分查找定位，成交活躍的價位靠近最優價，插入和刪除只需移動
+末尾少量元素。
+"""
+
+import logging
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 未同步時緩存的增量條數上限
+DEFAULT_MAX_BUFFER = 10000
+
+
+class OrderBookGapError(ValueError):
+    """增量序號不連續，需要重新獲取快照"""
+
+
+class BookSide:
+    """訂單簿的一側"""
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        # 排序鍵：買方為價格，賣方為負價格，最優價位都在末尾
+        self._keys: List[float] = []
+        self._quantities: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _key(self, price: float) -> float:
+        return price if self.is_bid else -price
+
+    def _price(self, key: float) -> float:
+        return key if self.is_bid else -key
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._quantities.clear()
+
+    def update(self, price: float, quantity: float) -> None:
+        """設置價位的數量，數量為0時刪除該價位"""
+        key = self._key(price)
+        keys = self._keys
+        index = bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            if quantity > 0:
+                self._quantities[index] = quantity
+            else:
+                del keys[index]
+                del self._quantities[index]
+        elif quantity > 0:
+            keys.insert(index, key)
+            self._quantities.insert(index, quantity)
+
+    def load(self, levels: Iterable[Sequence[Any]]) -> None:
+        """用快照的價位替換全部內容"""
+        book = {}
+        for price, quantity in levels:
+            quantity = float(quantity)
+            if quantity > 0:
+                book[self._key(float(price))] = quantity
+        self._keys = sorted(book)
+        self._quantities = [book[key] for key in self._keys]
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        """最優價位 (價格, 數量)"""
+        if not self._keys:
+            return None
+        return self._price(self._keys[-1]), self._quantities[-1]
+
+    def top(self, n: int) -> List[Tuple[float, float]]:
+        """從最優價開始的 n 檔"""
+        keys = self._keys[-n:] if n > 0 else []
+        quantities = self._quantities[-n:] if n > 0 else []
+        return [(self._price(key), quantity) for key, quantity in zip(reversed(keys), reversed(quantities))]
+
+    def depth(self, size: float) -> Optional[Tuple[float, float]]:
+        """
+        從最優價開始吃掉 size 數量
+
+        Returns:
+            (成交均價, 最差成交價)；深度不足時為 None
+        """
+        if size <= 0:
+            return None
+        remaining = size
+        notional = 0.0
+        keys = self._keys
+        quantities = self._quantities
+        for index in range(len(keys) - 1, -1, -1):
+            price = self._price(keys[index])
+            filled = min(remaining, quantities[index])
+            notional += filled * price
+            remaining -= filled
+            if remaining <= 0:
+                return notional / size, price
+        return None
+
+
+class OrderBook:
+    """單個交易對的 L2 訂單簿"""
+
+    def __init__(self, symbol: str, max_buffer: int = DEFAULT_MAX_BUFFER):
+        """
+        初始化訂單簿
+
+        Args:
+            symbol: 交易對
+            max_buffer: 未同步時緩存的增量條數上限
+        """
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id: Optional[int] = None
+        self.event_time: Optional[int] = None
+        self.synced = False
+        self.updates = 0  # 已應用的增量數
+        self.gaps = 0  # 檢測到的序號缺口數
+        self.snapshots = 0  # 已應用的快照數
+        self._awaiting_first = False
+        self._buffer: Deque[Mapping[str, Any]] = deque(maxlen=max_buffer)
+
+    def apply_snapshot(self, snapshot: Mapping[str, Any]) -> None:
+        """
+        應用深度快照並接續緩存的增量
+
+        Args:
+            snapshot: 深度接口的響應，包含 lastUpdateId、bids、asks
+
+        Raises:
+            OrderBookGapError: 緩存的增量與快照之間有缺口，需要更新的快照
+        """
+        self.bids.load(snapshot['bids'])
+        self.asks.load(snapshot['asks'])
+        self.last_update_id = int(snapshot['lastUpdateId'])
+        self.event_time = snapshot.get('E')
+        self.synced = True
+        self._awaiting_first = True
+        self.snapshots += 1
+
+        buffered = list(self._buffer)
+        self._buffer.clear()
+        for index, event in enumerate(buffered):
+            try:
+                self.apply_diff(event)
+            except OrderBookGapError:
+                # 缺口之後的增量留給下一個快照
+                self._buffer.extend(buffered[index + 1:])
+                raise
+        logger.debug(f"訂單簿已同步: {self.symbol} @ {self.last_update_id}, 接續 {len(buffered)} 條增量")
+
+    def apply_diff(self, event: Mapping[str, Any]) -> bool:
+        """
+        應用一條增量深度
+
+        Args:
+            event: 增量深度推送，包含 U、u、b、a，合約推送另有 pu
+
+        Returns:
+            是否已應用；未同步時緩存，早於快照的增量直接丟棄
+
+        Raises:
+            OrderBookGapError: 增量序號不連續，訂單簿回到未同步狀態
+        """
+        if not self.synced:
+            self._buffer.append(event)
+            return False
+
+        first_id = event['U']
+        final_id = event['u']
+        last_id = self.last_update_id
+        if final_id < last_id:
+            return False
+
+        previous_final = event.get('pu')
+        if self._awaiting_first:
+            expected = last_id if previous_final is not None else last_id + 1
+            if not first_id <= expected <= final_id and previous_final != last_id:
+                self._gap(event, f"首條增量 [{first_id}, {final_id}] 未覆蓋快照 {last_id}")
+        elif previous_final is not None:
+            if previous_final != last_id:
+                self._gap(event, f"增量 pu={previous_final}，上一條 u={last_id}")
+        elif first_id != last_id + 1:
+            self._gap(event, f"增量 U={first_id}，上一條 u={last_id}")
+
+        update_bid = self.bids.update
+        for price, quantity in event['b']:
+            update_bid(float(price), float(quantity))
+        update_ask = self.asks.update
+        for price, quantity in event['a']:
+            update_ask(float(price), float(quantity))
+
+        self.last_update_id = final_id
+        self.event_time = event.get('E', self.event_time)
+        self._awaiting_first = False
+        self.updates += 1
+        return True
+
+    def _gap(self, event: Mapping[str, Any], reason: str) -> None:
+        self.gaps += 1
+        self.reset()
+        self._buffer.append(event)
+        logger.warning(f"訂單簿序號缺口，需要重新同步: {self.symbol}: {reason}")
+        raise OrderBookGapError(f"{self.symbol}: {reason}")
+
+    def reset(self) -> None:
+        """清空訂單簿，回到未同步狀態"""
+        self.bids.clear()
+        self.asks.clear()
+        self.synced = False
+        self._awaiting_first = False
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        best = self.bids.best()
+        return best[0] if best else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        best = self.asks.best()
+        return best[0] if best else None
+
+    @property
+    def spread(self) -> Optional[float]:
+        """買賣價差"""
+        bid, ask = self.best_bid, self.best_ask
+        return ask - bid if bid is not None and ask is not None else None
+
+    @property
+    def mid_price(self) -> Optional[float]:
+        bid, ask = self.best_bid, self.best_ask
+        return (ask + bid) / 2 if bid is not None and ask is not None else None
+
+    def top(self, n: int = 5) -> Dict[str, List[Tuple[float, float]]]:
+        """買賣各 n 檔"""
+        return {'bids': self.bids.top(n), 'asks': self.asks.top(n)}
+
+    def vwap(self, side: str, size: float) -> Optional[float]:
+        """
+        按當前深度成交 size 數量的均價
+
+        Args:
+            side: buy 吃賣方深度，sell 吃買方深度
+            size: 數量
+
+        Returns:
+            成交均價；深度不足時為 None
+        """
+        result = self._book_side(side).depth(size)
+        return result[0] if result else None
+
+    def fill_price(self, side: str, size: float) -> Optional[float]:
+        """按當前深度成交 size 數量需要的最差價格，深度不足時為 None"""
+        result = self._book_side(side).depth(size)
+        return result[1] if result else None
+
+    def _book_side(self, side: str) -> BookSide:
+        side = side.lower()
+        if side == 'buy':
+            return self.asks
+        if side == 'sell':
+            return self.bids
+        raise ValueError(f"無效的方向: {side}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'symbol': self.symbol,
+            'synced': self.synced,
+            'last_update_id': self.last_update_id,
+            'bid_levels': len(self.bids),
+            'ask_levels': len(self.asks),
+            'best_bid': self.best_bid,
+            'best_ask': self.best_ask,
+            'spread': self.spread,
+            'updates': self.updates,
+            'gaps': self.gaps,
+            'snapshots': self.snapshots,
+            'buffered': len(self._buffer),
+        }
@@ -0,0 +1,464 @@
+"""
+交易所請求限流
+
+交易所按時間窗口限制請求權重和下單次數，例如 Binance U本位合約每分鐘 2400 權重、
+每 10 秒 300 個訂單、每分鐘 1200 個訂單，不同接口的權重也不同。
+限流器為每個窗口維護一個令牌桶，請求按接口權重和是否下單扣減令牌，
+令牌不足時按到達順序排隊等待，而不是直接發出請求後被交易所拒絕。
+
+交易所在響應頭中返回已使用的權重和訂單數（例如 X-MBX-USED-WEIGHT-1M），
+限流器據此校正剩餘額度，同一 IP 上其他進程的消耗也會被計入。
+收到 429（請求過多）或 418（IP 被封禁）時按 Retry-After 暫停所有請求。
+
+請求分為三個優先級通道：撤單和止損單為 CRITICAL，新訂單為 HIGH，行情和賬戶輪詢為 LOW。
+高優先級的請求總是先於低優先級的請求獲得額度，並且低優先級請求不能動用每個窗口
+預留的一部分額度，因此額度耗盡時緊急撤單仍然可以立即發出。LOW 通道排隊過長時
+新請求直接被拒絕，排隊超過期限的請求被丟棄，過期的行情數據沒有必要再請求。
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 按請求數計算的窗口
+REQUESTS = "REQUESTS"
+# 按接口權重計算的窗口
+REQUEST_WEIGHT = "REQUEST_WEIGHT"
+# 按下單次數計算的窗口
+ORDERS = "ORDERS"
+
+# 收到 429/418 但沒有 Retry-After 時的暫停時間（秒）
+DEFAULT_RETRY_AFTER = {429: 1.0, 418: 60.0}
+
+# 接口權重：固定值，或根據請求參數計算權重的函數
+EndpointWeight = Union[int, Callable[[Mapping[str, Any]], int]]
+
+# 每個通道保留的等待時間樣本數，用於計算分位數
+LATENCY_SAMPLES = 1024
+
+
+class RequestPriority(Enum):
+    """請求優先級，數值越小越優先"""
+    CRITICAL = 0  # 撤單、止損單
+    HIGH = 1  # 新訂單
+    LOW = 2  # 行情、持倉、餘額等輪詢
+
+
+# 每個通道不能動用的額度比例，留給更高優先級的請求
+DEFAULT_LANE_RESERVE = {
+    RequestPriority.CRITICAL: 0.0,
+    RequestPriority.HIGH: 0.05,
+    RequestPriority.LOW: 0.2,
+}
+
+# 每個通道的最長排隊時間（秒），超過後丟棄請求，None 表示不限
+DEFAULT_LANE_MAX_WAIT: Dict[RequestPriority, Optional[float]] = {
+    RequestPriority.CRITICAL: None,
+    RequestPriority.HIGH: None,
+    RequestPriority.LOW: 5.0,
+}
+
+# 每個通道的最大排隊數，排滿後拒絕新請求，None 表示不限
+DEFAULT_LANE_MAX_QUEUED: Dict[RequestPriority, Optional[int]] = {
+    RequestPriority.CRITICAL: None,
+    RequestPriority.HIGH: None,
+    RequestPriority.LOW: 100,
+}
+
+
+class RequestDroppedError(RuntimeError):
+    """請求在發出前被限流器丟棄"""
+
+    def __init__(self, reason: str, priority: RequestPriority, message: str):
+        super().__init__(message)
+        self.reason = reason  # shed：排隊已滿；expired：排隊超過期限
+        self.priority = priority
+
+
+@dataclass
+class RateLimit:
+    """一個限流窗口"""
+    kind: str  # REQUESTS、REQUEST_WEIGHT 或 ORDERS
+    interval: float  # 窗口長度（秒）
+    limit: int  # 窗口內允許的總量
+    header: Optional[str] = None  # 交易所返回該窗口已用量的響應頭
+
+    def __post_init__(self):
+        if self.interval <= 0 or self.limit <= 0:
+            raise ValueError(f"限流窗口的長度和額度必須大於0: {self}")
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    容量等於窗口額度，令牌按 額度/窗口長度 的速度勻速補充，
+    允許突發用完整個窗口的額度，長期速率不超過限額。
+    """
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self.capacity = float(limit.limit)
+        self.rate = limit.limit / limit.interval
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost: float, now: float, reserve: float = 0.0) -> float:
+        """
+        扣減 cost 個令牌前需要等待的時間（秒）
+
+        Args:
+            cost: 消耗的令牌數
+            now: 當前時間
+            reserve: 扣減後必須保留的容量比例
+        """
+        self.refill(now)
+        if cost <= 0:
+            return 0.0
+        # 超過容量的請求只能等桶滿後發出
+        needed = min(cost + reserve * self.capacity, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, cost: float) -> None:
+        self.tokens -= min(cost, self.capacity)
+
+    def sync(self, used: float) -> None:
+        """按交易所報告的已用量校正，只會減少剩餘令牌"""
+        self.tokens = min(self.tokens, self.capacity - used)
+
+
+@dataclass
+class LaneStats:
+    """一個優先級通道的統計"""
+    requests: int = 0
+    delayed: int = 0  # 需要等待的請求數
+    total_wait: float = 0.0  # 累計等待時間（秒）
+    max_wait: float = 0.0
+    shed: int = 0  # 排隊已滿被拒絕的請求數
+    expired: int = 0  # 排隊超過期限被丟棄的請求數
+    coalesced: int = 0  # 合併到相同的進行中請求的次數
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    def to_dict(self) -> Dict[str, Any]:
+        waits = sorted(self.waits)
+
+        def percentile(percent: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(len(waits) * percent / 100))]
+
+        return {
+            'requests': self.requests,
+            'delayed': self.delayed,
+            'total_wait': self.total_wait,
+            'max_wait': self.max_wait,
+            'p50_wait': percentile(50),
+            'p99_wait': percentile(99),
+            'shed': self.shed,
+            'expired': self.expired,
+            'coalesced': self.coalesced,
+        }
+
+
+class _Waiter:
+    """排隊中的請求"""
+
+    __slots__ = ('costs', 'event')
+
+    def __init__(self, costs: List[float]):
+        self.costs = costs
+        self.event = asyncio.Event()
+
+
+class RateLimiter:
+    """
+    按權重和窗口限流的請求調度器
+
+    每個優先級一個先進先出的隊列，只有最高優先級非空隊列的隊首請求可以扣減令牌。
+    同一通道內權重大的請求不會被持續到達的小請求餓死，等待順序與到達順序一致；
+    更高優先級的請求到達時立即成為隊首，不需要等待正在等額度的低優先級請求。
+    """
+
+    def __init__(
+        self,
+        limits: Iterable[RateLimit],
+        endpoint_weights: Optional[Dict[str, EndpointWeight]] = None,
+        order_endpoints: Iterable[Tuple[str, str]] = (),
+        default_weight: int = 1,
+        lane_reserve: Optional[Dict[RequestPriority, float]] = None,
+        lane_max_wait: Optional[Dict[RequestPriority, Optional[float]]] = None,
+        lane_max_queued: Optional[Dict[RequestPriority, Optional[int]]] = None,
+    ):
+        """
+        初始化限流器
+
+        Args:
+            limits: 限流窗口
+            endpoint_weights: 接口路徑到權重的映射，未列出的接口使用 default_weight
+            order_endpoints: 計入下單次數的 (HTTP方法, 接口路徑)
+            default_weight: 默認權重
+            lane_reserve: 每個通道不能動用的額度比例
+            lane_max_wait: 每個通道的最長排隊時間（秒）
+            lane_max_queued: 每個通道的最大排隊數
+        """
+        self.buckets: List[TokenBucket] = [TokenBucket(limit) for limit in limits]
+        self.endpoint_weights = dict(endpoint_weights or {})
+        self.order_endpoints = {(method.upper(), endpoint) for method, endpoint in order_endpoints}
+        self.default_weight = default_weight
+        self.lane_reserve = {**DEFAULT_LANE_RESERVE, **(lane_reserve or {})}
+        self.lane_max_wait = {**DEFAULT_LANE_MAX_WAIT, **(lane_max_wait or {})}
+        self.lane_max_queued = {**DEFAULT_LANE_MAX_QUEUED, **(lane_max_queued or {})}
+        self.lane_stats = {priority: LaneStats() for priority in RequestPriority}
+        self.throttled = 0  # 收到 429 的次數
+        self.banned = 0  # 收到 418 的次數
+        self.paused_until = 0.0
+        self._lanes: Dict[RequestPriority, Deque[_Waiter]] = {
+            priority: deque() for priority in RequestPriority
+        }
+
+    def priority_for(self, method: str, endpoint: str) -> RequestPriority:
+        """請求的默認優先級：撤單為 CRITICAL，下單為 HIGH，其餘為 LOW"""
+        method = method.upper()
+        if method == 'DELETE' and any(endpoint == e for _, e in self.order_endpoints):
+            return RequestPriority.CRITICAL
+        if (method, endpoint) in self.order_endpoints:
+            return RequestPriority.HIGH
+        return RequestPriority.LOW
+
+    def weight(self, endpoint: str, params: Optional[Mapping[str, Any]] = None) -> int:
+        """接口權重"""
+        weight = self.endpoint_weights.get(endpoint, self.default_weight)
+        if callable(weight):
+            weight = weight(params or {})
+        return int(weight)
+
+    def costs(self, method: str, endpoint: str,
+              params: Optional[Mapping[str, Any]] = None) -> List[float]:
+        """請求在每個窗口上的消耗，與 buckets 一一對應"""
+        weight = self.weight(endpoint, params)
+        is_order = (method.upper(), endpoint) in self.order_endpoints
+        costs = []
+        for bucket in self.buckets:
+            kind = bucket.limit.kind
+            if kind == REQUEST_WEIGHT:
+                costs.append(float(weight))
+            elif kind == ORDERS:
+                costs.append(1.0 if is_order else 0.0)
+            else:
+                costs.append(1.0)
+        return costs
+
+    async def acquire(self, method: str, endpoint: str,
+                      params: Optional[Mapping[str, Any]] = None,
+                      priority: Optional[RequestPriority] = None,
+                      max_wait: Optional[float] = None) -> float:
+        """
+        等待額度並扣減
+
+        Args:
+            method: HTTP 方法
+            endpoint: 接口路徑
+            params: 請求參數，用於計算權重
+            priority: 優先級，默認按 priority_for 判斷
+            max_wait: 最長排隊時間（秒），默認使用通道的設置
+
+        Returns:
+            等待時間（秒）
+
+        Raises:
+            RequestDroppedError: 通道排隊已滿或排隊超過期限
+        """
+        if priority is None:
+            priority = self.priority_for(method, endpoint)
+        if max_wait is None:
+            max_wait = self.lane_max_wait.get(priority)
+        lane = self._lanes[priority]
+        stats = self.lane_stats[priority]
+
+        max_queued = self.lane_max_queued.get(priority)
+        if max_queued is not None and len(lane) >= max_queued:
+            stats.shed += 1
+            raise RequestDroppedError('shed', priority, f"{priority.name} 通道排隊已滿: {method} {endpoint}")
+
+        waiter = _Waiter(self.costs(method, endpoint, params))
+        reserve = self.lane_reserve.get(priority, 0.0)
+        start = time.monotonic()
+        deadline = start + max_wait if max_wait is not None else None
+        lane.append(waiter)
+        try:
+            while True:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    stats.expired += 1
+                    raise RequestDroppedError(
+                        'expired', priority, f"{priority.name} 通道排隊超過 {max_wait} 秒: {method} {endpoint}"
+                    )
+                timeout = None
+                if self._head() is waiter:
+                    timeout = self._delay(waiter.costs, now, reserve)
+                    if timeout <= 0:
+                        break
+                if deadline is not None:
+                    timeout = deadline - now if timeout is None else min(timeout, deadline - now)
+                waiter.event.clear()
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            for bucket, cost in zip(self.buckets, waiter.costs):
+                bucket.take(cost)
+        finally:
+            lane.remove(waiter)
+            head = self._head()
+            if head is not None:
+                head.event.set()
+
+        waited = time.monotonic() - start
+        stats.requests += 1
+        stats.waits.append(waited)
+        if waited > 0.001:
+            stats.delayed += 1
+            stats.total_wait += waited
+            stats.max_wait = max(stats.max_wait, waited)
+        return waited
+
+    def _head(self) -> Optional[_Waiter]:
+        """最高優先級非空通道的隊首"""
+        for priority in RequestPriority:
+            lane = self._lanes[priority]
+            if lane:
+                return lane[0]
+        return None
+
+    def _delay(self, costs: List[float], now: float, reserve: float = 0.0) -> float:
+        delay = self.paused_until - now
+        for bucket, cost in zip(self.buckets, costs):
+            delay = max(delay, bucket.delay(cost, now, reserve))
+        return delay
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """根據響應頭中的已用量校正剩餘額度"""
+        for bucket in self.buckets:
+            header = bucket.limit.header
+            if header is None:
+                continue
+            value = headers.get(header)
+            if value is None:
+                continue
+            try:
+                used = float(value)
+            except ValueError:
+                continue
+            bucket.refill(time.monotonic())
+            bucket.sync(used)
+
+    def pause(self, status: int, retry_after: Optional[str] = None) -> float:
+        """
+        收到 429/418 後暫停所有請求
+
+        Args:
+            status: HTTP 狀態碼
+            retry_after: Retry-After 響應頭
+
+        Returns:
+            暫停時間（秒）
+        """
+        try:
+            seconds = float(retry_after) if retry_after is not None else DEFAULT_RETRY_AFTER[status]
+        except (KeyError, ValueError):
+            seconds = DEFAULT_RETRY_AFTER[429]
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if status == 418:
+            self.banned += 1
+            logger.error(f"IP 已被交易所封禁，暫停請求 {seconds:.0f} 秒")
+        else:
+            self.throttled += 1
+            logger.warning(f"請求過於頻繁，暫停請求 {seconds:.1f} 秒")
+        return seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        """等待時間和每個窗口的剩餘額度"""
+        now = time.monotonic()
+        windows = []
+        for bucket in self.buckets:
+            bucket.refill(now)
+            windows.append({
+                'kind': bucket.limit.kind,
+                'interval': bucket.limit.interval,
+                'limit': bucket.limit.limit,
+                'remaining': max(0.0, bucket.tokens),
+            })
+        lanes = self.lane_stats.values()
+        delayed = sum(lane.delayed for lane in lanes)
+        total_wait = sum(lane.total_wait for lane in lanes)
+        return {
+            'requests': sum(lane.requests for lane in lanes),
+            'delayed': delayed,
+            'queued': sum(len(lane) for lane in self._lanes.values()),
+            'total_wait': total_wait,
+            'avg_wait': total_wait / delayed if delayed else 0.0,
+            'max_wait': max(lane.max_wait for lane in lanes),
+            'throttled': self.throttled,
+            'banned': self.banned,
+            'paused_for': max(0.0, self.paused_until - now),
+            'windows': windows,
+            'lanes': {
+                priority.name: dict(self.lane_stats[priority].to_dict(), queued=len(self._lanes[priority]))
+                for priority in RequestPriority
+            },
+        }
+
+
+def _depth_weight(params: Mapping[str, Any]) -> int:
+    limit = int(params.get('limit', 500))
+    if limit <= 50:
+        return 2
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 10
+    return 20
+
+
+def _ticker_weight(params: Mapping[str, Any]) -> int:
+    # 不帶 symbol 時返回全部交易對
+    return 1 if params.get('symbol') else 40
+
+
+# Binance U本位合約接口權重
+BINANCE_FUTURES_WEIGHTS: Dict[str, EndpointWeight] = {
+    '/fapi/v1/ticker/24hr': _ticker_weight,
+    '/fapi/v1/depth': _depth_weight,
+    '/fapi/v1/exchangeInfo': 1,
+    '/fapi/v1/order': 1,
+    '/fapi/v1/commissionRate': 20,
+    '/fapi/v2/balance': 5,
+    '/fapi/v2/account': 5,
+    '/fapi/v2/positionRisk': 5,
+}
+
+# 計入下單次數的接口
+BINANCE_FUTURES_ORDER_ENDPOINTS = (
+    ('POST', '/fapi/v1/order'),
+    ('POST', '/fapi/v1/batchOrders'),
+)
+
+
+def binance_futures_limits(requests_per_second: int) -> List[RateLimit]:
+    """Binance U本位合約的限流窗口，另加本地的每秒請求數限制"""
+    return [
+        RateLimit(REQUESTS, 1.0, requests_per_second),
+        RateLimit(REQUEST_WEIGHT, 60.0, 2400, header='X-MBX-USED-WEIGHT-1M'),
+        RateLimit(ORDERS, 10.0, 300, header='X-MBX-ORDER-COUNT-10S'),
+        RateLimit(ORDERS, 60.0, 1200, header='X-MBX-ORDER-COUNT-1M'),
+    ]
@@ -58,7 +58,8 @@ class TradingCoordinator:
         strategy_config: DynamicPositionConfig,
         exchange_manager: ExchangeManager,
         initial_balance: float = 10000.0,
-        update_interval: float = 1.0  # 更新間隔（秒）
+        update_interval: float = 1.0,  # 更新間隔（秒）
+        use_market_stream: bool = True  # 交易所支持行情推送時由推送驅動主循環
     ):
         # 初始化組件
         self.strategy = self._create_strategy(strategy_config)
@@ -69,6 +70,7 @@ class TradingCoordinator:
         # 配置
         self.config = strategy_config
         self.update_interval = update_interval
+        self.use_market_stream = use_market_stream
         
         # 狀態管理
         self.status = TradingStatus(state=TradingState.STOPPED)
@@ -79,6 +81,13 @@ class TradingCoordinator:
         self.market_data: Dict[str, MarketData] = {}
         self.price_history: Dict[str, List[float]] = {}
         
+        # 行情推送：每條推送喚醒一次主循環，沒有推送時按 update_interval 輪詢
+        self.market_stream_task: Optional[asyncio.Task] = None
+        self._streamed_market_data: Optional[MarketData] = None
+        self._market_update = asyncio.Event()
+        # 維護訂單簿的交易所，停止時取消深度訂閱
+        self._order_book_exchange: Optional[ExchangeInterface] = None
+        
         # 事件回調
         self.event_callbacks: Dict[str, List[Callable]] = {
             'order_executed': [],
@@ -127,9 +136,19 @@ class TradingCoordinator:
             # 連接交易所
             await self.exchange_manager.connect_all()
             
+            # 執行引擎使用交易所維護的訂單簿估算成交價格
+            exchange = self.exchange_manager.get_exchange()
+            if exchange is not None:
+                self.execution_engine.order_books = exchange.order_books
+            
             # 初始化市場數據
             await self._initialize_market_data()
             
+            # 訂閱行情推送和訂單簿
+            if self.use_market_stream and exchange is not None:
+                await self._start_market_stream(exchange)
+                await self._start_order_book(exchange)
+            
             # 啟動主循環
             self.running = True
             self.main_task = asyncio.create_task(self._main_loop())
@@ -142,6 +161,8 @@ class TradingCoordinator:
             logger.error(f"啟動交易協調器失敗: {e}")
             self.status.state = TradingState.STOPPED
             self.running = False
+            await self._stop_market_stream()
+            await self._stop_order_book()
             raise
     
     async def stop(self):
@@ -162,6 +183,8 @@ class TradingCoordinator:
                     await self.main_task
                 except asyncio.CancelledError:
                     pass
+            await self._stop_market_stream()
+            await self._stop_order_book()
             
             # 清理過期訂單
             await self.execution_engine.cleanup_expired_orders()
@@ -212,7 +235,7 @@ class TradingCoordinator:
         
         symbol = self.config.symbol
         try:
-            market_data = await exchange.get_market_data(symbol)
+            market_data = await self.exchange_manager.get_market_data(symbol)
             self.market_data[symbol] = market_data
             self.risk_manager.update_market_data(symbol, market_data)
             
@@ -238,7 +261,7 @@ class TradingCoordinator:
                 
                 # 檢查是否暫停
                 if self.status.state == TradingState.PAUSED:
-                    await asyncio.sleep(self.update_interval)
+                    await self._wait_for_market_update()
                     continue
                 
                 # 檢查緊急模式
@@ -261,7 +284,7 @@ class TradingCoordinator:
                 # 清理過期訂單
                 await self.execution_engine.cleanup_expired_orders()
                 
-                await asyncio.sleep(self.update_interval)
+                await self._wait_for_market_update()
                 
             except asyncio.CancelledError:
                 logger.info("主循環被取消")
@@ -273,15 +296,76 @@ class TradingCoordinator:
         
         logger.info("交易主循環結束")
     
+    async def _start_market_stream(self, exchange: ExchangeInterface):
+        """訂閱交易對的行情推送，交易所不支持推送時保持輪詢"""
+        stream = await exchange.start_market_stream([self.config.symbol])
+        if stream is None:
+            logger.info(f"交易所不支持行情推送，每 {self.update_interval} 秒輪詢行情")
+            return
+        self.market_stream_task = asyncio.create_task(self._consume_market_stream(stream))
+        logger.info(f"已訂閱行情推送: {self.config.symbol}")
+    
+    async def _consume_market_stream(self, stream):
+        """保存最新的推送行情並喚醒主循環"""
+        async for market_data in stream.updates([self.config.symbol]):
+            self._streamed_market_data = market_data
+            self._market_update.set()
+    
+    async def _stop_market_stream(self):
+        """停止消費行情推送，訂閱本身隨交易所連接關閉"""
+        if self.market_stream_task is None:
+            return
+        self.market_stream_task.cancel()
+        try:
+            await self.market_stream_task
+        except asyncio.CancelledError:
+            pass
+        self.market_stream_task = None
+        self._streamed_market_data = None
+
+    async def _start_order_book(self, exchange: ExchangeInterface):
+        """維護交易對的訂單簿，執行引擎按深度估算成交價格"""
+        order_books = await exchange.start_order_book([self.config.symbol])
+        if order_books is None:
+            logger.info("交易所不支持深度推送，訂單價格按最大滑點估算")
+            return
+        self._order_book_exchange = exchange
+        logger.info(f"已訂閱訂單簿: {self.config.symbol}")
+
+    async def _stop_order_book(self):
+        """取消訂單簿的深度訂閱"""
+        if self._order_book_exchange is None:
+            return
+        exchange, self._order_book_exchange = self._order_book_exchange, None
+        await exchange.stop_order_book([self.config.symbol])
+
+    async def _wait_for_market_update(self):
+        """
+        等待下一輪處理
+        
+        有行情推送時在收到推送後立即返回，最長等待 update_interval，
+        行情安靜時仍按該間隔檢查風險和過期訂單；沒有推送時等待 update_interval。
+        """
+        if self.market_stream_task is None:
+            await asyncio.sleep(self.update_interval)
+            return
+        try:
+            await asyncio.wait_for(self._market_update.wait(), self.update_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._market_update.clear()
+    
     async def _update_market_data(self):
-        """更新市場數據"""
+        """更新市場數據，優先使用尚未處理的推送行情"""
         exchange = self.exchange_manager.get_exchange()
         if not exchange:
             return
         
         symbol = self.config.symbol
         try:
-            market_data = await exchange.get_market_data(symbol)
+            market_data, self._streamed_market_data = self._streamed_market_data, None
+            if market_data is None:
+                market_data = await self.exchange_manager.get_market_data(symbol)
             self.market_data[symbol] = market_data
             self.risk_manager.update_market_data(symbol, market_data)
             
@@ -5,16 +5,115 @@
 use anyhow::Result;
 use serde::{Deserialize, Serialize};
 use std::collections::HashMap;
+use std::path::{Path, PathBuf};
 use std::process::{Command, Stdio};
 use std::sync::Arc;
-use tokio::sync::RwLock;
+use std::time::Duration;
+use tokio::io::{AsyncReadExt, AsyncWriteExt, BufReader};
+use tokio::process::{Child, ChildStdin, ChildStdout};
+use tokio::sync::{Mutex, RwLock};
 use tracing::{info, error, warn};
 
+/// 默認的橋接腳本路徑（相對於工作目錄）
+const DEFAULT_BRIDGE_SCRIPT: &str = "python/bridge/rust_bridge.py";
+
+/// 默認的單次調用超時
+const DEFAULT_REQUEST_TIMEOUT: Duration = Duration::from_secs(600);
+
+/// 列式二進制行情文件的魔數，格式定義見 python/bridge/market_data.py
+const COLUMNAR_MAGIC: &[u8; 8] = b"TBCOLS01";
+
 /// Python策略管理器
 #[derive(Debug)]
 pub struct PythonStrategyManager {
     strategies: Arc<RwLock<HashMap<String, PythonStrategy>>>,
     python_executable: String,
+    bridge_script: String,
+    request_timeout: Duration,
+    binary_market_data: bool,
+    snapshot_path: Option<String>,
+    worker: Mutex<Option<PythonWorker>>,
+}
+
+/// 常駐Python工作進程
+///
+/// 通過標準輸入輸出交換幀：4字節大端長度 + 內容。
+/// 請求內容為 `{"function": ..., "args": [...]}`，響應為函數返回的JSON。
+#[derive(Debug)]
+struct PythonWorker {
+    child: Child,
+    stdin: ChildStdin,
+    stdout: BufReader<ChildStdout>,
+}
+
+impl PythonWorker {
+    /// 啟動工作進程，指定快照路徑時工作進程啟動時從快照恢復策略並定期保存
+    async fn spawn(
+        python_executable: &str,
+        bridge_script: &str,
+        snapshot_path: Option<&str>,
+    ) -> Result<Self> {
+        let mut command = tokio::process::Command::new(python_executable);
+        command
+            .arg(bridge_script)
+            .arg("--worker")
+            .stdin(Stdio::piped())
+            .stdout(Stdio::piped())
+            .stderr(Stdio::inherit())
+            .kill_on_drop(true);
+        if let Some(path) = snapshot_path {
+            command.env("BRIDGE_SNAPSHOT_PATH", path);
+        }
+        let mut child = command.spawn()?;
+
+        let stdin = child
+            .stdin
+            .take()
+            .ok_or_else(|| anyhow::anyhow!("無法獲取Python工作進程的標準輸入"))?;
+        let stdout = child
+            .stdout
+            .take()
+            .ok_or_else(|| anyhow::anyhow!("無法獲取Python工作進程的標準輸出"))?;
+
+        Ok(Self {
+            child,
+            stdin,
+            stdout: BufReader::new(stdout),
+        })
+    }
+
+    /// 發送一個請求幀並讀取響應幀
+    async fn call(&mut self, payload: &[u8]) -> Result<Vec<u8>> {
+        self.send(payload).await?;
+        self.receive().await
+    }
+
+    /// 發送一個請求幀
+    async fn send(&mut self, payload: &[u8]) -> Result<()> {
+        let length = u32::try_from(payload.len())?;
+        self.stdin.write_all(&length.to_be_bytes()).await?;
+        self.stdin.write_all(payload).await?;
+        self.stdin.flush().await?;
+        Ok(())
+    }
+
+    /// 讀取一個響應幀
+    async fn receive(&mut self) -> Result<Vec<u8>> {
+        let length = self.stdout.read_u32().await? as usize;
+        let mut response = vec![0u8; length];
+        self.stdout.read_exact(&mut response).await?;
+        Ok(response)
+    }
+
+    /// 通知工作進程退出並等待結束
+    async fn shutdown(mut self) -> Result<()> {
+        let request = serde_json::to_vec(&serde_json::json!({ "function": "shutdown" }))?;
+        if self.call(&request).await.is_err() {
+            self.child.kill().await?;
+        }
+        self.child.wait().await?;
+        Ok(())
+    }
 }
 
 /// Python策略信息
@@ -41,6 +140,60 @@ pub struct PythonSignal {
     pub metadata: HashMap<String, String>,
 }
 
+/// 流式回測事件，格式見 python/bridge/rust_bridge.py 的 stream_backtest
+#[derive(Debug, Clone, Serialize, Deserialize)]
+#[serde(tag = "type", rename_all = "snake_case")]
+pub enum BacktestStreamEvent {
+    /// 回測進度
+    Progress {
+        processed: u64,
+        total: u64,
+        equity: f64,
+        total_return: f64,
+        max_drawdown: f64,
+    },
+    /// 匯總指標，在所有分塊之前發送
+    Header {
+        strategy_name: String,
+        trade_count: usize,
+        equity_points: usize,
+        daily_return_count: usize,
+        /// 其餘匯總指標，比率類指標為無窮大時是 null
+        #[serde(flatten)]
+        metrics: HashMap<String, serde_json::Value>,
+    },
+    /// 交易記錄分塊
+    Trades {
+        offset: usize,
+        items: Vec<serde_json::Value>,
+    },
+    /// 權益曲線分塊
+    Equity {
+        offset: usize,
+        #[serde(deserialize_with = "nullable_f64_vec")]
+        values: Vec<f64>,
+    },
+    /// 日收益率分塊
+    DailyReturns {
+        offset: usize,
+        #[serde(deserialize_with = "nullable_f64_vec")]
+        values: Vec<f64>,
+    },
+    /// 結果發送完畢
+    End,
+    /// 回測失敗
+    Error { error: String },
+}
+
+/// 批量生成信號的結果
+#[derive(Debug, Clone, Default, Serialize, Deserialize)]
+pub struct BatchSignals {
+    /// 每個策略的信號
+    pub signals: HashMap<String, Vec<PythonSignal>>,
+    /// 失敗策略的錯誤信息
+    pub errors: HashMap<String, String>,
+}
+
 /// 回測配置
 #[derive(Debug, Clone, Serialize, Deserialize)]
 pub struct BacktestConfig {
@@ -64,29 +217,65 @@ pub struct MarketData {
     pub volume: f64,
 }
 
+/// 讀取可能為 null 的浮點數
+///
+/// 橋接響應把 NaN 和無窮大（例如沒有虧損日時的 Sortino 比率）統一編碼為 null，
+/// 讀取為 NaN；f64 序列化為 JSON 時 NaN 也輸出為 null，兩個方向一致。
+fn nullable_f64<'de, D>(deserializer: D) -> std::result::Result<f64, D::Error>
+where
+    D: serde::Deserializer<'de>,
+{
+    Ok(Option::<f64>::deserialize(deserializer)?.unwrap_or(f64::NAN))
+}
+
+/// 讀取可能包含 null 的浮點數組，null 讀取為 NaN
+fn nullable_f64_vec<'de, D>(deserializer: D) -> std::result::Result<Vec<f64>, D::Error>
+where
+    D: serde::Deserializer<'de>,
+{
+    let values = Vec::<Option<f64>>::deserialize(deserializer)?;
+    Ok(values.into_iter().map(|value| value.unwrap_or(f64::NAN)).collect())
+}
+
 /// 回測結果
+///
+/// 比率類指標和收益序列中的 NaN、無窮大在橋接響應中為 null，讀取為 NaN。
 #[derive(Debug, Clone, Serialize, Deserialize)]
 pub struct BacktestResult {
     pub strategy_name: String,
     pub start_date: String,
     pub end_date: String,
+    #[serde(deserialize_with = "nullable_f64")]
     pub initial_capital: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub final_capital: f64,
     pub total_trades: i32,
     pub winning_trades: i32,
     pub losing_trades: i32,
+    #[serde(deserialize_with = "nullable_f64")]
     pub total_pnl: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub total_return: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub annual_return: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub max_drawdown: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub sharpe_ratio: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub sortino_ratio: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub volatility: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub win_rate: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub avg_trade_pnl: f64,
+    #[serde(deserialize_with = "nullable_f64")]
     pub profit_factor: f64,
     pub trades: Vec<serde_json::Value>,
+    #[serde(deserialize_with = "nullable_f64_vec")]
     pub daily_returns: Vec<f64>,
+    #[serde(deserialize_with = "nullable_f64_vec")]
     pub equity_curve: Vec<f64>,
 }
 
@@ -96,12 +285,52 @@ impl PythonStrategyManager {
         Self {
             strategies: Arc::new(RwLock::new(HashMap::new())),
             python_executable: "python".to_string(),
+            bridge_script: DEFAULT_BRIDGE_SCRIPT.to_string(),
+            request_timeout: DEFAULT_REQUEST_TIMEOUT,
+            binary_market_data: true,
+            snapshot_path: None,
+            worker: Mutex::new(None),
         }
     }
 
     /// 設置Python可執行文件路徑
     pub fn set_python_executable(&mut self, path: String) {
         self.python_executable = path;
+        // 已啟動的工作進程使用舊的解釋器，丟棄後在下次調用時重新啟動
+        self.worker.get_mut().take();
+    }
+
+    /// 設置橋接腳本路徑
+    pub fn set_bridge_script(&mut self, path: String) {
+        self.bridge_script = path;
+        self.worker.get_mut().take();
+    }
+
+    /// 設置單次調用超時
+    pub fn set_request_timeout(&mut self, timeout: Duration) {
+        self.request_timeout = timeout;
+    }
+
+    /// 設置是否以列式二進制文件傳輸行情數據，關閉時回退為JSON數組
+    pub fn set_binary_market_data(&mut self, enabled: bool) {
+        self.binary_market_data = enabled;
+    }
+
+    /// 設置策略狀態快照文件，下次啟動工作進程時生效
+    ///
+    /// 工作進程啟動時從快照恢復策略的指標和持倉狀態，運行中定期保存，退出時再保存一次，
+    /// 重啟後無需重新回放歷史K線即可繼續生成信號。
+    pub fn set_snapshot_path(&mut self, path: Option<String>) {
+        self.snapshot_path = path;
+    }
+
+    /// 關閉常駐工作進程
+    pub async fn shutdown(&self) -> Result<()> {
+        if let Some(worker) = self.worker.lock().await.take() {
+            worker.shutdown().await?;
+            info!("Python工作進程已關閉");
+        }
+        Ok(())
     }
 
     /// 創建策略
@@ -130,9 +359,19 @@ impl PythonStrategyManager {
 
     /// 生成交易信號
     pub async fn generate_signals(&self, strategy_id: &str, market_data: &[MarketData]) -> Result<Vec<PythonSignal>> {
-        let market_data_json = serde_json::to_string(market_data)?;
+        // 二進制文件在調用結束後刪除
+        let market_data_file = if self.binary_market_data {
+            Some(MarketDataFile::write(market_data)?)
+        } else {
+            None
+        };
+        let market_data_json = match &market_data_file {
+            Some(file) => file.reference().to_string(),
+            None => serde_json::to_string(market_data)?,
+        };
         
         let result = self.call_python_function("generate_signals", &[strategy_id, &market_data_json]).await?;
+        drop(market_data_file);
         
         // 解析結果
         if let Ok(signals) = serde_json::from_str::<Vec<PythonSignal>>(&result) {
@@ -149,11 +388,114 @@ impl PythonStrategyManager {
         }
     }
 
+    /// 用同一份行情數據為多個策略生成信號
+    ///
+    /// 行情數據只傳輸和解析一次。單個策略失敗記錄在 `errors` 中，不影響其他策略；
+    /// `max_workers` 大於1時Python端用線程池並行評估。
+    pub async fn generate_signals_batch(
+        &self,
+        strategy_ids: &[String],
+        market_data: &[MarketData],
+        max_workers: Option<usize>,
+    ) -> Result<BatchSignals> {
+        let market_data_file = if self.binary_market_data {
+            Some(MarketDataFile::write(market_data)?)
+        } else {
+            None
+        };
+        let market_data_json = match &market_data_file {
+            Some(file) => file.reference().to_string(),
+            None => serde_json::to_string(market_data)?,
+        };
+        let strategy_ids_json = serde_json::to_string(strategy_ids)?;
+        let max_workers = max_workers.map(|n| n.to_string()).unwrap_or_default();
+
+        let result = self
+            .call_python_function(
+                "generate_signals_batch",
+                &[&strategy_ids_json, &market_data_json, &max_workers],
+            )
+            .await?;
+        drop(market_data_file);
+
+        if let Ok(batch) = serde_json::from_str::<BatchSignals>(&result) {
+            for (strategy_id, error) in &batch.errors {
+                warn!("策略生成信號失敗: {}: {}", strategy_id, error);
+            }
+            return Ok(batch);
+        }
+        if let Ok(error) = serde_json::from_str::<serde_json::Value>(&result) {
+            if let Some(error_msg) = error.get("error") {
+                return Err(anyhow::anyhow!("批量生成信號失敗: {}", error_msg));
+            }
+        }
+        Err(anyhow::anyhow!("批量生成信號失敗: 無效響應"))
+    }
+
+    /// 追加新K線並增量生成信號
+    ///
+    /// 只傳輸新K線，數據量很小，直接以JSON發送。工作進程重啟或K線出現缺口後
+    /// 返回需要重新同步的錯誤，調用方應先調用 resync_market_data。
+    pub async fn append_market_data(&self, strategy_id: &str, candles: &[MarketData]) -> Result<Vec<PythonSignal>> {
+        let candles_json = serde_json::to_string(candles)?;
+        let result = self.call_python_function("append_market_data", &[strategy_id, &candles_json]).await?;
+        Self::parse_signals(&result)
+    }
+
+    /// 用完整歷史重建策略的滾動窗口
+    pub async fn resync_market_data(
+        &self,
+        strategy_id: &str,
+        market_data: &[MarketData],
+        window_size: Option<usize>,
+    ) -> Result<Vec<PythonSignal>> {
+        let market_data_file = if self.binary_market_data {
+            Some(MarketDataFile::write(market_data)?)
+        } else {
+            None
+        };
+        let market_data_json = match &market_data_file {
+            Some(file) => file.reference().to_string(),
+            None => serde_json::to_string(market_data)?,
+        };
+        let window_size = window_size.map(|size| size.to_string()).unwrap_or_default();
+
+        let result = self
+            .call_python_function("resync_market_data", &[strategy_id, &market_data_json, &window_size])
+            .await?;
+        drop(market_data_file);
+        Self::parse_signals(&result)
+    }
+
+    fn parse_signals(result: &str) -> Result<Vec<PythonSignal>> {
+        if let Ok(signals) = serde_json::from_str::<Vec<PythonSignal>>(result) {
+            return Ok(signals);
+        }
+        if let Ok(error) = serde_json::from_str::<serde_json::Value>(result) {
+            if error.get("resync_required").and_then(|v| v.as_bool()).unwrap_or(false) {
+                return Err(anyhow::anyhow!("策略窗口需要重新同步: {}", error["error"]));
+            }
+            if let Some(error_msg) = error.get("error") {
+                return Err(anyhow::anyhow!("生成信號失敗: {}", error_msg));
+            }
+        }
+        Err(anyhow::anyhow!("生成信號失敗: 無效響應"))
+    }
+
     /// 運行回測
     pub async fn run_backtest(&self, config: BacktestConfig) -> Result<BacktestResult> {
-        let config_json = serde_json::to_string(&config)?;
+        let mut config_value = serde_json::to_value(&config)?;
+        let market_data_file = if self.binary_market_data {
+            let file = MarketDataFile::write(&config.market_data)?;
+            config_value["market_data"] = file.reference();
+            Some(file)
+        } else {
+            None
+        };
+        let config_json = config_value.to_string();
         
         let result = self.call_python_function("run_backtest_from_json", &[&config_json]).await?;
+        drop(market_data_file);
         
         // 解析結果
         if let Ok(backtest_result) = serde_json::from_str::<BacktestResult>(&result) {
@@ -170,6 +512,158 @@ impl PythonStrategyManager {
         }
     }
 
+    /// 以事件流方式運行回測
+    ///
+    /// 回測過程中收到進度事件，結束後依次收到匯總指標和交易、權益曲線、
+    /// 日收益率的分塊，調用方可以邊接收邊處理，不需要一次性持有整個結果。
+    /// 回調返回錯誤時中止讀取，並丟棄工作進程以免剩餘的幀與後續請求錯位。
+    pub async fn run_backtest_streaming<F>(&self, config: BacktestConfig, mut on_event: F) -> Result<()>
+    where
+        F: FnMut(BacktestStreamEvent) -> Result<()>,
+    {
+        let mut config_value = serde_json::to_value(&config)?;
+        let market_data_file = if self.binary_market_data {
+            let file = MarketDataFile::write(&config.market_data)?;
+            config_value["market_data"] = file.reference();
+            Some(file)
+        } else {
+            None
+        };
+        let request = serde_json::to_vec(&serde_json::json!({
+            "function": "stream_backtest",
+            "args": [config_value.to_string()],
+        }))?;
+
+        let mut worker = self.worker.lock().await;
+        let current = self.ensure_worker(&mut worker).await?;
+
+        let outcome = tokio::time::timeout(
+            self.request_timeout,
+            Self::read_backtest_stream(current, &request, &mut on_event),
+        )
+        .await;
+        drop(market_data_file);
+
+        match outcome {
+            Ok(Ok(None)) => Ok(()),
+            Ok(Ok(Some(error))) => Err(anyhow::anyhow!("回測失敗: {}", error)),
+            Ok(Err(e)) => {
+                // 通信或回調失敗時可能還有未讀的幀
+                *worker = None;
+                Err(e)
+            }
+            Err(_) => {
+                *worker = None;
+                error!("流式回測超時");
+                Err(anyhow::anyhow!("流式回測超時"))
+            }
+        }
+    }
+
+    /// 讀取回測事件直到結束事件，返回錯誤事件中的信息
+    async fn read_backtest_stream<F>(
+        worker: &mut PythonWorker,
+        request: &[u8],
+        on_event: &mut F,
+    ) -> Result<Option<String>>
+    where
+        F: FnMut(BacktestStreamEvent) -> Result<()>,
+    {
+        worker.send(request).await?;
+        loop {
+            let frame = worker.receive().await?;
+            let event = serde_json::from_slice::<BacktestStreamEvent>(&frame)
+                .map_err(|e| anyhow::anyhow!("無效的回測事件: {}", e))?;
+            match event {
+                BacktestStreamEvent::End => return Ok(None),
+                BacktestStreamEvent::Error { error } => return Ok(Some(error)),
+                event => on_event(event)?,
+            }
+        }
+    }
+
+    /// 提交異步回測任務，返回任務ID
+    ///
+    /// 任務在Python端的進程池中排隊執行，調用立即返回。行情數據以JSON內聯發送：
+    /// 二進制行情文件在調用返回時即被刪除，而任務可能稍後才開始讀取數據。
+    pub async fn submit_backtest(&self, config: &BacktestConfig) -> Result<String> {
+        let config_json = serde_json::to_string(config)?;
+        let result = self.call_python_function("submit_backtest", &[&config_json]).await?;
+        let response = serde_json::from_str::<serde_json::Value>(&result)?;
+        match response.get("job_id").and_then(|v| v.as_str()) {
+            Some(job_id) => Ok(job_id.to_string()),
+            None => Err(anyhow::anyhow!(
+                "提交回測任務失敗: {}",
+                response.get("error").cloned().unwrap_or_default()
+            )),
+        }
+    }
+
+    /// 查詢回測任務狀態
+    pub async fn backtest_status(&self, job_id: &str) -> Result<serde_json::Value> {
+        self.call_job_function("get_backtest_status", job_id).await
+    }
+
+    /// 查詢回測任務進度和當前績效指標
+    pub async fn backtest_progress(&self, job_id: &str) -> Result<serde_json::Value> {
+        self.call_job_function("get_backtest_progress", job_id).await
+    }
+
+    /// 取消回測任務，任務已結束時返回 false
+    pub async fn cancel_backtest(&self, job_id: &str) -> Result<bool> {
+        let response = self.call_job_function("cancel_backtest", job_id).await?;
+        Ok(response.get("success").and_then(|v| v.as_bool()).unwrap_or(false))
+    }
+
+    /// 讀取回測任務結果，任務尚未完成時返回 None
+    pub async fn backtest_result(&self, job_id: &str) -> Result<Option<BacktestResult>> {
+        let result = self.call_python_function("get_backtest_result", &[job_id]).await?;
+        if let Ok(backtest_result) = serde_json::from_str::<BacktestResult>(&result) {
+            return Ok(Some(backtest_result));
+        }
+        let response = serde_json::from_str::<serde_json::Value>(&result)?;
+        if response.get("pending").and_then(|v| v.as_bool()).unwrap_or(false) {
+            return Ok(None);
+        }
+        Err(anyhow::anyhow!(
+            "讀取回測結果失敗: {}",
+            response.get("error").cloned().unwrap_or_default()
+        ))
+    }
+
+    async fn call_job_function(&self, function_name: &str, job_id: &str) -> Result<serde_json::Value> {
+        let result = self.call_python_function(function_name, &[job_id]).await?;
+        let response = serde_json::from_str::<serde_json::Value>(&result)?;
+        if let Some(error_msg) = response.get("error") {
+            return Err(anyhow::anyhow!("回測任務請求失敗: {}", error_msg));
+        }
+        Ok(response)
+    }
+
+    /// 立即保存策略狀態快照，未指定路徑時使用 `set_snapshot_path` 設置的路徑
+    pub async fn save_snapshot(&self, path: Option<&str>) -> Result<serde_json::Value> {
+        let path = path.or(self.snapshot_path.as_deref()).unwrap_or("");
+        let result = self.call_python_function("save_strategy_snapshot", &[path]).await?;
+        let response = serde_json::from_str::<serde_json::Value>(&result)?;
+        if let Some(error_msg) = response.get("error") {
+            return Err(anyhow::anyhow!("保存策略快照失敗: {}", error_msg));
+        }
+        Ok(response)
+    }
+
+    /// 獲取橋接調用指標：每個函數的調用次數、錯誤次數、分階段耗時和負載大小的分位數
+    ///
+    /// 啟動工作進程前設置環境變量 `BRIDGE_TRACE_FILE` 時，每次調用還會追加到該 JSON Lines 文件。
+    pub async fn bridge_metrics(&self, reset: bool) -> Result<serde_json::Value> {
+        let reset = if reset { "1" } else { "" };
+        let result = self.call_python_function("get_bridge_metrics", &[reset]).await?;
+        let metrics = serde_json::from_str::<serde_json::Value>(&result)?;
+        if let Some(error_msg) = metrics.get("error") {
+            return Err(anyhow::anyhow!("獲取橋接指標失敗: {}", error_msg));
+        }
+        Ok(metrics)
+    }
+
     /// 獲取策略信息
     pub async fn get_strategy_info(&self, strategy_id: &str) -> Result<serde_json::Value> {
         let result = self.call_python_function("get_strategy_info", &[strategy_id]).await?;
@@ -225,57 +719,119 @@ impl PythonStrategyManager {
     }
 
     /// 調用Python函數
+    ///
+    /// 請求發送到常駐工作進程，策略實例在多次調用之間保持。
+    /// 工作進程意外退出時會重新啟動，並按本地緩存的配置恢復策略後重試一次。
     async fn call_python_function(&self, function_name: &str, args: &[&str]) -> Result<String> {
-        let script = format!(
-            r#"
-import sys
-import os
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'python'))
-
-from bridge.rust_bridge import {}
-
-if __name__ == "__main__":
-    try:
-        result = {}({})
-        print(result)
-    except Exception as e:
-        import json
-        print(json.dumps({{"error": str(e)}}))
-"#,
-            function_name,
-            function_name,
-            args.iter().enumerate().map(|(i, _)| format!("sys.argv[{}]", i + 1)).collect::<Vec<_>>().join(", ")
-        );
-
-        // 寫入臨時腳本文件
-        let script_path = format!("/tmp/python_bridge_{}.py", function_name);
-        std::fs::write(&script_path, script)?;
-
-        // 構建命令
-        let mut cmd = Command::new(&self.python_executable);
-        cmd.arg(&script_path);
-        
-        for arg in args {
-            cmd.arg(arg);
+        let request = serde_json::to_vec(&serde_json::json!({
+            "function": function_name,
+            "args": args,
+        }))?;
+
+        let mut worker = self.worker.lock().await;
+        let mut last_error = None;
+
+        for _ in 0..2 {
+            let current = self.ensure_worker(&mut worker).await?;
+            match tokio::time::timeout(self.request_timeout, current.call(&request)).await {
+                Ok(Ok(response)) => return Ok(String::from_utf8(response)?),
+                Ok(Err(e)) => {
+                    warn!("Python工作進程通信失敗，將重新啟動: {}", e);
+                    *worker = None;
+                    last_error = Some(e);
+                }
+                Err(_) => {
+                    // 超時的請求可能仍在執行，丟棄工作進程以免響應錯位
+                    *worker = None;
+                    error!("Python函數調用超時: {}", function_name);
+                    return Err(anyhow::anyhow!("Python函數調用超時: {}", function_name));
+                }
+            }
         }
 
-        cmd.stdout(Stdio::piped())
-            .stderr(Stdio::piped());
-
-        // 執行命令
-        let output = cmd.output()?;
+        Err(last_error.unwrap_or_else(|| anyhow::anyhow!("Python工作進程不可用")))
+    }
 
-        // 清理臨時文件
-        let _ = std::fs::remove_file(&script_path);
+    /// 返回常駐工作進程，沒有時啟動
+    ///
+    /// 工作進程在崩潰、超時或更換解釋器和腳本後被丟棄，新啟動的工作進程一律按本地緩存的
+    /// 配置恢復策略，所有調用路徑共用此邏輯。
+    async fn ensure_worker<'a>(&self, worker: &'a mut Option<PythonWorker>) -> Result<&'a mut PythonWorker> {
+        if worker.is_none() {
+            let mut spawned = PythonWorker::spawn(
+                &self.python_executable,
+                &self.bridge_script,
+                self.snapshot_path.as_deref(),
+            )
+            .await?;
+            if !self.strategies.read().await.is_empty() {
+                self.restore_strategies(&mut spawned).await;
+            }
+            info!("Python工作進程已啟動");
+            *worker = Some(spawned);
+        }
+        Ok(worker.as_mut().expect("工作進程已啟動"))
+    }
 
-        if !output.status.success() {
-            let stderr = String::from_utf8_lossy(&output.stderr);
-            error!("Python腳本執行失敗: {}", stderr);
-            return Err(anyhow::anyhow!("Python腳本執行失敗: {}", stderr));
+    /// 在新啟動的工作進程中重新創建已知策略
+    ///
+    /// 已從快照恢復的策略保留其狀態，但快照可能早於最近一次配置更新，
+    /// 因此按本地緩存重新應用配置；快照中沒有的策略重新創建。
+    async fn restore_strategies(&self, worker: &mut PythonWorker) {
+        let restored = match Self::list_worker_strategies(worker).await {
+            Ok(restored) => restored,
+            Err(e) => {
+                warn!("讀取Python工作進程的策略列表失敗: {}", e);
+                Vec::new()
+            }
+        };
+        let strategies = self.strategies.read().await;
+        for (strategy_id, strategy) in strategies.iter() {
+            if restored.contains(strategy_id) {
+                if let Err(e) = Self::reapply_strategy_config(worker, strategy_id, strategy).await {
+                    warn!("重新應用Python策略配置失敗: {}: {}", strategy_id, e);
+                }
+                continue;
+            }
+            if let Err(e) = Self::restore_strategy(worker, strategy).await {
+                warn!("恢復Python策略失敗: {}: {}", strategy_id, e);
+            }
         }
+    }
 
-        let stdout = String::from_utf8_lossy(&output.stdout);
-        Ok(stdout.trim().to_string())
+    async fn list_worker_strategies(worker: &mut PythonWorker) -> Result<Vec<String>> {
+        let request = serde_json::to_vec(&serde_json::json!({ "function": "list_strategies" }))?;
+        let response = worker.call(&request).await?;
+        Ok(serde_json::from_slice::<Vec<String>>(&response)?)
+    }
+
+    async fn restore_strategy(worker: &mut PythonWorker, strategy: &PythonStrategy) -> Result<()> {
+        let config_json = serde_json::to_string(strategy)?;
+        let request = serde_json::to_vec(&serde_json::json!({
+            "function": "create_strategy_from_json",
+            "args": [config_json],
+        }))?;
+        worker.call(&request).await?;
+        Ok(())
+    }
+
+    /// 用本地緩存的配置覆蓋快照中的策略配置，未變化的參數不會觸發重新預熱
+    async fn reapply_strategy_config(
+        worker: &mut PythonWorker,
+        strategy_id: &str,
+        strategy: &PythonStrategy,
+    ) -> Result<()> {
+        let config_json = serde_json::to_string(&serde_json::json!({
+            "parameters": strategy.parameters,
+            "risk_params": strategy.risk_params,
+            "enabled": strategy.enabled,
+        }))?;
+        let request = serde_json::to_vec(&serde_json::json!({
+            "function": "update_strategy_config",
+            "args": [strategy_id, config_json],
+        }))?;
+        worker.call(&request).await?;
+        Ok(())
     }
 
     /// 測試Python環境
@@ -332,6 +888,82 @@ print("Python environment test completed")
     }
 }
 
+/// 臨時的列式二進制行情文件，離開作用域時刪除
+struct MarketDataFile {
+    path: PathBuf,
+}
+
+impl MarketDataFile {
+    /// 編碼K線並寫入臨時文件，優先使用 /dev/shm
+    fn write(market_data: &[MarketData]) -> Result<Self> {
+        let shm = Path::new("/dev/shm");
+        let dir = if shm.is_dir() { shm.to_path_buf() } else { std::env::temp_dir() };
+        let path = dir.join(format!("trading_bot_market_data_{}.bin", uuid::Uuid::new_v4()));
+        std::fs::write(&path, encode_columnar(market_data)?)?;
+        Ok(Self { path })
+    }
+
+    /// 傳給Python端的文件引用
+    fn reference(&self) -> serde_json::Value {
+        serde_json::json!({
+            "format": "columnar",
+            "path": self.path.to_string_lossy(),
+        })
+    }
+}
+
+impl Drop for MarketDataFile {
+    fn drop(&mut self) {
+        let _ = std::fs::remove_file(&self.path);
+    }
+}
+
+/// 把K線編碼為小端序定寬列
+///
+/// 佈局：魔數、行數 u64、列數 u32、保留 u32、每列的類型和名稱、8字節對齊填充、各列數據。
+fn encode_columnar(market_data: &[MarketData]) -> Result<Vec<u8>> {
+    let getters: [(&str, fn(&MarketData) -> f64); 5] = [
+        ("open", |c| c.open),
+        ("high", |c| c.high),
+        ("low", |c| c.low),
+        ("close", |c| c.close),
+        ("volume", |c| c.volume),
+    ];
+    let rows = market_data.len();
+    let mut buffer = Vec::with_capacity(128 + rows * 8 * (getters.len() + 1));
+
+    buffer.extend_from_slice(COLUMNAR_MAGIC);
+    buffer.extend_from_slice(&(rows as u64).to_le_bytes());
+    buffer.extend_from_slice(&((getters.len() + 1) as u32).to_le_bytes());
+    buffer.extend_from_slice(&0u32.to_le_bytes());
+
+    buffer.push(b't');
+    buffer.push("timestamp".len() as u8);
+    buffer.extend_from_slice(b"timestamp");
+    for (name, _) in &getters {
+        buffer.push(b'f');
+        buffer.push(name.len() as u8);
+        buffer.extend_from_slice(name.as_bytes());
+    }
+    while buffer.len() % 8 != 0 {
+        buffer.push(0);
+    }
+
+    for candle in market_data {
+        let nanos = chrono::DateTime::parse_from_rfc3339(&candle.timestamp)?
+            .timestamp_nanos_opt()
+            .ok_or_else(|| anyhow::anyhow!("時間戳超出範圍: {}", candle.timestamp))?;
+        buffer.extend_from_slice(&nanos.to_le_bytes());
+    }
+    for (_, get) in &getters {
+        for candle in market_data {
+            buffer.extend_from_slice(&get(candle).to_le_bytes());
+        }
+    }
+
+    Ok(buffer)
+}
+
 impl Default for PythonStrategyManager {
     fn default() -> Self {
         Self::new()
@@ -0,0 +1,918 @@
+"""
+回測模塊測試
+
+測試回測引擎的增量路徑、前綴路徑以及相關的回測工具。
+"""
+
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from typing import List
+import sys
+import os
+import warnings
+
+# 與橋接層一致，以 python/ 為根目錄導入策略和回測模塊
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python")
+)
+
+from strategies.base import (
+    BaseStrategy,
+    StrategyConfig,
+    StrategySignal,
+    SignalType,
+)
+from backtest import (
+    BacktestEngine,
+    BacktestConfig,
+    Bar,
+    IncrementalStrategy,
+    RollingMean,
+    run_backtest,
+    supports_incremental,
+    VectorizedBacktestEngine,
+    run_vectorized_backtest,
+    signals_to_positions,
+    ParameterSweep,
+    SharedOHLCV,
+    expand_grid,
+    WalkForwardOptimizer,
+    make_folds,
+    BacktestResult,
+    MonteCarloSimulator,
+    run_monte_carlo,
+    TradeLedger,
+    FloatBuffer,
+    ReturnStatistics,
+    CandleStore,
+    BacktestCache,
+    make_cache_key,
+)
+import importlib
+import pickle
+
+
+def make_ohlcv(n: int = 600, seed: int = 42, freq: str = "1h") -> pd.DataFrame:
+    """生成隨機遊走的OHLCV測試數據"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    index = pd.date_range("2024-01-01", periods=n, freq=freq)
+    return pd.DataFrame(
+        {
+            "open": close * (1 + rng.normal(0, 0.001, n)),
+            "high": close * 1.005,
+            "low": close * 0.995,
+            "close": close,
+            "volume": rng.uniform(100, 1000, n),
+        },
+        index=index,
+    )
+
+
+class PrefixSMAStrategy(BaseStrategy):
+    """只實現 generate_signals 的SMA交叉策略"""
+
+    def generate_signals(self, data: pd.DataFrame) -> List[StrategySignal]:
+        fast = self.config.parameters["fast_period"]
+        slow = self.config.parameters["slow_period"]
+        closes = data["close"].to_numpy()
+        if len(closes) < slow + 1:
+            return []
+
+        fast_prev, fast_now = closes[-fast - 1 : -1].mean(), closes[-fast:].mean()
+        slow_prev, slow_now = closes[-slow - 1 : -1].mean(), closes[-slow:].mean()
+        return self._cross_signals(fast_prev, slow_prev, fast_now, slow_now, closes[-1])
+
+    def _cross_signals(self, fast_prev, slow_prev, fast_now, slow_now, price):
+        if fast_prev <= slow_prev and fast_now > slow_now:
+            return [StrategySignal(self.config.symbol, SignalType.BUY, 1.0, price)]
+        if fast_prev >= slow_prev and fast_now < slow_now:
+            return [StrategySignal(self.config.symbol, SignalType.SELL, 1.0, price)]
+        return []
+
+
+class IncrementalSMAStrategy(IncrementalStrategy, PrefixSMAStrategy):
+    """同時實現增量接口的SMA交叉策略"""
+
+    def reset(self):
+        super().reset()
+        self.closes = []
+
+    def on_bar(self, bar: Bar) -> List[StrategySignal]:
+        self.closes.append(bar.close)
+        fast = self.config.parameters["fast_period"]
+        slow = self.config.parameters["slow_period"]
+        if len(self.closes) < slow + 1:
+            return []
+        if len(self.closes) > slow + 1:
+            self.closes.pop(0)
+
+        closes = np.asarray(self.closes)
+        fast_prev, fast_now = closes[-fast - 1 : -1].mean(), closes[-fast:].mean()
+        slow_prev, slow_now = closes[:-1].mean(), closes[1:].mean()
+        return self._cross_signals(fast_prev, slow_prev, fast_now, slow_now, bar.close)
+
+
+def make_strategy(cls=IncrementalSMAStrategy, fast: int = 5, slow: int = 20):
+    config = StrategyConfig(
+        name=f"SMA_{fast}_{slow}",
+        symbol="BTCUSDT",
+        parameters={"fast_period": fast, "slow_period": slow},
+    )
+    return cls(config)
+
+
+def make_sma_strategy(fast_period: int, slow_period: int):
+    """參數掃描使用的模塊級策略工廠"""
+    return make_strategy(fast=fast_period, slow=slow_period)
+
+
+def make_crashing_strategy(fast_period: int, slow_period: int):
+    """模擬工作進程崩潰的策略工廠"""
+    os._exit(1)
+
+
+class TestIncrementalBacktest:
+    """增量回測測試"""
+
+    def setup_method(self):
+        self.data = make_ohlcv()
+        self.start = self.data.index[0].to_pydatetime()
+        self.end = self.data.index[-1].to_pydatetime()
+
+    def _run(self, strategy):
+        return run_backtest(strategy, self.data, self.start, self.end)
+
+    def test_supports_incremental(self):
+        """測試增量接口檢測"""
+        assert supports_incremental(make_strategy(IncrementalSMAStrategy))
+        assert not supports_incremental(make_strategy(PrefixSMAStrategy))
+
+    def test_incremental_matches_prefix(self):
+        """測試增量路徑與前綴路徑產生相同交易"""
+        incremental = self._run(make_strategy(IncrementalSMAStrategy))
+        prefix = self._run(make_strategy(PrefixSMAStrategy))
+
+        assert incremental.total_trades > 0
+        assert incremental.total_trades == prefix.total_trades
+        for a, b in zip(incremental.trades, prefix.trades):
+            assert a["timestamp"] == b["timestamp"]
+            assert a["action"] == b["action"]
+            assert a["price"] == pytest.approx(b["price"])
+        assert incremental.final_capital == pytest.approx(prefix.final_capital)
+        assert incremental.equity_curve == pytest.approx(prefix.equity_curve)
+
+    def test_incremental_path_skips_prefix(self, monkeypatch):
+        """測試增量路徑不會調用 generate_signals"""
+        strategy = make_strategy(IncrementalSMAStrategy)
+
+        def fail(_data):
+            raise AssertionError("增量路徑不應重新切片歷史數據")
+
+        monkeypatch.setattr(strategy, "generate_signals", fail)
+        result = self._run(strategy)
+        assert len(result.equity_curve) == len(self.data) + 1
+
+    def test_warmup_bars(self):
+        """測試預熱K線只交給策略，不交易也不計入權益，兩條路徑結果一致"""
+        results = []
+        for cls in (IncrementalSMAStrategy, PrefixSMAStrategy):
+            config = BacktestConfig(
+                strategy=make_strategy(cls),
+                start_date=self.data.index[100].to_pydatetime(),
+                end_date=self.end,
+                warmup_bars=100,
+            )
+            results.append(BacktestEngine(config).run(self.data))
+        incremental, prefix = results
+
+        assert len(incremental.equity_curve) == len(self.data) - 100 + 1
+        assert incremental.total_trades > 0
+        assert min(trade["timestamp"] for trade in incremental.trades) >= self.data.index[100]
+        assert [t["timestamp"] for t in incremental.trades] == [t["timestamp"] for t in prefix.trades]
+        assert incremental.equity_curve == pytest.approx(prefix.equity_curve)
+
+    def test_shipped_sma_crossover_parity(self, monkeypatch):
+        """測試內置增量SMA交叉策略逐根 on_bar 的信號與每個前綴上 generate_signals 一致"""
+        from strategies.incremental_sma_crossover import IncrementalSMACrossoverStrategy
+
+        incremental = make_strategy(IncrementalSMACrossoverStrategy)
+        prefix = make_strategy(IncrementalSMACrossoverStrategy)
+        signals = 0
+        for i, bar in enumerate(self.data.itertuples()):
+            expected = prefix.generate_signals(self.data.iloc[: i + 1])
+            actual = incremental.on_bar(
+                Bar(bar.Index, bar.open, bar.high, bar.low, bar.close, bar.volume)
+            )
+            assert [(s.signal_type, s.price, s.metadata) for s in actual] == [
+                (s.signal_type, s.price, s.metadata) for s in expected
+            ]
+            signals += len(actual)
+        assert signals > 0
+
+        # 回測走增量路徑，交易與前綴路徑的參考策略一致
+        strategy = make_strategy(IncrementalSMACrossoverStrategy)
+        monkeypatch.setattr(strategy, "generate_signals", None)
+        result = self._run(strategy)
+        reference = self._run(make_strategy(PrefixSMAStrategy))
+        assert result.total_trades > 0
+        assert [t["timestamp"] for t in result.trades] == [t["timestamp"] for t in reference.trades]
+        assert result.final_capital == pytest.approx(reference.final_capital)
+
+        with pytest.raises(ValueError):
+            make_strategy(IncrementalSMACrossoverStrategy, fast=20, slow=5)
+
+    def test_rolling_mean_resize(self):
+        """測試滑動平均修改週期後與完整重算一致，加長超出緩衝區時使用歷史數據"""
+        closes = self.data["close"].to_numpy()
+        mean = RollingMean(10, capacity=30)
+        for value in closes[:100]:
+            mean.update(value)
+        assert mean.value == pytest.approx(closes[90:100].mean())
+
+        mean.resize(25)
+        assert mean.value == pytest.approx(closes[75:100].mean())
+        mean.resize(60, history=closes[:100])
+        assert mean.value == pytest.approx(closes[40:100].mean())
+
+        for value in closes[100:200]:
+            mean.update(value)
+        assert mean.value == pytest.approx(closes[140:200].mean())
+
+        with pytest.raises(ValueError):
+            mean.resize(0)
+        assert RollingMean(5).value is None
+
+
+class TestVectorizedBacktest:
+    """向量化回測測試"""
+
+    def setup_method(self):
+        self.data = make_ohlcv(n=2000, freq="15min")
+        self.start = self.data.index[0].to_pydatetime()
+        self.end = self.data.index[-1].to_pydatetime()
+        rng = np.random.default_rng(7)
+        self.signals = rng.choice([-1, 0, 0, 0, 0, 0, 0, 1], len(self.data))
+
+    def _reference_equity(self, positions, commission, slippage, max_position_size, trades=None):
+        """逐根K線的參考實現：倉位變化時按收盤價調倉，其餘K線持倉數量不變"""
+        cash, quantity, previous, entry = 10000.0, 0.0, 0.0, 0.0
+        equity = []
+        for price, target in zip(self.data["close"].to_numpy(), positions):
+            if target != previous:
+                value = (cash + quantity * price) * max_position_size * target
+                traded = value - quantity * price
+                fee = abs(traded) * (commission + slippage)
+                cash -= traded + fee
+                new_quantity = value / price
+                if trades is not None:
+                    pnl = 0.0 if traded > 0 else (price - entry) * -traded / price - fee
+                    trades.append((abs(new_quantity - quantity), pnl))
+                if new_quantity > quantity:
+                    entry = (entry * quantity + price * (new_quantity - quantity)) / new_quantity
+                quantity = new_quantity
+            previous = target
+            equity.append(cash + quantity * price)
+        return np.array(equity)
+
+    def test_signals_to_positions(self):
+        """測試信號轉換為倉位"""
+        positions = signals_to_positions(np.array([0, 1, 0, 0, -1, 0, 1]))
+        assert positions.tolist() == [0, 1, 1, 1, 0, 0, 1]
+
+    def test_matches_reference_loop(self):
+        """測試權益曲線與逐根參考實現一致"""
+        positions = signals_to_positions(self.signals) * 0.5
+        result = run_vectorized_backtest(
+            make_strategy(),
+            self.data,
+            self.start,
+            self.end,
+            commission=0.002,
+            slippage=0.0005,
+            max_position_size=0.8,
+            positions=positions,
+        )
+
+        expected = self._reference_equity(positions, 0.002, 0.0005, 0.8)
+        assert result.equity_curve[0] == 10000.0
+        assert np.allclose(result.equity_curve[1:], expected, rtol=1e-10)
+        assert result.final_capital == pytest.approx(expected[-1])
+
+        changes = np.count_nonzero(np.diff(np.concatenate(([0.0], positions))))
+        assert result.total_trades == changes
+
+        peak = np.maximum.accumulate(np.concatenate(([10000.0], expected)))
+        assert result.max_drawdown == pytest.approx(np.max((peak[1:] - expected) / peak[1:]))
+
+    def test_positions_changing_every_bar(self):
+        """測試倉位每根K線都變化時，權益和逐筆交易與參考實現一致"""
+        positions = np.random.default_rng(9).uniform(0, 1, len(self.data))
+        result = run_vectorized_backtest(
+            make_strategy(),
+            self.data,
+            self.start,
+            self.end,
+            commission=0.002,
+            slippage=0.0005,
+            max_position_size=0.8,
+            positions=positions,
+        )
+
+        trades = []
+        expected = self._reference_equity(positions, 0.002, 0.0005, 0.8, trades)
+        assert np.allclose(result.equity_curve[1:], expected, rtol=1e-10)
+        assert len(result.trades) == len(trades) == len(self.data)
+        reference = np.array(trades)
+        assert np.allclose(result.trades.quantity, reference[:, 0], rtol=1e-8)
+        assert np.allclose(result.trades.pnl, reference[:, 1], rtol=1e-8, atol=1e-9)
+
+    def test_strategy_positions(self):
+        """測試調用策略的 generate_positions"""
+        strategy = make_strategy()
+        strategy.generate_positions = lambda data: signals_to_positions(self.signals)
+        config = BacktestConfig(strategy=strategy, start_date=self.start, end_date=self.end)
+
+        result = VectorizedBacktestEngine(config).run(self.data)
+        assert len(result.equity_curve) == len(self.data) + 1
+        assert all(trade["action"] in ("買入", "平多") for trade in result.trades)
+
+    def test_local_day_boundaries(self):
+        """測試帶非UTC時區的數據按當地日期計算每日收益，與 BacktestEngine 一致"""
+        data = make_ohlcv(n=240).tz_localize("Asia/Taipei")
+        start = data.index[0].to_pydatetime()
+        end = data.index[-1].to_pydatetime()
+
+        strategy = make_strategy()
+        strategy.on_bar = lambda bar: []
+        config = BacktestConfig(strategy=strategy, start_date=start, end_date=end)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            vectorized = VectorizedBacktestEngine(config).run(data, np.zeros(len(data)))
+        event = BacktestEngine(config).run(data)
+
+        # 當地時間10天，按UTC分組會得到11天
+        assert len(vectorized.daily_returns) == len(event.daily_returns) == 9
+        assert vectorized.sharpe_ratio == event.sharpe_ratio
+        assert vectorized.volatility == event.volatility
+
+    def test_position_length_mismatch(self):
+        """測試倉位數組長度不一致時報錯"""
+        config = BacktestConfig(
+            strategy=make_strategy(), start_date=self.start, end_date=self.end
+        )
+        with pytest.raises(ValueError):
+            VectorizedBacktestEngine(config).run(self.data, np.zeros(10))
+
+
+class TestParameterSweep:
+    """參數掃描測試"""
+
+    def setup_method(self):
+        self.data = make_ohlcv(n=400)
+        self.start = self.data.index[0].to_pydatetime()
+        self.end = self.data.index[-1].to_pydatetime()
+        self.grid = {"fast_period": [3, 5], "slow_period": [15, 20]}
+
+    def test_expand_grid(self):
+        """測試參數網格展開"""
+        params = expand_grid(self.grid)
+        assert len(params) == 4
+        assert {"fast_period": 5, "slow_period": 15} in params
+        assert expand_grid([{"fast_period": 1}]) == [{"fast_period": 1}]
+
+    def test_shared_ohlcv_zero_copy(self):
+        """測試共享內存數據與原數據一致且不複製"""
+        with SharedOHLCV.from_dataframe(self.data) as shared:
+            attached = SharedOHLCV.attach(shared.handle)
+            frame = attached.to_dataframe()
+            assert frame.equals(self.data[["open", "high", "low", "close", "volume"]])
+            assert np.shares_memory(frame["close"].to_numpy(), attached.values)
+            del frame
+            attached.close()
+
+    def test_sweep_matches_serial_backtests(self):
+        """測試並行掃描結果與逐個回測一致並按指標排序"""
+        sweep = ParameterSweep(
+            make_sma_strategy,
+            self.grid,
+            self.data,
+            self.start,
+            self.end,
+            max_workers=2,
+            rank_by="total_return",
+        )
+        table = sweep.run()
+
+        assert len(table) == 4
+        assert table["error"].isna().all()
+        assert table["total_return"].is_monotonic_decreasing
+
+        for _, row in table.iterrows():
+            expected = run_backtest(
+                make_sma_strategy(int(row["fast_period"]), int(row["slow_period"])),
+                self.data,
+                self.start,
+                self.end,
+            )
+            assert row["final_capital"] == pytest.approx(expected.final_capital)
+
+    def test_sweep_cancel(self):
+        """測試取消後不再產出結果"""
+        sweep = ParameterSweep(
+            make_sma_strategy,
+            {"fast_period": [2, 3, 4, 5], "slow_period": [10, 15, 20, 25]},
+            self.data,
+            self.start,
+            self.end,
+            max_workers=1,
+        )
+        received = []
+        for result in sweep.iter_results():
+            received.append(result)
+            sweep.cancel()
+
+        assert sweep.cancelled
+        assert len(received) < 16
+
+    def test_worker_crash_keeps_params(self):
+        """測試工作進程崩潰時失敗結果仍帶有對應的參數"""
+        sweep = ParameterSweep(
+            make_crashing_strategy,
+            {"fast_period": [3], "slow_period": [15]},
+            self.data,
+            self.start,
+            self.end,
+            max_workers=1,
+        )
+        results = list(sweep.iter_results())
+        assert len(results) == 1
+        assert results[0].params == {"fast_period": 3, "slow_period": 15}
+        assert results[0].error
+
+
+class TestWalkForward:
+    """前推優化測試"""
+
+    def setup_method(self):
+        self.data = make_ohlcv(n=700)
+        self.grid = {"fast_period": [3, 5], "slow_period": [15, 20]}
+
+    def test_rolling_folds(self):
+        """測試滾動窗口切分"""
+        folds = make_folds(700, 300, 100)
+        assert len(folds) == 4
+        assert all(f.in_sample_end - f.in_sample_start == 300 for f in folds)
+        assert all(f.out_of_sample_start == f.in_sample_end for f in folds)
+        assert folds[-1].out_of_sample_end == 700
+
+    def test_anchored_folds(self):
+        """測試錨定窗口切分"""
+        folds = make_folds(700, 300, 100, anchored=True)
+        assert all(f.in_sample_start == 0 for f in folds)
+        assert [f.in_sample_end for f in folds] == [300, 400, 500, 600]
+
+    def test_overlapping_oos_is_rejected(self):
+        """測試步長小於樣本外窗口時拒絕切分，步長更大時樣本外窗口之間留空"""
+        with pytest.raises(ValueError):
+            make_folds(700, 300, 100, step_bars=50)
+
+        folds = make_folds(700, 300, 100, step_bars=150)
+        assert [(f.out_of_sample_start, f.out_of_sample_end) for f in folds] == [(300, 400), (450, 550), (600, 700)]
+
+    def test_walk_forward_stitches_oos(self):
+        """測試各折樣本外結果拼接為連續權益曲線"""
+        optimizer = WalkForwardOptimizer(
+            make_sma_strategy,
+            self.grid,
+            self.data,
+            in_sample_bars=300,
+            out_of_sample_bars=200,
+            max_workers=2,
+            rank_by="total_return",
+        )
+        result = optimizer.run()
+
+        assert len(result.folds) == 2
+        assert all(fold.error is None for fold in result.folds)
+        combined = result.combined
+        assert len(combined.equity_curve) == 1 + 2 * 200
+        assert combined.start_date == self.data.index[300]
+
+        # 拼接後的期末資金等於各折收益率連乘
+        growth = np.prod([1 + f.out_of_sample.total_return for f in result.folds])
+        assert combined.final_capital == pytest.approx(10000.0 * growth)
+
+        # 每折的最優參數確實是樣本內收益最高的組合
+        first = result.folds[0]
+        in_sample = self.data.iloc[:300]
+        returns = {
+            (p["fast_period"], p["slow_period"]): run_backtest(
+                make_sma_strategy(**p),
+                in_sample,
+                in_sample.index[0].to_pydatetime(),
+                in_sample.index[-1].to_pydatetime(),
+            ).total_return
+            for p in expand_grid(self.grid)
+        }
+        best = max(returns, key=returns.get)
+        assert (first.best_params["fast_period"], first.best_params["slow_period"]) == best
+        assert len(result.summary()) == 2
+
+
+    def test_oos_warms_up_from_in_sample(self):
+        """測試樣本外回測用樣本內末尾的K線預熱，交易和權益從樣本外開始記錄"""
+        optimizer = WalkForwardOptimizer(
+            make_sma_strategy,
+            self.grid,
+            self.data,
+            in_sample_bars=300,
+            out_of_sample_bars=200,
+            max_workers=1,
+            warmup_bars=50,
+        )
+        first = optimizer.run().folds[0]
+        oos = first.out_of_sample
+
+        window = self.data.iloc[250:500]
+        config = BacktestConfig(
+            strategy=make_sma_strategy(**first.best_params),
+            start_date=self.data.index[300].to_pydatetime(),
+            end_date=window.index[-1].to_pydatetime(),
+            warmup_bars=50,
+        )
+        expected = BacktestEngine(config).run(window)
+
+        assert oos.start_date == self.data.index[300]
+        assert len(oos.equity_curve) == 1 + 200
+        assert oos.final_capital == pytest.approx(expected.final_capital)
+        assert all(trade["timestamp"] >= self.data.index[300] for trade in oos.trades)
+
+class TestMonteCarlo:
+    """蒙特卡洛模擬測試"""
+
+    def setup_method(self):
+        rng = np.random.default_rng(3)
+        pnl = rng.normal(10, 100, 300)
+        trades = []
+        for value in pnl:
+            trades.append({"action": "買入", "pnl": 0.0})
+            trades.append({"action": "平多", "pnl": float(value)})
+
+        self.result = BacktestResult(
+            strategy_name="MC",
+            start_date=datetime(2023, 1, 1),
+            end_date=datetime(2024, 1, 1),
+            initial_capital=10000.0,
+            final_capital=10000.0 + pnl.sum(),
+            daily_returns=rng.normal(0.0005, 0.01, 365).tolist(),
+            trades=trades,
+        )
+        self.pnl = pnl
+
+    def test_trade_reshuffle_preserves_final_capital(self):
+        """測試交易重排不改變期末資金但改變回撤"""
+        mc = run_monte_carlo(self.result, n_paths=500, method="trade_reshuffle", seed=1)
+        assert mc.n_paths == 500
+        assert np.allclose(mc.final_capital, 10000.0 + self.pnl.sum())
+        assert mc.max_drawdown.std() > 0
+
+    def test_daily_bootstrap_distribution(self):
+        """測試每日收益自助法的分佈統計"""
+        mc = run_monte_carlo(self.result, n_paths=2000, method="daily_bootstrap", seed=1)
+        table = mc.percentiles()
+        assert list(table.index) == ["p5", "p25", "p50", "p75", "p95"]
+        assert table["final_capital"].is_monotonic_increasing
+        assert (mc.max_drawdown >= 0).all() and (mc.max_drawdown < 1).all()
+        assert 0.0 <= mc.probability_of_loss <= 1.0
+
+    def test_chunking_is_deterministic(self):
+        """測試分塊計算與單塊計算在相同種子下結果一致"""
+        small = MonteCarloSimulator(
+            self.result, n_paths=300, method="trade_bootstrap", seed=5, max_chunk_bytes=10_000
+        )
+        assert len(small._chunk_sizes()) > 1
+        first = small.run()
+        single = MonteCarloSimulator(
+            self.result, n_paths=300, method="trade_bootstrap", seed=5, max_chunk_bytes=1 << 30
+        )
+        assert len(single._chunk_sizes()) == 1
+        second = single.run()
+        assert np.array_equal(first.final_capital, second.final_capital)
+
+
+class TestTradeLedger:
+    """列式交易賬本測試"""
+
+    def setup_method(self):
+        rng = np.random.default_rng(11)
+        times = pd.date_range("2024-01-01", periods=200, freq="1h", tz="UTC")
+        self.records = []
+        for i, ts in enumerate(times):
+            self.records.append(
+                {
+                    "timestamp": ts,
+                    "action": "買入" if i % 2 == 0 else "平多",
+                    "price": float(100 + i),
+                    "quantity": 1.5,
+                    "commission": 0.1,
+                    "slippage": 0.01,
+                    "capital": 10000.0 + i,
+                    "signal_strength": 0.8,
+                    "pnl": 0.0 if i % 2 == 0 else float(rng.normal(5, 20)),
+                }
+            )
+        self.ledger = TradeLedger(capacity=4)
+        for record in self.records:
+            self.ledger.append(record)
+
+    def test_growth_and_dict_view(self):
+        """測試超出容量後擴容，並保持字典視圖兼容"""
+        assert len(self.ledger) == 200
+        assert self.ledger[0] == self.records[0]
+        assert self.ledger[-1] == self.records[-1]
+        assert list(self.ledger)[5] == self.records[5]
+        assert self.ledger[10:12] == self.records[10:12]
+        with pytest.raises(IndexError):
+            self.ledger[200]
+
+    def test_statistics_match_dicts(self):
+        """測試向量化統計與逐筆計算一致"""
+        pnl = [r["pnl"] for r in self.records]
+        assert self.ledger.winning_count == sum(1 for p in pnl if p > 0)
+        assert self.ledger.losing_count == sum(1 for p in pnl if p < 0)
+        assert self.ledger.total_pnl == pytest.approx(sum(pnl))
+        profit = sum(p for p in pnl if p > 0)
+        loss = -sum(p for p in pnl if p < 0)
+        assert self.ledger.profit_factor() == pytest.approx(profit / loss)
+        assert self.ledger.mask("買入").sum() == 100
+
+    def test_to_dataframe_is_zero_copy(self):
+        """測試導出的數值列直接引用賬本數組"""
+        df = self.ledger.to_dataframe()
+        assert len(df) == 200
+        assert np.shares_memory(df["pnl"].to_numpy(), self.ledger.pnl)
+        assert df["timestamp"].iloc[3] == self.records[3]["timestamp"]
+        assert df["action"].iloc[1] == "平多"
+
+    def test_extend_with_scale_and_pickle(self):
+        """測試按比例合併賬本及序列化"""
+        combined = TradeLedger()
+        combined.extend(self.ledger, scale=2.0)
+        combined.extend(self.records[:2])
+        assert len(combined) == 202
+        expected = 2 * self.ledger.total_pnl + self.records[1]["pnl"]
+        assert combined.total_pnl == pytest.approx(expected)
+        assert combined[0]["price"] == self.records[0]["price"]
+
+        restored = pickle.loads(pickle.dumps(combined))
+        assert len(restored) == 202
+        assert restored[-1] == self.records[1]
+        restored.append(self.records[3])
+        assert len(restored) == 203
+
+    def test_engine_records_into_ledger(self):
+        """測試回測引擎使用賬本記錄交易"""
+        data = make_ohlcv(400)
+        result = run_backtest(
+            make_strategy(), data, data.index[0], data.index[-1]
+        )
+        assert isinstance(result.trades, TradeLedger)
+        assert result.total_trades == len(result.trades)
+        assert result.total_pnl == pytest.approx(
+            sum(trade["pnl"] for trade in result.trades)
+        )
+
+
+class TestStreamingMetrics:
+    """流式績效統計測試"""
+
+    def test_float_buffer_growth(self):
+        """測試緩衝區擴容後數據保持不變"""
+        buffer = FloatBuffer(capacity=2, initial=[1.0])
+        for i in range(100):
+            buffer.append(float(i))
+        buffer.extend(np.arange(3.0))
+        assert len(buffer) == 104
+        assert buffer[-1] == 2.0 and buffer[1] == 0.0
+        assert buffer.capacity >= 104
+        assert np.array_equal(np.asarray(buffer)[1:101], np.arange(100.0))
+
+    def test_welford_matches_numpy(self):
+        """測試逐個更新與批量合併的統計量和 numpy 一致"""
+        returns = np.random.default_rng(5).normal(0.001, 0.02, 1000)
+        streaming = ReturnStatistics()
+        for value in returns:
+            streaming.update(value)
+        merged = ReturnStatistics()
+        merged.update_many(returns[:300])
+        merged.update_many(returns[300:])
+
+        negative = returns[returns < 0]
+        expected_sharpe = returns.mean() / returns.std() * np.sqrt(252)
+        expected_sortino = returns.mean() / negative.std() * np.sqrt(252)
+        for stats in (streaming, merged):
+            assert stats.volatility == pytest.approx(returns.std() * np.sqrt(252))
+            assert stats.sharpe_ratio == pytest.approx(expected_sharpe)
+            assert stats.sortino_ratio == pytest.approx(expected_sortino)
+
+    def test_engine_metrics_available_during_run(self):
+        """測試回測過程中可以隨時讀取指標，結束時與結果一致"""
+        data = make_ohlcv(24 * 30)
+        config = BacktestConfig(
+            strategy=make_strategy(),
+            start_date=data.index[0],
+            end_date=data.index[-1],
+        )
+        engine = BacktestEngine(config)
+        snapshots = []
+        original_step = engine._step
+
+        def step(*args):
+            date = original_step(*args)
+            snapshots.append(engine.current_metrics())
+            return date
+
+        engine._step = step
+        result = engine.run(data)
+
+        assert len(snapshots) == len(data)
+        assert snapshots[-1]["bars"] == len(data)
+        assert snapshots[-1]["sharpe_ratio"] == pytest.approx(result.sharpe_ratio)
+        assert engine.equity_curve.capacity == len(data) + 1
+        returns = np.asarray(result.daily_returns)
+        assert result.volatility == pytest.approx(returns.std() * np.sqrt(252))
+
+    def test_progress_callback(self, tmp_path):
+        """測試進度回調按間隔觸發，最後一次為全部K線；緩存命中時只回調一次"""
+        data = make_ohlcv(500)
+        events = []
+
+        def on_progress(processed, total, metrics):
+            events.append((processed, total, metrics["equity"]))
+
+        cache = BacktestCache(str(tmp_path))
+        result = run_backtest(
+            make_strategy(), data, data.index[0], data.index[-1],
+            cache=cache, progress_callback=on_progress,
+        )
+        assert [processed for processed, _, _ in events] == list(range(5, 501, 5))
+        assert events[-1] == (500, 500, result.final_capital)
+
+        events.clear()
+        run_backtest(
+            make_strategy(), data, data.index[0], data.index[-1],
+            cache=cache, progress_callback=on_progress,
+        )
+        assert events == [(500, 500, result.final_capital)]
+
+
+class TestCandleStore:
+    """本地K線存儲測試"""
+
+    def setup_method(self):
+        self.data = make_ohlcv(24 * 90, seed=8)
+
+    def test_range_read_matches_mask(self, tmp_path):
+        """測試按日期範圍讀取與布爾掩碼過濾一致"""
+        store = CandleStore(tmp_path)
+        store.write("BTCUSDT", self.data)
+        assert store.symbols() == ["BTCUSDT"]
+        assert store.partitions("BTCUSDT") == ["2024-01", "2024-02", "2024-03"]
+
+        start, end = datetime(2024, 1, 20, 5), datetime(2024, 2, 10, 12)
+        expected = self.data[(self.data.index >= start) & (self.data.index <= end)]
+        loaded = store.read("BTCUSDT", start, end)
+        expected.index = expected.index.as_unit("ns")
+        pd.testing.assert_frame_equal(loaded, expected, check_freq=False)
+
+        # 單個分區內的讀取直接引用內存映射
+        single = store.read("BTCUSDT", datetime(2024, 2, 1), datetime(2024, 2, 3))
+        assert len(single) == 24 * 2 + 1
+        base = single["close"].to_numpy()
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        assert isinstance(base, np.memmap)
+
+    def test_write_merges_and_overrides(self, tmp_path):
+        """測試重複寫入按時間戳去重，新數據優先"""
+        store = CandleStore(tmp_path)
+        store.write("BTCUSDT", self.data.iloc[:1000])
+        updated = self.data.iloc[900:].copy()
+        updated["close"] += 1.0
+        store.write("BTCUSDT", updated)
+
+        loaded = store.read("BTCUSDT")
+        assert len(loaded) == len(self.data)
+        assert loaded["close"].iloc[899] == self.data["close"].iloc[899]
+        assert loaded["close"].iloc[900] == self.data["close"].iloc[900] + 1.0
+        assert store.time_range("BTCUSDT") == (self.data.index[0], self.data.index[-1])
+
+    def test_timezone_aware_data(self, tmp_path):
+        """測試帶時區的數據按 UTC 存儲並還原時區"""
+        data = self.data.tz_localize("UTC").tz_convert("Asia/Taipei")
+        store = CandleStore(tmp_path)
+        store.write("ETHUSDT", data)
+        loaded = store.read("ETHUSDT", data.index[100], data.index[200])
+        assert str(loaded.index.tz) == "Asia/Taipei"
+        assert loaded.index[0] == data.index[100] and len(loaded) == 101
+        with pytest.raises(ValueError):
+            store.write("ETHUSDT", self.data)
+
+    def test_backtest_from_store(self, tmp_path):
+        """測試回測直接讀取存儲中的日期範圍"""
+        store = CandleStore(tmp_path)
+        store.write("BTCUSDT", self.data)
+        start, end = datetime(2024, 1, 15), datetime(2024, 2, 15)
+
+        from_store = run_backtest(make_strategy(), store, start, end, symbol="BTCUSDT")
+        from_frame = run_backtest(make_strategy(), self.data, start, end)
+        assert from_store.final_capital == pytest.approx(from_frame.final_capital)
+        assert from_store.total_trades == from_frame.total_trades
+        with pytest.raises(ValueError):
+            run_backtest(make_strategy(), store, start, end)
+
+
+class TestBacktestCache:
+    """回測結果緩存測試"""
+
+    def setup_method(self):
+        self.data = make_ohlcv(400, seed=12)
+        self.start = self.data.index[0]
+        self.end = self.data.index[-1]
+
+    def test_hit_returns_same_result(self, tmp_path):
+        """測試相同輸入第二次回測命中緩存"""
+        cache = BacktestCache(str(tmp_path))
+        first = run_backtest(make_strategy(), self.data, self.start, self.end, cache=cache)
+        renamed = make_strategy()
+        renamed.name = "renamed"
+        second = run_backtest(renamed, self.data, self.start, self.end, cache=cache)
+
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.writes) == (1, 1, 1)
+        assert second.final_capital == first.final_capital
+        assert len(second.trades) == len(first.trades)
+        assert second.strategy_name == "renamed"
+
+    def test_key_covers_inputs(self, tmp_path):
+        """測試數據、參數和成本變化都會生成新的緩存鍵"""
+        cache = BacktestCache(str(tmp_path))
+        run_backtest(make_strategy(), self.data, self.start, self.end, cache=cache)
+        run_backtest(
+            make_strategy(), self.data, self.start, self.end, commission=0.002, cache=cache
+        )
+        run_backtest(make_strategy(fast=6), self.data, self.start, self.end, cache=cache)
+        changed = self.data.copy()
+        changed.iloc[-1, changed.columns.get_loc("close")] += 1.0
+        run_backtest(make_strategy(), changed, self.start, self.end, cache=cache)
+        assert cache.stats().misses == 4 and len(cache) == 4
+
+    def test_key_covers_strategy_code(self, tmp_path, monkeypatch):
+        """測試修改策略源代碼後生成新的緩存鍵"""
+        module_path = tmp_path / "edited_strategy.py"
+        module_path.write_text(
+            "from strategies.base import BaseStrategy\n\n"
+            "class EditedStrategy(BaseStrategy):\n"
+            "    def generate_signals(self, data):\n"
+            "        return []\n"
+        )
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, "edited_strategy", raising=False)
+        module = importlib.import_module("edited_strategy")
+
+        strategy = module.EditedStrategy(make_strategy().config)
+        config = BacktestConfig(strategy=strategy, start_date=self.start, end_date=self.end)
+        key = make_cache_key(self.data, config)
+        assert make_cache_key(self.data, config) == key
+
+        module_path.write_text(module_path.read_text().replace("return []", "return list()"))
+        assert make_cache_key(self.data, config) != key
+
+    def test_lru_eviction_and_reload(self, tmp_path):
+        """測試超過大小上限時淘汰最久未使用的結果，重新打開後索引保留"""
+        cache = BacktestCache(str(tmp_path), max_bytes=10_000)
+        cache.put("a", b"x" * 4000)
+        cache.put("b", b"x" * 4000)
+        assert cache.get("a") is not None
+        cache.put("c", b"x" * 4000)
+
+        assert "b" not in cache and "a" in cache and "c" in cache
+        assert cache.stats().evictions == 1
+        reopened = BacktestCache(str(tmp_path), max_bytes=10_000)
+        assert len(reopened) == 2 and reopened.get("c") == b"x" * 4000
+
+    def test_shared_directory(self, tmp_path):
+        """測試共用目錄的多個緩存實例互相讀到結果，並按目錄總大小淘汰"""
+        first = BacktestCache(str(tmp_path), max_bytes=10_000)
+        second = BacktestCache(str(tmp_path), max_bytes=10_000)
+        first.put("a", b"x" * 4000)
+        assert "a" in second and second.get("a") == b"x" * 4000
+
+        second.put("b", b"x" * 4000)
+        first.put("c", b"x" * 4000)
+        assert sorted(os.listdir(tmp_path)) == ["b.pkl", "c.pkl"]
+        assert first.get("a") is None and first.get("b") == b"x" * 4000
+        assert first.stats().errors == 0
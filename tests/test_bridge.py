@@ -0,0 +1,1075 @@
+"""
+Rust橋接模塊測試
+
+測試常駐工作進程的幀協議和請求分發。
+"""
+
+import pytest
+import io
+import numpy as np
+import pandas as pd
+import json
+import struct
+import subprocess
+import sys
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+# 添加Python策略層目錄到路徑
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PYTHON_DIR = os.path.join(PROJECT_ROOT, "python")
+sys.path.append(PYTHON_DIR)
+
+from bridge.rust_bridge import (
+    read_frame,
+    write_frame,
+    StrategyManager,
+    serve_worker,
+    strategy_manager,
+    append_market_data,
+    create_strategy_from_json,
+    generate_signals,
+    generate_signals_batch,
+    resync_market_data,
+    run_backtest_from_json,
+    stream_backtest,
+    get_bridge_metrics,
+    handle_worker_request,
+    load_strategy_class,
+    register_strategy,
+    _align_timezone,
+    _bar_at,
+)
+from bridge.codec import available_codecs, get_codec, negotiate_codec
+from bridge.market_data import encode_columnar, parse_market_data, write_columnar
+from bridge.jobs import BacktestJobManager
+from bridge.metrics import Histogram, bridge_metrics
+from bridge.rolling_window import RollingWindow
+from bridge.snapshot import SNAPSHOT_MAGIC, SnapshotError
+from backtest.incremental import ReconfigurableStrategy, RollingMean
+from strategies.base import BaseStrategy, SignalType, StrategyConfig, StrategySignal
+
+
+STRATEGY_CONFIG = {
+    "name": "SMA_Bridge_Test",
+    "symbol": "BTCUSDT",
+    "timeframe": "1h",
+    "parameters": {"fast_period": 5, "slow_period": 20},
+    "risk_params": {"stop_loss": 0.02},
+}
+
+
+def make_market_data(n: int = 30, start_index: int = 0) -> str:
+    """生成JSON格式的K線數據，價格為鋸齒形以產生交叉信號"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(start_index, start_index + n):
+        price = 100.0 + abs(i % 40 - 20)
+        rows.append(
+            {
+                "timestamp": (start + timedelta(hours=i)).isoformat(),
+                "open": price,
+                "high": price + 1,
+                "low": price - 1,
+                "close": price,
+                "volume": 10.0,
+            }
+        )
+    return json.dumps(rows)
+
+
+def encode_request(function: str, *args: str) -> bytes:
+    payload = json.dumps({"function": function, "args": list(args)}).encode("utf-8")
+    return struct.pack(">I", len(payload)) + payload
+
+
+class TestWorkerProtocol:
+    """工作進程幀協議測試"""
+
+    def teardown_method(self):
+        strategy_manager.remove_strategy(STRATEGY_CONFIG["name"])
+
+    def test_frame_round_trip(self):
+        """測試幀的寫入和讀取"""
+        stream = io.BytesIO()
+        write_frame(stream, b"hello")
+        write_frame(stream, b"")
+        stream.seek(0)
+        assert read_frame(stream) == b"hello"
+        assert read_frame(stream) == b""
+        assert read_frame(stream) is None
+
+    def test_serve_worker_dispatch(self):
+        """測試請求按順序分發並保持策略狀態"""
+        requests = io.BytesIO(
+            encode_request("ping")
+            + encode_request("create_strategy_from_json", json.dumps(STRATEGY_CONFIG))
+            + encode_request("list_strategies")
+            + encode_request("generate_signals", STRATEGY_CONFIG["name"], make_market_data())
+            + encode_request("no_such_function")
+            + encode_request("shutdown")
+            + encode_request("ping")
+        )
+        responses = io.BytesIO()
+        serve_worker(requests, responses)
+
+        responses.seek(0)
+        frames = []
+        while True:
+            frame = read_frame(responses)
+            if frame is None:
+                break
+            frames.append(json.loads(frame))
+
+        assert frames[0] == "pong"
+        assert frames[1] == STRATEGY_CONFIG["name"]
+        assert STRATEGY_CONFIG["name"] in frames[2]
+        assert isinstance(frames[3], list)
+        assert "error" in frames[4]
+        # shutdown 之後的請求不再處理
+        assert frames[5] == "bye" and len(frames) == 6
+
+
+class TestWorkerProcess:
+    """常駐工作進程測試"""
+
+    def setup_method(self):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(PYTHON_DIR, "bridge", "rust_bridge.py"), "--worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def teardown_method(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+    def call(self, function: str, *args: str):
+        self.process.stdin.write(encode_request(function, *args))
+        self.process.stdin.flush()
+        return json.loads(read_frame(self.process.stdout))
+
+    def test_strategy_survives_between_calls(self):
+        """測試策略在多次調用之間保持"""
+        assert self.call("create_strategy_from_json", json.dumps(STRATEGY_CONFIG)) == (
+            STRATEGY_CONFIG["name"]
+        )
+        market_data = make_market_data()
+        self.call("generate_signals", STRATEGY_CONFIG["name"], market_data)
+
+        for _ in range(20):
+            signals = self.call("generate_signals", STRATEGY_CONFIG["name"], market_data)
+
+        assert isinstance(signals, list)
+        assert self.call("shutdown") == "bye"
+        assert self.process.wait(timeout=10) == 0
+
+
+class TestLazyImports:
+    """延遲導入測試"""
+
+    def run_fresh(self, code: str) -> str:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            path for path in (PYTHON_DIR, env.get("PYTHONPATH")) if path
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=60
+        )
+        assert completed.returncode == 0, completed.stderr
+        return completed.stdout.strip()
+
+    def test_metadata_calls_do_not_load_pandas(self):
+        """測試查詢策略列表和信息不加載 pandas、NumPy 和策略模塊"""
+        loaded = self.run_fresh(
+            "import sys, bridge\n"
+            "from bridge.rust_bridge import list_strategies, get_strategy_info\n"
+            "list_strategies(); get_strategy_info('missing')\n"
+            "print(','.join(m for m in ('pandas', 'numpy', 'strategies.sma_crossover', "
+            "'multiprocessing') if m in sys.modules))"
+        )
+        assert loaded == ""
+
+    def test_package_exports_resolve_on_access(self):
+        """測試包級導出名稱在訪問時導入"""
+        output = self.run_fresh(
+            "import sys, bridge, backtest\n"
+            "print('pandas' in sys.modules)\n"
+            "print(bridge.RollingWindow.__module__, backtest.BacktestEngine.__module__)\n"
+            "print('RollingWindow' in dir(bridge))"
+        )
+        assert output.splitlines() == [
+            "False",
+            "bridge.rolling_window backtest.engine",
+            "True",
+        ]
+
+    def test_register_strategy(self):
+        """測試按模塊路徑註冊策略，類在創建時才加載"""
+        from bridge import rust_bridge
+
+        try:
+            register_strategy("Counting_Test", f"{__name__}:CountingStrategy")
+            assert "counting_test" not in rust_bridge._strategy_classes
+            assert load_strategy_class("counting_test") is CountingStrategy
+
+            register_strategy("counting_test", CountingStrategy)
+            assert load_strategy_class("counting_test") is CountingStrategy
+        finally:
+            rust_bridge.STRATEGY_REGISTRY.pop("counting_test", None)
+            rust_bridge._strategy_classes.pop("counting_test", None)
+
+        with pytest.raises(ValueError):
+            load_strategy_class("no_such_strategy")
+
+
+class TestBridgeMetrics:
+    """橋接調用指標測試"""
+
+    def setup_method(self):
+        bridge_metrics.reset()
+        create_strategy_from_json(json.dumps(STRATEGY_CONFIG))
+
+    def teardown_method(self):
+        bridge_metrics.close_trace()
+
+    def test_histogram_percentiles_within_precision(self):
+        """測試分位數的相對誤差不超過子桶精度"""
+        values = np.random.default_rng(0).integers(0, 10**7, 50000)
+        histogram = Histogram()
+        for value in values:
+            histogram.record(int(value))
+
+        for percent in (50, 90, 99, 99.9):
+            exact = np.percentile(values, percent, method="inverted_cdf")
+            assert abs(histogram.percentile(percent) - exact) <= exact / 128 + 1
+        assert histogram.percentile(100) == values.max()
+        assert Histogram().percentile(50) == 0
+
+    def test_signal_phases_and_errors(self):
+        """測試生成信號記錄分階段耗時、負載大小和錯誤次數"""
+        market_data = make_market_data()
+        output = generate_signals(STRATEGY_CONFIG["name"], market_data)
+        generate_signals("missing", market_data)
+
+        metrics = json.loads(get_bridge_metrics())["functions"]["generate_signals"]
+        assert metrics["calls"] == 2 and metrics["errors"] == 1
+        assert set(metrics["phases_us"]) == {"parse", "compute", "serialize"}
+        assert metrics["phases_us"]["parse"]["count"] == 1
+        assert metrics["bytes_in"]["max"] == len(STRATEGY_CONFIG["name"]) + len(market_data)
+        assert metrics["bytes_out"]["min"] <= len(output)
+        assert "get_bridge_metrics" not in json.loads(get_bridge_metrics())["functions"]
+
+        json.loads(get_bridge_metrics(reset=True))
+        assert json.loads(get_bridge_metrics())["functions"] == {}
+
+    def test_trace_file(self, tmp_path):
+        """測試每次調用寫入一行跟蹤記錄"""
+        path = str(tmp_path / "bridge-trace.jsonl")
+        bridge_metrics.open_trace(path)
+        generate_signals(STRATEGY_CONFIG["name"], make_market_data())
+        generate_signals("missing", make_market_data())
+        bridge_metrics.close_trace()
+
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert [line["function"] for line in lines] == ["generate_signals"] * 2
+        assert lines[0]["error"] is None and "missing" in lines[1]["error"]
+        assert set(lines[0]["phases_us"]) == {"parse", "compute", "serialize"}
+
+    def test_worker_request(self):
+        """測試通過工作進程協議讀取並清空指標"""
+        generate_signals(STRATEGY_CONFIG["name"], make_market_data())
+        payload = json.dumps({"function": "get_bridge_metrics", "args": ["1"]}).encode("utf-8")
+        snapshot = json.loads(handle_worker_request(payload))
+        assert snapshot["functions"]["generate_signals"]["calls"] == 1
+        assert bridge_metrics.snapshot()["functions"] == {}
+
+
+class CountingStrategy(BaseStrategy):
+    """記錄收到的K線的增量策略"""
+
+    def __init__(self, config: StrategyConfig):
+        super().__init__(config)
+        self.bars = []
+
+    def reset(self):
+        super().reset()
+        self.bars = []
+
+    def on_bar(self, bar):
+        self.bars.append(bar)
+        return []
+
+    def generate_signals(self, data):
+        return []
+
+
+class EvaluatingStrategy(BaseStrategy):
+    """記錄每次評估時窗口末尾收盤價的非增量策略"""
+
+    def __init__(self, config: StrategyConfig):
+        super().__init__(config)
+        self.closes = []
+
+    def generate_signals(self, data):
+        self.closes.append(data["close"].iloc[-1])
+        return []
+
+
+class HotSMAStrategy(ReconfigurableStrategy, BaseStrategy):
+    """可熱更新均線週期的增量SMA交叉策略"""
+
+    HOT_PARAMETERS = frozenset({"fast_period", "slow_period"})
+
+    def reset(self):
+        super().reset()
+        self.fast = RollingMean(self.parameters["fast_period"], capacity=50)
+        self.slow = RollingMean(self.parameters["slow_period"], capacity=50)
+        self.previous = None
+        self.rebuilt = []
+
+    def on_bar(self, bar):
+        fast, slow = self.fast.update(bar.close), self.slow.update(bar.close)
+        previous, self.previous = self.previous, (fast, slow)
+        if previous is None or None in previous or slow is None:
+            return []
+        if previous[0] <= previous[1] and fast > slow:
+            return [StrategySignal(self.symbol, SignalType.BUY, 1.0, bar.close)]
+        if previous[0] >= previous[1] and fast < slow:
+            return [StrategySignal(self.symbol, SignalType.SELL, 1.0, bar.close)]
+        return []
+
+    def generate_signals(self, data):
+        return []
+
+    def reconfigure(self, changes, history=None):
+        if any(int(value) < 1 for value in changes.values()):
+            raise ValueError(f"週期必須大於0: {changes}")
+        closes = None if history is None else history["close"].to_numpy()
+        for name, mean in (("fast_period", self.fast), ("slow_period", self.slow)):
+            if name in changes:
+                mean.resize(int(changes[name]), closes)
+                self.rebuilt.append(name)
+        self.previous = (self.fast.value, self.slow.value)
+
+
+class TestIncrementalSignals:
+    """增量信號接口測試"""
+
+    def setup_method(self):
+        create_strategy_from_json(json.dumps(STRATEGY_CONFIG))
+        self.strategy_id = STRATEGY_CONFIG["name"]
+
+    def teardown_method(self):
+        strategy_manager.remove_strategy(self.strategy_id)
+        strategy_manager.remove_strategy("Counting")
+
+    def test_append_matches_full_window(self):
+        """測試逐根追加得到的信號與每次傳入完整歷史一致"""
+        history = json.loads(make_market_data(200))
+        resync_market_data(self.strategy_id, json.dumps(history[:50]))
+
+        for i in range(50, 200):
+            appended = json.loads(append_market_data(self.strategy_id, json.dumps(history[i : i + 1])))
+            full = json.loads(generate_signals(self.strategy_id, json.dumps(history[: i + 1])))
+            # 信號時間戳是生成時刻，不參與比較
+            for signal in appended + full:
+                signal.pop("timestamp")
+            assert appended == full
+
+        assert len(strategy_manager.windows[self.strategy_id]) == 200
+
+    def test_gap_requires_resync(self):
+        """測試K線缺口和未同步的窗口要求重新同步"""
+        history = json.loads(make_market_data(60))
+        result = json.loads(append_market_data(self.strategy_id, json.dumps(history[:1])))
+        assert result["resync_required"]
+
+        resync_market_data(self.strategy_id, json.dumps(history[:40]))
+        result = json.loads(append_market_data(self.strategy_id, json.dumps(history[45:46])))
+        assert result["resync_required"]
+
+        resync_market_data(self.strategy_id, json.dumps(history[:46]))
+        assert isinstance(json.loads(append_market_data(self.strategy_id, json.dumps(history[46:47]))), list)
+
+    def test_window_is_bounded(self):
+        """測試窗口長度固定，重複時間戳覆蓋最後一根K線"""
+        history = json.loads(make_market_data(120))
+        resync_market_data(self.strategy_id, json.dumps(history[:30]), 25)
+        for i in range(30, 120):
+            append_market_data(self.strategy_id, json.dumps(history[i : i + 1]))
+
+        update = dict(history[-1], close=999.0)
+        append_market_data(self.strategy_id, json.dumps([update]))
+
+        frame = strategy_manager.windows[self.strategy_id].frame()
+        expected = parse_market_data(json.dumps(history[-25:]))
+        assert len(frame) == 25
+        assert frame.index.equals(expected.index)
+        assert frame["close"].iloc[-1] == 999.0
+
+    def test_incremental_strategy_receives_only_closed_bars(self):
+        """測試支持 on_bar 的策略只處理已收盤K線，同步時重新預熱"""
+        config = StrategyConfig(name="Counting", symbol="BTCUSDT", timeframe="1h")
+        strategy = CountingStrategy(config)
+        strategy_manager.strategies["Counting"] = strategy
+        strategy_manager.strategy_configs["Counting"] = config
+
+        history = json.loads(make_market_data(40))
+        resync_market_data("Counting", json.dumps(history[:30]))
+        assert len(strategy.bars) == 29
+
+        append_market_data("Counting", json.dumps(history[29:32]))
+        assert len(strategy.bars) == 31
+        assert strategy.bars[-1].close == history[30]["close"]
+
+        resync_market_data("Counting", json.dumps(history[:35]))
+        assert len(strategy.bars) == 34
+
+    def test_open_bar_updates_match_cold_replay(self):
+        """測試未收盤K線多次更新後，增量策略的信號和狀態與用最終K線冷啟動回放一致"""
+        config = StrategyConfig(
+            name="Counting", symbol="BTCUSDT", timeframe="1h",
+            parameters={"fast_period": 5, "slow_period": 20},
+        )
+        strategy = HotSMAStrategy(config)
+        strategy_manager.strategies["Counting"] = strategy
+        strategy_manager.strategy_configs["Counting"] = config
+
+        history = json.loads(make_market_data(200))
+        resync_market_data("Counting", json.dumps(history[:50]))
+        live = []
+        for i in range(50, 200):
+            # 每根K線先以偏離最終值的價格到達兩次，再以最終值到達
+            for offset in (7.0, -3.0):
+                tick = dict(history[i], close=history[i]["close"] + offset)
+                live.extend(json.loads(append_market_data("Counting", json.dumps([tick]))))
+            live.extend(json.loads(append_market_data("Counting", json.dumps(history[i : i + 1]))))
+
+        # 冷啟動：用最終K線預熱到同步時的狀態，再逐根回放之後收盤的K線
+        cold = HotSMAStrategy(config)
+        final = parse_market_data(json.dumps(history[:199]))
+        StrategyManager._replay(cold, final.iloc[:49])
+        expected = []
+        for position in range(49, len(final)):
+            expected.extend(cold.on_bar(_bar_at(final, position)))
+
+        assert [(s["signal_type"], s["price"]) for s in live] == [
+            (s.signal_type.value, s.price) for s in expected
+        ]
+        assert strategy.fast.value == cold.fast.value
+        assert strategy.slow.value == cold.slow.value
+        assert strategy.previous == cold.previous
+
+    def test_open_bar_update_reevaluates(self):
+        """測試未收盤K線更新時重新評估非增量策略，重複的K線不觸發評估"""
+        config = StrategyConfig(name="Evaluating", symbol="BTCUSDT", timeframe="1h")
+        strategy = EvaluatingStrategy(config)
+        strategy_manager.strategies["Evaluating"] = strategy
+        strategy_manager.strategy_configs["Evaluating"] = config
+        try:
+            history = json.loads(make_market_data(30))
+            resync_market_data("Evaluating", json.dumps(history))
+            evaluations = len(strategy.closes)
+
+            update = dict(history[-1], close=history[-1]["close"] + 5)
+            append_market_data("Evaluating", json.dumps([update]))
+            assert strategy.closes[evaluations:] == [update["close"]]
+
+            append_market_data("Evaluating", json.dumps(history[:1]))
+            assert len(strategy.closes) == evaluations + 1
+        finally:
+            strategy_manager.remove_strategy("Evaluating")
+
+    def test_rolling_window_compaction(self):
+        """測試緩衝區寫滿後移動，窗口內容保持連續"""
+        data = parse_market_data(make_market_data(100))
+        window = RollingWindow(capacity=10, interval=3600 * 10**9)
+        window.reset(data.iloc[:5])
+        for i in range(5, 100):
+            added, overwritten, closed = window.append(data.iloc[i : i + 1])
+            assert (added, overwritten) == ([0], False)
+            assert closed.index.equals(data.index[i - 1 : i])
+        pd.testing.assert_frame_equal(
+            window.frame(), data.iloc[-10:], check_freq=False, check_names=False, check_index_type=False
+        )
+
+
+class TestHotReconfigure:
+    """策略參數熱更新測試"""
+
+    def setup_method(self):
+        self.history = json.loads(make_market_data(300))
+        self.strategy = self.add_strategy("Hot")
+
+    def teardown_method(self):
+        strategy_manager.remove_strategy("Hot")
+        strategy_manager.remove_strategy("Cold")
+
+    def add_strategy(self, name, fast=5, slow=20):
+        config = StrategyConfig(
+            name=name,
+            symbol="BTCUSDT",
+            timeframe="1h",
+            parameters={"fast_period": fast, "slow_period": slow},
+        )
+        strategy = HotSMAStrategy(config)
+        strategy_manager.strategies[name] = strategy
+        strategy_manager.strategy_configs[name] = config
+        return strategy
+
+    def test_hot_update_keeps_instance_and_state(self):
+        """測試熱更新保留策略實例和持倉，只重算修改的指標，之後的信號與冷啟動一致"""
+        resync_market_data("Hot", json.dumps(self.history[:150]), 100)
+        self.strategy.total_trades = 7
+
+        assert strategy_manager.update_strategy_config("Hot", {"parameters": {"fast_period": 40}})
+        assert strategy_manager.get_strategy("Hot") is self.strategy
+        assert self.strategy.total_trades == 7
+        assert self.strategy.rebuilt == ["fast_period"]
+        assert strategy_manager.strategy_configs["Hot"].parameters["fast_period"] == 40
+
+        self.add_strategy("Cold", fast=40)
+        resync_market_data("Cold", json.dumps(self.history[:150]), 100)
+        for i in range(150, 300):
+            bar = json.dumps(self.history[i : i + 1])
+            hot = json.loads(append_market_data("Hot", bar))
+            cold = json.loads(append_market_data("Cold", bar))
+            for signal in hot + cold:
+                signal.pop("timestamp")
+            assert hot == cold
+
+    def test_cold_path_for_other_parameters(self):
+        """測試修改未聲明熱更新的參數時重新創建策略"""
+        from bridge import rust_bridge
+
+        register_strategy("hot_sma_test", HotSMAStrategy)
+        try:
+            resync_market_data("Hot", json.dumps(self.history[:50]))
+            strategy_manager.strategy_configs["Hot"].parameters["mode"] = "a"
+            assert strategy_manager.update_strategy_config("Hot", {"parameters": {"mode": "b"}})
+        finally:
+            rust_bridge.STRATEGY_REGISTRY.pop("hot_sma_test", None)
+            rust_bridge._strategy_classes.pop("hot_sma_test", None)
+
+        strategy = strategy_manager.get_strategy("Hot")
+        assert strategy is not self.strategy
+        assert strategy.fast.value == self.strategy.fast.value
+
+    def test_invalid_hot_update_is_rejected(self):
+        """測試熱更新參數不合法時不修改配置和狀態"""
+        resync_market_data("Hot", json.dumps(self.history[:50]))
+        assert not strategy_manager.update_strategy_config("Hot", {"parameters": {"fast_period": 0}})
+        assert strategy_manager.get_strategy("Hot") is self.strategy
+        assert self.strategy.fast.period == 5
+        assert strategy_manager.strategy_configs["Hot"].parameters["fast_period"] == 5
+
+
+class TestStrategySnapshot:
+    """策略狀態快照測試"""
+
+    def setup_method(self):
+        self.history = json.loads(make_market_data(300))
+        self.manager = StrategyManager()
+        config = StrategyConfig(
+            name="Snap", symbol="BTCUSDT", timeframe="1h",
+            parameters={"fast_period": 5, "slow_period": 20},
+        )
+        self.manager.strategies["Snap"] = HotSMAStrategy(config)
+        self.manager.strategy_configs["Snap"] = config
+        self.manager.resync_market_data("Snap", parse_market_data(json.dumps(self.history[:200])), 100)
+        self.manager.strategies["Snap"].total_trades = 3
+
+    def test_restored_strategy_continues_without_replay(self, tmp_path):
+        """測試恢復後的策略保留狀態，無需重新同步即可得到與原策略相同的信號"""
+        path = str(tmp_path / "strategies.snap")
+        assert self.manager.save_snapshot(path) == os.path.getsize(path)
+
+        restored = StrategyManager()
+        assert restored.restore_snapshot(path) == ["Snap"]
+
+        strategy = restored.strategies["Snap"]
+        assert strategy.total_trades == 3
+        assert strategy.config is restored.strategy_configs["Snap"]
+        assert len(restored.windows["Snap"]) == 100
+
+        for i in range(200, 300):
+            bar = parse_market_data(json.dumps(self.history[i : i + 1]))
+            expected = self.manager.append_market_data("Snap", bar)
+            actual = restored.append_market_data("Snap", bar)
+            assert [(s.signal_type, s.price) for s in actual] == [
+                (s.signal_type, s.price) for s in expected
+            ]
+
+    def test_version_checks(self, tmp_path, monkeypatch):
+        """測試文件版本不兼容或損壞時拒絕讀取，策略狀態版本變化時跳過該策略"""
+        path = str(tmp_path / "strategies.snap")
+        self.manager.save_snapshot(path)
+        with open(path, "rb") as f:
+            data = bytearray(f.read())
+        assert data.startswith(SNAPSHOT_MAGIC)
+
+        corrupted = str(tmp_path / "corrupted.snap")
+        for offset in (len(SNAPSHOT_MAGIC), len(data) - 1):
+            broken = bytearray(data)
+            broken[offset] ^= 0xFF
+            with open(corrupted, "wb") as f:
+                f.write(broken)
+            with pytest.raises(SnapshotError):
+                StrategyManager().restore_snapshot(corrupted)
+
+        monkeypatch.setattr(HotSMAStrategy, "STATE_VERSION", 2, raising=False)
+        assert StrategyManager().restore_snapshot(path) == []
+
+    def test_config_changes_are_saved_immediately(self, tmp_path):
+        """測試更新配置和刪除策略後立即保存快照，不等待保存間隔"""
+        from bridge.snapshot import SnapshotScheduler
+
+        path = str(tmp_path / "strategies.snap")
+        snapshots = SnapshotScheduler(self.manager, path, interval=3600)
+        assert not snapshots.tick()
+
+        assert self.manager.update_strategy_config("Snap", {"parameters": {"fast_period": 8}})
+        assert snapshots.tick()
+        restored = StrategyManager()
+        restored.restore_snapshot(path)
+        assert restored.strategy_configs["Snap"].parameters["fast_period"] == 8
+
+        assert self.manager.remove_strategy("Snap")
+        assert snapshots.tick()
+        assert StrategyManager().restore_snapshot(path) == []
+
+    def test_reapplying_same_config_keeps_state(self):
+        """測試重新應用相同的配置時保留策略實例和狀態"""
+        strategy = self.manager.strategies["Snap"]
+        config = self.manager.strategy_configs["Snap"]
+        assert self.manager.update_strategy_config(
+            "Snap", {"parameters": dict(config.parameters), "risk_params": {"max_loss": 0.1}}
+        )
+        assert self.manager.strategies["Snap"] is strategy
+        assert strategy.total_trades == 3
+        assert config.risk_params["max_loss"] == 0.1
+
+    def test_worker_restores_on_restart(self, tmp_path):
+        """測試工作進程退出時保存快照，重啟後直接追加K線"""
+        env = dict(os.environ, BRIDGE_SNAPSHOT_PATH=str(tmp_path / "worker.snap"))
+        history = json.loads(make_market_data(60))
+
+        def start():
+            return subprocess.Popen(
+                [sys.executable, os.path.join(PYTHON_DIR, "bridge", "rust_bridge.py"), "--worker"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env,
+            )
+
+        def call(process, function, *args):
+            process.stdin.write(encode_request(function, *args))
+            process.stdin.flush()
+            return json.loads(read_frame(process.stdout))
+
+        process = start()
+        try:
+            call(process, "create_strategy_from_json", json.dumps(STRATEGY_CONFIG))
+            call(process, "resync_market_data", STRATEGY_CONFIG["name"], json.dumps(history[:50]))
+            assert call(process, "shutdown") == "bye"
+            assert process.wait(timeout=10) == 0
+
+            process = start()
+            assert call(process, "list_strategies") == [STRATEGY_CONFIG["name"]]
+            signals = call(
+                process, "append_market_data", STRATEGY_CONFIG["name"], json.dumps(history[50:51])
+            )
+            assert isinstance(signals, list)
+            assert call(process, "shutdown") == "bye"
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+
+class TestBatchSignals:
+    """批量信號接口測試"""
+
+    def setup_method(self):
+        self.strategy_ids = []
+        for fast, slow in [(3, 10), (5, 20), (8, 30)]:
+            config = dict(STRATEGY_CONFIG, name=f"SMA_{fast}_{slow}",
+                          parameters={"fast_period": fast, "slow_period": slow})
+            self.strategy_ids.append(create_strategy_from_json(json.dumps(config)))
+
+    def teardown_method(self):
+        for strategy_id in self.strategy_ids:
+            strategy_manager.remove_strategy(strategy_id)
+
+    @pytest.mark.parametrize("max_workers", [None, 4])
+    def test_batch_matches_individual_calls(self, max_workers):
+        """測試批量結果與逐個調用一致，未知策略單獨報錯"""
+        market_data = make_market_data(200)
+        result = json.loads(
+            generate_signals_batch(
+                json.dumps(self.strategy_ids + ["missing"]), market_data, max_workers
+            )
+        )
+
+        assert set(result["signals"]) == set(self.strategy_ids)
+        assert list(result["errors"]) == ["missing"]
+        for strategy_id in self.strategy_ids:
+            individual = json.loads(generate_signals(strategy_id, market_data))
+            batched = result["signals"][strategy_id]
+            for signal in individual + batched:
+                signal.pop("timestamp")
+            assert batched == individual
+
+    def test_batch_through_worker_protocol(self):
+        """測試批量函數可以通過工作進程調用"""
+        requests = io.BytesIO(
+            encode_request("generate_signals_batch", json.dumps(self.strategy_ids), make_market_data())
+            + encode_request("generate_signals_batch", "not json", make_market_data())
+        )
+        responses = io.BytesIO()
+        serve_worker(requests, responses)
+
+        responses.seek(0)
+        batch = json.loads(read_frame(responses))
+        assert set(batch["signals"]) == set(self.strategy_ids) and batch["errors"] == {}
+        assert "error" in json.loads(read_frame(responses))
+
+
+class TestCodec:
+    """響應編解碼測試"""
+
+    def make_backtest_config(self) -> str:
+        config = {
+            "strategy": dict(STRATEGY_CONFIG, name="SMA_Codec_Test"),
+            "market_data": json.loads(make_market_data(200)),
+            "start_date": "2024-01-01T00:00:00+00:00",
+            "end_date": "2024-01-31T00:00:00+00:00",
+            "use_cache": False,
+        }
+        return json.dumps(config)
+
+    def teardown_method(self):
+        strategy_manager.remove_strategy("SMA_Codec_Test")
+
+    @pytest.mark.parametrize("name", available_codecs())
+    def test_native_types(self, name):
+        """測試 NumPy 數組、標量、時間戳和枚舉的序列化"""
+        from strategies.base import SignalType
+
+        codec = get_codec(name)
+        payload = {
+            "equity": np.linspace(1.0, 2.0, 5),
+            "count": np.int64(3),
+            "timestamp": pd.Timestamp("2024-01-01", tz="UTC"),
+            "signal": SignalType.BUY,
+        }
+        decoded = codec.decode(codec.encode(payload))
+        assert decoded == {
+            "equity": [1.0, 1.25, 1.5, 1.75, 2.0],
+            "count": 3,
+            "timestamp": "2024-01-01T00:00:00+00:00",
+            "signal": SignalType.BUY.value,
+        }
+
+    @pytest.mark.parametrize("name", available_codecs())
+    def test_non_finite_floats(self, name):
+        """測試所有編解碼器把 NaN 和無窮大統一編碼為 null"""
+        codec = get_codec(name)
+        payload = {
+            "sortino_ratio": float("inf"),
+            "sharpe_ratio": float("nan"),
+            "profit_factor": np.float64("-inf"),
+            "daily_returns": np.array([0.5, np.inf, np.nan]),
+            "equity_curve": np.array([1.0, 2.0]),
+            "trades": [{"pnl": float("nan"), "price": 1.5}],
+        }
+        decoded = codec.decode(codec.encode(payload))
+        assert decoded == {
+            "sortino_ratio": None,
+            "sharpe_ratio": None,
+            "profit_factor": None,
+            "daily_returns": [0.5, None, None],
+            "equity_curve": [1.0, 2.0],
+            "trades": [{"pnl": None, "price": 1.5}],
+        }
+        if codec.is_json:
+            assert b"Infinity" not in codec.encode(payload)
+
+    def test_negotiation(self):
+        """測試按偏好選擇第一個可用的編解碼器"""
+        assert negotiate_codec(["no_such_codec", "json"]).name == "json"
+        assert negotiate_codec("no_such_codec, json").name == "json"
+        assert negotiate_codec().is_json
+        with pytest.raises(ValueError):
+            negotiate_codec(["no_such_codec"])
+
+    def test_backtest_with_trades_serializes(self):
+        """測試包含交易時間戳的回測結果可以序列化"""
+        result = json.loads(run_backtest_from_json(self.make_backtest_config()))
+        assert "error" not in result
+        assert result["total_trades"] > 0
+        datetime.fromisoformat(result["trades"][0]["timestamp"])
+        assert len(result["equity_curve"]) == 201
+
+    def test_backtest_does_not_replace_live_strategy(self):
+        """測試同名回測不替換、不修改策略管理器中的實盤策略"""
+        live_config = dict(STRATEGY_CONFIG, name="SMA_Codec_Test", parameters={"fast_period": 3, "slow_period": 8})
+        create_strategy_from_json(json.dumps(live_config))
+        live = strategy_manager.get_strategy("SMA_Codec_Test")
+        revision = strategy_manager.revision
+
+        result = json.loads(run_backtest_from_json(self.make_backtest_config()))
+        assert "error" not in result
+        short = json.loads(self.make_backtest_config())
+        short["market_data"] = short["market_data"][:1]
+        run_backtest_from_json(json.dumps(short))
+
+        assert strategy_manager.get_strategy("SMA_Codec_Test") is live
+        assert live.config.parameters == {"fast_period": 3, "slow_period": 8}
+        assert strategy_manager.revision == revision
+
+    @pytest.mark.parametrize("name", available_codecs())
+    def test_worker_negotiates_codec(self, name):
+        """測試工作進程按請求協商的編解碼器編碼響應"""
+        request = json.dumps(
+            {"function": "run_backtest_from_json", "args": [self.make_backtest_config()], "accept": [name]}
+        ).encode("utf-8")
+        ping = json.dumps({"function": "ping", "accept": [name]}).encode("utf-8")
+        requests = io.BytesIO(
+            struct.pack(">I", len(request)) + request + struct.pack(">I", len(ping)) + ping
+        )
+        responses = io.BytesIO()
+        serve_worker(requests, responses)
+
+        responses.seek(0)
+        tag, _, body = read_frame(responses).partition(b"\0")
+        assert tag.decode() == name
+        result = get_codec(name).decode(body)
+        assert result["total_trades"] > 0 and len(result["equity_curve"]) == 201
+
+        tag, _, body = read_frame(responses).partition(b"\0")
+        assert get_codec(tag.decode()).decode(body) == "pong"
+
+    def test_backtest_metrics_recorded_once(self):
+        """測試每次回測只記錄一次調用，協商編解碼器時的編碼耗時計入 serialize 階段"""
+        bridge_metrics.reset()
+        run_backtest_from_json(self.make_backtest_config())
+        functions = bridge_metrics.snapshot()["functions"]
+        assert list(functions) == ["run_backtest_from_json"]
+        assert functions["run_backtest_from_json"]["calls"] == 1
+        assert {"parse", "compute", "convert", "serialize"} <= set(
+            functions["run_backtest_from_json"]["phases_us"]
+        )
+
+        request = json.dumps(
+            {"function": "run_backtest_from_json", "args": [self.make_backtest_config()],
+             "accept": [available_codecs()[-1]]}
+        ).encode("utf-8")
+        handle_worker_request(request)
+        functions = bridge_metrics.snapshot(reset=True)["functions"]
+        assert functions["run_backtest_from_json"]["calls"] == 1
+        assert functions["run_backtest_encoded"]["calls"] == 1
+        assert "serialize" in functions["run_backtest_encoded"]["phases_us"]
+
+
+class TestStreamingBacktest:
+    """流式回測結果測試"""
+
+    def make_config(self, **overrides) -> str:
+        config = {
+            "strategy": dict(STRATEGY_CONFIG, name="SMA_Stream_Test"),
+            "market_data": json.loads(make_market_data(300)),
+            "start_date": "2024-01-01T00:00:00+00:00",
+            "end_date": "2024-02-01T00:00:00+00:00",
+            "use_cache": False,
+            "chunk_size": 64,
+        }
+        config.update(overrides)
+        return json.dumps(config)
+
+    def teardown_method(self):
+        strategy_manager.remove_strategy("SMA_Stream_Test")
+
+    def test_event_order_and_reassembly(self):
+        """測試事件順序，分塊拼接後與一次性結果一致"""
+        events = []
+        end = stream_backtest(self.make_config(), lambda event: events.append(json.loads(event)))
+        events.append(json.loads(end))
+
+        types = [event["type"] for event in events]
+        header_at = types.index("header")
+        assert set(types[:header_at]) == {"progress"}
+        assert events[header_at - 1]["processed"] == events[header_at - 1]["total"] == 300
+        assert types[-1] == "end"
+
+        header = events[header_at]
+        trades = [item for event in events if event["type"] == "trades" for item in event["items"]]
+        equity = [v for event in events if event["type"] == "equity" for v in event["values"]]
+        assert all(len(event.get("values", event.get("items", []))) <= 64 for event in events)
+
+        full = json.loads(run_backtest_from_json(self.make_config()))
+        assert header["final_capital"] == full["final_capital"]
+        assert header["trade_count"] == len(trades) == len(full["trades"])
+        assert header["equity_points"] == len(equity) == 301
+        assert equity == full["equity_curve"] and trades == full["trades"]
+
+    def test_worker_streams_frames(self):
+        """測試工作進程為一個請求發送多個事件幀，之後繼續處理其他請求"""
+        requests = io.BytesIO(
+            encode_request("stream_backtest", self.make_config(market_data=[]))
+            + encode_request("stream_backtest", self.make_config(chunk_size=1000))
+            + encode_request("ping")
+        )
+        responses = io.BytesIO()
+        serve_worker(requests, responses)
+
+        responses.seek(0)
+        assert json.loads(read_frame(responses))["type"] == "error"
+        types = []
+        while not types or types[-1] != "end":
+            types.append(json.loads(read_frame(responses))["type"])
+        assert set(types[:-5]) == {"progress"}
+        assert types[-5:] == ["header", "trades", "equity", "daily_returns", "end"]
+        assert json.loads(read_frame(responses)) == "pong"
+
+
+class TestBacktestJobs:
+    """異步回測任務測試"""
+
+    def setup_method(self):
+        self.manager = BacktestJobManager(max_workers=2)
+
+    def teardown_method(self):
+        self.manager.shutdown(wait=False)
+        strategy_manager.remove_strategy("SMA_Job_Test")
+
+    def make_config(self, n: int = 300) -> str:
+        return json.dumps(
+            {
+                "strategy": dict(STRATEGY_CONFIG, name="SMA_Job_Test"),
+                "market_data": json.loads(make_market_data(n)),
+                "start_date": "2024-01-01T00:00:00+00:00",
+                "end_date": "2025-01-01T00:00:00+00:00",
+                "use_cache": False,
+            }
+        )
+
+    def wait(self, job_id: str, timeout: float = 60.0) -> dict:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.manager.status(job_id)
+            if status["status"] in ("completed", "failed", "cancelled"):
+                return status
+            time.sleep(0.05)
+        raise TimeoutError(job_id)
+
+    def test_concurrent_jobs_complete(self):
+        """測試多個任務並發完成，結果與同步回測一致"""
+        job_ids = [self.manager.submit(self.make_config()) for _ in range(3)]
+        failing = self.manager.submit(json.dumps({"strategy": STRATEGY_CONFIG}))
+
+        expected = json.loads(run_backtest_from_json(self.make_config()))
+        for job_id in job_ids:
+            status = self.wait(job_id)
+            assert status["status"] == "completed" and status["progress"] == 1.0
+            result = json.loads(self.manager.result(job_id))
+            assert result["final_capital"] == expected["final_capital"]
+            assert result["trades"] == expected["trades"]
+
+        assert self.wait(failing)["status"] == "failed"
+        with pytest.raises(RuntimeError):
+            self.manager.result(failing)
+        with pytest.raises(KeyError):
+            self.manager.status("missing")
+
+    def test_cancel_running_job(self):
+        """測試運行中的任務在進度回調時中止"""
+        job_id = self.manager.submit(self.make_config(3000))
+        deadline = time.monotonic() + 30
+        while self.manager.progress(job_id)["processed"] == 0:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        assert self.manager.cancel(job_id)
+        status = self.wait(job_id)
+        assert status["status"] == "cancelled"
+        assert status["processed"] < 3000
+        assert not self.manager.cancel(job_id)
+
+    def test_results_evicted_under_memory_cap(self):
+        """測試結果總大小超過上限時淘汰最早完成的結果"""
+        first = self.manager.submit(self.make_config())
+        size = self.wait(first)["result_bytes"]
+        self.manager.max_result_bytes = size
+
+        second = self.manager.submit(self.make_config())
+        self.wait(second)
+
+        assert self.manager.status(first)["result_evicted"]
+        with pytest.raises(RuntimeError):
+            self.manager.result(first)
+        assert len(self.manager.result(second)) == size
+        assert self.manager.result_bytes == size
+
+    def test_finished_jobs_pruned(self):
+        """測試已結束任務超過數量上限或保留時間後連同結果刪除"""
+        self.manager.max_finished_jobs = 1
+        first = self.manager.submit(self.make_config())
+        self.wait(first)
+        second = self.manager.submit(self.make_config())
+        self.wait(second)
+
+        with pytest.raises(KeyError):
+            self.manager.status(first)
+        assert [job["job_id"] for job in self.manager.list_jobs()] == [second]
+
+        self.manager.finished_job_ttl = 0.0
+        assert self.manager.list_jobs() == []
+        assert self.manager.result_bytes == 0
+
+
+class TestColumnarMarketData:
+    """列式二進制行情傳輸測試"""
+
+    def setup_method(self):
+        n = 1000
+        index = pd.date_range("2024-01-01", periods=n, freq="1min", tz="UTC", name="timestamp")
+        rng = np.random.default_rng(0)
+        self.data = pd.DataFrame(
+            {col: rng.random(n) for col in ["open", "high", "low", "close", "volume"]},
+            index=index.as_unit("ns"),
+        )
+
+    def test_round_trip_is_zero_copy(self, tmp_path):
+        """測試文件解碼結果與原數據一致，數值列引用映射內存"""
+        path = str(tmp_path / "market.bin")
+        write_columnar(path, self.data)
+        reference = json.dumps({"format": "columnar", "path": path})
+        decoded = parse_market_data(reference)
+
+        pd.testing.assert_frame_equal(decoded, self.data, check_freq=False)
+        assert not decoded["close"].to_numpy().flags.writeable
+
+    def test_mixed_columns(self):
+        """測試包含整數列時逐列解碼"""
+        data = self.data.assign(trades=np.arange(len(self.data)))
+        decoded = parse_market_data(encode_columnar(data))
+        assert decoded["trades"].dtype == np.int64
+        pd.testing.assert_frame_equal(decoded, data, check_freq=False)
+
+    def test_json_records_still_supported(self):
+        """測試JSON記錄數組仍按原方式解析"""
+        decoded = parse_market_data(make_market_data(5))
+        assert list(decoded.columns) == ["open", "high", "low", "close", "volume"]
+        assert decoded.index.name == "timestamp" and len(decoded) == 5
+
+    def test_backtest_dates_follow_index_timezone(self):
+        """測試回測起止時間按行情索引的時區對齊"""
+        decoded = parse_market_data(encode_columnar(self.data))
+        start = _align_timezone(datetime(2024, 1, 1, 0, 30), decoded)
+        assert start.tzinfo is not None
+        window = decoded[(decoded.index >= start) & (decoded.index <= decoded.index[-1])]
+        assert len(window) == len(self.data) - 30
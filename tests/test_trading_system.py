@@ -22,7 +22,13 @@ from python.strategies.base import StrategySignal, SignalType
 from python.trading.execution_engine import ExecutionEngine, Order, OrderSide, OrderType, OrderStatus
 from python.trading.exchange_interface import (
     ExchangeManager, MockExchangeInterface, ExchangeConfig,
-    MarketData, BalanceInfo, PositionInfo
+    MarketData, BalanceInfo, PositionInfo,
+    BinanceInterface, BinanceMarketStream, MarketDataCache
+)
+from python.trading.order_book import OrderBook, OrderBookGapError
+from python.trading.rate_limiter import (
+    RateLimit, RateLimiter, REQUEST_WEIGHT, ORDERS,
+    RequestPriority, RequestDroppedError
 )
 from python.trading.risk_management import RiskManager, RiskLimits, RiskLevel, AlertType
 from python.trading.trading_coordinator import TradingCoordinator, TradingState
@@ -68,6 +74,28 @@ class TestExecutionEngine:
         assert order.leverage == 2.0
         assert order.status == OrderStatus.PENDING
     
+    def test_order_price_from_order_book(self):
+        """測試訂單簿已同步時按深度計算訂單價格，不超過最大滑點"""
+        signal = StrategySignal(
+            symbol="BTCUSDT",
+            signal_type=SignalType.BUY,
+            strength=0.8,
+            price=50000.0,
+            metadata={}
+        )
+        assert self.execution_engine._calculate_order_price(signal, 50000.0, 0.5) == pytest.approx(50050.0)
+
+        book = OrderBook("BTCUSDT")
+        book.apply_snapshot({
+            "lastUpdateId": 1,
+            "bids": [["49999.9", "1"]],
+            "asks": [["50000.1", "0.3"], ["50001.0", "1"], ["50100.0", "10"]],
+        })
+        self.execution_engine.order_books["BTCUSDT"] = book
+        assert self.execution_engine._calculate_order_price(signal, 50000.0, 0.5) == 50001.0
+        # 深度消耗超過最大滑點時仍以最大滑點為上限
+        assert self.execution_engine._calculate_order_price(signal, 50000.0, 5.0) == pytest.approx(50050.0)
+    
     def test_order_id_generation(self):
         """測試訂單ID生成"""
         order_id_1 = self.execution_engine.generate_order_id()
@@ -252,6 +280,723 @@ class TestExchangeInterface:
         await self.exchange.disconnect()
 
 
+class FakeBinanceStreamServer:
+    """本地 Binance 組合流服務，記錄訂閱請求並按需推送行情"""
+
+    def __init__(self):
+        self.subscriptions = []
+        self.connections = []
+        self.runner = None
+        self.url = None
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/stream", self._handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections.append(ws)
+        async for message in ws:
+            request_data = message.json()
+            if request_data["method"] == "SUBSCRIBE":
+                self.subscriptions.append(request_data["params"])
+            await ws.send_json({"result": None, "id": request_data["id"]})
+        return ws
+
+    async def push(self, stream, data):
+        await self.connections[-1].send_json({"stream": stream, "data": data})
+
+    async def drop(self):
+        await self.connections[-1].close()
+
+
+class TestBinanceMarketStream:
+    """WebSocket 行情訂閱測試"""
+
+    async def _wait_for(self, condition, timeout=2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            assert asyncio.get_running_loop().time() < deadline, "等待超時"
+            await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_merge_streams_into_market_data(self):
+        """測試 ticker、bookTicker 和 kline 合併為最新行情"""
+        server = FakeBinanceStreamServer()
+        await server.start()
+        stream = BinanceMarketStream(server.url, ["BTCUSDT"])
+        await stream.start()
+        try:
+            assert await stream.wait_connected(2.0)
+            await self._wait_for(lambda: server.subscriptions)
+            assert server.subscriptions[0] == [
+                "btcusdt@ticker", "btcusdt@bookTicker", "btcusdt@kline_1m"
+            ]
+            assert stream.get_latest("BTCUSDT") is None
+
+            updates = stream.updates(["BTCUSDT"])
+            pending = asyncio.ensure_future(updates.__anext__())
+            await server.push("btcusdt@ticker", {
+                "e": "24hrTicker", "E": 1000, "s": "BTCUSDT", "c": "50000.5",
+                "v": "1234", "h": "51000", "l": "49000", "P": "1.5",
+            })
+            first = await asyncio.wait_for(pending, 1.0)
+            assert first.price == 50000.5
+            assert first.high_24h == 51000.0
+
+            await server.push("btcusdt@bookTicker", {
+                "e": "bookTicker", "E": 1001, "s": "BTCUSDT", "b": "50000.1", "a": "50000.9",
+            })
+            await server.push("btcusdt@kline_1m", {
+                "e": "kline", "E": 1002, "s": "BTCUSDT",
+                "k": {"t": 0, "T": 59999, "i": "1m", "o": "49900", "h": "50100",
+                      "l": "49800", "c": "50001", "v": "10", "x": False},
+            })
+            await self._wait_for(lambda: stream.get_latest("BTCUSDT").timestamp == 1002)
+            latest = stream.get_latest("btcusdt", max_age=5.0)
+            assert latest.price == 50001.0
+            assert (latest.bid, latest.ask) == (50000.1, 50000.9)
+            assert latest.volume == 1234.0
+            # 之前產出的行情不會被後續更新修改
+            assert first.bid is None
+            assert stream.latest_klines["BTCUSDT"].closed is False
+        finally:
+            await stream.stop()
+            await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_reconnect_resubscribes(self):
+        """測試斷線後重連並重新訂閱"""
+        server = FakeBinanceStreamServer()
+        await server.start()
+        stream = BinanceMarketStream(server.url, ["BTCUSDT"], reconnect_delay=0.01)
+        await stream.start()
+        try:
+            await self._wait_for(lambda: len(server.subscriptions) == 1)
+            await stream.subscribe(["ETHUSDT"])
+            await self._wait_for(lambda: len(server.subscriptions) == 2)
+            assert server.subscriptions[1][0] == "ethusdt@ticker"
+
+            await server.drop()
+            await self._wait_for(lambda: len(server.subscriptions) == 3)
+            assert stream.reconnects == 1
+            assert set(server.subscriptions[2]) == {
+                f"{symbol}@{name}" for symbol in ("btcusdt", "ethusdt")
+                for name in ("ticker", "bookTicker", "kline_1m")
+            }
+        finally:
+            await stream.stop()
+            await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_get_market_data_uses_stream(self):
+        """測試有推送行情時 get_market_data 不發送 REST 請求"""
+        server = FakeBinanceStreamServer()
+        await server.start()
+        exchange = BinanceInterface(ExchangeConfig(
+            name="binance", api_key="test_key", api_secret="test_secret",
+            base_url="https://api.mock.com", ws_url=server.url,
+        ))
+        exchange._make_request = AsyncMock(side_effect=AssertionError("不應請求 REST"))
+        try:
+            stream = await exchange.start_market_stream(["BTCUSDT"])
+            await self._wait_for(lambda: server.subscriptions)
+            await server.push("btcusdt@ticker", {
+                "e": "24hrTicker", "E": 2000, "s": "BTCUSDT", "c": "42000",
+                "v": "1", "h": "43000", "l": "41000", "P": "-0.5",
+            })
+            await self._wait_for(lambda: stream.get_latest("BTCUSDT") is not None)
+
+            market_data = await exchange.get_market_data("BTCUSDT")
+            assert market_data.price == 42000.0
+            assert market_data.change_24h == -0.5
+        finally:
+            await exchange.disconnect()
+            await server.stop()
+        assert exchange.market_stream is None
+
+
+class TestRateLimiter:
+    """請求限流測試"""
+
+    def _limiter(self):
+        return RateLimiter(
+            [
+                RateLimit(REQUEST_WEIGHT, 0.1, 10, header="X-MBX-USED-WEIGHT-1M"),
+                RateLimit(ORDERS, 1.0, 2),
+            ],
+            endpoint_weights={"/heavy": 8, "/light": 1},
+            order_endpoints=[("POST", "/order")],
+        )
+
+    def test_costs(self):
+        """測試接口權重和下單次數"""
+        limiter = self._limiter()
+        assert limiter.costs("GET", "/heavy") == [8.0, 0.0]
+        assert limiter.costs("POST", "/order") == [1.0, 1.0]
+        assert limiter.costs("GET", "/unknown") == [1.0, 0.0]
+
+    @pytest.mark.asyncio
+    async def test_wait_for_budget(self):
+        """測試額度不足時等待而不是失敗"""
+        limiter = self._limiter()
+        assert await limiter.acquire("GET", "/heavy") < 0.01
+        # 剩餘 2 權重，按每秒 100 權重補充，還需約 0.06 秒
+        waited = await limiter.acquire("GET", "/heavy")
+        assert 0.04 < waited < 0.2
+
+        stats = limiter.get_stats()
+        assert stats["requests"] == 2
+        assert stats["delayed"] == 1
+        assert stats["max_wait"] == pytest.approx(waited)
+        assert stats["windows"][0]["remaining"] < 10
+
+    @pytest.mark.asyncio
+    async def test_fifo_order(self):
+        """測試大權重請求不會被後到的小請求搶先"""
+        limiter = self._limiter()
+        await limiter.acquire("GET", "/heavy")
+        completed = []
+
+        async def request(name, endpoint):
+            await limiter.acquire("GET", endpoint)
+            completed.append(name)
+
+        await asyncio.gather(
+            request("heavy", "/heavy"),
+            request("light1", "/light"),
+            request("light2", "/light"),
+        )
+        assert completed == ["heavy", "light1", "light2"]
+
+    @pytest.mark.asyncio
+    async def test_headers_and_pause(self):
+        """測試根據響應頭校正額度，收到 429 後暫停"""
+        limiter = self._limiter()
+        limiter.update_from_headers({"X-MBX-USED-WEIGHT-1M": "10"})
+        assert limiter.get_stats()["windows"][0]["remaining"] < 1
+
+        limiter = self._limiter()
+        assert limiter.pause(429, "0.05") == 0.05
+        waited = await limiter.acquire("GET", "/light")
+        assert waited >= 0.04
+        assert limiter.get_stats()["throttled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_make_request_retries_after_429(self):
+        """測試 _make_request 收到 429 後暫停並重試"""
+        from aiohttp import web
+
+        calls = []
+
+        async def handler(request):
+            calls.append(request.query.get("timestamp"))
+            if len(calls) == 1:
+                return web.json_response({"code": -1003}, status=429, headers={"Retry-After": "0.05"})
+            return web.json_response({"ok": True}, headers={"X-MBX-USED-WEIGHT-1M": "2390"})
+
+        app = web.Application()
+        app.router.add_get("/fapi/v1/exchangeInfo", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        exchange = BinanceInterface(ExchangeConfig(
+            name="binance", api_key="test_key", api_secret="test_secret",
+            base_url=f"http://127.0.0.1:{port}",
+        ))
+        try:
+            result = await exchange._make_request("GET", "/fapi/v1/exchangeInfo", signed=True)
+            assert result == {"ok": True}
+            assert len(calls) == 2
+            stats = exchange.get_rate_limit_stats()
+            assert stats["throttled"] == 1
+            weight_window = next(w for w in stats["windows"] if w["kind"] == REQUEST_WEIGHT)
+            assert weight_window["remaining"] < 20
+        finally:
+            await exchange.disconnect()
+            await runner.cleanup()
+
+
+class TestRequestPriority:
+    """請求優先級通道測試"""
+
+    def _saturated_limiter(self, **kwargs):
+        limiter = RateLimiter(
+            [RateLimit(REQUEST_WEIGHT, 1.0, 10)],
+            endpoint_weights={"/poll": 5},
+            order_endpoints=[("POST", "/order"), ("DELETE", "/order")],
+            **kwargs,
+        )
+        # 模擬額度已被用完
+        limiter.buckets[0].tokens = 0.0
+        return limiter
+
+    def test_default_priority(self):
+        """測試撤單、下單和輪詢的默認通道"""
+        limiter = self._saturated_limiter()
+        assert limiter.priority_for("DELETE", "/order") is RequestPriority.CRITICAL
+        assert limiter.priority_for("POST", "/order") is RequestPriority.HIGH
+        assert limiter.priority_for("GET", "/poll") is RequestPriority.LOW
+
+    @pytest.mark.asyncio
+    async def test_critical_preempts_queued_polls(self):
+        """測試額度耗盡時撤單先於已排隊的輪詢發出"""
+        limiter = self._saturated_limiter()
+        completed = []
+
+        async def request(name, method, endpoint):
+            await limiter.acquire(method, endpoint)
+            completed.append(name)
+
+        polls = [asyncio.ensure_future(request(f"poll{i}", "GET", "/poll")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await request("cancel", "DELETE", "/order")
+        assert completed == ["cancel"]
+        for poll in polls:
+            poll.cancel()
+        await asyncio.gather(*polls, return_exceptions=True)
+
+        lanes = limiter.get_stats()["lanes"]
+        assert lanes["CRITICAL"]["requests"] == 1
+        # 等待一個令牌補充（0.1 秒），不需要等前面的輪詢
+        assert lanes["CRITICAL"]["p99_wait"] < 0.2
+        assert lanes["LOW"]["queued"] == 0
+
+    @pytest.mark.asyncio
+    async def test_shed_and_expire_polls(self):
+        """測試低優先級請求排隊已滿時被拒絕，排隊超時時被丟棄"""
+        limiter = self._saturated_limiter(
+            lane_max_queued={RequestPriority.LOW: 1},
+            lane_max_wait={RequestPriority.LOW: 0.05},
+        )
+        first = asyncio.ensure_future(limiter.acquire("GET", "/poll"))
+        await asyncio.sleep(0)
+        with pytest.raises(RequestDroppedError) as shed:
+            await limiter.acquire("GET", "/poll")
+        assert shed.value.reason == "shed"
+
+        with pytest.raises(RequestDroppedError) as expired:
+            await first
+        assert expired.value.reason == "expired"
+
+        lanes = limiter.get_stats()["lanes"]
+        assert lanes["LOW"]["shed"] == 1
+        assert lanes["LOW"]["expired"] == 1
+
+    @pytest.mark.asyncio
+    async def test_coalesce_identical_polls(self):
+        """測試相同的輪詢請求合併為一次"""
+        from aiohttp import web
+
+        calls = []
+
+        async def handler(request):
+            calls.append(request.query["symbol"])
+            await asyncio.sleep(0.05)
+            return web.json_response({"symbol": request.query["symbol"]})
+
+        app = web.Application()
+        app.router.add_get("/fapi/v1/premiumIndex", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        exchange = BinanceInterface(ExchangeConfig(
+            name="binance", api_key="test_key", api_secret="test_secret",
+            base_url=f"http://127.0.0.1:{port}",
+        ))
+        try:
+            results = await asyncio.gather(*[
+                exchange._make_request("GET", "/fapi/v1/premiumIndex", params={"symbol": symbol})
+                for symbol in ("BTCUSDT", "BTCUSDT", "BTCUSDT", "ETHUSDT")
+            ])
+            assert [r["symbol"] for r in results] == ["BTCUSDT"] * 3 + ["ETHUSDT"]
+            assert sorted(calls) == ["BTCUSDT", "ETHUSDT"]
+            assert exchange.get_rate_limit_stats()["lanes"]["LOW"]["coalesced"] == 2
+        finally:
+            await exchange.disconnect()
+            await runner.cleanup()
+
+
+class TestMarketDataCache:
+    """行情緩存測試"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_refresh_and_single_flight(self):
+        """測試 200 個交易對一次請求刷新，併發讀取共用同一次刷新"""
+        from aiohttp import web
+
+        calls = []
+        symbols = [f"SYM{i}USDT" for i in range(200)]
+
+        async def handler(request):
+            calls.append(dict(request.query))
+            await asyncio.sleep(0.05)
+            return web.json_response([
+                {"symbol": symbol, "lastPrice": str(100 + i), "volume": "10",
+                 "closeTime": 1000, "highPrice": "200", "lowPrice": "50",
+                 "priceChangePercent": "1.0"}
+                for i, symbol in enumerate(symbols)
+            ])
+
+        app = web.Application()
+        app.router.add_get("/fapi/v1/ticker/24hr", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        exchange = BinanceInterface(ExchangeConfig(
+            name="binance", api_key="test_key", api_secret="test_secret",
+            base_url=f"http://127.0.0.1:{port}",
+        ))
+        cache = MarketDataCache(exchange, ttl=10.0)
+        try:
+            results = await asyncio.gather(
+                cache.get_many(symbols[:100]),
+                cache.get_many(symbols[100:]),
+                cache.get("sym5usdt"),
+            )
+            assert len(calls) == 1
+            assert calls[0] == {}
+            assert results[0]["SYM0USDT"].price == 100.0
+            assert results[1]["SYM199USDT"].price == 299.0
+            assert results[2].bid is None
+
+            await cache.get_many(symbols)
+            assert len(calls) == 1
+            stats = cache.get_stats()
+            assert stats["refreshes"] == 1
+            assert stats["coalesced"] == 2
+            assert stats["hits"] == 200
+            assert stats["symbols_per_refresh"] == 200
+        finally:
+            await exchange.disconnect()
+            await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_few_symbols_use_per_symbol_requests(self):
+        """測試只關注一個交易對時逐個請求，只消耗權重1而不是全量接口的40"""
+        from aiohttp import web
+
+        calls = []
+
+        async def handler(request):
+            calls.append(dict(request.query))
+            return web.json_response(
+                {"symbol": request.query["symbol"], "lastPrice": "100", "volume": "10",
+                 "closeTime": 1000, "highPrice": "200", "lowPrice": "50",
+                 "priceChangePercent": "1.0"}
+            )
+
+        app = web.Application()
+        app.router.add_get("/fapi/v1/ticker/24hr", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        exchange = BinanceInterface(ExchangeConfig(
+            name="binance", api_key="test_key", api_secret="test_secret",
+            base_url=f"http://127.0.0.1:{port}",
+        ))
+        manager = ExchangeManager()
+        manager.add_exchange("binance", exchange, is_default=True)
+        try:
+            market_data = await manager.get_market_data("BTCUSDT")
+            assert market_data.price == 100.0
+            assert calls == [{"symbol": "BTCUSDT"}]
+
+            # 權重桶按時間回補，只檢查請求次數和單個請求的權重
+            assert exchange.get_rate_limit_stats()["requests"] == 1
+            assert exchange.rate_limiter.weight("/fapi/v1/ticker/24hr", {"symbol": "BTCUSDT"}) == 1
+        finally:
+            await exchange.disconnect()
+            await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_ttl_and_stale_fallback(self):
+        """測試緩存過期後刷新，刷新失敗時返回過期數據"""
+        config = ExchangeConfig(
+            name="mock_exchange", api_key="test_key",
+            api_secret="test_secret", base_url="https://api.mock.com"
+        )
+        exchange = MockExchangeInterface(config)
+        exchange.get_market_data_bulk = AsyncMock(wraps=exchange.get_market_data_bulk)
+        manager = ExchangeManager(market_data_ttl=0.05)
+        manager.add_exchange("mock", exchange, is_default=True)
+
+        first = await manager.get_market_data("BTCUSDT")
+        assert await manager.get_market_data("BTCUSDT") is first
+        assert exchange.get_market_data_bulk.await_count == 1
+
+        await asyncio.sleep(0.06)
+        second = await manager.get_market_data("BTCUSDT")
+        assert second is not first
+        assert exchange.get_market_data_bulk.await_count == 2
+
+        await asyncio.sleep(0.06)
+        exchange.get_market_data_bulk.side_effect = ConnectionError("網絡中斷")
+        assert await manager.get_market_data("BTCUSDT") is second
+
+        stats = manager.get_market_data_cache_stats()["mock"]
+        assert stats["misses"] == 1
+        assert stats["expired"] == 2
+        assert stats["hits"] == 1
+        assert stats["stale_served"] == 1
+        assert stats["refresh_errors"] == 1
+        assert stats["max_served_age"] >= 0.06
+
+    @pytest.mark.asyncio
+    async def test_idle_symbols_expire(self):
+        """測試長時間未讀取的交易對不再刷新，其緩存被刪除"""
+        config = ExchangeConfig(
+            name="mock_exchange", api_key="test_key",
+            api_secret="test_secret", base_url="https://api.mock.com"
+        )
+        exchange = MockExchangeInterface(config)
+        exchange.get_market_data_bulk = AsyncMock(wraps=exchange.get_market_data_bulk)
+        cache = MarketDataCache(exchange, ttl=0.0, idle_ttl=60.0)
+
+        await cache.get_many(["BTCUSDT", "ETHUSDT"])
+        # ETHUSDT 最近一次讀取在 idle_ttl 之前
+        cache.watched["ETHUSDT"] -= 120.0
+        await cache.get("BTCUSDT")
+
+        assert exchange.get_market_data_bulk.await_args.args[0] == ["BTCUSDT"]
+        assert set(cache.watched) == {"BTCUSDT"}
+        stats = cache.get_stats()
+        assert stats["unwatched"] == 1
+        assert stats["cached_symbols"] == 1
+
+    @pytest.mark.asyncio
+    async def test_partial_failure(self):
+        """測試部分交易對沒有行情時其他交易對照常返回，單個讀取仍拋出異常"""
+        config = ExchangeConfig(
+            name="mock_exchange", api_key="test_key",
+            api_secret="test_secret", base_url="https://api.mock.com"
+        )
+        exchange = MockExchangeInterface(config)
+        get_market_data_bulk = exchange.get_market_data_bulk
+
+        async def without_missing(symbols):
+            return await get_market_data_bulk([symbol for symbol in symbols if symbol != "MISSINGUSDT"])
+
+        exchange.get_market_data_bulk = without_missing
+        cache = MarketDataCache(exchange, ttl=10.0)
+
+        result = await cache.get_many(["BTCUSDT", "MISSINGUSDT"])
+        assert list(result) == ["BTCUSDT"]
+        with pytest.raises(KeyError):
+            await cache.get("MISSINGUSDT")
+        assert cache.get_stats()["failures"] == 2
+
+
+DEPTH_FEED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "btcusdt_depth_feed.jsonl")
+
+
+def load_depth_feed():
+    """錄製的 BTCUSDT 增量深度：depthUpdate、snapshot，最後一行為最終訂單簿"""
+    import json
+
+    with open(DEPTH_FEED, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def book_levels(levels):
+    return [(float(price), float(quantity)) for price, quantity in levels if float(quantity) > 0]
+
+
+class TestOrderBook:
+    """本地訂單簿測試"""
+
+    def setup_method(self):
+        """測試前設置"""
+        self.feed = load_depth_feed()
+        self.final = self.feed[-1]["data"]
+
+    def assert_matches_final(self, book):
+        top = book.top(1000)
+        assert top["bids"] == book_levels(self.final["bids"])
+        assert top["asks"] == book_levels(self.final["asks"])
+        assert book.last_update_id == self.final["lastUpdateId"]
+
+    def test_replay_recorded_feed(self):
+        """測試快照前的增量被緩存，快照後接續並與最終訂單簿一致"""
+        book = OrderBook("BTCUSDT")
+        snapshots = 0
+        for line in self.feed[:-1]:
+            if line["type"] == "snapshot":
+                snapshots += 1
+                if snapshots == 1:
+                    book.apply_snapshot(line["data"])
+                    assert book.synced
+            else:
+                applied = book.apply_diff(line["data"])
+                assert applied or not book.synced or line["data"]["u"] < book.last_update_id
+
+        self.assert_matches_final(book)
+        assert book.gaps == 0
+        assert book.best_bid < book.best_ask
+        assert book.spread == pytest.approx(book.best_ask - book.best_bid)
+
+    def test_gap_detection_and_resync(self):
+        """測試丟失增量時檢測到缺口，用後續快照重新同步"""
+        book = OrderBook("BTCUSDT")
+        events = [line for line in self.feed if line["type"] == "depthUpdate"]
+        dropped = events[200]["data"]["u"]
+        gaps = 0
+        for line in self.feed[:-1]:
+            if line["type"] == "snapshot":
+                if not book.synced:
+                    book.apply_snapshot(line["data"])
+                continue
+            if line["data"]["u"] == dropped:
+                continue
+            try:
+                book.apply_diff(line["data"])
+            except OrderBookGapError:
+                gaps += 1
+                assert not book.synced
+                assert book.best_bid is None
+
+        assert gaps == 1
+        assert book.synced
+        self.assert_matches_final(book)
+
+    def test_stale_snapshot_raises(self):
+        """測試快照早於緩存的增量時要求新的快照"""
+        book = OrderBook("BTCUSDT")
+        events = [line["data"] for line in self.feed if line["type"] == "depthUpdate"]
+        for event in events[10:20]:
+            book.apply_diff(event)
+        first_snapshot = next(line["data"] for line in self.feed if line["type"] == "snapshot")
+        with pytest.raises(OrderBookGapError):
+            book.apply_snapshot(first_snapshot)
+        assert not book.synced
+        assert book.get_stats()["buffered"] == 10
+
+    def test_queries(self):
+        """測試 top-N、VWAP、成交價和價差"""
+        book = OrderBook("BTCUSDT")
+        book.apply_snapshot({
+            "lastUpdateId": 10,
+            "bids": [["99.0", "1"], ["100.0", "2"], ["98.0", "5"]],
+            "asks": [["101.0", "1"], ["102.0", "3"], ["103.0", "0"]],
+        })
+        assert book.top(2) == {"bids": [(100.0, 2.0), (99.0, 1.0)], "asks": [(101.0, 1.0), (102.0, 3.0)]}
+        assert book.spread == 1.0
+        assert book.mid_price == 100.5
+        assert book.vwap("buy", 2) == pytest.approx((101.0 + 102.0) / 2)
+        assert book.fill_price("buy", 2) == 102.0
+        assert book.vwap("sell", 3) == pytest.approx((2 * 100.0 + 99.0) / 3)
+        assert book.vwap("buy", 10) is None
+
+        book.apply_diff({"U": 11, "u": 12, "pu": 10, "b": [["100.0", "0"], ["100.5", "1"]], "a": []})
+        assert book.best_bid == 100.5
+        assert book.top(3)["bids"] == [(100.5, 1.0), (99.0, 1.0), (98.0, 5.0)]
+
+    def test_long_diff_sequence(self):
+        """測試連續應用大量增量後，訂單簿與按價位逐條回放的結果一致"""
+        import random
+
+        rng = random.Random(1)
+        book = OrderBook("BTCUSDT")
+        book.apply_snapshot({
+            "lastUpdateId": 0,
+            "bids": [[f"{50000 - i * 0.1:.1f}", "1"] for i in range(1000)],
+            "asks": [[f"{50000.1 + i * 0.1:.1f}", "1"] for i in range(1000)],
+        })
+        events = []
+        for n in range(1, 5001):
+            events.append({
+                "U": n, "u": n, "pu": n - 1,
+                "b": [[f"{50000 - rng.randint(0, 200) * 0.1:.1f}", f"{rng.choice([0, 1, 2])}"] for _ in range(5)],
+                "a": [[f"{50000.1 + rng.randint(0, 200) * 0.1:.1f}", f"{rng.choice([0, 1, 2])}"] for _ in range(5)],
+            })
+
+        expected = {
+            "bids": {round(50000 - i * 0.1, 1): 1.0 for i in range(1000)},
+            "asks": {round(50000.1 + i * 0.1, 1): 1.0 for i in range(1000)},
+        }
+        for event in events:
+            book.apply_diff(event)
+            for side, key in (("bids", "b"), ("asks", "a")):
+                for price, quantity in event[key]:
+                    if float(quantity):
+                        expected[side][float(price)] = float(quantity)
+                    else:
+                        expected[side].pop(float(price), None)
+
+        assert book.updates == 5000
+        top = book.top(2000)
+        assert top["bids"] == sorted(expected["bids"].items(), reverse=True)
+        assert top["asks"] == sorted(expected["asks"].items())
+
+    @pytest.mark.asyncio
+    async def test_stream_resyncs_order_book(self):
+        """測試 WebSocket 增量深度維護訂單簿，缺口後自動重新獲取快照"""
+        server = FakeBinanceStreamServer()
+        await server.start()
+        events = [line["data"] for line in self.feed if line["type"] == "depthUpdate"]
+        snapshots = [line["data"] for line in self.feed if line["type"] == "snapshot"]
+        requested = []
+
+        async def fetch_snapshot(symbol):
+            requested.append(symbol)
+            return snapshots[len(requested) - 1]
+
+        stream = BinanceMarketStream(server.url, reconnect_delay=0.01)
+        await stream.start()
+        try:
+            await stream.wait_connected(2.0)
+            await stream.subscribe_depth(["BTCUSDT"], fetch_snapshot)
+            await self._wait_for(lambda: server.subscriptions)
+            assert server.subscriptions[0] == ["btcusdt@depth@100ms"]
+            book = stream.order_books["BTCUSDT"]
+
+            for event in events[:200] + events[201:]:
+                await server.push("btcusdt@depth@100ms", event)
+            await self._wait_for(lambda: book.last_update_id == self.final["lastUpdateId"])
+
+            assert requested == ["BTCUSDT", "BTCUSDT"]
+            assert book.gaps == 1
+            self.assert_matches_final(book)
+
+            await stream.unsubscribe_depth(["BTCUSDT"])
+            assert "BTCUSDT" not in stream.order_books
+        finally:
+            await stream.stop()
+            await server.stop()
+
+    async def _wait_for(self, condition, timeout=2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            assert asyncio.get_running_loop().time() < deadline, "等待超時"
+            await asyncio.sleep(0.01)
+
+
 class TestRiskManager:
     """風險管理測試"""
     
@@ -362,6 +1107,17 @@ class TestRiskManager:
         assert AlertType.LEVERAGE_WARNING in alert_types or AlertType.DRAWDOWN_WARNING in alert_types
 
 
+class FakeMarketStream:
+    """按需推送行情的訂閱"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    async def updates(self, symbols=None):
+        while True:
+            yield await self.queue.get()
+
+
 class TestTradingCoordinator:
     """交易協調器測試"""
     
@@ -420,6 +1176,85 @@ class TestTradingCoordinator:
         assert self.coordinator.status.state == TradingState.STOPPED
         assert self.coordinator.running is False
     
+    @pytest.mark.asyncio
+    async def test_market_stream_drives_main_loop(self):
+        """測試啟動時訂閱行情推送，推送到達後立即處理而不等待輪詢間隔"""
+        stream = FakeMarketStream()
+        exchange = self.exchange_manager.get_exchange()
+        exchange.start_market_stream = AsyncMock(return_value=stream)
+        coordinator = TradingCoordinator(
+            self.config, self.exchange_manager, initial_balance=10000.0, update_interval=30.0
+        )
+
+        await coordinator.start()
+        try:
+            exchange.start_market_stream.assert_awaited_once_with(["BTCUSDT"])
+            assert coordinator.market_stream_task is not None
+            await asyncio.sleep(0.05)
+
+            stream.queue.put_nowait(MarketData(symbol="BTCUSDT", price=12345.0, volume=1.0, timestamp=0.0))
+            deadline = asyncio.get_running_loop().time() + 1.0
+            while coordinator.market_data["BTCUSDT"].price != 12345.0:
+                assert asyncio.get_running_loop().time() < deadline, "推送行情未被處理"
+                await asyncio.sleep(0.01)
+            assert coordinator.price_history["BTCUSDT"][-1] == 12345.0
+        finally:
+            await coordinator.stop()
+        assert coordinator.market_stream_task is None
+
+    @pytest.mark.asyncio
+    async def test_polling_without_market_stream(self):
+        """測試關閉行情推送時不訂閱，按更新間隔輪詢"""
+        exchange = self.exchange_manager.get_exchange()
+        exchange.start_market_stream = AsyncMock()
+        coordinator = TradingCoordinator(
+            self.config, self.exchange_manager, update_interval=0.1, use_market_stream=False
+        )
+        await coordinator.start()
+        await coordinator.stop()
+        exchange.start_market_stream.assert_not_awaited()
+        assert coordinator.market_stream_task is None
+
+    @pytest.mark.asyncio
+    async def test_order_book_prices_orders(self):
+        """測試啟動時訂閱交易對的訂單簿，訂單價格按深度計算，停止時取消訂閱"""
+        exchange = self.exchange_manager.get_exchange()
+
+        async def start_order_book(symbols):
+            for symbol in symbols:
+                book = OrderBook(symbol)
+                book.apply_snapshot({
+                    "lastUpdateId": 1,
+                    "bids": [["49999.9", "1"]],
+                    "asks": [["50000.1", "0.3"], ["50001.0", "1"], ["50100.0", "10"]],
+                })
+                exchange.order_books[symbol] = book
+            return exchange.order_books
+
+        async def stop_order_book(symbols):
+            for symbol in symbols:
+                exchange.order_books.pop(symbol, None)
+
+        exchange.start_order_book = AsyncMock(side_effect=start_order_book)
+        exchange.stop_order_book = AsyncMock(side_effect=stop_order_book)
+        signal = StrategySignal(
+            symbol="BTCUSDT",
+            signal_type=SignalType.BUY,
+            strength=0.8,
+            price=50000.0,
+            metadata={}
+        )
+
+        await self.coordinator.start()
+        try:
+            exchange.start_order_book.assert_awaited_once_with(["BTCUSDT"])
+            engine = self.coordinator.execution_engine
+            assert engine._calculate_order_price(signal, 50000.0, 0.5) == 50001.0
+        finally:
+            await self.coordinator.stop()
+        exchange.stop_order_book.assert_awaited_once_with(["BTCUSDT"])
+        assert engine._calculate_order_price(signal, 50000.0, 0.5) == pytest.approx(50050.0)
+
     def test_event_system(self):
         """測試事件系統"""
         events_received = []